@@ -8,6 +8,7 @@ Features:
 """
 
 import asyncio
+from pathlib import Path
 from typing import Any, Callable, Dict, Optional
 
 import structlog
@@ -24,7 +25,9 @@ from telegram.ext import (
 from ..config.features import FeatureFlags
 from ..config.settings import Settings
 from ..exceptions import ClaudeCodeTelegramError
+from ..storage.telegram_persistence import SQLitePersistence
 from .features.registry import FeatureRegistry
+from .middleware.pipeline import MiddlewarePipeline
 
 logger = structlog.get_logger()
 
@@ -39,19 +42,19 @@ class ClaudeCodeBot:
         self.app: Optional[Application] = None
         self.is_running = False
         self.feature_registry: Optional[FeatureRegistry] = None
+        self.middleware_pipeline: Optional[MiddlewarePipeline] = None
 
     async def initialize(self) -> None:
         """Initialize bot application."""
         logger.info("Initializing Telegram bot")
 
-        # Create application with persistence
-        from telegram.ext import PicklePersistence
-        import os
-
-        # Set up persistence for user_data and context
-        persistence_file = os.path.join(os.getcwd(), "data", "telegram_persistence.pickle")
-        os.makedirs(os.path.dirname(persistence_file), exist_ok=True)
-        persistence = PicklePersistence(filepath=persistence_file)
+        # Create application with persistence for user_data and context,
+        # stored per key in the bot database
+        persistence = SQLitePersistence(
+            self.deps["storage"].db_manager,
+            update_interval=self.settings.telegram_persistence_interval_seconds,
+            legacy_pickle=Path.cwd() / "data" / "telegram_persistence.pickle",
+        )
 
         builder = Application.builder()
         builder.token(self.settings.telegram_token_str)
@@ -84,15 +87,6 @@ class ClaudeCodeBot:
         # Add middleware
         self._add_middleware()
 
-        # Add Claude availability middleware
-        from .middleware.claude_availability import claude_availability_middleware
-        self.app.add_handler(
-            MessageHandler(
-                filters.ALL, self._create_middleware_handler(claude_availability_middleware)
-            ),
-            group=-4,
-        )
-
         # Set error handler
         self.app.add_error_handler(self._error_handler)
 
@@ -253,60 +247,36 @@ class ClaudeCodeBot:
     def _add_middleware(self) -> None:
         """Add middleware to application."""
         from .middleware.auth import auth_middleware
+        from .middleware.claude_availability import claude_availability_middleware
         from .middleware.rate_limit import rate_limit_middleware
         from .middleware.security import security_middleware
 
-        # Middleware runs in order of group numbers (lower = earlier)
-        # Security middleware first (validate inputs)
-        self.app.add_handler(
-            MessageHandler(
-                filters.ALL, self._create_middleware_handler(security_middleware)
-            ),
-            group=-3,
+        # Stages run in order in a single handler group ahead of all others:
+        # Claude availability, then security (validate inputs), then
+        # authentication, then rate limiting
+        self.middleware_pipeline = MiddlewarePipeline(
+            [
+                ("claude_availability", claude_availability_middleware),
+                ("security", security_middleware),
+                ("auth", auth_middleware),
+                ("rate_limit", rate_limit_middleware),
+            ],
+            dependencies=self.deps,
+            settings=self.settings,
         )
-
-        # Authentication second
         self.app.add_handler(
-            MessageHandler(
-                filters.ALL, self._create_middleware_handler(auth_middleware)
-            ),
-            group=-2,
+            MessageHandler(filters.ALL, self.middleware_pipeline), group=-1
         )
 
-        # Rate limiting third
-        self.app.add_handler(
-            MessageHandler(
-                filters.ALL, self._create_middleware_handler(rate_limit_middleware)
-            ),
-            group=-1,
+        logger.info(
+            "Middleware added to bot", stages=self.middleware_pipeline.stage_names
         )
 
-        logger.info("Middleware added to bot")
-
-    def _create_middleware_handler(self, middleware_func: Callable) -> Callable:
-        """Create middleware handler that injects dependencies."""
-
-        async def middleware_wrapper(
-            update: Update, context: ContextTypes.DEFAULT_TYPE
-        ):
-            # Inject dependencies into context
-            for key, value in self.deps.items():
-                context.bot_data[key] = value
-            context.bot_data["settings"] = self.settings
-
-            # Create a dummy handler that continues processing
-            async def continue_handler(event, data):
-                # This allows the message to continue to the actual handlers
-                return None
-
-            # Call middleware with Telegram-style parameters
-            result = await middleware_func(continue_handler, update, context.bot_data)
-            
-            # If middleware returns None, it blocked the request
-            # If it returns result of handler, continue processing
-            return result
-
-        return middleware_wrapper
+    def get_middleware_stats(self) -> Dict[str, Any]:
+        """Get middleware pipeline counters and latency histograms."""
+        if not self.middleware_pipeline:
+            return {}
+        return self.middleware_pipeline.get_stats()
 
     async def start(self) -> None:
         """Start the bot."""
@@ -366,6 +336,11 @@ class ClaudeCodeBot:
             if self.feature_registry:
                 self.feature_registry.shutdown()
 
+            if self.middleware_pipeline:
+                logger.info(
+                    "Middleware pipeline stats", **self.middleware_pipeline.get_stats()
+                )
+
             if self.app:
                 # Stop the updater if it's running
                 if self.app.updater.running:
@@ -0,0 +1,263 @@
+"""
+Streaming archive inspection for uploaded zip/tar files
+
+Features:
+- Members read straight from the zip/tar stream, nothing extracted to disk
+- File tree, counts and head snippets collected in one pass
+- Hard limits on uncompressed size, entry count and snippet memory
+- Compression-ratio zip bomb detection
+"""
+
+import bisect
+import tarfile
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import IO, Callable, Dict, List, Optional, Set, Tuple
+
+# Same limit the extracting implementation enforced
+MAX_UNCOMPRESSED_SIZE = 100 * 1024 * 1024
+MAX_ENTRIES = 50_000
+# Source code rarely compresses beyond ~20:1; bombs go far past 1000:1
+MAX_COMPRESSION_RATIO = 200
+# Small members can have absurd ratios legitimately (e.g. a run of zeros)
+RATIO_CHECK_MIN_SIZE = 1024 * 1024
+MAX_TREE_LINES = 1000
+SNIPPET_FILES = 5
+SNIPPET_CHARS = 1000
+# Enough bytes for SNIPPET_CHARS of UTF-8 text, after newline translation
+SNIPPET_BYTES = SNIPPET_CHARS * 4 + 8
+
+# Code files under these directories are never picked as key files
+EXCLUDED_PARTS = {"node_modules", "__pycache__", ".git", "dist", "build"}
+
+
+@dataclass
+class _TreeNode:
+    """Directory in the archive tree"""
+
+    dirs: Dict[str, "_TreeNode"] = field(default_factory=dict)
+    files: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class ArchiveSummary:
+    """What an archive contains, without its contents"""
+
+    file_tree: str
+    entry_count: int
+    code_file_count: int
+    # (relative path, first SNIPPET_CHARS characters) of the key code files
+    snippets: List[Tuple[str, str]]
+    uncompressed_size: int
+
+
+class ArchiveReader:
+    """Single-pass, bounded reader for zip and tar archives"""
+
+    def __init__(
+        self,
+        code_extensions: Set[str],
+        priority: Callable[[str], tuple],
+        format_size: Callable[[int], str],
+    ):
+        self.code_extensions = code_extensions
+        self.priority = priority
+        self.format_size = format_size
+
+    def read(self, archive_path: Path) -> ArchiveSummary:
+        """Inspect an archive; raises ValueError for unsafe archives"""
+        state = _ReadState(self, archive_path.stat().st_size)
+
+        if archive_path.suffix == ".zip":
+            self._read_zip(archive_path, state)
+        elif archive_path.suffix in {".tar", ".gz", ".bz2", ".xz"}:
+            self._read_tar(archive_path, state)
+
+        return state.summary()
+
+    def _read_zip(self, archive_path: Path, state: "_ReadState") -> None:
+        with zipfile.ZipFile(archive_path) as zf:
+            infos = zf.infolist()
+            if len(infos) > MAX_ENTRIES:
+                raise ValueError("Archive has too many entries")
+
+            # Headers are checked up front, before anything is decompressed
+            total_size = sum(info.file_size for info in infos)
+            state.check_size(total_size)
+            for info in infos:
+                if (
+                    info.file_size > RATIO_CHECK_MIN_SIZE
+                    and info.file_size > info.compress_size * MAX_COMPRESSION_RATIO
+                ):
+                    raise ValueError("Archive compression ratio too high")
+
+            for info in infos:
+                path = _safe_parts(info.filename)
+                if path is None:
+                    continue
+                if info.is_dir():
+                    state.add_dir(path)
+                elif state.add_file(path, info.file_size):
+                    with zf.open(info) as source:
+                        state.add_snippet(path, source)
+
+    def _read_tar(self, archive_path: Path, state: "_ReadState") -> None:
+        # Stream mode: members are visited once, in archive order
+        with tarfile.open(archive_path, "r|*") as tf:
+            entries = 0
+            for member in tf:
+                # Check before the member's data gets decompressed
+                state.check_size(member.offset_data + member.size)
+                entries += 1
+                if entries > MAX_ENTRIES:
+                    raise ValueError("Archive has too many entries")
+
+                if member.name.startswith("/") or ".." in member.name:
+                    continue
+                path = _safe_parts(member.name)
+                if path is None:
+                    continue
+                if member.isdir():
+                    state.add_dir(path)
+                elif member.isfile() and state.add_file(path, member.size):
+                    source = tf.extractfile(member)
+                    if source is not None:
+                        state.add_snippet(path, source)
+
+
+class _ReadState:
+    """Tree, counts and best snippets accumulated while reading"""
+
+    def __init__(self, reader: ArchiveReader, archive_size: int):
+        self.reader = reader
+        self.archive_size = max(archive_size, 1)
+        self.root = _TreeNode()
+        self.entry_count = 0
+        self.code_file_count = 0
+        self.uncompressed_size = 0
+        # Best SNIPPET_FILES key files so far as (priority, path, snippet)
+        self._best: List[Tuple[tuple, str, str]] = []
+
+    def check_size(self, uncompressed: int) -> None:
+        """Enforce size and whole-archive ratio limits"""
+        self.uncompressed_size = max(self.uncompressed_size, uncompressed)
+        if uncompressed > MAX_UNCOMPRESSED_SIZE:
+            raise ValueError("Archive too large")
+        if (
+            uncompressed > RATIO_CHECK_MIN_SIZE
+            and uncompressed > self.archive_size * MAX_COMPRESSION_RATIO
+        ):
+            raise ValueError("Archive compression ratio too high")
+
+    def add_dir(self, parts: Tuple[str, ...]) -> _TreeNode:
+        """Add a directory (and missing parents) to the tree"""
+        node = self.root
+        for name in parts:
+            child = node.dirs.get(name)
+            if child is None:
+                child = node.dirs[name] = _TreeNode()
+                self.entry_count += 1
+            node = child
+        return node
+
+    def add_file(self, parts: Tuple[str, ...], size: int) -> bool:
+        """Add a file; True if its head should be read as a key file"""
+        parent = self.add_dir(parts[:-1])
+        name = parts[-1]
+        if name in parent.dirs:
+            return False
+        if name in parent.files:
+            # Duplicate entry: the later one wins, as with extraction
+            parent.files[name] = size
+            return False
+        self.entry_count += 1
+        parent.files[name] = size
+
+        if PurePosixPath(name).suffix.lower() not in self.reader.code_extensions:
+            return False
+        if any(part in EXCLUDED_PARTS for part in parts):
+            return False
+        self.code_file_count += 1
+
+        return len(self._best) < SNIPPET_FILES or self._key(parts) < self._best[-1][0]
+
+    def add_snippet(self, parts: Tuple[str, ...], source: IO[bytes]) -> None:
+        """Read a bounded head of a key file"""
+        head = source.read(SNIPPET_BYTES)
+        text = head.decode("utf-8", errors="ignore")
+        # Match read_text() universal newline handling
+        text = text.replace("\r\n", "\n").replace("\r", "\n")[:SNIPPET_CHARS]
+
+        bisect.insort(self._best, (self._key(parts), "/".join(parts), text))
+        del self._best[SNIPPET_FILES:]
+
+    def summary(self) -> ArchiveSummary:
+        """Build the final summary"""
+        return ArchiveSummary(
+            file_tree=self._render_tree(),
+            entry_count=self.entry_count,
+            code_file_count=self.code_file_count,
+            snippets=[(path, text) for _, path, text in self._best],
+            uncompressed_size=self.uncompressed_size,
+        )
+
+    def _key(self, parts: Tuple[str, ...]) -> tuple:
+        # The path breaks ties between equally important names
+        return self.reader.priority(parts[-1]) + ("/".join(parts),)
+
+    def _render_tree(self) -> str:
+        """Render like FileHandler._build_file_tree, capped in length"""
+        lines: List[str] = []
+        truncated = 0
+        # (node, sorted entries, next index, prefix) per open directory
+        stack = [(self.root, _sorted_entries(self.root), 0, "")]
+
+        while stack:
+            node, entries, index, prefix = stack[-1]
+            if index >= len(entries):
+                stack.pop()
+                continue
+            stack[-1] = (node, entries, index + 1, prefix)
+            name, child = entries[index]
+
+            if len(lines) >= MAX_TREE_LINES:
+                truncated += 1 + (_count_entries(child) if child else 0)
+                continue
+
+            is_last = index == len(entries) - 1
+            connector = "└── " if is_last else "├── "
+            if child is not None:
+                lines.append(f"{prefix}{connector}{name}/")
+                sub_prefix = prefix + ("    " if is_last else "│   ")
+                stack.append((child, _sorted_entries(child), 0, sub_prefix))
+            else:
+                size = self.reader.format_size(node.files[name])
+                lines.append(f"{prefix}{connector}{name} ({size})")
+
+        if truncated:
+            lines.append(f"... ({truncated} more entries)")
+        return "\n".join(lines)
+
+
+def _sorted_entries(node: _TreeNode) -> List[Tuple[str, Optional[_TreeNode]]]:
+    """Directories first, then files, each sorted by name"""
+    entries: List[Tuple[str, Optional[_TreeNode]]] = sorted(node.dirs.items())
+    entries += [(name, None) for name in sorted(node.files)]
+    return entries
+
+
+def _count_entries(node: _TreeNode) -> int:
+    count = len(node.files)
+    for child in node.dirs.values():
+        count += 1 + _count_entries(child)
+    return count
+
+
+def _safe_parts(name: str) -> Optional[Tuple[str, ...]]:
+    """Split a member name, rejecting absolute and traversing paths"""
+    path = PurePosixPath(name)
+    if path.is_absolute() or ".." in path.parts:
+        return None
+    parts = tuple(part for part in path.parts if part not in ("", "."))
+    return parts or None
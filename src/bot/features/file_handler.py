@@ -3,25 +3,89 @@ Advanced file handling
 
 Features:
 - Multiple file processing
-- Zip archive extraction
-- Code analysis
+- Streaming zip/tar inspection without extraction
+- Code analysis (single pruned walk, threaded TODO scan, cached per tree state)
 - Diff generation
 """
 
-import shutil
-import tarfile
+import asyncio
+import copy
+import fnmatch
+import hashlib
+import os
+import re
 import uuid
-import zipfile
-from collections import defaultdict
-from dataclasses import dataclass
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Set, Tuple
 
 from telegram import Document
 
 from src.config import Settings
 from src.security.validators import SecurityValidator
 
+from .archive_reader import ArchiveReader
+
+# Common entry point file names, in reporting order
+ENTRY_POINT_FILES = [
+    "main.py",
+    "app.py",
+    "server.py",
+    "__main__.py",
+    "index.js",
+    "app.js",
+    "server.js",
+    "main.js",
+    "main.go",
+    "main.rs",
+    "main.cpp",
+    "main.c",
+    "Main.java",
+    "App.java",
+    "index.php",
+    "index.html",
+]
+
+# Common test file patterns and top-level test directories
+TEST_FILE_PATTERNS = [
+    "test_*.py",
+    "*_test.py",
+    "*_test.go",
+    "*.test.js",
+    "*.spec.js",
+    "*.test.ts",
+    "*.spec.ts",
+]
+TEST_DIRECTORIES = {"test", "tests", "__tests__", "spec"}
+_ENTRY_POINT_NAMES = frozenset(ENTRY_POINT_FILES)
+_TEST_FILE_RE = re.compile(
+    "|".join(fnmatch.translate(pattern) for pattern in TEST_FILE_PATTERNS)
+)
+
+TODO_SCAN_WORKERS = 8
+ANALYSIS_CACHE_SIZE = 16
+
+
+def _count_todos(paths: List[str]) -> int:
+    """Count TODO and FIXME markers in a batch of files (runs in a worker)"""
+    count = 0
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        if data.isascii():
+            # Same result as decoding first, without the copy
+            data = data.upper()
+            count += data.count(b"TODO") + data.count(b"FIXME")
+        else:
+            text = data.decode("utf-8", errors="ignore").upper()
+            count += text.count("TODO") + text.count("FIXME")
+    return count
+
 
 @dataclass
 class ProcessedFile:
@@ -44,6 +108,21 @@ class CodebaseAnalysis:
     file_stats: Dict[str, int]
 
 
+@dataclass
+class _CodebaseWalk:
+    """Everything the analyzers need, collected in one walk"""
+
+    languages: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    file_extensions: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    entry_points: Dict[str, List[str]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    code_files: List[str] = field(default_factory=list)
+    root_files: Set[str] = field(default_factory=set)
+    has_tests: bool = False
+    fingerprint: str = ""
+
+
 class FileHandler:
     """Handle various file operations"""
 
@@ -130,6 +209,31 @@ class FileHandler:
             ".xml": "XML",
         }
 
+        # Directories never descended into during codebase analysis
+        self.ignored_dirs = {
+            "node_modules",
+            "__pycache__",
+            ".git",
+            ".hg",
+            ".svn",
+            ".venv",
+            "venv",
+            ".tox",
+            ".mypy_cache",
+            ".pytest_cache",
+            "dist",
+            "build",
+        }
+
+        self.archive_reader = ArchiveReader(
+            self.code_extensions, self._code_file_priority, self._format_size
+        )
+
+        # Most recent analysis per directory, keyed by tree fingerprint
+        self._analysis_cache: "OrderedDict[str, Tuple[str, CodebaseAnalysis]]" = (
+            OrderedDict()
+        )
+
     async def handle_document_upload(
         self, document: Document, user_id: int, context: str = ""
     ) -> ProcessedFile:
@@ -191,77 +295,27 @@ class FileHandler:
             return "binary"
 
     async def _process_archive(self, archive_path: Path, context: str) -> ProcessedFile:
-        """Extract and analyze archive contents"""
+        """Analyze archive contents straight from the archive stream"""
 
-        # Create extraction directory
-        extract_dir = self.temp_dir / f"extract_{uuid.uuid4()}"
-        extract_dir.mkdir()
+        # Bounded single pass off the event loop; raises for unsafe archives
+        summary = await asyncio.to_thread(self.archive_reader.read, archive_path)
 
-        try:
-            # Extract based on type
-            if archive_path.suffix == ".zip":
-                with zipfile.ZipFile(archive_path) as zf:
-                    # Security check - prevent zip bombs
-                    total_size = sum(f.file_size for f in zf.filelist)
-                    if total_size > 100 * 1024 * 1024:  # 100MB limit
-                        raise ValueError("Archive too large")
-
-                    # Extract with security checks
-                    for file_info in zf.filelist:
-                        # Prevent path traversal
-                        file_path = Path(file_info.filename)
-                        if file_path.is_absolute() or ".." in file_path.parts:
-                            continue
-
-                        # Extract file
-                        target_path = extract_dir / file_path
-                        target_path.parent.mkdir(parents=True, exist_ok=True)
-
-                        with (
-                            zf.open(file_info) as source,
-                            open(target_path, "wb") as target,
-                        ):
-                            shutil.copyfileobj(source, target)
-
-            elif archive_path.suffix in {".tar", ".gz", ".bz2", ".xz"}:
-                with tarfile.open(archive_path) as tf:
-                    # Security checks
-                    total_size = sum(member.size for member in tf.getmembers())
-                    if total_size > 100 * 1024 * 1024:  # 100MB limit
-                        raise ValueError("Archive too large")
-
-                    # Extract with security checks
-                    for member in tf.getmembers():
-                        # Prevent path traversal
-                        if member.name.startswith("/") or ".." in member.name:
-                            continue
-
-                        tf.extract(member, extract_dir)
-
-            # Analyze contents
-            file_tree = self._build_file_tree(extract_dir)
-            code_files = self._find_code_files(extract_dir)
-
-            # Create analysis prompt
-            prompt = f"{context}\n\nProject structure:\n{file_tree}\n\n"
-
-            # Add key files
-            for file_path in code_files[:5]:  # Limit to 5 files
-                content = file_path.read_text(encoding="utf-8", errors="ignore")
-                prompt += f"\nFile: {file_path.relative_to(extract_dir)}\n```\n{content[:1000]}...\n```\n"
-
-            return ProcessedFile(
-                type="archive",
-                prompt=prompt,
-                metadata={
-                    "file_count": len(list(extract_dir.rglob("*"))),
-                    "code_files": len(code_files),
-                },
-            )
+        # Create analysis prompt
+        prompt = f"{context}\n\nProject structure:\n{summary.file_tree}\n\n"
 
-        finally:
-            # Cleanup
-            shutil.rmtree(extract_dir, ignore_errors=True)
+        # Add key files
+        for relative_path, snippet in summary.snippets:
+            prompt += f"\nFile: {relative_path}\n```\n{snippet}...\n```\n"
+
+        return ProcessedFile(
+            type="archive",
+            prompt=prompt,
+            metadata={
+                "file_count": summary.entry_count,
+                "code_files": summary.code_file_count,
+                "uncompressed_size": summary.uncompressed_size,
+            },
+        )
 
     async def _process_code_file(self, file_path: Path, context: str) -> ProcessedFile:
         """Process single code file"""
@@ -299,28 +353,6 @@ class FileHandler:
             },
         )
 
-    def _build_file_tree(self, directory: Path, prefix: str = "") -> str:
-        """Build visual file tree"""
-        items = sorted(directory.iterdir(), key=lambda x: (x.is_file(), x.name))
-        tree_lines = []
-
-        for i, item in enumerate(items):
-            is_last = i == len(items) - 1
-            current_prefix = "└── " if is_last else "├── "
-
-            if item.is_dir():
-                tree_lines.append(f"{prefix}{current_prefix}{item.name}/")
-                # Recursive call with updated prefix
-                sub_prefix = prefix + ("    " if is_last else "│   ")
-                tree_lines.append(self._build_file_tree(item, sub_prefix))
-            else:
-                size = item.stat().st_size
-                tree_lines.append(
-                    f"{prefix}{current_prefix}{item.name} ({self._format_size(size)})"
-                )
-
-        return "\n".join(filter(None, tree_lines))
-
     def _format_size(self, size: int) -> str:
         """Format file size for display"""
         for unit in ["B", "KB", "MB", "GB"]:
@@ -329,42 +361,25 @@ class FileHandler:
             size /= 1024.0
         return f"{size:.1f}TB"
 
-    def _find_code_files(self, directory: Path) -> List[Path]:
-        """Find all code files in directory"""
-        code_files = []
-
-        for file_path in directory.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in self.code_extensions:
-                # Skip common non-code directories
-                if any(
-                    part in file_path.parts
-                    for part in ["node_modules", "__pycache__", ".git", "dist", "build"]
-                ):
-                    continue
-                code_files.append(file_path)
-
-        # Sort by importance (main files first, then by name)
-        def sort_key(path: Path) -> tuple:
-            name = path.name.lower()
-            # Prioritize main/index files
-            if name in [
-                "main.py",
-                "index.js",
-                "app.py",
-                "server.py",
-                "main.go",
-                "main.rs",
-            ]:
-                return (0, name)
-            elif name.startswith("index."):
-                return (1, name)
-            elif name.startswith("main."):
-                return (2, name)
-            else:
-                return (3, name)
-
-        code_files.sort(key=sort_key)
-        return code_files
+    def _code_file_priority(self, name: str) -> tuple:
+        """Sort key for code files (main files first, then by name)"""
+        name = name.lower()
+        # Prioritize main/index files
+        if name in [
+            "main.py",
+            "index.js",
+            "app.py",
+            "server.py",
+            "main.go",
+            "main.rs",
+        ]:
+            return (0, name)
+        elif name.startswith("index."):
+            return (1, name)
+        elif name.startswith("main."):
+            return (2, name)
+        else:
+            return (3, name)
 
     def _detect_language(self, extension: str) -> str:
         """Detect programming language from extension"""
@@ -372,79 +387,101 @@ class FileHandler:
 
     async def analyze_codebase(self, directory: Path) -> CodebaseAnalysis:
         """Analyze entire codebase"""
+        key = str(directory)
+        walk = await asyncio.to_thread(self._walk_codebase, directory)
+
+        cached = self._analysis_cache.get(key)
+        if cached is not None and cached[0] == walk.fingerprint:
+            self._analysis_cache.move_to_end(key)
+            return copy.deepcopy(cached[1])
 
         analysis = CodebaseAnalysis(
-            languages={},
-            frameworks=[],
-            entry_points=[],
-            todo_count=0,
-            test_coverage=False,
-            file_stats={},
+            languages=dict(walk.languages),
+            frameworks=self._detect_frameworks(directory, walk.root_files),
+            entry_points=self._find_entry_points(walk),
+            todo_count=await self._find_todos(walk.code_files),
+            test_coverage=walk.has_tests,
+            file_stats=dict(walk.file_extensions),
         )
 
-        # Language detection
-        language_stats = defaultdict(int)
-        file_extensions = defaultdict(int)
+        self._analysis_cache[key] = (walk.fingerprint, copy.deepcopy(analysis))
+        self._analysis_cache.move_to_end(key)
+        while len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+            self._analysis_cache.popitem(last=False)
+
+        return analysis
 
-        for file_path in directory.rglob("*"):
-            if file_path.is_file():
-                ext = file_path.suffix.lower()
-                file_extensions[ext] += 1
+    def _walk_codebase(self, directory: Path) -> _CodebaseWalk:
+        """Walk the tree once with os.scandir, pruning ignored directories"""
+        walk = _CodebaseWalk()
+        # Directory mtimes catch added, removed and renamed entries; the
+        # stats of files that are read catch content changes
+        digest = hashlib.blake2b(digest_size=16)
+        stack = [(str(directory), "")]
+
+        while stack:
+            path, relative = stack.pop()
+            try:
+                digest.update(f"{relative}\0{os.stat(path).st_mtime_ns}\n".encode())
+                with os.scandir(path) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+
+            for entry in entries:
+                name = entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in self.ignored_dirs:
+                            stack.append((entry.path, f"{relative}{name}/"))
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
 
+                # Same rule as Path.suffix
+                dot = name.rfind(".")
+                ext = name[dot:].lower() if 0 < dot < len(name) - 1 else ""
+                walk.file_extensions[ext] += 1
                 language = self._detect_language(ext)
                 if language and language != "text":
-                    language_stats[language] += 1
-
-        analysis.languages = dict(language_stats)
-        analysis.file_stats = dict(file_extensions)
-
-        # Find entry points
-        analysis.entry_points = self._find_entry_points(directory)
-
-        # Detect frameworks
-        analysis.frameworks = self._detect_frameworks(directory)
-
-        # Find TODOs and FIXMEs
-        analysis.todo_count = await self._find_todos(directory)
-
-        # Check for tests
-        test_files = self._find_test_files(directory)
-        analysis.test_coverage = len(test_files) > 0
+                    walk.languages[language] += 1
 
-        return analysis
+                if name in _ENTRY_POINT_NAMES:
+                    walk.entry_points[name].append(f"{relative}{name}")
 
-    def _find_entry_points(self, directory: Path) -> List[str]:
+                if not walk.has_tests and (
+                    _TEST_FILE_RE.match(name)
+                    or relative.partition("/")[0] in TEST_DIRECTORIES
+                ):
+                    walk.has_tests = True
+
+                is_code = ext in self.code_extensions
+                if is_code:
+                    walk.code_files.append(entry.path)
+                if not relative:
+                    walk.root_files.add(name)
+                if is_code or not relative:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    digest.update(
+                        f"{relative}{name}\0{st.st_mtime_ns}\0{st.st_size}\n".encode()
+                    )
+
+        walk.fingerprint = digest.hexdigest()
+        return walk
+
+    def _find_entry_points(self, walk: _CodebaseWalk) -> List[str]:
         """Find likely entry points in the codebase"""
         entry_points = []
-
-        # Common entry point patterns
-        patterns = [
-            "main.py",
-            "app.py",
-            "server.py",
-            "__main__.py",
-            "index.js",
-            "app.js",
-            "server.js",
-            "main.js",
-            "main.go",
-            "main.rs",
-            "main.cpp",
-            "main.c",
-            "Main.java",
-            "App.java",
-            "index.php",
-            "index.html",
-        ]
-
-        for pattern in patterns:
-            for file_path in directory.rglob(pattern):
-                if file_path.is_file():
-                    entry_points.append(str(file_path.relative_to(directory)))
-
+        for name in ENTRY_POINT_FILES:
+            entry_points.extend(sorted(walk.entry_points.get(name, [])))
         return entry_points
 
-    def _detect_frameworks(self, directory: Path) -> List[str]:
+    def _detect_frameworks(self, directory: Path, root_files: Set[str]) -> List[str]:
         """Detect frameworks and libraries used"""
         frameworks = []
 
@@ -461,61 +498,38 @@ class FileHandler:
         }
 
         for indicator_file, possible_frameworks in indicators.items():
-            file_path = directory / indicator_file
-            if file_path.exists():
+            if indicator_file in root_files:
+                file_path = directory / indicator_file
                 content = file_path.read_text(encoding="utf-8", errors="ignore").lower()
                 for framework in possible_frameworks:
                     if framework.lower() in content:
                         frameworks.append(framework)
 
         # Check for specific framework files
-        if (directory / "manage.py").exists():
+        if "manage.py" in root_files:
             frameworks.append("Django")
-        if (directory / "artisan").exists():
+        if "artisan" in root_files:
             frameworks.append("Laravel")
-        if (directory / "next.config.js").exists():
+        if "next.config.js" in root_files:
             frameworks.append("Next.js")
 
         return list(set(frameworks))  # Remove duplicates
 
-    async def _find_todos(self, directory: Path) -> int:
-        """Count TODO and FIXME comments"""
-        todo_count = 0
-
-        for file_path in directory.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in self.code_extensions:
-                try:
-                    content = file_path.read_text(encoding="utf-8", errors="ignore")
-                    # Count TODOs and FIXMEs
-                    todo_count += content.upper().count("TODO")
-                    todo_count += content.upper().count("FIXME")
-                except Exception:
-                    continue
-
-        return todo_count
-
-    def _find_test_files(self, directory: Path) -> List[Path]:
-        """Find test files in the codebase"""
-        test_files = []
-
-        # Common test patterns
-        test_patterns = [
-            "test_*.py",
-            "*_test.py",
-            "*_test.go",
-            "*.test.js",
-            "*.spec.js",
-            "*.test.ts",
-            "*.spec.ts",
-        ]
-
-        for pattern in test_patterns:
-            test_files.extend(directory.rglob(pattern))
-
-        # Check test directories
-        for test_dir_name in ["test", "tests", "__tests__", "spec"]:
-            test_dir = directory / test_dir_name
-            if test_dir.exists() and test_dir.is_dir():
-                test_files.extend(test_dir.rglob("*"))
-
-        return [f for f in test_files if f.is_file()]
+    async def _find_todos(self, code_files: List[str]) -> int:
+        """Count TODO and FIXME comments across a thread pool"""
+        if not code_files:
+            return 0
+
+        workers = min(TODO_SCAN_WORKERS, len(code_files))
+        batches = [code_files[i::workers] for i in range(workers)]
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="todo-scan"
+        ) as executor:
+            counts = await asyncio.gather(
+                *(
+                    loop.run_in_executor(executor, _count_todos, batch)
+                    for batch in batches
+                )
+            )
+        return sum(counts)
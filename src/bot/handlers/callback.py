@@ -3,6 +3,7 @@
 import structlog
 from datetime import datetime
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
 from ...claude.facade import ClaudeIntegration
@@ -11,7 +12,9 @@ from ...security.audit import AuditLogger
 from ...security.validators import SecurityValidator
 from ...localization.util import t, get_user_id
 from ...localization.helpers import get_user_text
+from ..utils.directory_listing import get_directory_lister
 from ..utils.error_handler import safe_user_error
+from ..utils.formatting import format_file_size
 
 logger = structlog.get_logger()
 
@@ -68,6 +71,7 @@ async def handle_callback_query(
             "explain": handle_explain_callback,
             "refresh": handle_refresh_callback,
             "claude_status": handle_claude_status_callback,
+            "ls": handle_ls_page_callback,
         }
 
         # Check for MCP callbacks first
@@ -613,7 +617,27 @@ async def _handle_status_action(query, context: ContextTypes.DEFAULT_TYPE) -> No
     )
 
 
-async def _handle_ls_action(query, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def handle_ls_page_callback(
+    query, param: str, context: ContextTypes.DEFAULT_TYPE
+) -> None:
+    """Handle paging through a directory listing (``<view>:<offset>``)."""
+    view, _, offset = (param or "").partition(":")
+    if view == "noop":
+        # Page indicator; the query has already been answered
+        return
+    try:
+        page_offset = int(offset)
+    except (TypeError, ValueError):
+        page_offset = 0
+    if view == "quick":
+        await _handle_ls_action_for_quick(query, context, page_offset)
+    else:
+        await _handle_ls_action(query, context, page_offset)
+
+
+async def _handle_ls_action(
+    query, context: ContextTypes.DEFAULT_TYPE, offset: int = 0
+) -> None:
     """Handle ls action."""
     settings: Settings = context.bot_data["settings"]
     current_dir = context.user_data.get(
@@ -621,42 +645,16 @@ async def _handle_ls_action(query, context: ContextTypes.DEFAULT_TYPE) -> None:
     )
 
     try:
-        # List directory contents (similar to /ls command)
-        items = []
-        directories = []
-        files = []
-
-        for item in sorted(current_dir.iterdir()):
-            if item.name.startswith("."):
-                continue
-
-            if item.is_dir():
-                directories.append(f"📁 {item.name}/")
-            else:
-                try:
-                    size = item.stat().st_size
-                    size_str = _format_file_size(size)
-                    files.append(f"📄 {item.name} ({size_str})")
-                except OSError:
-                    files.append(f"📄 {item.name}")
-
-        items = directories + files
+        # List directory contents (same cached listing as /ls command)
+        page = get_directory_lister(context.bot_data).page(current_dir, offset)
         relative_path = current_dir.relative_to(settings.approved_directory)
-
-        if not items:
-            message = f"📂 `{relative_path}/`\n\n_(empty directory)_"
-        else:
-            message = f"📂 `{relative_path}/`\n\n"
-            max_items = 30  # Limit for inline display
-            if len(items) > max_items:
-                shown_items = items[:max_items]
-                message += "\n".join(shown_items)
-                message += f"\n\n_... and {len(items) - max_items} more items_"
-            else:
-                message += "\n".join(items)
+        message = page.format(relative_path)
 
         # Add buttons
         keyboard = []
+        pagination = page.pagination_buttons()
+        if pagination:
+            keyboard.append(pagination)
         if current_dir != settings.approved_directory:
             keyboard.append(
                 [
@@ -680,6 +678,9 @@ async def _handle_ls_action(query, context: ContextTypes.DEFAULT_TYPE) -> None:
             message, parse_mode=None, reply_markup=reply_markup
         )
 
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            await query.edit_message_text(f"❌ Error listing directory: {str(e)}")
     except Exception as e:
         await query.edit_message_text(f"❌ Error listing directory: {str(e)}")
 
@@ -2340,15 +2341,6 @@ async def _handle_schedules_action(query, context: ContextTypes.DEFAULT_TYPE) ->
             logger.error("Failed to send schedules error message", error=str(nested_e), user_id=user_id)
 
 
-def _format_file_size(size: int) -> str:
-    """Format file size in human-readable format."""
-    for unit in ["B", "KB", "MB", "GB"]:
-        if size < 1024:
-            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
-        size /= 1024
-    return f"{size:.1f}TB"
-
-
 # NEW CALLBACK HANDLERS FROM GROK ALL-FIX
 
 async def handle_prompts_settings_callback(query, param: str, context: ContextTypes.DEFAULT_TYPE):
@@ -2702,7 +2694,9 @@ async def handle_quick_action_execution_callback(
         await query.edit_message_text(error_text, parse_mode=None)
 
 
-async def _handle_ls_action_for_quick(query, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _handle_ls_action_for_quick(
+    query, context: ContextTypes.DEFAULT_TYPE, offset: int = 0
+) -> None:
     """Handle ls action for quick actions using same logic as /ls command."""
     settings: Settings = context.bot_data["settings"]
     current_dir = context.user_data.get(
@@ -2710,39 +2704,10 @@ async def _handle_ls_action_for_quick(query, context: ContextTypes.DEFAULT_TYPE)
     )
 
     try:
-        # List directory contents (same logic as /ls command)
-        items = []
-        directories = []
-        files = []
-
-        for item in sorted(current_dir.iterdir()):
-            if item.name.startswith("."):
-                continue
-
-            if item.is_dir():
-                directories.append(f"📁 {item.name}/")
-            else:
-                try:
-                    size = item.stat().st_size
-                    size_str = _format_file_size(size)
-                    files.append(f"📄 {item.name} ({size_str})")
-                except OSError:
-                    files.append(f"📄 {item.name}")
-
-        items = directories + files
+        # List directory contents (same cached listing as /ls command)
+        page = get_directory_lister(context.bot_data).page(current_dir, offset)
         relative_path = current_dir.relative_to(settings.approved_directory)
-
-        if not items:
-            message = f"📂 `{relative_path}/`\n\n_(empty directory)_"
-        else:
-            message = f"📂 `{relative_path}/`\n\n"
-            max_items = 30  # Limit for inline display
-            if len(items) > max_items:
-                shown_items = items[:max_items]
-                message += "\n".join(shown_items)
-                message += f"\n\n_... and {len(items) - max_items} more items_"
-            else:
-                message += "\n".join(items)
+        message = page.format(relative_path)
 
         # Add action buttons for quick actions
         keyboard = [
@@ -2755,6 +2720,9 @@ async def _handle_ls_action_for_quick(query, context: ContextTypes.DEFAULT_TYPE)
                 InlineKeyboardButton("📋 Меню", callback_data="action:quick_actions")
             ]
         ]
+        pagination = page.pagination_buttons(view="quick")
+        if pagination:
+            keyboard.insert(0, pagination)
         reply_markup = InlineKeyboardMarkup(keyboard)
 
         await query.edit_message_text(
@@ -2762,6 +2730,10 @@ async def _handle_ls_action_for_quick(query, context: ContextTypes.DEFAULT_TYPE)
             reply_markup=reply_markup
         )
 
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            logger.error("Error in ls quick action", error=str(e))
+            await query.edit_message_text(f"❌ Помилка при виконанні ls: {str(e)}")
     except Exception as e:
         logger.error("Error in ls quick action", error=str(e))
         error_text = f"❌ Помилка при виконанні ls: {str(e)}"
@@ -2853,7 +2825,7 @@ async def handle_file_edit_callback(
             if file_size > 20 * 1024 * 1024:  # 20MB limit
                 await query.edit_message_text(
                     f"❌ **Файл занадто великий**\n\n"
-                    f"Файл `{filename}` має розмір {_format_file_size(file_size)}.\n"
+                    f"Файл `{filename}` має розмір {format_file_size(file_size)}.\n"
                     f"Максимальний розмір для редагування: 20MB.\n\n"
                     f"Використайте інші інструменти для великих файлів.",
                     reply_markup=InlineKeyboardMarkup([
@@ -2867,7 +2839,7 @@ async def handle_file_edit_callback(
                 await query.edit_message_text(
                     f"📤 **Надсилаю файл для редагування...**\n\n"
                     f"📁 Файл: `{filename}`\n"
-                    f"📏 Розмір: {_format_file_size(file_size)}\n\n"
+                    f"📏 Розмір: {format_file_size(file_size)}\n\n"
                     f"⏳ Зачекайте...",
                     parse_mode=None
                 )
@@ -2880,7 +2852,7 @@ async def handle_file_edit_callback(
                         caption=(
                             f"✏️ **Файл для редагування**\n\n"
                             f"📁 Назва: `{filename}`\n"
-                            f"📏 Розмір: {_format_file_size(file_size)}\n\n"
+                            f"📏 Розмір: {format_file_size(file_size)}\n\n"
                             f"🔄 **Як редагувати:**\n"
                             f"1. Завантажте цей файл\n"
                             f"2. Відредагуйте у вашому редакторі\n"
@@ -15,6 +15,7 @@ from ...config.settings import Settings
 from ...security.audit import AuditLogger
 from ...security.validators import SecurityValidator
 from ...localization.util import t, get_user_id, get_effective_message
+from ..utils.directory_listing import get_directory_lister
 from ..utils.error_handler import safe_user_error, safe_critical_error
 from datetime import datetime
 from pathlib import Path
@@ -742,48 +743,18 @@ async def list_files(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     ) if context.user_data else settings_typed.approved_directory
 
     try:
-        # List directory contents
-        items = []
-        directories = []
-        files = []
-
-        for item in sorted(current_dir.iterdir()):
-            # Skip hidden files (starting with .)
-            if item.name.startswith("."):
-                continue
-
-            if item.is_dir():
-                directories.append(f"📁 {item.name}/")
-            else:
-                # Get file size
-                try:
-                    size = item.stat().st_size
-                    size_str = _format_file_size(size)
-                    files.append(f"📄 {item.name} ({size_str})")
-                except OSError:
-                    files.append(f"📄 {item.name}")
-
-        # Combine directories first, then files
-        items = directories + files
+        # List directory contents (cached, first page)
+        page = get_directory_lister(context.bot_data).page(current_dir)
 
         # Format response
         relative_path = current_dir.relative_to(settings_typed.approved_directory)
-        if not items:
-            ls_message = f"📂 `{relative_path}/`\n\n_(empty directory)_"
-        else:
-            ls_message = f"📂 `{relative_path}/`\n\n"
-
-            # Limit items shown to prevent message being too long
-            max_items = 50
-            if len(items) > max_items:
-                shown_items = items[:max_items]
-                ls_message += "\n".join(shown_items)
-                ls_message += f"\n\n_... and {len(items) - max_items} more items_"
-            else:
-                ls_message += "\n".join(items)
+        ls_message = page.format(relative_path)
 
         # Add navigation buttons if not at root
         keyboard = []
+        pagination = page.pagination_buttons()
+        if pagination:
+            keyboard.append(pagination)
         if current_dir != settings_typed.approved_directory:
             keyboard.append(
                 [
@@ -1302,16 +1273,6 @@ async def quick_actions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 
 
-def _format_file_size(size: int) -> str:
-    """Format file size in human-readable format."""
-    size_float = float(size)
-    for unit in ["B", "KB", "MB", "GB"]:
-        if size_float < 1024:
-            return f"{size_float:.1f}{unit}" if unit != "B" else f"{int(size_float)}B"
-        size_float /= 1024
-    return f"{size_float:.1f}TB"
-
-
 async def schedules_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List and manage scheduled tasks."""
     user_id = get_user_id(update)
@@ -1462,6 +1423,18 @@ async def status_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         claude_active = "🤖 Сесія Claude: ✅ Активна" if context.user_data.get('claude_session_active') else await t(context, user_id, "status.claude_session_inactive")
         
         full_status = f"{status_text}\n\n{current_dir}\n{claude_active}"
+
+        claude_integration = context.bot_data.get("claude_integration")
+        if claude_integration:
+            cache_stats = claude_integration.session_manager.get_cache_stats()
+            cache_line = await t(
+                context,
+                user_id,
+                "status.session_cache",
+                hit_rate=f"{cache_stats['hit_rate'] * 100:.0f}",
+                size=cache_stats["size"],
+            )
+            full_status += f"\n{cache_line}"
         await message.reply_text(full_status)
         logger.info("Status command executed", user_id=user_id)
     except Exception as e:
@@ -16,7 +16,12 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from ...claude.facade import ClaudeIntegration
-from ...claude.exceptions import ClaudeError, ClaudeTimeoutError, ClaudeProcessError
+from ...claude.exceptions import (
+    ClaudeError,
+    ClaudeProcessError,
+    ClaudeRequestCancelledError,
+    ClaudeTimeoutError,
+)
 from ...config.settings import Settings
 from ...exceptions import SecurityError
 from ...localization.util import t, get_user_id, get_effective_message
@@ -297,6 +302,13 @@ class ImageCommandHandler:
                 if i < len(formatted_messages) - 1:
                     await asyncio.sleep(0.5)
 
+        except ClaudeRequestCancelledError:
+            # A newer message from this user replaced the queued one
+            logger.info("Queued image request superseded", user_id=user_id)
+            try:
+                await progress_msg.delete()
+            except Exception as e:
+                logger.warning("Could not delete progress message", error=str(e))
         except ClaudeTimeoutError as e:
             logger.error("Claude timeout processing images", error=str(e))
             error_text = await t(context, user_id, "commands.img.error", error="Timeout - спробуйте пізніше")
@@ -7,11 +7,16 @@ import structlog
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from ...claude.exceptions import ClaudeToolValidationError
+from ...claude.exceptions import (
+    ClaudeRequestCancelledError,
+    ClaudeToolValidationError,
+)
 from ...config.settings import Settings
 from ...security.audit import AuditLogger
-from ...security.rate_limiter import RateLimiter
 from ...security.validators import SecurityValidator
+from ..utils.formatting import format_file_size
+from ..utils.progress_updater import ProgressHandle, ProgressUpdater
+from ..utils.response_streamer import ResponseStreamer
 from .command import handle_claude_auth_code
 
 logger = structlog.get_logger()
@@ -54,6 +59,17 @@ async def _format_progress_update(update_obj) -> Optional[str]:
 
         return progress_text
 
+    elif update_obj.type == "queued":
+        # Waiting for a free Claude slot
+        position = update_obj.progress.get("position") if update_obj.progress else None
+        if position:
+            return f"⏳ **Queued** — position {position}\n\nYour request will start shortly"
+        return "⏳ **Queued**"
+
+    elif update_obj.type == "restart":
+        # The run is being retried from the start
+        return "🔄 **Retrying...**"
+
     elif update_obj.type == "error":
         # Handle error messages
         return f"❌ **Error**\n\n_{update_obj.get_error_message()}_"
@@ -85,6 +101,42 @@ async def _format_progress_update(update_obj) -> Optional[str]:
     return None
 
 
+def _get_progress_updater(context: ContextTypes.DEFAULT_TYPE) -> ProgressUpdater:
+    """Get the shared progress updater, creating one if not injected."""
+    updater = context.bot_data.get("progress_updater")
+    if updater is None:
+        updater = ProgressUpdater()
+        context.bot_data["progress_updater"] = updater
+    return updater
+
+
+def _create_stream_handler(
+    progress: ProgressHandle, streamer: Optional[ResponseStreamer] = None
+):
+    """Create a stream callback that feeds a coalescing progress handle.
+
+    With a ``streamer``, assistant text is also delivered as it arrives;
+    a restart of the run discards the text of the abandoned attempt.
+    """
+
+    async def stream_handler(update_obj):
+        if streamer and update_obj.type == "restart":
+            streamer.reset()
+        elif streamer and update_obj.type == "assistant" and update_obj.content:
+            try:
+                streamer.add_text(update_obj.content)
+            except Exception as e:
+                logger.warning("Failed to stream response text", error=str(e))
+        try:
+            progress_text = await _format_progress_update(update_obj)
+            if progress_text:
+                progress.update(progress_text, parse_mode="Markdown")
+        except Exception as e:
+            logger.warning("Failed to format progress update", error=str(e))
+
+    return stream_handler
+
+
 def _format_error_message(error_str: str) -> str:
     """Format error messages for user-friendly display."""
     if "usage limit reached" in error_str.lower():
@@ -93,6 +145,9 @@ def _format_error_message(error_str: str) -> str:
     elif "tool not allowed" in error_str.lower():
         # Tool validation error - already handled in facade.py
         return error_str
+    elif "replaced by a newer message" in error_str.lower():
+        # Queued request superseded by the scheduler
+        return "⏭️ **Request skipped**\n\nReplaced by your newer message."
     elif "no conversation found" in error_str.lower():
         return (
             f"🔄 **Session Not Found**\n\n"
@@ -141,7 +196,6 @@ async def handle_text_message(
     settings: Settings = context.bot_data["settings"]
 
     # Get services
-    rate_limiter: Optional[RateLimiter] = context.bot_data.get("rate_limiter")
     audit_logger: Optional[AuditLogger] = context.bot_data.get("audit_logger")
 
     logger.info(
@@ -174,16 +228,8 @@ async def handle_text_message(
             logger.error("Image command handler not found for text message", user_id=user_id)
 
     try:
-        # Check rate limit with estimated cost for text processing
-        estimated_cost = _estimate_text_processing_cost(message_text)
-
-        if rate_limiter:
-            allowed, limit_message = await rate_limiter.check_rate_limit(
-                user_id, estimated_cost
-            )
-            if not allowed:
-                await update.message.reply_text(f"⏱️ {limit_message}")
-                return
+        # Rate and cost limits were already checked (and charged) by the
+        # rate limit middleware stage, using the learned cost model
 
         # Перевірка доступності Claude (згідно з планом)
         availability_monitor = context.bot_data.get("claude_availability_monitor")
@@ -223,14 +269,20 @@ async def handle_text_message(
         # Get existing session ID
         session_id = context.user_data.get("claude_session_id")
 
-        # Enhanced stream updates handler with progress tracking
-        async def stream_handler(update_obj):
-            try:
-                progress_text = await _format_progress_update(update_obj)
-                if progress_text:
-                    await progress_msg.edit_text(progress_text, parse_mode="Markdown")
-            except Exception as e:
-                logger.warning("Failed to update progress message", error=str(e))
+        from ..utils.formatting import ResponseFormatter
+
+        formatter = ResponseFormatter(settings)
+
+        # Stream updates are coalesced and rate-limited per chat; finished
+        # response chunks go out through the same buckets
+        updater = _get_progress_updater(context)
+        progress = updater.track(progress_msg)
+        streamer = (
+            ResponseStreamer(update.message, formatter.renderer, updater)
+            if settings.enable_progressive_delivery
+            else None
+        )
+        stream_handler = _create_stream_handler(progress, streamer)
 
         # Run Claude command
         claude_response = None
@@ -264,13 +316,15 @@ async def handle_text_message(
                 except Exception as e:
                     logger.warning("Failed to log interaction to storage", error=str(e))
 
-            # Format response
-            from ..utils.formatting import ResponseFormatter
-
-            formatter = ResponseFormatter(settings)
-            formatted_messages = formatter.format_claude_response(
-                claude_response.content
-            )
+            # Format response; streamed text only needs its last chunks
+            if streamer is not None and streamer.has_text:
+                if not streamer.includes(claude_response.content):
+                    streamer.add_text(claude_response.content)
+                formatted_messages = []
+            else:
+                formatted_messages = formatter.format_claude_response(
+                    claude_response.content
+                )
 
         except ClaudeToolValidationError as e:
             # Tool validation error with detailed instructions
@@ -284,6 +338,14 @@ async def handle_text_message(
             from ..utils.formatting import FormattedMessage
 
             formatted_messages = [FormattedMessage(str(e), parse_mode=None)]
+        except ClaudeRequestCancelledError:
+            # A newer message from this user replaced the queued one
+            logger.info("Queued request superseded", user_id=user_id)
+            if streamer is not None:
+                await streamer.cancel()
+            await progress.close()
+            await progress_msg.delete()
+            return
         except Exception as e:
             logger.error("Claude integration failed", error=str(e), user_id=user_id)
             # Format error and create FormattedMessage
@@ -293,9 +355,17 @@ async def handle_text_message(
                 FormattedMessage(_format_error_message(str(e)), parse_mode=None)
             ]
 
-        # Delete progress message
+        # Delete progress message (dropping any pending update)
+        await progress.close()
         await progress_msg.delete()
 
+        # Flush streamed output, including partial text before an error
+        streamed = streamer is not None and streamer.has_text
+        if streamed:
+            await streamer.finish(
+                formatter.get_response_keyboard() if not formatted_messages else None
+            )
+
         # Send formatted responses (may be multiple messages)
         for i, message in enumerate(formatted_messages):
             try:
@@ -303,7 +373,9 @@ async def handle_text_message(
                     message.text,
                     parse_mode=message.parse_mode,
                     reply_markup=message.reply_markup,
-                    reply_to_message_id=update.message.message_id if i == 0 else None,
+                    reply_to_message_id=(
+                        update.message.message_id if i == 0 and not streamed else None
+                    ),
                 )
 
                 # Small delay between messages to avoid rate limits
@@ -417,7 +489,6 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "security_validator"
     )
     audit_logger: Optional[AuditLogger] = context.bot_data.get("audit_logger")
-    rate_limiter: Optional[RateLimiter] = context.bot_data.get("rate_limiter")
 
     logger.info(
         "Processing document upload",
@@ -455,16 +526,6 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             return
 
-        # Check rate limit for file processing
-        file_cost = _estimate_file_processing_cost(document.file_size)
-        if rate_limiter:
-            allowed, limit_message = await rate_limiter.check_rate_limit(
-                user_id, file_cost
-            )
-            if not allowed:
-                await update.message.reply_text(f"⏱️ {limit_message}")
-                return
-
         # Send processing indicator
         await update.message.chat.send_action("upload_document")
 
@@ -556,6 +617,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "current_directory", settings.approved_directory
         )
         session_id = context.user_data.get("claude_session_id")
+        progress = _get_progress_updater(context).track(claude_progress_msg)
 
         # Process with Claude
         try:
@@ -564,6 +626,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 working_directory=current_dir,
                 user_id=user_id,
                 session_id=session_id,
+                on_stream=_create_stream_handler(progress),
             )
 
             # Update session ID
@@ -583,6 +646,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
 
             # Delete progress message
+            await progress.close()
             await claude_progress_msg.delete()
 
             # Send responses
@@ -598,6 +662,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     await asyncio.sleep(0.5)
 
         except Exception as e:
+            await progress.close()
             await claude_progress_msg.edit_text(
                 _format_error_message(str(e)), parse_mode=None
             )
@@ -714,6 +779,7 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                 "current_directory", settings.approved_directory
             )
             session_id = context.user_data.get("claude_session_id")
+            progress = _get_progress_updater(context).track(claude_progress_msg)
 
             # Process with Claude
             try:
@@ -722,6 +788,7 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                     working_directory=current_dir,
                     user_id=user_id,
                     session_id=session_id,
+                    on_stream=_create_stream_handler(progress),
                 )
 
                 # Update session ID
@@ -736,6 +803,7 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                 )
 
                 # Delete progress message
+                await progress.close()
                 await claude_progress_msg.delete()
 
                 # Send responses
@@ -752,7 +820,13 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                     if i < len(formatted_messages) - 1:
                         await asyncio.sleep(0.5)
 
+            except ClaudeRequestCancelledError:
+                # A newer message from this user replaced the queued one
+                logger.info("Queued image request superseded", user_id=user_id)
+                await progress.close()
+                await claude_progress_msg.delete()
             except Exception as e:
+                await progress.close()
                 await claude_progress_msg.edit_text(
                     _format_error_message(str(e)), parse_mode=None
                 )
@@ -781,49 +855,6 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         )
 
 
-def _estimate_text_processing_cost(text: str) -> float:
-    """Estimate cost for processing text message."""
-    # Base cost
-    base_cost = 0.001
-
-    # Additional cost based on length
-    length_cost = len(text) * 0.00001
-
-    # Additional cost for complex requests
-    complex_keywords = [
-        "analyze",
-        "generate",
-        "create",
-        "build",
-        "implement",
-        "refactor",
-        "optimize",
-        "debug",
-        "explain",
-        "document",
-    ]
-
-    text_lower = text.lower()
-    complexity_multiplier = 1.0
-
-    for keyword in complex_keywords:
-        if keyword in text_lower:
-            complexity_multiplier += 0.5
-
-    return (base_cost + length_cost) * min(complexity_multiplier, 3.0)
-
-
-def _estimate_file_processing_cost(file_size: int) -> float:
-    """Estimate cost for processing uploaded file."""
-    # Base cost for file handling
-    base_cost = 0.005
-
-    # Additional cost based on file size (per KB)
-    size_cost = (file_size / 1024) * 0.0001
-
-    return base_cost + size_cost
-
-
 async def _generate_placeholder_response(
     message_text: str, context: ContextTypes.DEFAULT_TYPE
 ) -> dict:
@@ -1254,14 +1285,6 @@ async def handle_file_action_message(update: Update, context: ContextTypes.DEFAU
                     f"📏 Розмір: {file_size:,} байт"
                 )
 
-                def _format_file_size(size: int) -> str:
-                    """Format file size in human-readable format."""
-                    for unit in ["B", "KB", "MB", "GB"]:
-                        if size < 1024:
-                            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
-                        size /= 1024
-                    return f"{size:.1f}TB"
-
                 # Send the file
                 with open(file_path, 'rb') as file:
                     await update.message.reply_document(
@@ -1270,7 +1293,7 @@ async def handle_file_action_message(update: Update, context: ContextTypes.DEFAU
                         caption=(
                             f"✏️ **Файл для редагування**\n\n"
                             f"📁 Назва: `{filename}`\n"
-                            f"📏 Розмір: {_format_file_size(file_size)}\n\n"
+                            f"📏 Розмір: {format_file_size(file_size)}\n\n"
                             f"🔄 **Як редагувати:**\n"
                             f"1. Завантажте цей файл\n"
                             f"2. Відредагуйте у вашому редакторі\n"
@@ -1,7 +1,13 @@
 """Bot middleware for authentication, rate limiting, and security."""
 
 from .auth import auth_middleware
+from .pipeline import MiddlewarePipeline
 from .rate_limit import rate_limit_middleware
 from .security import security_middleware
 
-__all__ = ["auth_middleware", "rate_limit_middleware", "security_middleware"]
+__all__ = [
+    "MiddlewarePipeline",
+    "auth_middleware",
+    "rate_limit_middleware",
+    "security_middleware",
+]
@@ -17,6 +17,8 @@ from typing import Any, Callable, Dict
 
 import structlog
 
+from .pipeline import get_update_context
+
 logger = structlog.get_logger()
 
 
@@ -30,12 +32,9 @@ async def auth_middleware(handler: Callable, event: Any, data: Dict[str, Any]) -
     4. Logs authentication events
     """
     # Extract user information
-    user_id = event.effective_user.id if event.effective_user else None
-    username = (
-        getattr(event.effective_user, "username", None)
-        if event.effective_user
-        else None
-    )
+    update_context = get_update_context(event, data)
+    user_id = update_context.user_id
+    username = update_context.username
 
     if not user_id:
         logger.warning("No user information in update")
@@ -53,18 +52,8 @@ async def auth_middleware(handler: Callable, event: Any, data: Dict[str, Any]) -
             )
         return
 
-    # Check if user is already authenticated
-    if auth_manager.is_authenticated(user_id):
-        # Update session activity
-        if auth_manager.refresh_session(user_id):
-            session = auth_manager.get_session(user_id)
-            logger.debug(
-                "Session refreshed",
-                user_id=user_id,
-                username=username,
-                auth_provider=session.auth_provider if session else None,
-            )
-
+    # Check if user is already authenticated (and update session activity)
+    if auth_manager.check_and_refresh(user_id):
         # Continue to handler
         return await handler(event, data)
 
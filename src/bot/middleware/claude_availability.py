@@ -76,7 +76,9 @@ class ClaudeAvailabilityMiddleware:
             return await handler(update, context)
 
         # Отримати availability monitor
-        availability_monitor = context.bot_data.get("claude_availability_monitor")
+        # Pipeline stages receive the bot_data mapping itself
+        bot_data = getattr(context, "bot_data", context)
+        availability_monitor = bot_data.get("claude_availability_monitor")
         if not availability_monitor:
             # Якщо немає монітора, продовжити нормально
             return await handler(update, context)
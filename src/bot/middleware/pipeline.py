@@ -0,0 +1,249 @@
+"""Single pre-dispatch middleware pipeline.
+
+Features:
+- One handler registration instead of one handler group per middleware
+- Dependencies injected once per update
+- User and message extracted once and shared by every stage
+- Short-circuit that actually stops later handler groups
+- Per-stage and dispatch-overhead latency histograms
+"""
+
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import structlog
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+logger = structlog.get_logger()
+
+# Key under which the shared UpdateContext is passed to stages
+UPDATE_CONTEXT_KEY = "update_context"
+
+# Histogram bucket upper bounds in milliseconds (last bucket is open-ended)
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+)
+
+Middleware = Callable[[Callable, Any, Dict[str, Any]], Any]
+
+
+class UpdateContext:
+    """What every stage needs from an update, extracted once."""
+
+    __slots__ = ("user_id", "username", "message", "text")
+
+    def __init__(self, update: Any):
+        user = update.effective_user
+        self.user_id: Optional[int] = user.id if user else None
+        self.username: Optional[str] = getattr(user, "username", None) if user else None
+        self.message = update.effective_message
+        self.text: Optional[str] = self.message.text if self.message else None
+
+
+def get_update_context(event: Any, data: Dict[str, Any]) -> UpdateContext:
+    """Shared context from the pipeline, or a fresh one outside of it."""
+    context = data.get(UPDATE_CONTEXT_KEY)
+    if context is None:
+        context = UpdateContext(event)
+    return context
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with O(1) memory."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        """Initialize empty histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add one sample."""
+        ms = seconds * 1000
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                if i < len(LATENCY_BUCKETS_MS):
+                    return LATENCY_BUCKETS_MS[i]
+                break
+        return round(self.max, 3)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summary plus non-empty buckets, keyed by upper bound."""
+        buckets = {}
+        for i, n in enumerate(self.counts):
+            if n:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+                buckets[f"<={bound}" if bound is not None else "inf"] = n
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+            "buckets_ms": buckets,
+        }
+
+
+class _Stage:
+    __slots__ = ("name", "func", "latency", "passed", "blocked", "errors")
+
+    def __init__(self, name: str, func: Middleware):
+        self.name = name
+        self.func = func
+        self.latency = LatencyHistogram()
+        self.passed = 0
+        self.blocked = 0
+        self.errors = 0
+
+
+class _Gate:
+    """Stage ``handler`` that records whether the update was let through."""
+
+    __slots__ = ("opened",)
+
+    def __init__(self) -> None:
+        self.opened = False
+
+    async def __call__(self, event: Any, data: Dict[str, Any]) -> None:
+        self.opened = True
+
+
+class MiddlewarePipeline:
+    """Run middleware stages in order as one Telegram handler.
+
+    Stages keep the ``(handler, event, data)`` middleware signature and are
+    run one after another rather than nested, so each stage's latency is
+    its own. A stage that returns without calling ``handler`` blocks the
+    update: the pipeline raises ``ApplicationHandlerStop`` so no later
+    handler group sees it. A stage that raises is reported to the
+    application's error handlers and also blocks the update.
+
+    ``data`` is a per-update copy of ``bot_data`` (after dependency
+    injection) carrying the shared ``UpdateContext``; state that must
+    outlive the update belongs on objects stored in ``bot_data``.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[Tuple[str, Middleware]],
+        dependencies: Mapping[str, Any],
+        settings: Any,
+    ):
+        """Initialize pipeline with ``(name, middleware)`` pairs in order."""
+        self._stages: List[_Stage] = [_Stage(name, func) for name, func in stages]
+        self._deps = dependencies
+        self._settings = settings
+
+        self.total_latency = LatencyHistogram()
+        self.overhead_latency = LatencyHistogram()
+        self.stats: Dict[str, int] = {
+            "updates": 0,
+            "passed": 0,
+            "blocked": 0,
+            "errors": 0,
+        }
+
+    @property
+    def stage_names(self) -> List[str]:
+        return [stage.name for stage in self._stages]
+
+    async def __call__(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> None:
+        """Telegram callback: run every stage or stop the update."""
+        started = time.perf_counter()
+        self.stats["updates"] += 1
+
+        bot_data = context.bot_data
+        bot_data.update(self._deps)
+        bot_data["settings"] = self._settings
+        data = dict(bot_data)
+        data[UPDATE_CONTEXT_KEY] = UpdateContext(update)
+
+        gate = _Gate()
+        in_stages = 0.0
+        for stage in self._stages:
+            gate.opened = False
+            stage_started = time.perf_counter()
+            try:
+                await stage.func(gate, update, data)
+            except Exception as e:
+                elapsed = time.perf_counter() - stage_started
+                stage.latency.record(elapsed)
+                stage.errors += 1
+                self.stats["errors"] += 1
+                self._finish(started, in_stages + elapsed)
+                logger.error("Middleware stage failed", stage=stage.name, error=str(e))
+                await context.application.process_error(update, e)
+                raise ApplicationHandlerStop from e
+
+            elapsed = time.perf_counter() - stage_started
+            stage.latency.record(elapsed)
+            in_stages += elapsed
+            if not gate.opened:
+                stage.blocked += 1
+                self.stats["blocked"] += 1
+                self._finish(started, in_stages)
+                raise ApplicationHandlerStop
+            stage.passed += 1
+
+        self.stats["passed"] += 1
+        self._finish(started, in_stages)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters and latency histograms for the pipeline and each stage."""
+        return {
+            **self.stats,
+            "total": self.total_latency.snapshot(),
+            "dispatch_overhead": self.overhead_latency.snapshot(),
+            "stages": {
+                stage.name: {
+                    "passed": stage.passed,
+                    "blocked": stage.blocked,
+                    "errors": stage.errors,
+                    "latency": stage.latency.snapshot(),
+                }
+                for stage in self._stages
+            },
+        }
+
+    def _finish(self, started: float, in_stages: float) -> None:
+        total = time.perf_counter() - started
+        self.total_latency.record(total)
+        self.overhead_latency.record(max(0.0, total - in_stages))
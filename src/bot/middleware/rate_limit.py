@@ -1,9 +1,12 @@
 """Rate limiting middleware for Telegram bot."""
 
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Optional
 
 import structlog
 
+from ...security.cost_model import CostModel, classify_message, prior_cost
+from .pipeline import get_update_context
+
 logger = structlog.get_logger()
 
 
@@ -18,12 +21,9 @@ async def rate_limit_middleware(
     3. Logs rate limit violations
     4. Provides helpful error messages
     """
-    user_id = event.effective_user.id if event.effective_user else None
-    username = (
-        getattr(event.effective_user, "username", None)
-        if event.effective_user
-        else None
-    )
+    update_context = get_update_context(event, data)
+    user_id = update_context.user_id
+    username = update_context.username
 
     if not user_id:
         logger.warning("No user information in update")
@@ -32,14 +32,15 @@ async def rate_limit_middleware(
     # Get dependencies from context
     rate_limiter = data.get("rate_limiter")
     audit_logger = data.get("audit_logger")
+    cost_model = data.get("cost_model")
 
     if not rate_limiter:
         logger.error("Rate limiter not available in middleware context")
         # Don't block on missing rate limiter - this could be a config issue
         return await handler(event, data)
 
-    # Estimate cost based on message content and type
-    estimated_cost = estimate_message_cost(event)
+    # Predict cost from what similar messages actually cost
+    estimated_cost = estimate_message_cost(event, cost_model)
 
     # Check rate limits
     allowed, message = await rate_limiter.check_rate_limit(
@@ -81,51 +82,32 @@ async def rate_limit_middleware(
     return await handler(event, data)
 
 
-def estimate_message_cost(event: Any) -> float:
+def estimate_message_cost(
+    event: Any, cost_model: Optional[CostModel] = None
+) -> float:
     """Estimate the cost of processing a message.
 
-    This is a simple heuristic - in practice, you'd want more
-    sophisticated cost estimation based on:
-    - Message type (text, file, command)
-    - Content complexity
-    - Expected Claude usage
+    Uses the learned cost model when available, which predicts from the
+    actual cost of similar earlier messages; otherwise falls back to the
+    heuristic prior.
     """
     message = event.effective_message
-    message_text = message.text if message else ""
-
-    # Base cost for any message
-    base_cost = 0.01
-
-    # Additional cost based on message length (handle None case)
-    length_cost = len(message_text or "") * 0.0001
-
-    # Higher cost for certain types of messages
-    if (message and message.document) or (message and message.photo):
-        # File uploads cost more
-        return base_cost + length_cost + 0.05
-
-    if message_text.startswith("/"):
-        # Commands cost more
-        return base_cost + length_cost + 0.02
-
-    # Check for complex operations keywords
-    complex_keywords = [
-        "analyze",
-        "generate",
-        "create",
-        "build",
-        "compile",
-        "test",
-        "debug",
-        "refactor",
-        "optimize",
-        "explain",
-    ]
-
-    if any(keyword in message_text.lower() for keyword in complex_keywords):
-        return base_cost + length_cost + 0.03
+    message_text = (message.text if message else "") or ""
+
+    is_file = bool(message and (message.document or message.photo))
+    file_size = 0
+    if message and message.document:
+        file_size = message.document.file_size or 0
+    elif message and message.photo:
+        file_size = message.photo[-1].file_size or 0
+
+    if cost_model is not None and event.effective_user:
+        return cost_model.estimate(
+            event.effective_user.id, message_text, is_file, file_size
+        )
 
-    return base_cost + length_cost
+    kind = classify_message(message_text, is_file)
+    return prior_cost(kind, file_size if is_file else len(message_text))
 
 
 async def cost_tracking_middleware(
@@ -4,8 +4,30 @@ from typing import Any, Callable, Dict
 
 import structlog
 
+from ...security.threat_scanner import MESSAGE_SCANNER, RECON_SCANNER
+from .pipeline import get_update_context
+
 logger = structlog.get_logger()
 
+# Scanner category -> (audit violation type, audit details prefix, user-facing reason)
+_MESSAGE_VIOLATIONS = {
+    "command_injection": (
+        "command_injection_attempt",
+        "Dangerous pattern detected",
+        "Command injection attempt",
+    ),
+    "path_traversal": (
+        "path_traversal_attempt",
+        "Path traversal pattern detected",
+        "Path traversal attempt",
+    ),
+    "suspicious_url": (
+        "suspicious_url",
+        "Suspicious URL pattern detected",
+        "Suspicious URL detected",
+    ),
+}
+
 
 async def security_middleware(
     handler: Callable, event: Any, data: Dict[str, Any]
@@ -18,12 +40,9 @@ async def security_middleware(
     3. Detects potential attacks
     4. Logs security violations
     """
-    user_id = event.effective_user.id if event.effective_user else None
-    username = (
-        getattr(event.effective_user, "username", None)
-        if event.effective_user
-        else None
-    )
+    update_context = get_update_context(event, data)
+    user_id = update_context.user_id
+    username = update_context.username
 
     if not user_id:
         logger.warning("No user information in update")
@@ -39,13 +58,17 @@ async def security_middleware(
         return await handler(event, data)
 
     # Validate text content if present
-    message = event.effective_message
-    if message and message.text:
+    message = update_context.message
+    if update_context.text:
         # Check if this is an image processing context (more lenient validation)
         is_image_context = await is_image_processing_context(event, data)
 
         is_safe, violation_type = await validate_message_content(
-            message.text, security_validator, user_id, audit_logger, is_image_context
+            update_context.text,
+            security_validator,
+            user_id,
+            audit_logger,
+            is_image_context,
         )
         if not is_safe:
             await message.reply_text(
@@ -121,97 +144,31 @@ async def validate_message_content(
 ) -> tuple[bool, str]:
     """Validate message text content for security threats."""
 
-    # Check for command injection patterns
-    dangerous_patterns = [
-        r";\s*rm\s+",
-        r";\s*del\s+",
-        r";\s*format\s+",
-        r"`[^`]*`",
-        r"\$\([^)]*\)",
-        r"&&\s*rm\s+",
-        r"\|\s*mail\s+",
-        r">\s*/dev/",
-        r"curl\s+.*\|\s*sh",
-        r"wget\s+.*\|\s*sh",
-        r"exec\s*\(",
-        r"eval\s*\(",
-    ]
-
-    import re
-
-    for pattern in dangerous_patterns:
-        if re.search(pattern, text, re.IGNORECASE):
-            if audit_logger:
-                await audit_logger.log_security_violation(
-                    user_id=user_id,
-                    violation_type="command_injection_attempt",
-                    details=f"Dangerous pattern detected: {pattern}",
-                    severity="high",
-                    attempted_action="message_send",
-                )
-
-            logger.warning(
-                "Command injection attempt detected",
+    # One pass over the text for injection, traversal and URL rules
+    rule = MESSAGE_SCANNER.scan(text)
+    if rule is not None:
+        violation_type, details, reason = _MESSAGE_VIOLATIONS[rule.category]
+        if audit_logger:
+            await audit_logger.log_security_violation(
                 user_id=user_id,
-                pattern=pattern,
-                text_preview=text[:100],
+                violation_type=violation_type,
+                details=f"{details}: {rule.pattern}",
+                severity=rule.severity,
+                attempted_action="message_send",
             )
-            return False, "Command injection attempt"
-
-    # Check for path traversal attempts
-    path_traversal_patterns = [
-        r"\.\./.*",
-        r"~\/.*",
-        r"\/etc\/.*",
-        r"\/var\/.*",
-        r"\/usr\/.*",
-        r"\/sys\/.*",
-        r"\/proc\/.*",
-    ]
-
-    for pattern in path_traversal_patterns:
-        if re.search(pattern, text):
-            if audit_logger:
-                await audit_logger.log_security_violation(
-                    user_id=user_id,
-                    violation_type="path_traversal_attempt",
-                    details=f"Path traversal pattern detected: {pattern}",
-                    severity="high",
-                    attempted_action="message_send",
-                )
 
+        if rule.category == "suspicious_url":
+            logger.warning(
+                "Suspicious URL detected", user_id=user_id, pattern=rule.pattern
+            )
+        else:
             logger.warning(
-                "Path traversal attempt detected",
+                f"{reason} detected",
                 user_id=user_id,
-                pattern=pattern,
+                pattern=rule.pattern,
                 text_preview=text[:100],
             )
-            return False, "Path traversal attempt"
-
-    # Check for suspicious URLs or domains
-    suspicious_patterns = [
-        r"https?://[^/]*\.ru/",
-        r"https?://[^/]*\.tk/",
-        r"https?://[^/]*\.ml/",
-        r"https?://bit\.ly/",
-        r"https?://tinyurl\.com/",
-        r"javascript:",
-        r"data:text/html",
-    ]
-
-    for pattern in suspicious_patterns:
-        if re.search(pattern, text, re.IGNORECASE):
-            if audit_logger:
-                await audit_logger.log_security_violation(
-                    user_id=user_id,
-                    violation_type="suspicious_url",
-                    details=f"Suspicious URL pattern detected: {pattern}",
-                    severity="medium",
-                    attempted_action="message_send",
-                )
-
-            logger.warning("Suspicious URL detected", user_id=user_id, pattern=pattern)
-            return False, "Suspicious URL detected"
+        return False, reason
 
     # Sanitize content using security validator
     if is_image_context:
@@ -379,29 +336,7 @@ async def threat_detection_middleware(
     text = message.text if message else ""
 
     # Suspicious commands that might indicate reconnaissance
-    recon_patterns = [
-        r"ls\s+/",
-        r"find\s+/",
-        r"locate\s+",
-        r"which\s+",
-        r"whereis\s+",
-        r"ps\s+",
-        r"netstat\s+",
-        r"lsof\s+",
-        r"env\s*$",
-        r"printenv\s*$",
-        r"whoami\s*$",
-        r"id\s*$",
-        r"uname\s+",
-        r"cat\s+/etc/",
-        r"cat\s+/proc/",
-    ]
-
-    import re
-
-    recon_attempts = sum(
-        1 for pattern in recon_patterns if re.search(pattern, text, re.IGNORECASE)
-    )
+    recon_attempts = len(RECON_SCANNER.scan_all(text)) if text else 0
 
     if recon_attempts > 0:
         user_data["recon_attempts"] = (
@@ -0,0 +1,366 @@
+"""Cached, paginated directory listings for the file browser.
+
+Features:
+- os.scandir listing that reuses d_type instead of a stat per entry
+- Per-directory cache validated against the directory mtime
+- File sizes stat'ed only for the page being shown
+- Optional inotify invalidation on Linux
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+from telegram import InlineKeyboardButton
+
+from .formatting import format_file_size
+
+logger = structlog.get_logger()
+
+DEFAULT_PAGE_SIZE = 50
+# Keep a page well inside Telegram's 4096 character limit
+DEFAULT_PAGE_CHARS = 3500
+DEFAULT_CACHE_SIZE = 128
+# A directory modified this recently may change again within the same
+# mtime tick, so its cached listing is not trusted without a watch
+RACY_WINDOW_NS = 2_000_000_000
+
+# inotify(7)
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_WATCH_MASK = (
+    _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT = struct.Struct("iIII")
+
+
+class _InotifyWatcher:
+    """Non-blocking inotify instance polled before cached listings are used."""
+
+    def __init__(self, libc: Any, fd: int, on_change: Callable[[Optional[str]], None]):
+        """Initialize watcher on an open inotify descriptor."""
+        self._libc = libc
+        self._fd = fd
+        self._on_change = on_change
+        self._paths: Dict[int, str] = {}
+        self._wds: Dict[str, int] = {}
+
+    @classmethod
+    def create(
+        cls, on_change: Callable[[Optional[str]], None]
+    ) -> Optional["_InotifyWatcher"]:
+        """Create a watcher, or None where inotify is unavailable."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(
+                ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+            )
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logger.info("inotify not available", error=str(e))
+            return None
+        if fd < 0:
+            logger.info("inotify not available", errno=ctypes.get_errno())
+            return None
+        return cls(libc, fd, on_change)
+
+    def watch(self, path: str) -> bool:
+        """Watch ``path``; False if it has to fall back to mtime checks."""
+        if path in self._wds:
+            return True
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            # Typically ENOSPC once max_user_watches is reached
+            logger.debug("inotify watch failed", path=path, errno=ctypes.get_errno())
+            return False
+        if wd in self._paths:
+            # Same inode reached through another path
+            return False
+        self._paths[wd] = path
+        self._wds[path] = wd
+        return True
+
+    def unwatch(self, path: str) -> None:
+        """Stop watching ``path``."""
+        wd = self._wds.pop(path, None)
+        if wd is not None:
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def poll(self) -> None:
+        """Apply all pending events without blocking."""
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    self._on_change(None)
+                    continue
+                path = self._paths.get(wd)
+                if path is None:
+                    continue
+                self._on_change(path)
+                if mask & _IN_IGNORED:
+                    # The kernel dropped the watch (directory deleted)
+                    self._paths.pop(wd, None)
+                    self._wds.pop(path, None)
+
+    def close(self) -> None:
+        """Close the inotify descriptor."""
+        os.close(self._fd)
+        self._paths.clear()
+        self._wds.clear()
+
+
+class DirectoryListing:
+    """Sorted visible entries of one directory, directories first."""
+
+    __slots__ = ("path", "names", "dir_count", "mtime_ns", "racy", "watched")
+
+    def __init__(
+        self,
+        path: str,
+        names: List[str],
+        dir_count: int,
+        mtime_ns: int,
+        racy: bool,
+        watched: bool,
+    ):
+        """Initialize listing."""
+        self.path = path
+        self.names = names
+        self.dir_count = dir_count
+        self.mtime_ns = mtime_ns
+        self.racy = racy
+        self.watched = watched
+
+    def format_entry(self, index: int) -> str:
+        """Format one entry; file sizes are read at display time."""
+        name = self.names[index]
+        if index < self.dir_count:
+            return f"📁 {name}/"
+        try:
+            size = os.stat(os.path.join(self.path, name)).st_size
+        except OSError:
+            return f"📄 {name}"
+        return f"📄 {name} ({format_file_size(size)})"
+
+
+class ListingPage:
+    """One page of a directory listing."""
+
+    __slots__ = ("lines", "offset", "end", "total", "page_size")
+
+    def __init__(
+        self, lines: List[str], offset: int, end: int, total: int, page_size: int
+    ):
+        """Initialize page."""
+        self.lines = lines
+        self.offset = offset
+        self.end = end
+        self.total = total
+        self.page_size = page_size
+
+    @property
+    def prev_offset(self) -> Optional[int]:
+        """Offset of the previous page, if any."""
+        return max(0, self.offset - self.page_size) if self.offset > 0 else None
+
+    @property
+    def next_offset(self) -> Optional[int]:
+        """Offset of the next page, if any."""
+        return self.end if self.end < self.total else None
+
+    def format(self, relative_path: Path) -> str:
+        """Format the page as a message."""
+        if not self.total:
+            return f"📂 `{relative_path}/`\n\n_(empty directory)_"
+        message = f"📂 `{relative_path}/`\n\n" + "\n".join(self.lines)
+        if len(self.lines) < self.total:
+            message += (
+                f"\n\n_Showing {self.offset + 1}–{self.end} of {self.total} items_"
+            )
+        return message
+
+    def pagination_buttons(self, view: str = "browse") -> List[InlineKeyboardButton]:
+        """Keyboard row for paging, empty when everything fits.
+
+        ``view`` is carried in the callback data so that paging keeps the
+        keyboard the listing was shown with.
+        """
+        if len(self.lines) >= self.total:
+            return []
+        row = []
+        if self.prev_offset is not None:
+            target = f"ls:{view}:{self.prev_offset}"
+            row.append(InlineKeyboardButton("◀️", callback_data=target))
+        # The indicator only shows where we are; pressing it does nothing
+        row.append(
+            InlineKeyboardButton(
+                f"{self.offset + 1}–{self.end} / {self.total}",
+                callback_data="ls:noop",
+            )
+        )
+        if self.next_offset is not None:
+            target = f"ls:{view}:{self.next_offset}"
+            row.append(InlineKeyboardButton("▶️", callback_data=target))
+        return row
+
+
+class DirectoryLister:
+    """Directory listing service shared by /ls and the file browser callbacks."""
+
+    def __init__(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        page_chars: int = DEFAULT_PAGE_CHARS,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        use_inotify: bool = True,
+    ):
+        """Initialize lister."""
+        self.page_size = page_size
+        self.page_chars = page_chars
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, DirectoryListing]" = OrderedDict()
+        self._watcher = (
+            _InotifyWatcher.create(self._invalidate) if use_inotify else None
+        )
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def listing(self, directory: Path) -> DirectoryListing:
+        """Get the listing of ``directory``, scanning only if it changed."""
+        key = str(directory)
+        if self._watcher:
+            self._watcher.poll()
+
+        cached = self._cache.get(key)
+        if cached is not None and cached.watched:
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return cached
+
+        # Watch before scanning so that no change can slip in between
+        watched = self._watcher.watch(key) if self._watcher else False
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+            if cached is not None and not cached.racy and cached.mtime_ns == mtime_ns:
+                cached.watched = watched
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached
+
+            self.stats["misses"] += 1
+            listing = self._scan(key, mtime_ns, watched)
+        except OSError:
+            self._invalidate(key)
+            raise
+        self._cache[key] = listing
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            if self._watcher:
+                self._watcher.unwatch(evicted)
+        return listing
+
+    def page(self, directory: Path, offset: int = 0) -> ListingPage:
+        """Get the page of ``directory`` starting at ``offset``."""
+        listing = self.listing(directory)
+        total = len(listing.names)
+        if offset >= total:
+            # Directory shrank since the button was sent
+            offset = (max(total - 1, 0) // self.page_size) * self.page_size
+        offset = max(offset, 0)
+
+        lines: List[str] = []
+        chars = 0
+        end = offset
+        while end < total and len(lines) < self.page_size:
+            line = listing.format_entry(end)
+            if lines and chars + len(line) + 1 > self.page_chars:
+                break
+            lines.append(line)
+            chars += len(line) + 1
+            end += 1
+        return ListingPage(lines, offset, end, total, self.page_size)
+
+    def invalidate(self, directory: Optional[Path] = None) -> None:
+        """Drop the cached listing of ``directory``, or all of them."""
+        self._invalidate(str(directory) if directory is not None else None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lister statistics."""
+        return {
+            **self.stats,
+            "cached_directories": len(self._cache),
+            "inotify": self._watcher is not None,
+        }
+
+    def close(self) -> None:
+        """Release the inotify descriptor."""
+        if self._watcher:
+            self._watcher.close()
+            self._watcher = None
+
+    def _invalidate(self, key: Optional[str]) -> None:
+        # Watches only exist for cached directories
+        keys = list(self._cache) if key is None else [key]
+        for path in keys:
+            self._cache.pop(path, None)
+            if self._watcher:
+                self._watcher.unwatch(path)
+        self.stats["invalidations"] += 1
+
+    def _scan(self, key: str, mtime_ns: int, watched: bool) -> DirectoryListing:
+        directories: List[str] = []
+        files: List[str] = []
+        with os.scandir(key) as entries:
+            for entry in entries:
+                # Skip hidden files (starting with .)
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (directories if is_dir else files).append(entry.name)
+        directories.sort()
+        files.sort()
+        racy = time.time_ns() - mtime_ns < RACY_WINDOW_NS
+        return DirectoryListing(
+            key, directories + files, len(directories), mtime_ns, racy, watched
+        )
+
+
+def get_directory_lister(bot_data: Dict[str, Any]) -> DirectoryLister:
+    """Get the shared directory lister, creating one if not injected."""
+    lister = bot_data.get("directory_lister")
+    if lister is None:
+        lister = DirectoryLister()
+        bot_data["directory_lister"] = lister
+    return lister
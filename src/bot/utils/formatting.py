@@ -1,12 +1,22 @@
 """Format bot responses for optimal display."""
 
-import re
 from dataclasses import dataclass
 from typing import Any, List, Optional
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from ...config.settings import Settings
+from .response_renderer import ResponseRenderer
+
+
+def format_file_size(size: int) -> str:
+    """Format file size in human-readable format."""
+    size_float = float(size)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size_float < 1024:
+            return f"{size_float:.1f}{unit}" if unit != "B" else f"{int(size_float)}B"
+        size_float /= 1024
+    return f"{size_float:.1f}TB"
 
 
 @dataclass
@@ -30,26 +40,15 @@ class ResponseFormatter:
         self.settings = settings
         self.max_message_length = 4000  # Telegram limit is 4096, leave some buffer
         self.max_code_block_length = 3000  # Max length for code blocks
+        self.renderer = ResponseRenderer(
+            self.max_message_length, self.max_code_block_length
+        )
 
     def format_claude_response(
         self, text: str, context: Optional[dict] = None
     ) -> List[FormattedMessage]:
         """Enhanced formatting with context awareness and semantic chunking."""
-        # Clean and prepare text
-        text = self._clean_text(text)
-
-        # Check if we need semantic chunking (for complex content)
-        if self._should_use_semantic_chunking(text):
-            # Use enhanced semantic chunking for complex content
-            chunks = self._semantic_chunk(text, context)
-            messages = []
-            for chunk in chunks:
-                formatted = self._format_chunk(chunk)
-                messages.extend(formatted)
-        else:
-            # Use original simple formatting for basic content
-            text = self._format_code_blocks(text)
-            messages = self._split_message(text)
+        messages = [FormattedMessage(chunk) for chunk in self.renderer.render(text)]
 
         # Add context-aware quick actions to the last message
         if messages and self.settings.enable_quick_actions:
@@ -57,27 +56,13 @@ class ResponseFormatter:
 
         return messages if messages else [FormattedMessage("_(No content to display)_")]
 
-    def _should_use_semantic_chunking(self, text: str) -> bool:
-        """Determine if semantic chunking is needed."""
-        # Use semantic chunking for complex content with multiple code blocks,
-        # file operations, or very long text
-        code_block_count = text.count("```")
-        has_file_operations = any(
-            indicator in text
-            for indicator in [
-                "Creating file",
-                "Editing file",
-                "Reading file",
-                "Writing to",
-                "Modified file",
-                "Deleted file",
-                "File created",
-                "File updated",
-            ]
-        )
-        is_very_long = len(text) > self.max_message_length * 2
-
-        return code_block_count > 2 or has_file_operations or is_very_long
+    def get_response_keyboard(
+        self, context: Optional[dict] = None
+    ) -> Optional[InlineKeyboardMarkup]:
+        """Quick actions for the last message of a response, if enabled."""
+        if not self.settings.enable_quick_actions:
+            return None
+        return self._get_contextual_keyboard(context)
 
     def format_error_message(
         self, error: str, error_type: str = "Error"
@@ -168,229 +153,6 @@ class ResponseFormatter:
 
         return FormattedMessage(text, parse_mode=None)
 
-    def _semantic_chunk(self, text: str, context: Optional[dict]) -> List[dict]:
-        """Split text into semantic chunks based on content type."""
-        chunks = []
-
-        # Identify different content sections
-        sections = self._identify_sections(text)
-
-        for section in sections:
-            if section["type"] == "code_block":
-                chunks.extend(self._chunk_code_block(section))
-            elif section["type"] == "explanation":
-                chunks.extend(self._chunk_explanation(section))
-            elif section["type"] == "file_operations":
-                chunks.append(self._format_file_operations_section(section))
-            elif section["type"] == "mixed":
-                chunks.extend(self._chunk_mixed_content(section))
-            else:
-                # Default text chunking
-                chunks.extend(self._chunk_text(section))
-
-        return chunks
-
-    def _identify_sections(self, text: str) -> List[dict]:
-        """Identify different content types in the text."""
-        sections = []
-        lines = text.split("\n")
-        current_section = {"type": "text", "content": "", "start_line": 0}
-        in_code_block = False
-        code_start = 0
-
-        for i, line in enumerate(lines):
-            # Check for code block markers
-            if line.strip().startswith("```"):
-                if not in_code_block:
-                    # Start of code block
-                    if current_section["content"].strip():
-                        sections.append(current_section)
-                    in_code_block = True
-                    code_start = i
-                    current_section = {
-                        "type": "code_block",
-                        "content": line + "\n",
-                        "start_line": i,
-                    }
-                else:
-                    # End of code block
-                    current_section["content"] += line + "\n"
-                    sections.append(current_section)
-                    in_code_block = False
-                    current_section = {
-                        "type": "text",
-                        "content": "",
-                        "start_line": i + 1,
-                    }
-            elif in_code_block:
-                current_section["content"] += line + "\n"
-            else:
-                # Check for file operation patterns
-                if self._is_file_operation_line(line):
-                    if current_section["type"] != "file_operations":
-                        if current_section["content"].strip():
-                            sections.append(current_section)
-                        current_section = {
-                            "type": "file_operations",
-                            "content": line + "\n",
-                            "start_line": i,
-                        }
-                    else:
-                        current_section["content"] += line + "\n"
-                else:
-                    # Regular text
-                    if current_section["type"] != "text":
-                        if current_section["content"].strip():
-                            sections.append(current_section)
-                        current_section = {
-                            "type": "text",
-                            "content": line + "\n",
-                            "start_line": i,
-                        }
-                    else:
-                        current_section["content"] += line + "\n"
-
-        # Add the last section
-        if current_section["content"].strip():
-            sections.append(current_section)
-
-        return sections
-
-    def _is_file_operation_line(self, line: str) -> bool:
-        """Check if a line indicates file operations."""
-        file_indicators = [
-            "Creating file",
-            "Editing file",
-            "Reading file",
-            "Writing to",
-            "Modified file",
-            "Deleted file",
-            "File created",
-            "File updated",
-        ]
-        return any(indicator in line for indicator in file_indicators)
-
-    def _chunk_code_block(self, section: dict) -> List[dict]:
-        """Handle code block chunking."""
-        content = section["content"]
-        if len(content) <= self.max_code_block_length:
-            return [{"type": "code_block", "content": content, "format": "single"}]
-
-        # Split large code blocks
-        chunks = []
-        lines = content.split("\n")
-        current_chunk = lines[0] + "\n"  # Start with the ``` line
-
-        for line in lines[1:-1]:  # Skip first and last ``` lines
-            if len(current_chunk + line + "\n```\n") > self.max_code_block_length:
-                current_chunk += "```"
-                chunks.append(
-                    {"type": "code_block", "content": current_chunk, "format": "split"}
-                )
-                current_chunk = "```\n" + line + "\n"
-            else:
-                current_chunk += line + "\n"
-
-        current_chunk += lines[-1]  # Add the closing ```
-        chunks.append(
-            {"type": "code_block", "content": current_chunk, "format": "split"}
-        )
-
-        return chunks
-
-    def _chunk_explanation(self, section: dict) -> List[dict]:
-        """Handle explanation text chunking."""
-        content = section["content"]
-        if len(content) <= self.max_message_length:
-            return [{"type": "explanation", "content": content}]
-
-        # Split by paragraphs first
-        paragraphs = content.split("\n\n")
-        chunks = []
-        current_chunk = ""
-
-        for paragraph in paragraphs:
-            if len(current_chunk + paragraph + "\n\n") > self.max_message_length:
-                if current_chunk:
-                    chunks.append(
-                        {"type": "explanation", "content": current_chunk.strip()}
-                    )
-                current_chunk = paragraph + "\n\n"
-            else:
-                current_chunk += paragraph + "\n\n"
-
-        if current_chunk:
-            chunks.append({"type": "explanation", "content": current_chunk.strip()})
-
-        return chunks
-
-    def _chunk_mixed_content(self, section: dict) -> List[dict]:
-        """Handle mixed content sections."""
-        # For now, treat as regular text
-        return self._chunk_text(section)
-
-    def _chunk_text(self, section: dict) -> List[dict]:
-        """Handle regular text chunking."""
-        content = section["content"]
-        if len(content) <= self.max_message_length:
-            return [{"type": "text", "content": content}]
-
-        # Split at natural break points
-        chunks = []
-        current_chunk = ""
-
-        sentences = content.split(". ")
-        for sentence in sentences:
-            test_chunk = current_chunk + sentence + ". "
-            if len(test_chunk) > self.max_message_length:
-                if current_chunk:
-                    chunks.append({"type": "text", "content": current_chunk.strip()})
-                current_chunk = sentence + ". "
-            else:
-                current_chunk = test_chunk
-
-        if current_chunk:
-            chunks.append({"type": "text", "content": current_chunk.strip()})
-
-        return chunks
-
-    def _format_file_operations_section(self, section: dict) -> dict:
-        """Format file operations section."""
-        return {"type": "file_operations", "content": section["content"]}
-
-    def _format_chunk(self, chunk: dict) -> List[FormattedMessage]:
-        """Format individual chunks into FormattedMessage objects."""
-        chunk_type = chunk["type"]
-        content = chunk["content"]
-
-        if chunk_type == "code_block":
-            # Format code blocks with proper styling
-            if chunk.get("format") == "split":
-                title = (
-                    "📄 **Code (continued)**"
-                    if "continued" in content
-                    else "📄 **Code**"
-                )
-            else:
-                title = "📄 **Code**"
-
-            text = f"{title}\n\n{content}"
-
-        elif chunk_type == "file_operations":
-            # Format file operations with icons
-            text = f"📁 **File Operations**\n\n{content}"
-
-        elif chunk_type == "explanation":
-            # Regular explanation text
-            text = content
-
-        else:
-            # Default text formatting
-            text = content
-
-        # Split if still too long
-        return self._split_message(text)
-
     def _get_contextual_keyboard(
         self, context: Optional[dict]
     ) -> Optional[InlineKeyboardMarkup]:
@@ -423,154 +185,9 @@ class ResponseFormatter:
 
         return InlineKeyboardMarkup(buttons) if buttons else None
 
-    def _clean_text(self, text: str) -> str:
-        """Clean text for Telegram display."""
-        # Remove excessive whitespace
-        text = re.sub(r"\n{3,}", "\n\n", text)
-
-        # Escape special Markdown characters (but preserve intentional formatting)
-        # Be careful not to escape characters inside code blocks
-        text = self._escape_markdown_outside_code(text)
-
-        return text.strip()
-
-    def _escape_markdown_outside_code(self, text: str) -> str:
-        """Escape Markdown characters outside of code blocks."""
-        # More robust markdown escaping
-        parts = []
-        in_code_block = False
-        
-        lines = text.split("\n")
-        for line in lines:
-            if line.strip().startswith("```"):
-                in_code_block = not in_code_block
-                parts.append(line)
-            elif in_code_block:
-                # Inside code block - don't escape anything
-                parts.append(line)
-            else:
-                # Outside code blocks - escape problematic characters more carefully
-                # Split by backticks to handle inline code
-                line_parts = []
-                segments = line.split("`")
-                
-                for i, segment in enumerate(segments):
-                    if i % 2 == 0:  # Outside inline code
-                        # Escape only truly problematic characters for Telegram
-                        segment = (segment
-                                  .replace("\\", "\\\\")  # Escape backslashes first
-                                  .replace("[", r"\[")    # Escape square brackets
-                                  .replace("]", r"\]")
-                                  )
-                        # Don't escape * and _ as they're commonly used intentionally
-                    line_parts.append(segment)
-                
-                # Rejoin with backticks
-                processed_line = "`".join(line_parts)
-                parts.append(processed_line)
-
-        return "\n".join(parts)
-
-    def _format_code_blocks(self, text: str) -> str:
-        """Ensure code blocks are properly formatted for Telegram."""
-        # Handle triple backticks with language specification
-        pattern = r"```(\w+)?\n(.*?)```"
-
-        def replace_code_block(match):
-            lang = match.group(1) or ""
-            code = match.group(2)
-
-            # Telegram doesn't support language hints, but we can add them as comments
-            if lang and lang.lower() not in ["text", "plain"]:
-                # Add language as a comment at the top
-                code = f"# {lang}\n{code}"
-
-            # Ensure code block doesn't exceed length limits
-            if len(code) > self.max_code_block_length:
-                code = code[: self.max_code_block_length - 50] + "\n... (truncated)"
-
-            return f"```\n{code}\n```"
-
-        return re.sub(pattern, replace_code_block, text, flags=re.DOTALL)
-
     def _split_message(self, text: str) -> List[FormattedMessage]:
         """Split long messages while preserving formatting."""
-        if len(text) <= self.max_message_length:
-            return [FormattedMessage(text)]
-
-        messages = []
-        current_lines = []
-        current_length = 0
-        in_code_block = False
-
-        lines = text.split("\n")
-
-        for line in lines:
-            line_length = len(line) + 1  # +1 for newline
-
-            # Check for code block markers
-            if line.strip() == "```":
-                in_code_block = not in_code_block
-
-            # If this is a very long line that exceeds limit by itself, split it
-            if line_length > self.max_message_length:
-                # Split the line into chunks
-                chunks = []
-                for i in range(0, len(line), self.max_message_length - 100):
-                    chunks.append(line[i : i + self.max_message_length - 100])
-
-                for chunk in chunks:
-                    chunk_length = len(chunk) + 1
-
-                    if (
-                        current_length + chunk_length > self.max_message_length
-                        and current_lines
-                    ):
-                        # Save current message
-                        if in_code_block:
-                            current_lines.append("```")
-                        messages.append(FormattedMessage("\n".join(current_lines)))
-
-                        # Start new message
-                        current_lines = []
-                        current_length = 0
-                        if in_code_block:
-                            current_lines.append("```")
-                            current_length = 4
-
-                    current_lines.append(chunk)
-                    current_length += chunk_length
-                continue
-
-            # Check if adding this line would exceed the limit
-            if current_length + line_length > self.max_message_length and current_lines:
-                # Close code block if we're in one
-                if in_code_block:
-                    current_lines.append("```")
-
-                # Save current message
-                messages.append(FormattedMessage("\n".join(current_lines)))
-
-                # Start new message
-                current_lines = []
-                current_length = 0
-
-                # Reopen code block if needed
-                if in_code_block:
-                    current_lines.append("```")
-                    current_length = 4  # Length of '```\n'
-
-            current_lines.append(line)
-            current_length += line_length
-
-        # Add remaining content
-        if current_lines:
-            # Close code block if needed
-            if in_code_block:
-                current_lines.append("```")
-            messages.append(FormattedMessage("\n".join(current_lines)))
-
-        return messages
+        return [FormattedMessage(chunk) for chunk in self.renderer.split_message(text)]
 
     def _get_quick_actions_keyboard(self) -> InlineKeyboardMarkup:
         """Get quick actions inline keyboard."""
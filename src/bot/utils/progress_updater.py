@@ -0,0 +1,209 @@
+"""Coalescing, rate-aware updates of Telegram progress messages.
+
+Features:
+- Latest-value slot per progress message (intermediate updates are dropped)
+- Unchanged text is never re-sent
+- Per-chat and global token buckets matching Telegram flood limits
+- Honors RetryAfter without ever blocking the caller
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import structlog
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = structlog.get_logger()
+
+# Telegram allows roughly one message per second per chat (with short bursts)
+# and about 30 per second across all chats for a single bot.
+DEFAULT_CHAT_RATE = 1.0
+DEFAULT_CHAT_BURST = 3
+DEFAULT_GLOBAL_RATE = 25.0
+DEFAULT_GLOBAL_BURST = 25
+
+
+class TokenBucket:
+    """Monotonic-clock token bucket."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def block_for(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (Telegram flood wait)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class ProgressHandle:
+    """Latest-value slot for a single progress message.
+
+    ``update`` only stores the text and makes sure a flusher is running, so
+    it never waits on Telegram. The flusher sends the newest text whenever
+    the chat's bucket allows it.
+    """
+
+    def __init__(self, updater: "ProgressUpdater", message: Message):
+        self._updater = updater
+        self.message = message
+        self._latest: Optional[str] = None
+        self._parse_mode: Optional[str] = None
+        self._sent: Optional[str] = message.text
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def update(self, text: str, parse_mode: Optional[str] = None) -> None:
+        """Replace the pending text; returns immediately."""
+        if self._closed:
+            return
+        self._latest = text
+        self._parse_mode = parse_mode
+        if text == self._sent:
+            self._updater.stats["skipped_unchanged"] += 1
+            return
+        self._updater.stats["updates"] += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self) -> None:
+        """Wait until the latest text has been sent (or dropped on error)."""
+        if self._task and not self._task.done():
+            await self._task
+
+    async def close(self) -> None:
+        """Stop updating; any pending text is discarded."""
+        self._closed = True
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                logger.debug("Progress flusher cancelled")
+
+    async def _flush_loop(self) -> None:
+        chat_id = self.message.chat_id
+        while not self._closed and self._latest is not None:
+            if self._latest == self._sent:
+                return
+
+            await self._updater.acquire(chat_id)
+            if self._closed:
+                return
+
+            text, parse_mode = self._latest, self._parse_mode
+            if text == self._sent:
+                return
+
+            try:
+                await self.message.edit_text(text, parse_mode=parse_mode)
+                self._sent = text
+                self._updater.stats["edits"] += 1
+            except RetryAfter as e:
+                retry = e.retry_after
+                seconds = (
+                    retry.total_seconds() if hasattr(retry, "total_seconds") else retry
+                )
+                self._updater.flood_wait(chat_id, float(seconds))
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    self._sent = text
+                else:
+                    logger.warning("Progress edit rejected", error=str(e))
+                    self._updater.stats["errors"] += 1
+                    return
+            except TelegramError as e:
+                logger.warning("Failed to update progress message", error=str(e))
+                self._updater.stats["errors"] += 1
+                return
+
+
+class ProgressUpdater:
+    """Shared, rate-limited editor for progress messages across all chats."""
+
+    def __init__(
+        self,
+        chat_rate: float = DEFAULT_CHAT_RATE,
+        chat_burst: int = DEFAULT_CHAT_BURST,
+        global_rate: float = DEFAULT_GLOBAL_RATE,
+        global_burst: int = DEFAULT_GLOBAL_BURST,
+    ):
+        """Initialize updater with per-chat and global rate limits."""
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats: Dict[int, TokenBucket] = {}
+
+        self.stats: Dict[str, int] = {
+            "updates": 0,
+            "edits": 0,
+            "skipped_unchanged": 0,
+            "flood_waits": 0,
+            "errors": 0,
+        }
+
+    def track(self, message: Message) -> ProgressHandle:
+        """Create a coalescing handle for a progress message."""
+        return ProgressHandle(self, message)
+
+    async def acquire(self, chat_id: int) -> None:
+        """Wait for both the chat's and the global bucket."""
+        bucket = self._bucket(chat_id)
+        while True:
+            wait = max(bucket.delay(), self._global.delay())
+            if wait <= 0:
+                bucket.take()
+                self._global.take()
+                return
+            await asyncio.sleep(wait)
+
+    def flood_wait(self, chat_id: int, seconds: float) -> None:
+        """Record a RetryAfter from Telegram for ``chat_id``."""
+        self.stats["flood_waits"] += 1
+        self._bucket(chat_id).block_for(seconds)
+        logger.warning("Telegram flood wait", chat_id=chat_id, retry_after=seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get updater statistics."""
+        return {**self.stats, "tracked_chats": len(self._chats)}
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= 10000:
+                self._prune()
+            # Group chats (negative ids) get ~20 messages per minute
+            rate = self.chat_rate if chat_id > 0 else min(self.chat_rate, 20 / 60)
+            bucket = TokenBucket(rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune(self) -> None:
+        """Drop buckets that are full again (idle chats)."""
+        now = time.monotonic()
+        for chat_id in [
+            cid
+            for cid, b in self._chats.items()
+            if b.tokens + (now - b.updated) * b.rate >= b.capacity
+            and b.blocked_until <= now
+        ]:
+            del self._chats[chat_id]
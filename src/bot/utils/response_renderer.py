@@ -0,0 +1,501 @@
+"""Single-pass renderer that turns Claude output into Telegram messages.
+
+Features:
+- Walks the response once, line by line, as text arrives
+- Blank-run collapsing, Markdown escaping and code-fence tracking in the same step
+- Sections (text, code, file operations) chunked as they grow
+- Telegram-sized chunks emitted as soon as they are final
+- Output identical to the former multi-pass ResponseFormatter
+"""
+
+import re
+from typing import List, Optional, Tuple, Union
+
+FENCE = "```"
+
+FILE_OPERATION_INDICATORS = (
+    "Creating file",
+    "Editing file",
+    "Reading file",
+    "Writing to",
+    "Modified file",
+    "Deleted file",
+    "File created",
+    "File updated",
+)
+
+CODE_TITLE = "📄 **Code**"
+CODE_CONTINUED_TITLE = "📄 **Code (continued)**"
+FILE_OPERATIONS_TITLE = "📁 **File Operations**"
+
+DEFAULT_MAX_MESSAGE_LENGTH = 4000  # Telegram limit is 4096, leave some buffer
+DEFAULT_MAX_CODE_BLOCK_LENGTH = 3000
+
+_FILE_OPERATION_RE = re.compile(
+    "|".join(re.escape(indicator) for indicator in FILE_OPERATION_INDICATORS)
+)
+# Fenced block as rewritten for short responses
+_CODE_BLOCK_RE = re.compile(r"```(\w+)?\n(.*?)```", re.DOTALL)
+
+# Line kinds, decided once per line
+_PLAIN = 0
+_FILE_OPERATION = 1
+_CODE = 2
+_FENCE = 3
+
+_TEXT_SECTION = "text"
+_CODE_SECTION = "code_block"
+_FILE_OPERATIONS_SECTION = "file_operations"
+
+
+def escape_markdown(segment: str) -> str:
+    """Escape the characters Telegram Markdown trips over."""
+    return segment.replace("\\", "\\\\").replace("[", r"\[").replace("]", r"\]")
+
+
+def escape_line(line: str) -> str:
+    """Escape a line outside code blocks, leaving inline code alone."""
+    if "\\" not in line and "[" not in line and "]" not in line:
+        return line
+    if "`" not in line:
+        return escape_markdown(line)
+    segments = line.split("`")
+    segments[::2] = [escape_markdown(segment) for segment in segments[::2]]
+    return "`".join(segments)
+
+
+def is_file_operation_line(line: str) -> bool:
+    """Whether a line reports a file being created, edited or read."""
+    return _FILE_OPERATION_RE.search(line) is not None
+
+
+class _CodeChunker:
+    """Cut a long code block into fenced, titled pieces as lines arrive."""
+
+    __slots__ = ("_renderer", "_lines", "_length")
+
+    def __init__(self, renderer: "ResponseRenderer"):
+        self._renderer = renderer
+        self._lines: List[str] = []
+        self._length = 0
+
+    def add(self, line: str, ready: List[str]) -> None:
+        if not self._lines:
+            # The opening fence starts the first piece whatever its length
+            self._lines.append(line)
+            self._length = len(line) + 1
+        elif self._length + len(line) + 5 > self._renderer.max_code_block_length:
+            self._emit(self._lines + [FENCE], self._length + len(FENCE), ready)
+            self._lines = [FENCE, line]
+            self._length = len(FENCE) + len(line) + 2
+        else:
+            self._lines.append(line)
+            self._length += len(line) + 1
+
+    def finish(self, ready: List[str]) -> None:
+        self._emit(self._lines + [""], self._length, ready)
+
+    def _emit(self, lines: List[str], length: int, ready: List[str]) -> None:
+        title = (
+            CODE_CONTINUED_TITLE
+            if any("continued" in line for line in lines)
+            else CODE_TITLE
+        )
+        ready.extend(
+            self._renderer.split_lines([title, ""] + lines, len(title) + 2 + length)
+        )
+
+
+class _SentenceChunker:
+    """Cut long text at sentence boundaries as lines arrive."""
+
+    __slots__ = ("_renderer", "_current", "_length", "_tail")
+
+    def __init__(self, renderer: "ResponseRenderer"):
+        self._renderer = renderer
+        self._current: List[str] = []
+        self._length = 0
+        # Start of a sentence whose end has not arrived yet
+        self._tail: List[str] = []
+
+    def add(self, line: str, ready: List[str]) -> None:
+        # ". " never spans a line break, so lines can be split on their own
+        parts = (line + "\n").split(". ")
+        self._tail.append(parts[0])
+        if len(parts) == 1:
+            return
+        self._sentence("".join(self._tail), ready)
+        for sentence in parts[1:-1]:
+            self._sentence(sentence, ready)
+        self._tail = [parts[-1]]
+
+    def finish(self, ready: List[str]) -> None:
+        self._sentence("".join(self._tail), ready)
+        if self._length:
+            self._emit(ready)
+
+    def _sentence(self, sentence: str, ready: List[str]) -> None:
+        size = len(sentence) + 2
+        if self._length + size > self._renderer.max_message_length:
+            if self._length:
+                self._emit(ready)
+            self._current = [sentence, ". "]
+            self._length = size
+        else:
+            self._current.append(sentence)
+            self._current.append(". ")
+            self._length += size
+
+    def _emit(self, ready: List[str]) -> None:
+        ready.extend(self._renderer.split_message("".join(self._current).strip()))
+
+
+_Chunker = Union[_CodeChunker, _SentenceChunker]
+
+
+class _Section:
+    """Lines of one text, code or file-operations section.
+
+    Once a code or text section outgrows a single chunk its lines go
+    straight to a chunker, which emits each piece as soon as it is final.
+    """
+
+    __slots__ = ("kind", "lines", "length", "has_text", "chunker")
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.lines: List[str] = []
+        # Length of the section as "line\n" per line
+        self.length = 0
+        self.has_text = kind == _CODE_SECTION
+        self.chunker: Optional[_Chunker] = None
+
+
+class RenderStream:
+    """Incremental rendering of one response.
+
+    ``feed`` takes text as it arrives and returns the messages that can no
+    longer change; ``close`` returns the rest. Complete lines are processed
+    in batches as they arrive, except the last line with content and any
+    blank lines after it: whether those end the response (and get
+    stripped) is only known later.
+    """
+
+    def __init__(self, renderer: "ResponseRenderer"):
+        """Initialize stream state."""
+        self._renderer = renderer
+        self._partial: List[str] = []
+        self._started = False
+        self._closed = False
+
+        self._last: Optional[str] = None
+        self._held: List[str] = []
+
+        self._prev_empty = False
+        self._in_code = False
+        self._length = -1
+        self._fences = 0
+        # Lines seen before the response is known to need sectioning;
+        # None once it does
+        self._buffer: Optional[List[Tuple[str, int]]] = []
+        self._section = _Section(_TEXT_SECTION)
+        self._ready: List[str] = []
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def feed(self, text: str) -> List[str]:
+        """Add text; returns messages completed by it."""
+        if self._closed:
+            raise ValueError("Render stream is closed")
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return []
+            self._started = True
+
+        end = text.rfind("\n")
+        if end < 0:
+            self._partial.append(text)
+            return []
+        if self._partial:
+            self._partial.append(text[:end])
+            complete = "".join(self._partial)
+            self._partial = []
+        else:
+            complete = text[:end]
+        if end + 1 < len(text):
+            self._partial.append(text[end + 1 :])
+
+        lines = complete.split("\n")
+        index = len(lines) - 1
+        while index >= 0 and (not lines[index] or lines[index].isspace()):
+            index -= 1
+        if index < 0:
+            self._held.extend(lines)
+            return []
+
+        ready = [] if self._last is None else [self._last] + self._held
+        ready.extend(lines[:index])
+        self._last = lines[index]
+        self._held = lines[index + 1 :]
+        self._process(ready)
+        return self._take_ready()
+
+    def close(self) -> List[str]:
+        """Finish the response; returns the remaining messages."""
+        if self._closed:
+            return []
+        self._closed = True
+
+        tail = "".join(self._partial)
+        if tail and not tail.isspace():
+            ready = [] if self._last is None else [self._last] + self._held
+            ready.append(tail.rstrip())
+        elif self._last is not None:
+            ready = [self._last.rstrip()]
+        else:
+            ready = []
+        self._partial = []
+        self._last = None
+        self._held = []
+        self._process(ready)
+
+        renderer = self._renderer
+        if self._buffer is not None:
+            text = "\n".join(line for line, _ in self._buffer)
+            text = renderer.format_code_blocks(text)
+            self._ready.extend(renderer.split_message(text))
+            self._buffer = None
+        else:
+            self._finish_section()
+        return self._take_ready()
+
+    def _take_ready(self) -> List[str]:
+        ready, self._ready = self._ready, []
+        return ready
+
+    def _process(self, lines: List[str]) -> None:
+        """Collapse, escape, classify and section complete lines."""
+        prev_empty = self._prev_empty
+        in_code = self._in_code
+        search_file_operation = _FILE_OPERATION_RE.search
+
+        for line in lines:
+            if not line:
+                # Runs of blank lines collapse to one
+                if prev_empty:
+                    continue
+                prev_empty = True
+                kind = _CODE if in_code else _PLAIN
+            else:
+                prev_empty = False
+                if FENCE in line and line.lstrip().startswith(FENCE):
+                    in_code = not in_code
+                    kind = _FENCE
+                elif in_code:
+                    kind = _CODE
+                else:
+                    if "\\" in line or "[" in line or "]" in line:
+                        line = escape_line(line)
+                    kind = _FILE_OPERATION if search_file_operation(line) else _PLAIN
+
+            buffer = self._buffer
+            if buffer is None:
+                self._add(line, kind)
+            else:
+                self._buffer_line(buffer, line, kind)
+
+        self._prev_empty = prev_empty
+        self._in_code = in_code
+
+    def _buffer_line(self, buffer: List[Tuple[str, int]], line: str, kind: int) -> None:
+        """Hold a line until the response is known to need sectioning."""
+        buffer.append((line, kind))
+        self._length += len(line) + 1
+        self._fences += line.count(FENCE)
+        if (
+            self._fences > 2
+            or self._length > self._renderer.max_message_length * 2
+            or kind == _FILE_OPERATION
+            or (kind != _PLAIN and is_file_operation_line(line))
+        ):
+            # Complex content: replay what was held into sections
+            self._buffer = None
+            for buffered_line, buffered_kind in buffer:
+                self._add(buffered_line, buffered_kind)
+
+    def _add(self, line: str, kind: int) -> None:
+        """Extend the current section, emitting it when it ends."""
+        if kind == _FENCE:
+            if self._section.kind != _CODE_SECTION:
+                self._finish_section()
+                self._section = _Section(_CODE_SECTION)
+                self._append(line)
+            else:
+                self._append(line)
+                self._finish_section()
+                self._section = _Section(_TEXT_SECTION)
+        elif kind == _CODE:
+            self._append(line)
+        else:
+            wanted = (
+                _FILE_OPERATIONS_SECTION if kind == _FILE_OPERATION else _TEXT_SECTION
+            )
+            if self._section.kind != wanted:
+                self._finish_section()
+                self._section = _Section(wanted)
+            self._append(line)
+
+    def _append(self, line: str) -> None:
+        section = self._section
+        if section.chunker is not None:
+            section.chunker.add(line, self._ready)
+            return
+
+        section.lines.append(line)
+        section.length += len(line) + 1
+        if not section.has_text and line and not line.isspace():
+            section.has_text = True
+
+        if section.kind == _CODE_SECTION:
+            limit = self._renderer.max_code_block_length
+        elif section.kind == _TEXT_SECTION:
+            limit = self._renderer.max_message_length
+        else:
+            return
+        if section.length > limit and section.has_text:
+            # Too long for one chunk: start emitting pieces
+            chunker = self._renderer.chunker(section.kind)
+            section.chunker = chunker
+            for section_line in section.lines:
+                chunker.add(section_line, self._ready)
+            section.lines = []
+
+    def _finish_section(self) -> None:
+        section = self._section
+        if section.chunker is not None:
+            section.chunker.finish(self._ready)
+        elif section.has_text:
+            # Whitespace-only sections are dropped
+            self._ready.extend(self._renderer.render_section(section))
+
+
+class ResponseRenderer:
+    """Render Claude responses as Telegram-sized Markdown messages.
+
+    Short, simple responses get their code fences normalized and are split
+    on line boundaries. Long responses, or ones with several code blocks or
+    file operations, are cut into text, code and file-operation sections,
+    each chunked on its own and titled. Both paths produce exactly what the
+    original multi-pass formatter did, but the response is walked once and
+    long responses yield messages while later text is still arriving.
+    """
+
+    def __init__(
+        self,
+        max_message_length: int = DEFAULT_MAX_MESSAGE_LENGTH,
+        max_code_block_length: int = DEFAULT_MAX_CODE_BLOCK_LENGTH,
+    ):
+        """Initialize renderer with message size limits."""
+        self.max_message_length = max_message_length
+        self.max_code_block_length = max_code_block_length
+
+    def render(self, text: str) -> List[str]:
+        """Render a complete response."""
+        stream = self.stream()
+        messages = stream.feed(text)
+        messages.extend(stream.close())
+        return messages
+
+    def stream(self) -> RenderStream:
+        """Start rendering a response that arrives in pieces."""
+        return RenderStream(self)
+
+    def split_message(self, text: str) -> List[str]:
+        """Split text on line boundaries, keeping code fences balanced."""
+        if len(text) <= self.max_message_length:
+            return [text]
+        return self.split_lines(text.split("\n"), len(text))
+
+    def format_code_blocks(self, text: str) -> str:
+        """Normalize fenced blocks, moving the language into a comment."""
+        return _CODE_BLOCK_RE.sub(self._replace_code_block, text)
+
+    def chunker(self, kind: str) -> _Chunker:
+        """Chunker for a section that does not fit in one piece."""
+        if kind == _CODE_SECTION:
+            return _CodeChunker(self)
+        return _SentenceChunker(self)
+
+    def render_section(self, section: _Section) -> List[str]:
+        """Title and split a section that fit in one chunk."""
+        if section.kind == _CODE_SECTION:
+            title = CODE_TITLE
+        elif section.kind == _FILE_OPERATIONS_SECTION:
+            title = FILE_OPERATIONS_TITLE
+        else:
+            return ["\n".join(section.lines) + "\n"]
+        return self.split_lines(
+            [title, ""] + section.lines + [""], len(title) + 2 + section.length
+        )
+
+    def split_lines(self, lines: List[str], length: int) -> List[str]:
+        """Split pre-split lines of a text ``length`` characters long."""
+        limit = self.max_message_length
+        if length <= limit:
+            return ["\n".join(lines)]
+
+        messages = []
+        current: List[str] = []
+        current_length = 0
+        in_code_block = False
+        piece = limit - 100
+
+        for line in lines:
+            line_length = len(line) + 1
+
+            if FENCE in line and line.strip() == FENCE:
+                in_code_block = not in_code_block
+
+            if line_length > limit:
+                # A line longer than a message is cut into pieces
+                parts = [line[i : i + piece] for i in range(0, len(line), piece)]
+            else:
+                parts = [line]
+
+            for part in parts:
+                part_length = len(part) + 1
+                if current_length + part_length > limit and current:
+                    # Close the code block in this message, reopen in the next
+                    if in_code_block:
+                        current.append(FENCE)
+                    messages.append("\n".join(current))
+                    current = []
+                    current_length = 0
+                    if in_code_block:
+                        current.append(FENCE)
+                        current_length = len(FENCE) + 1
+                current.append(part)
+                current_length += part_length
+
+        if current:
+            if in_code_block:
+                current.append(FENCE)
+            messages.append("\n".join(current))
+
+        return messages
+
+    def _replace_code_block(self, match: "re.Match") -> str:
+        lang = match.group(1) or ""
+        code = match.group(2)
+
+        # Telegram doesn't support language hints, but we can add them as comments
+        if lang and lang.lower() not in ["text", "plain"]:
+            code = f"# {lang}\n{code}"
+
+        if len(code) > self.max_code_block_length:
+            code = code[: self.max_code_block_length - 50] + "\n... (truncated)"
+
+        return f"```\n{code}\n```"
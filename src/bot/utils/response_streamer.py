@@ -0,0 +1,217 @@
+"""Progressive delivery of Claude responses while they are generated.
+
+Features:
+- Assistant text blocks rendered incrementally as they stream in
+- Each chunk sent as soon as it is final
+- Sends paced by the same per-chat buckets as progress edits
+- Quick-action keyboard on the last message (added by edit if already sent)
+- Restarted attempts drop unsent text and skip chunks that are already out
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+import structlog
+from telegram import InlineKeyboardMarkup, Message
+from telegram.error import RetryAfter, TelegramError
+
+from .progress_updater import ProgressUpdater
+from .response_renderer import ResponseRenderer
+
+logger = structlog.get_logger()
+
+# Consecutive assistant text blocks are separate paragraphs
+BLOCK_SEPARATOR = "\n\n"
+
+
+class ResponseStreamer:
+    """Send a response chunk by chunk while Claude is still running.
+
+    ``add_text`` is called from the stream callback and never waits on
+    Telegram: chunks the renderer reports as final are queued and a
+    background sender posts them in order, replying to the user's message
+    with the first one. ``finish`` renders the rest once the result is in
+    and waits until everything has been sent. ``reset`` abandons the text
+    streamed so far when the run is retried.
+    """
+
+    def __init__(
+        self,
+        reply_to: Message,
+        renderer: ResponseRenderer,
+        updater: ProgressUpdater,
+    ):
+        """Initialize streamer for a reply to ``reply_to``."""
+        self._reply_to = reply_to
+        self._renderer = renderer
+        self._stream = renderer.stream()
+        self._updater = updater
+
+        self._blocks: List[str] = []
+        self._has_text = False
+        self._queue: Deque[str] = deque()
+        # Chunks handed to the sender, and those a retry must not repeat
+        self._out: List[str] = []
+        self._already_out: Deque[str] = deque()
+        self._matched = 0
+        self._attempt = 0
+        self._sender: Optional[asyncio.Task] = None
+        self._finishing = False
+        self._reply_markup: Optional[InlineKeyboardMarkup] = None
+        self._markup_sent = False
+        self._last_sent: Optional[Message] = None
+
+        self._started = time.monotonic()
+        self.first_chunk_ms: Optional[int] = None
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def has_text(self) -> bool:
+        """Whether any non-blank response text has been streamed."""
+        return self._has_text
+
+    def add_text(self, text: str) -> None:
+        """Feed one assistant text block; returns immediately."""
+        if not text or self._stream.closed:
+            return
+        if self._blocks:
+            text = BLOCK_SEPARATOR + text
+        self._blocks.append(text)
+        if not self._has_text and not text.isspace():
+            self._has_text = True
+        self._enqueue(self._stream.feed(text))
+
+    def reset(self) -> None:
+        """Abandon the streamed text because the run is starting over.
+
+        Unsent chunks are dropped. Chunks already handed to Telegram stay
+        out; the retry's leading chunks are skipped while they match them.
+        """
+        self._queue.clear()
+        self._stream = self._renderer.stream()
+        self._blocks = []
+        self._already_out = deque(self._out)
+        self._matched = 0
+        self._attempt += 1
+        self._has_text = bool(self._out)
+
+    def includes(self, text: str) -> bool:
+        """Whether ``text`` was already part of the streamed blocks."""
+        return text.strip() in "".join(self._blocks)
+
+    async def finish(self, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """Send the remaining chunks and wait until all are delivered."""
+        self._finishing = True
+        self._reply_markup = reply_markup
+        self._enqueue(self._stream.close())
+        if self._sender is not None:
+            await self._sender
+
+        if reply_markup and not self._markup_sent and self._last_sent is not None:
+            # Everything was already out when the result arrived
+            try:
+                await self._last_sent.edit_reply_markup(reply_markup=reply_markup)
+            except TelegramError as e:
+                logger.warning("Failed to attach quick actions", error=str(e))
+
+        logger.info(
+            "Progressive response delivered",
+            chunks=self.sent,
+            failed=self.failed,
+            first_chunk_ms=self.first_chunk_ms,
+            total_ms=int((time.monotonic() - self._started) * 1000),
+        )
+
+    async def cancel(self) -> None:
+        """Stop sending; queued chunks are dropped."""
+        self._queue.clear()
+        self._stream.close()
+        if self._sender and not self._sender.done():
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                logger.debug("Response sender cancelled")
+
+    def _enqueue(self, chunks: List[str]) -> None:
+        skip = 0
+        while self._already_out and skip < len(chunks):
+            if chunks[skip] != self._already_out[0]:
+                # The retry diverged; send the rest of it as it comes
+                self._already_out.clear()
+                break
+            self._already_out.popleft()
+            self._matched += 1
+            skip += 1
+        chunks = chunks[skip:]
+        if not chunks:
+            return
+        self._queue.extend(chunks)
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send_loop())
+
+    async def _send_loop(self) -> None:
+        chat_id = self._reply_to.chat_id
+        while self._queue:
+            await self._updater.acquire(chat_id)
+            if not self._queue:
+                # Dropped by reset while waiting for the bucket
+                break
+            text = self._queue.popleft()
+            self._out.append(text)
+            attempt = self._attempt
+            is_last = self._finishing and not self._queue
+            reply_markup = self._reply_markup if is_last else None
+            first = self.sent == 0 and self.failed == 0
+
+            try:
+                message = await self._reply_to.reply_text(
+                    text,
+                    parse_mode=None,
+                    reply_markup=reply_markup,
+                    reply_to_message_id=self._reply_to.message_id if first else None,
+                )
+            except RetryAfter as e:
+                retry = e.retry_after
+                seconds = (
+                    retry.total_seconds() if hasattr(retry, "total_seconds") else retry
+                )
+                self._updater.flood_wait(chat_id, float(seconds))
+                self._out.pop()
+                if attempt != self._attempt and len(self._out) >= self._matched:
+                    # Abandoned by reset and not (yet) produced by the retry
+                    if self._already_out:
+                        self._already_out.pop()
+                    continue
+                self._queue.appendleft(text)
+                continue
+            except Exception as e:
+                self.failed += 1
+                logger.error(
+                    "Failed to send response message",
+                    error=str(e),
+                    message_index=self.sent + self.failed - 1,
+                    message_text=text[:200],
+                )
+                try:
+                    await self._reply_to.reply_text(
+                        "❌ Failed to send response. Please try again.",
+                        reply_to_message_id=(
+                            self._reply_to.message_id if first else None
+                        ),
+                    )
+                except TelegramError as send_error:
+                    logger.warning(
+                        "Failed to report send failure", error=str(send_error)
+                    )
+                continue
+
+            self.sent += 1
+            self._last_sent = message
+            if reply_markup is not None:
+                self._markup_sent = True
+            if self.first_chunk_ms is None:
+                self.first_chunk_ms = int((time.monotonic() - self._started) * 1000)
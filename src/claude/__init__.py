@@ -1,9 +1,11 @@
 """Claude Code integration module."""
 
+from .events import StreamEvent, StreamEventDecoder
 from .exceptions import (
     ClaudeError,
     ClaudeParsingError,
     ClaudeProcessError,
+    ClaudeRequestCancelledError,
     ClaudeSessionError,
     ClaudeTimeoutError,
 )
@@ -23,6 +25,7 @@ __all__ = [
     "ClaudeError",
     "ClaudeParsingError",
     "ClaudeProcessError",
+    "ClaudeRequestCancelledError",
     "ClaudeSessionError",
     "ClaudeTimeoutError",
     # Main integration
@@ -31,6 +34,8 @@ __all__ = [
     "ClaudeProcessManager",
     "ClaudeResponse",
     "StreamUpdate",
+    "StreamEvent",
+    "StreamEventDecoder",
     "SessionManager",
     "SessionStorage",
     "InMemorySessionStorage",
@@ -0,0 +1,499 @@
+"""Typed, incremental decoding of Claude CLI stream-json events.
+
+Features:
+- Peeks at the top-level ``"type"`` before decoding a line
+- Lazy decoding of large tool results (counted, decoded only on access)
+- Compact ``__slots__`` event objects with the ``StreamUpdate`` interface
+- Bounded response collector instead of retaining decoded message dicts
+"""
+
+import json
+import re
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import structlog
+
+from .exceptions import ClaudeParsingError
+
+logger = structlog.get_logger()
+
+# Lines above this size are decoded lazily when their type allows it
+DEFAULT_LAZY_THRESHOLD = 64 * 1024
+
+# The CLI always emits "type" as the first key of an event
+_TYPE_PEEK = re.compile(r'\{\s*"type"\s*:\s*"([A-Za-z_]+)"')
+_STRING_VALUE = re.compile(r'\s*:\s*"((?:[^"\\]|\\.)*)"')
+_NUMBER_VALUE = re.compile(r"\s*:\s*(-?\d+(?:\.\d+)?)")
+_TRUE_VALUE = re.compile(r"\s*:\s*true")
+
+_LAZY_TYPES = frozenset({"tool_result", "user"})
+
+
+def _peek_key(raw: str, key: str, pattern: "re.Pattern[str]") -> Optional[str]:
+    """Find ``"key": <value>`` in a raw JSON line without decoding it.
+
+    An unescaped ``"key"`` followed by a colon can only be an object key,
+    never text inside a JSON string, so this is safe to use as a hint.
+    """
+    token = f'"{key}"'
+    pos = raw.find(token)
+    while pos != -1:
+        match = pattern.match(raw, pos + len(token))
+        if match:
+            return match.group(1) if match.groups() else match.group(0)
+        pos = raw.find(token, pos + 1)
+    return None
+
+
+class StreamEvent:
+    """Base class for decoded stream events.
+
+    Mirrors the public interface of ``StreamUpdate`` so handlers can consume
+    either; fields a given event type never carries resolve to ``None``
+    through read-only class properties instead of per-instance storage.
+    Subclasses declare the fields they carry as slots or properties.
+    """
+
+    __slots__ = ("type", "session_id", "timestamp")
+
+    def __init__(
+        self,
+        type: str,
+        session_id: Optional[str] = None,
+        timestamp: Optional[str] = None,
+    ):
+        self.type = type
+        self.session_id = session_id
+        self.timestamp = timestamp
+
+    @property
+    def content(self) -> Optional[str]:
+        return None
+
+    @property
+    def tool_calls(self) -> Optional[List[Dict]]:
+        return None
+
+    @property
+    def metadata(self) -> Optional[Dict]:
+        return None
+
+    @property
+    def progress(self) -> Optional[Dict]:
+        return None
+
+    @property
+    def error_info(self) -> Optional[Dict]:
+        return None
+
+    @property
+    def execution_id(self) -> Optional[str]:
+        return None
+
+    @property
+    def parent_message_id(self) -> Optional[str]:
+        return None
+
+    @property
+    def session_context(self) -> Dict[str, Optional[str]]:
+        """Session context in the ``StreamUpdate`` shape."""
+        return {"session_id": self.session_id}
+
+    def is_error(self) -> bool:
+        """Check if this update represents an error."""
+        return self.type == "error" or bool(
+            self.metadata and self.metadata.get("is_error", False)
+        )
+
+    def get_tool_names(self) -> List[str]:
+        """Extract tool names from tool calls."""
+        if not self.tool_calls:
+            return []
+        return [call["name"] for call in self.tool_calls if call.get("name")]
+
+    def get_progress_percentage(self) -> Optional[int]:
+        """Get progress percentage if available."""
+        if self.progress:
+            return self.progress.get("percentage")
+        return None
+
+    def get_error_message(self) -> Optional[str]:
+        """Get error message if this is an error update."""
+        if self.error_info:
+            return self.error_info.get("message")
+        elif self.is_error() and self.content:
+            return self.content
+        return None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(type={self.type!r})"
+
+
+class AssistantEvent(StreamEvent):
+    """Assistant turn with text and/or tool calls."""
+
+    __slots__ = ("content", "tool_calls", "execution_id")
+
+    content: Optional[str]
+    tool_calls: Optional[List[Dict]]
+    execution_id: Optional[str]
+
+    def __init__(self, msg: Dict[str, Any]):
+        super().__init__("assistant", msg.get("session_id"), msg.get("timestamp"))
+        message = msg.get("message", {})
+        content_blocks = message.get("content", [])
+
+        text_content = []
+        tool_calls = []
+        if isinstance(content_blocks, str):
+            text_content.append(content_blocks)
+        else:
+            for block in content_blocks:
+                block_type = block.get("type")
+                if block_type == "text":
+                    text_content.append(block.get("text", ""))
+                elif block_type == "tool_use":
+                    tool_calls.append(
+                        {
+                            "name": block.get("name"),
+                            "input": block.get("input", {}),
+                            "id": block.get("id"),
+                        }
+                    )
+
+        self.content = "\n".join(text_content) if text_content else None
+        self.tool_calls = tool_calls or None
+        self.execution_id = msg.get("id")
+
+
+class UserEvent(StreamEvent):
+    """User turn; in CLI output these mostly carry tool results."""
+
+    __slots__ = ("_content", "_raw", "payload_bytes")
+
+    _content: Optional[str]
+    _raw: Optional[str]
+
+    def __init__(
+        self,
+        msg: Optional[Dict[str, Any]] = None,
+        raw: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ):
+        if msg is not None:
+            super().__init__("user", msg.get("session_id"), msg.get("timestamp"))
+            self._content = self._extract_text(msg)
+            self._raw = None
+            self.payload_bytes = 0
+        else:
+            super().__init__("user", session_id)
+            self._content = None
+            self._raw = raw
+            self.payload_bytes = len(raw or "")
+
+    @property
+    def content(self) -> Optional[str]:
+        if self._raw is not None:
+            msg = json.loads(self._raw)
+            self._raw = None
+            self.timestamp = msg.get("timestamp")
+            self._content = self._extract_text(msg)
+        return self._content
+
+    @staticmethod
+    def _extract_text(msg: Dict[str, Any]) -> Optional[str]:
+        message = msg.get("message", {})
+        content = message.get("content", "")
+
+        # Handle both string and block format content
+        if isinstance(content, list):
+            text_parts = []
+            for block in content:
+                if isinstance(block, dict) and block.get("type") == "text":
+                    text_parts.append(block.get("text", ""))
+                elif isinstance(block, str):
+                    text_parts.append(block)
+            content = "\n".join(text_parts)
+
+        return content if content else None
+
+
+class ToolResultEvent(StreamEvent):
+    """Tool execution result, optionally holding an undecoded payload."""
+
+    __slots__ = (
+        "tool_use_id",
+        "failed",
+        "execution_time_ms",
+        "payload_bytes",
+        "_content",
+        "_raw",
+    )
+
+    tool_use_id: Optional[str]
+    failed: bool
+    execution_time_ms: Optional[float]
+    _content: Optional[str]
+    _raw: Optional[str]
+
+    def __init__(
+        self,
+        msg: Optional[Dict[str, Any]] = None,
+        raw: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ):
+        if msg is not None:
+            super().__init__("tool_result", msg.get("session_id"), msg.get("timestamp"))
+            self._raw = None
+            self.payload_bytes = 0
+            self._apply(msg)
+            return
+
+        if raw is None:
+            raise ValueError("ToolResultEvent needs a decoded message or a raw line")
+        super().__init__("tool_result", session_id)
+        self._raw = raw
+        self._content = None
+        self.payload_bytes = len(raw)
+        self.tool_use_id = _peek_key(raw, "tool_use_id", _STRING_VALUE)
+        elapsed = _peek_key(raw, "execution_time_ms", _NUMBER_VALUE)
+        self.execution_time_ms = None
+        if elapsed:
+            value = float(elapsed)
+            self.execution_time_ms = int(value) if value.is_integer() else value
+        # Errors are rare and need the content, so decode them eagerly
+        self.failed = False
+        if _peek_key(raw, "is_error", _TRUE_VALUE):
+            self._decode()
+
+    def _apply(self, msg: Dict[str, Any]) -> None:
+        result = msg.get("result", {})
+        is_dict = isinstance(result, dict)
+        self._content = result.get("content") if is_dict else str(result)
+        self.tool_use_id = msg.get("tool_use_id")
+        self.failed = bool(result.get("is_error", False)) if is_dict else False
+        self.execution_time_ms = result.get("execution_time_ms") if is_dict else None
+
+    def _decode(self) -> None:
+        if self._raw is None:
+            return
+        msg = json.loads(self._raw)
+        self._raw = None
+        self.timestamp = msg.get("timestamp")
+        self._apply(msg)
+
+    @property
+    def content(self) -> Optional[str]:
+        if self._raw is not None:
+            self._decode()
+        return self._content
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "tool_use_id": self.tool_use_id,
+            "is_error": self.failed,
+            "execution_time_ms": self.execution_time_ms,
+        }
+
+    @property
+    def error_info(self) -> Optional[Dict[str, Any]]:
+        return {"message": self.content} if self.failed else None
+
+
+class SystemEvent(StreamEvent):
+    """System message (``init`` and other subtypes)."""
+
+    __slots__ = ("content", "metadata")
+
+    content: Optional[str]
+    metadata: Dict[str, Any]
+
+    def __init__(self, msg: Dict[str, Any]):
+        subtype = msg.get("subtype")
+        if subtype == "init":
+            super().__init__("system", msg.get("session_id"))
+            self.content = None
+            self.metadata = {
+                "subtype": "init",
+                "tools": msg.get("tools", []),
+                "mcp_servers": msg.get("mcp_servers", []),
+                "model": msg.get("model"),
+                "cwd": msg.get("cwd"),
+                "permission_mode": msg.get("permissionMode"),
+            }
+        else:
+            super().__init__("system", msg.get("session_id"), msg.get("timestamp"))
+            self.content = msg.get("message", str(msg))
+            self.metadata = {"subtype": subtype}
+
+
+class ErrorEvent(StreamEvent):
+    """Error reported by the CLI."""
+
+    __slots__ = ("content", "code", "subtype")
+
+    content: Optional[str]
+
+    def __init__(self, msg: Dict[str, Any]):
+        super().__init__("error", msg.get("session_id"), msg.get("timestamp"))
+        self.content = msg.get("message", msg.get("error", str(msg)))
+        self.code = msg.get("code")
+        self.subtype = msg.get("subtype")
+
+    @property
+    def error_info(self) -> Dict[str, Any]:
+        return {"message": self.content, "code": self.code, "subtype": self.subtype}
+
+
+class ProgressEvent(StreamEvent):
+    """Progress update."""
+
+    __slots__ = ("content", "progress")
+
+    content: Optional[str]
+    progress: Dict[str, Any]
+
+    def __init__(self, msg: Dict[str, Any]):
+        super().__init__("progress", msg.get("session_id"), msg.get("timestamp"))
+        self.content = msg.get("message", msg.get("status"))
+        self.progress = {
+            "percentage": msg.get("percentage"),
+            "step": msg.get("step"),
+            "total_steps": msg.get("total_steps"),
+            "operation": msg.get("operation"),
+        }
+
+
+class ResultEvent(StreamEvent):
+    """Final result message; keeps the (small) decoded dict."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, msg: Dict[str, Any]):
+        super().__init__("result", msg.get("session_id"), msg.get("timestamp"))
+        self.data = msg
+
+
+class QueuedEvent(StreamEvent):
+    """Synthetic event: the request is waiting for an execution slot."""
+
+    __slots__ = ("position",)
+
+    def __init__(self, position: int):
+        super().__init__("queued")
+        self.position = position
+
+    @property
+    def progress(self) -> Dict[str, int]:
+        return {"position": self.position}
+
+
+class RestartEvent(StreamEvent):
+    """Synthetic event: the attempt so far was abandoned and is being re-run.
+
+    Everything streamed before it belongs to the abandoned attempt.
+    """
+
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        super().__init__("restart")
+        self.reason = reason
+
+
+_EVENT_TYPES: Dict[str, Callable[[Dict[str, Any]], StreamEvent]] = {
+    "assistant": AssistantEvent,
+    "user": UserEvent,
+    "tool_result": ToolResultEvent,
+    "system": SystemEvent,
+    "error": ErrorEvent,
+    "progress": ProgressEvent,
+    "result": ResultEvent,
+}
+
+
+class StreamEventDecoder:
+    """Decode stream-json lines into typed events.
+
+    The top-level type is peeked from the line prefix; large ``tool_result``
+    and ``user`` lines are wrapped undecoded and only parsed if a consumer
+    actually reads their content.
+    """
+
+    def __init__(self, lazy_threshold: int = DEFAULT_LAZY_THRESHOLD):
+        """Initialize decoder with the lazy-decoding size threshold."""
+        self.lazy_threshold = lazy_threshold
+        self.decoded = 0
+        self.lazy = 0
+        self.lazy_bytes = 0
+        self.by_type: Counter = Counter()
+
+    def decode(self, line: str) -> Optional[StreamEvent]:
+        """Decode one line.
+
+        Returns ``None`` for unknown event types. Raises
+        ``json.JSONDecodeError`` for malformed JSON and
+        ``ClaudeParsingError`` for JSON without a ``type`` field.
+        """
+        peek = _TYPE_PEEK.match(line)
+        msg_type = peek.group(1) if peek else None
+
+        if msg_type in _LAZY_TYPES and len(line) > self.lazy_threshold:
+            self.lazy += 1
+            self.lazy_bytes += len(line)
+            self.by_type[msg_type] += 1
+            session = _peek_key(line, "session_id", _STRING_VALUE)
+            if msg_type == "tool_result":
+                return ToolResultEvent(raw=line, session_id=session)
+            return UserEvent(raw=line, session_id=session)
+
+        msg = json.loads(line)
+        if not isinstance(msg, dict) or "type" not in msg:
+            raise ClaudeParsingError(f"Invalid message structure: {line[:100]}")
+
+        msg_type = msg["type"]
+        self.decoded += 1
+        self.by_type[msg_type] += 1
+
+        event_cls = _EVENT_TYPES.get(msg_type)
+        if event_cls is None:
+            logger.debug("Unknown message type", msg_type=msg_type)
+            return None
+        return event_cls(msg)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Decoding statistics for logging."""
+        return {
+            "decoded": self.decoded,
+            "lazy": self.lazy,
+            "lazy_bytes": self.lazy_bytes,
+            "by_type": dict(self.by_type),
+        }
+
+
+class ResponseCollector:
+    """Keep only what the final response needs from the event stream.
+
+    Replaces retaining every decoded message: tracks the latest assistant
+    text and a bounded list of tool uses.
+    """
+
+    __slots__ = ("last_text", "tools_used")
+
+    def __init__(self, max_tools: int = 1000):
+        self.last_text: Optional[str] = None
+        self.tools_used: Deque[Dict[str, Any]] = deque(maxlen=max_tools)
+
+    def add(self, event: StreamEvent) -> None:
+        """Record an event if it contributes to the final response."""
+        if event.type != "assistant":
+            return
+        if event.content:
+            self.last_text = event.content
+        if event.tool_calls:
+            for call in event.tool_calls:
+                self.tools_used.append(
+                    {"name": call.get("name"), "timestamp": event.timestamp}
+                )
@@ -40,3 +40,9 @@ class ClaudeToolValidationError(ClaudeError):
         super().__init__(message)
         self.blocked_tools = blocked_tools or []
         self.allowed_tools = allowed_tools or []
+
+
+class ClaudeRequestCancelledError(ClaudeError):
+    """Queued request was cancelled before it started."""
+
+    pass
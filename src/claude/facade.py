@@ -9,9 +9,11 @@ from typing import Any, Callable, Dict, List, Optional, Union, TYPE_CHECKING
 import structlog
 
 from ..config.settings import Settings
-from .exceptions import ClaudeToolValidationError
+from .events import QueuedEvent, RestartEvent
+from .exceptions import ClaudeRequestCancelledError, ClaudeToolValidationError
 from .integration import ClaudeProcessManager, ClaudeResponse, StreamUpdate
 from .monitor import ToolMonitor
+from .scheduler import ClaudeScheduler
 # Temporarily disable SDK integration
 # from .sdk_integration import ClaudeSDKManager
 from .session import SessionManager
@@ -32,9 +34,14 @@ class ClaudeIntegration:
         sdk_manager: Optional[Any] = None,
         session_manager: Optional[SessionManager] = None,
         tool_monitor: Optional[ToolMonitor] = None,
+        scheduler: Optional[ClaudeScheduler] = None,
     ):
         """Initialize Claude integration facade."""
         self.config = config
+        self.scheduler = scheduler or ClaudeScheduler(
+            config.claude_max_concurrent_processes,
+            config.claude_max_concurrent_per_user,
+        )
 
         # Initialize both managers for fallback capability
         # SDK manager temporarily disabled
@@ -153,13 +160,17 @@ class ClaudeIntegration:
                 else session.session_id
             )
 
-            response = await self._execute_with_fallback(
-                prompt=enhanced_prompt,
-                working_directory=working_directory,
-                session_id=claude_session_id,
-                continue_session=should_continue,
-                stream_callback=stream_handler,
-            )
+            # Wait for an execution slot (global and per-user caps)
+            async with self.scheduler.slot(
+                user_id, self._queue_position_reporter(on_stream)
+            ):
+                response = await self._execute_with_fallback(
+                    prompt=enhanced_prompt,
+                    working_directory=working_directory,
+                    session_id=claude_session_id,
+                    continue_session=should_continue,
+                    stream_callback=stream_handler,
+                )
 
             # Check if tool validation failed
             if not tools_validated:
@@ -263,9 +274,21 @@ class ClaudeIntegration:
         # Images require visual analysis which CLI cannot do
         if self.sdk_manager:
             try:
-                return await self._run_command_with_images_sdk(
-                    prompt, images, working_directory, user_id, session_id, on_stream
-                )
+                # Admitted like run_command; the CLI fallback below takes
+                # its own slot through run_command
+                async with self.scheduler.slot(
+                    user_id, self._queue_position_reporter(on_stream)
+                ):
+                    return await self._run_command_with_images_sdk(
+                        prompt,
+                        images,
+                        working_directory,
+                        user_id,
+                        session_id,
+                        on_stream,
+                    )
+            except ClaudeRequestCancelledError:
+                raise
             except Exception as e:
                 logger.warning("SDK image processing failed, will try CLI fallback", error=str(e))
                 self._sdk_failed_count += 1
@@ -276,6 +299,18 @@ class ClaudeIntegration:
             prompt, images, working_directory, user_id, session_id, on_stream
         )
 
+    @staticmethod
+    def _queue_position_reporter(
+        on_stream: Optional[Callable[[StreamUpdate], None]],
+    ) -> Callable[[int], Any]:
+        """Scheduler callback forwarding queue positions to ``on_stream``."""
+
+        async def report_queue_position(position: int) -> None:
+            if on_stream:
+                await on_stream(QueuedEvent(position))
+
+        return report_queue_position
+
     async def _run_command_with_images_sdk(
         self,
         prompt: str,
@@ -574,6 +609,9 @@ class ClaudeIntegration:
                     # Use subprocess fallback
                     try:
                         logger.info("Executing with subprocess fallback")
+                        if stream_callback:
+                            # The SDK attempt may have streamed part of an answer
+                            await stream_callback(RestartEvent("sdk_fallback"))
                         response = await self.process_manager.execute_command(
                             prompt=prompt,
                             working_directory=working_directory,
@@ -691,14 +729,25 @@ class ClaudeIntegration:
             **tool_usage,
         }
 
+    def get_process_stats(self) -> Dict[str, Any]:
+        """Get subprocess and worker pool statistics."""
+        return {
+            "active_processes": self.process_manager.get_active_process_count(),
+            "time_to_first_token": self.process_manager.get_ttft_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "session_cache": self.session_manager.get_cache_stats(),
+            "session_cleanup": self.session_manager.get_cleanup_stats(),
+        }
+
     async def shutdown(self) -> None:
         """Shutdown integration and cleanup resources."""
         logger.info("Shutting down Claude integration")
 
-        # Kill any active processes
-        await self.manager.kill_all_processes()
+        # Kill any active processes (and warm workers)
+        await (self.manager or self.process_manager).kill_all_processes()
 
         # Clean up expired sessions
+        await self.session_manager.shutdown()
         await self.cleanup_expired_sessions()
 
         logger.info("Claude integration shutdown complete")
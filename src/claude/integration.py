@@ -9,21 +9,29 @@ Features:
 
 import asyncio
 import json
+import time
 import uuid
 from asyncio.subprocess import Process
 from collections import deque
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
 
 import structlog
 
 from ..config.settings import Settings
+from .events import (
+    DEFAULT_LAZY_THRESHOLD,
+    ResponseCollector,
+    StreamEventDecoder,
+)
 from .exceptions import (
     ClaudeParsingError,
     ClaudeProcessError,
     ClaudeTimeoutError,
 )
+from .stream_reader import DEFAULT_MAX_LINE_BYTES, LineFramer, iter_stream_lines
+from .worker_pool import ClaudeWorkerPool
 
 logger = structlog.get_logger()
 
@@ -97,10 +105,27 @@ class ClaudeProcessManager:
         self.active_processes: Dict[str, Process] = {}
 
         # Memory optimization settings
-        self.max_message_buffer = 1000  # Limit message history
+        self.max_message_buffer = 1000  # Limit retained tool-use history
+        # Larger tool results are counted but only decoded on access
+        self.lazy_decode_threshold = DEFAULT_LAZY_THRESHOLD
         self.streaming_buffer_size = (
             65536  # 64KB streaming buffer for large JSON messages
         )
+        # Hard cap for a single stream-json line (huge tool_result payloads)
+        self.max_line_bytes = DEFAULT_MAX_LINE_BYTES
+
+        # Optional warm worker pool (streaming input mode)
+        self.worker_pool: Optional[ClaudeWorkerPool] = (
+            ClaudeWorkerPool(config)
+            if getattr(config, "claude_worker_pool_enabled", False)
+            else None
+        )
+
+        # Time to first assistant event, pooled (warm worker) vs cold start
+        self.ttft_samples: Dict[str, Deque[float]] = {
+            "pooled": deque(maxlen=200),
+            "cold": deque(maxlen=200),
+        }
 
     async def execute_command(
         self,
@@ -111,6 +136,11 @@ class ClaudeProcessManager:
         stream_callback: Optional[Callable[[StreamUpdate], None]] = None,
     ) -> ClaudeResponse:
         """Execute Claude Code command."""
+        if self.worker_pool and prompt:
+            return await self._execute_pooled(
+                prompt, working_directory, session_id, continue_session, stream_callback
+            )
+
         # Build command
         cmd = self._build_command(prompt, session_id, continue_session)
 
@@ -127,12 +157,13 @@ class ClaudeProcessManager:
 
         try:
             # Start process
+            started = time.monotonic()
             process = await self._start_process(cmd, working_directory)
             self.active_processes[process_id] = process
 
             # Handle output with timeout
             result = await asyncio.wait_for(
-                self._handle_process_output(process, stream_callback),
+                self._handle_process_output(process, stream_callback, started),
                 timeout=self.config.claude_timeout_seconds,
             )
 
@@ -174,6 +205,104 @@ class ClaudeProcessManager:
             if process_id in self.active_processes:
                 del self.active_processes[process_id]
 
+    async def _execute_pooled(
+        self,
+        prompt: str,
+        working_directory: Path,
+        session_id: Optional[str],
+        continue_session: bool,
+        stream_callback: Optional[Callable[[StreamUpdate], None]],
+        retry_on_stale: bool = True,
+    ) -> ClaudeResponse:
+        """Execute a turn on a leased warm worker from the pool."""
+        lease_session = session_id if continue_session else None
+        started = time.monotonic()
+        worker, warm = await self.worker_pool.lease(working_directory, lease_session)
+        process_id = f"worker-{worker.process.pid}"
+        self.active_processes[process_id] = worker.process
+
+        logger.info(
+            "Running Claude turn on pooled worker",
+            process_id=process_id,
+            warm=warm,
+            working_directory=str(working_directory),
+            session_id=lease_session,
+            requests_served=worker.requests_served,
+        )
+
+        async def retry_on_new_worker() -> ClaudeResponse:
+            return await self._execute_pooled(
+                prompt,
+                working_directory,
+                session_id,
+                continue_session,
+                stream_callback,
+                retry_on_stale=False,
+            )
+
+        result = None
+        healthy = False
+        try:
+            try:
+                await worker.send_prompt(prompt)
+            except (BrokenPipeError, ConnectionResetError) as e:
+                if not (warm and retry_on_stale):
+                    raise
+                # Parked worker died before asyncio reaped its return code
+                logger.warning(
+                    "Warm Claude worker stdin closed, retrying",
+                    process_id=process_id,
+                    error=str(e),
+                )
+                await self.worker_pool.release(worker, None, healthy=False)
+                worker = None
+                return await retry_on_new_worker()
+
+            result, collector, events_seen = await asyncio.wait_for(
+                self._consume_events(
+                    worker.lines(),
+                    stream_callback,
+                    started,
+                    "pooled" if warm else "cold",
+                    stop_at_result=True,
+                ),
+                timeout=self.config.claude_timeout_seconds,
+            )
+
+            if result is None:
+                return_code = await worker.process.wait()
+                if warm and retry_on_stale and not events_seen:
+                    # Idle worker died while parked; retry once on a new one
+                    logger.warning(
+                        "Warm Claude worker exited before responding, retrying",
+                        process_id=process_id,
+                        return_code=return_code,
+                    )
+                    await self.worker_pool.release(worker, None, healthy=False)
+                    worker = None
+                    return await retry_on_new_worker()
+                self._raise_process_error(return_code, worker.stderr_tail)
+
+            healthy = True
+            return self._parse_result(result, collector)
+
+        except asyncio.TimeoutError:
+            logger.error(
+                "Claude Code worker timed out",
+                process_id=process_id,
+                timeout_seconds=self.config.claude_timeout_seconds,
+            )
+            raise ClaudeTimeoutError(
+                f"Claude Code timed out after {self.config.claude_timeout_seconds}s"
+            )
+
+        finally:
+            self.active_processes.pop(process_id, None)
+            if worker is not None:
+                await self.worker_pool.release(
+                    worker, result.get("session_id") if result else None, healthy
+                )
+
     def _build_command(
         self, prompt: str, session_id: Optional[str], continue_session: bool
     ) -> List[str]:
@@ -226,41 +355,64 @@ class ClaudeProcessManager:
         )
 
     async def _handle_process_output(
-        self, process: Process, stream_callback: Optional[Callable]
+        self,
+        process: Process,
+        stream_callback: Optional[Callable],
+        started: Optional[float] = None,
     ) -> ClaudeResponse:
-        """Memory-optimized output handling with bounded buffers."""
-        message_buffer = deque(maxlen=self.max_message_buffer)
+        """Memory-optimized output handling with bounded buffers.
+
+        Lines are decoded into compact typed events; only the pieces needed
+        for the final response are retained, not the decoded messages.
+        """
+        result, collector, _ = await self._consume_events(
+            self._read_stream_bounded(process.stdout),
+            stream_callback,
+            started if started is not None else time.monotonic(),
+            "cold",
+        )
+
+        # Wait for process to complete
+        return_code = await process.wait()
+
+        if return_code != 0:
+            stderr = await process.stderr.read()
+            self._raise_process_error(
+                return_code, stderr.decode("utf-8", errors="replace")
+            )
+
+        if not result:
+            logger.error("No result message received from Claude Code")
+            raise ClaudeParsingError("No result message received from Claude Code")
+
+        return self._parse_result(result, collector)
+
+    async def _consume_events(
+        self,
+        lines: AsyncIterator[str],
+        stream_callback: Optional[Callable],
+        started: float,
+        ttft_mode: str,
+        stop_at_result: bool = False,
+    ) -> Tuple[Optional[Dict], ResponseCollector, int]:
+        """Decode stream lines, dispatch events and collect the result.
+
+        Returns the result message (if any), the response collector and the
+        number of events seen.
+        """
+        decoder = StreamEventDecoder(self.lazy_decode_threshold)
+        collector = ResponseCollector(self.max_message_buffer)
         result = None
         parsing_errors = []
+        events_seen = 0
+        first_token_seen = False
 
-        async for line in self._read_stream_bounded(process.stdout):
+        async for line in lines:
             try:
-                msg = json.loads(line)
-
-                # Enhanced validation
-                if not self._validate_message_structure(msg):
-                    parsing_errors.append(f"Invalid message structure: {line[:100]}")
-                    continue
-
-                message_buffer.append(msg)
-
-                # Process immediately to avoid memory buildup
-                update = self._parse_stream_message(msg)
-                if update and stream_callback:
-                    try:
-                        await stream_callback(update)
-                    except Exception as e:
-                        logger.warning(
-                            "Stream callback failed",
-                            error=str(e),
-                            update_type=update.type,
-                        )
-
-                # Check for final result
-                if msg.get("type") == "result":
-                    logger.debug("Found result message", message_keys=list(msg.keys()), message_sample=str(msg)[:500])
-                    result = msg
-
+                event = decoder.decode(line)
+            except ClaudeParsingError as e:
+                parsing_errors.append(str(e))
+                continue
             except json.JSONDecodeError as e:
                 parsing_errors.append(f"JSON decode error: {e}")
                 logger.warning(
@@ -268,6 +420,42 @@ class ClaudeProcessManager:
                 )
                 continue
 
+            if event is None:
+                continue
+
+            events_seen += 1
+
+            # Check for final result
+            if event.type == "result":
+                logger.debug(
+                    "Found result message",
+                    message_keys=list(event.data.keys()),
+                    message_sample=str(event.data)[:500],
+                )
+                result = event.data
+                if stop_at_result:
+                    break
+                continue
+
+            if event.type == "assistant" and not first_token_seen:
+                first_token_seen = True
+                self.ttft_samples[ttft_mode].append(time.monotonic() - started)
+
+            collector.add(event)
+
+            # Process immediately to avoid memory buildup
+            if stream_callback:
+                try:
+                    await stream_callback(event)
+                except Exception as e:
+                    logger.warning(
+                        "Stream callback failed",
+                        error=str(e),
+                        update_type=event.type,
+                    )
+
+        logger.debug("Stream decoding finished", **decoder.get_stats())
+
         # Enhanced error reporting
         if parsing_errors:
             logger.warning(
@@ -276,56 +464,48 @@ class ClaudeProcessManager:
                 errors=parsing_errors[:5],
             )
 
-        # Wait for process to complete
-        return_code = await process.wait()
+        return result, collector, events_seen
 
-        if return_code != 0:
-            stderr = await process.stderr.read()
-            error_msg = stderr.decode("utf-8", errors="replace")
-            logger.error(
-                "Claude Code process failed",
-                return_code=return_code,
-                stderr=error_msg,
-            )
-
-            # Check for specific error types
-            if "usage limit reached" in error_msg.lower():
-                # Extract reset time if available
-                import re
-
-                time_match = re.search(
-                    r"reset at (\d+[apm]+)", error_msg, re.IGNORECASE
-                )
-                timezone_match = re.search(r"\(([^)]+)\)", error_msg)
-
-                reset_time = time_match.group(1) if time_match else "later"
-                timezone = timezone_match.group(1) if timezone_match else ""
-
-                user_friendly_msg = (
-                    f"⏱️ **Claude AI Usage Limit Reached**\n\n"
-                    f"You've reached your Claude AI usage limit for this period.\n\n"
-                    f"**When will it reset?**\n"
-                    f"Your limit will reset at **{reset_time}**"
-                    f"{f' ({timezone})' if timezone else ''}\n\n"
-                    f"**What you can do:**\n"
-                    f"• Wait for the limit to reset automatically\n"
-                    f"• Try again after the reset time\n"
-                    f"• Use simpler requests that require less processing\n"
-                    f"• Contact support if you need a higher limit"
-                )
+    def _raise_process_error(self, return_code: int, error_msg: str) -> None:
+        """Raise a user-facing error for a failed Claude process."""
+        logger.error(
+            "Claude Code process failed",
+            return_code=return_code,
+            stderr=error_msg,
+        )
 
-                raise ClaudeProcessError(user_friendly_msg)
+        # Check for specific error types
+        if "usage limit reached" in error_msg.lower():
+            # Extract reset time if available
+            import re
 
-            # Generic error handling for other cases
-            raise ClaudeProcessError(
-                f"Claude Code exited with code {return_code}: {error_msg}"
+            time_match = re.search(
+                r"reset at (\d+[apm]+)", error_msg, re.IGNORECASE
+            )
+            timezone_match = re.search(r"\(([^)]+)\)", error_msg)
+
+            reset_time = time_match.group(1) if time_match else "later"
+            timezone = timezone_match.group(1) if timezone_match else ""
+
+            user_friendly_msg = (
+                f"⏱️ **Claude AI Usage Limit Reached**\n\n"
+                f"You've reached your Claude AI usage limit for this period.\n\n"
+                f"**When will it reset?**\n"
+                f"Your limit will reset at **{reset_time}**"
+                f"{f' ({timezone})' if timezone else ''}\n\n"
+                f"**What you can do:**\n"
+                f"• Wait for the limit to reset automatically\n"
+                f"• Try again after the reset time\n"
+                f"• Use simpler requests that require less processing\n"
+                f"• Contact support if you need a higher limit"
             )
 
-        if not result:
-            logger.error("No result message received from Claude Code")
-            raise ClaudeParsingError("No result message received from Claude Code")
+            raise ClaudeProcessError(user_friendly_msg)
 
-        return self._parse_result(result, list(message_buffer))
+        # Generic error handling for other cases
+        raise ClaudeProcessError(
+            f"Claude Code exited with code {return_code}: {error_msg}"
+        )
 
     async def _read_stream(self, stream) -> AsyncIterator[str]:
         """Read lines from stream."""
@@ -336,223 +516,36 @@ class ClaudeProcessManager:
             yield line.decode("utf-8", errors="replace").strip()
 
     async def _read_stream_bounded(self, stream) -> AsyncIterator[str]:
-        """Read stream with memory bounds to prevent excessive memory usage."""
-        buffer = b""
+        """Read stream with memory bounds to prevent excessive memory usage.
 
-        while True:
-            chunk = await stream.read(self.streaming_buffer_size)
-            if not chunk:
-                break
+        Lines are framed in linear time and capped at ``max_line_bytes``;
+        oversized lines are truncated rather than buffered in full.
+        """
+        framer = LineFramer(self.max_line_bytes)
 
-            buffer += chunk
-
-            # Process complete lines
-            while b"\n" in buffer:
-                line, buffer = buffer.split(b"\n", 1)
-                yield line.decode("utf-8", errors="replace").strip()
-
-        # Process remaining buffer
-        if buffer:
-            yield buffer.decode("utf-8", errors="replace").strip()
-
-    def _parse_stream_message(self, msg: Dict) -> Optional[StreamUpdate]:
-        """Enhanced parsing with comprehensive message type support."""
-        msg_type = msg.get("type")
-
-        # Add support for more message types
-        if msg_type == "assistant":
-            return self._parse_assistant_message(msg)
-        elif msg_type == "tool_result":
-            return self._parse_tool_result_message(msg)
-        elif msg_type == "user":
-            return self._parse_user_message(msg)
-        elif msg_type == "system":
-            return self._parse_system_message(msg)
-        elif msg_type == "error":
-            return self._parse_error_message(msg)
-        elif msg_type == "progress":
-            return self._parse_progress_message(msg)
-
-        # Unknown message type - log and continue
-        logger.debug("Unknown message type", msg_type=msg_type, msg=msg)
-        return None
-
-    def _parse_assistant_message(self, msg: Dict) -> StreamUpdate:
-        """Parse assistant message with enhanced context."""
-        message = msg.get("message", {})
-        content_blocks = message.get("content", [])
-
-        # Get text content
-        text_content = []
-        tool_calls = []
-
-        for block in content_blocks:
-            if block.get("type") == "text":
-                text_content.append(block.get("text", ""))
-            elif block.get("type") == "tool_use":
-                tool_calls.append(
-                    {
-                        "name": block.get("name"),
-                        "input": block.get("input", {}),
-                        "id": block.get("id"),
-                    }
-                )
-
-        return StreamUpdate(
-            type="assistant",
-            content="\n".join(text_content) if text_content else None,
-            tool_calls=tool_calls if tool_calls else None,
-            timestamp=msg.get("timestamp"),
-            session_context={"session_id": msg.get("session_id")},
-            execution_id=msg.get("id"),
-        )
-
-    def _parse_tool_result_message(self, msg: Dict) -> StreamUpdate:
-        """Parse tool execution results."""
-        result = msg.get("result", {})
-        content = result.get("content") if isinstance(result, dict) else str(result)
-
-        return StreamUpdate(
-            type="tool_result",
-            content=content,
-            metadata={
-                "tool_use_id": msg.get("tool_use_id"),
-                "is_error": (
-                    result.get("is_error", False) if isinstance(result, dict) else False
-                ),
-                "execution_time_ms": (
-                    result.get("execution_time_ms")
-                    if isinstance(result, dict)
-                    else None
-                ),
-            },
-            timestamp=msg.get("timestamp"),
-            session_context={"session_id": msg.get("session_id")},
-            error_info={"message": content} if result.get("is_error", False) else None,
-        )
-
-    def _parse_user_message(self, msg: Dict) -> StreamUpdate:
-        """Parse user message."""
-        message = msg.get("message", {})
-        content = message.get("content", "")
-
-        # Handle both string and block format content
-        if isinstance(content, list):
-            text_parts = []
-            for block in content:
-                if isinstance(block, dict) and block.get("type") == "text":
-                    text_parts.append(block.get("text", ""))
-                elif isinstance(block, str):
-                    text_parts.append(block)
-            content = "\n".join(text_parts)
-
-        return StreamUpdate(
-            type="user",
-            content=content if content else None,
-            timestamp=msg.get("timestamp"),
-            session_context={"session_id": msg.get("session_id")},
-        )
+        async for line in iter_stream_lines(
+            stream, framer, self.streaming_buffer_size
+        ):
+            yield line
 
-    def _parse_system_message(self, msg: Dict) -> StreamUpdate:
-        """Parse system messages including init and other subtypes."""
-        subtype = msg.get("subtype")
-
-        if subtype == "init":
-            # Initial system message with available tools
-            return StreamUpdate(
-                type="system",
-                metadata={
-                    "subtype": "init",
-                    "tools": msg.get("tools", []),
-                    "mcp_servers": msg.get("mcp_servers", []),
-                    "model": msg.get("model"),
-                    "cwd": msg.get("cwd"),
-                    "permission_mode": msg.get("permissionMode"),
-                },
-                session_context={"session_id": msg.get("session_id")},
-            )
-        else:
-            # Other system messages
-            return StreamUpdate(
-                type="system",
-                content=msg.get("message", str(msg)),
-                metadata={"subtype": subtype},
-                timestamp=msg.get("timestamp"),
-                session_context={"session_id": msg.get("session_id")},
+        if framer.truncated_lines:
+            logger.warning(
+                "Truncated oversized stream lines",
+                count=framer.truncated_lines,
+                max_line_bytes=self.max_line_bytes,
+                bytes_read=framer.bytes_fed,
             )
 
-    def _parse_error_message(self, msg: Dict) -> StreamUpdate:
-        """Parse error messages."""
-        error_message = msg.get("message", msg.get("error", str(msg)))
-
-        return StreamUpdate(
-            type="error",
-            content=error_message,
-            error_info={
-                "message": error_message,
-                "code": msg.get("code"),
-                "subtype": msg.get("subtype"),
-            },
-            timestamp=msg.get("timestamp"),
-            session_context={"session_id": msg.get("session_id")},
-        )
-
-    def _parse_progress_message(self, msg: Dict) -> StreamUpdate:
-        """Parse progress update messages."""
-        return StreamUpdate(
-            type="progress",
-            content=msg.get("message", msg.get("status")),
-            progress={
-                "percentage": msg.get("percentage"),
-                "step": msg.get("step"),
-                "total_steps": msg.get("total_steps"),
-                "operation": msg.get("operation"),
-            },
-            timestamp=msg.get("timestamp"),
-            session_context={"session_id": msg.get("session_id")},
-        )
-
-    def _validate_message_structure(self, msg: Dict) -> bool:
-        """Validate message has required structure."""
-        required_fields = ["type"]
-        return all(field in msg for field in required_fields)
-
-    def _parse_result(self, result: Dict, messages: List[Dict]) -> ClaudeResponse:
+    def _parse_result(
+        self, result: Dict, collector: ResponseCollector
+    ) -> ClaudeResponse:
         """Parse final result message."""
         # Debug: log the result structure
         logger.debug("Parsing Claude result", result_keys=list(result.keys()), result_content=result.get("result", "NO_RESULT"))
 
-        # Extract actual content from messages if result field is empty
-        content = result.get("result", "")
-        if not content:
-            # Look for assistant messages with actual content
-            for msg in reversed(messages):  # Start from the last message
-                if msg.get("type") == "assistant":
-                    message = msg.get("message", {})
-                    if isinstance(message.get("content"), list):
-                        for block in message["content"]:
-                            if block.get("type") == "text" and block.get("text"):
-                                content = block["text"]
-                                break
-                    elif isinstance(message.get("content"), str):
-                        content = message["content"]
-
-                    if content:
-                        break
-
-        # Extract tools used from messages
-        tools_used = []
-        for msg in messages:
-            if msg.get("type") == "assistant":
-                message = msg.get("message", {})
-                for block in message.get("content", []):
-                    if block.get("type") == "tool_use":
-                        tools_used.append(
-                            {
-                                "name": block.get("name"),
-                                "timestamp": msg.get("timestamp"),
-                            }
-                        )
+        # Fall back to the latest assistant text if result field is empty
+        content = result.get("result", "") or collector.last_text or ""
+        tools_used = list(collector.tools_used)
 
         # Check if this is an error due to max turns
         is_error = result.get("is_error", False)
@@ -593,6 +586,29 @@ class ClaudeProcessManager:
 
         self.active_processes.clear()
 
+        if self.worker_pool:
+            await self.worker_pool.shutdown()
+
     def get_active_process_count(self) -> int:
         """Get number of active processes."""
         return len(self.active_processes)
+
+    def get_ttft_stats(self) -> Dict[str, Any]:
+        """Get time-to-first-token statistics for pooled and cold starts."""
+        stats: Dict[str, Any] = {}
+        for mode, samples in self.ttft_samples.items():
+            ordered = sorted(samples)
+            count = len(ordered)
+            stats[mode] = {
+                "count": count,
+                "avg_ms": round(sum(ordered) / count * 1000) if count else None,
+                "p50_ms": round(ordered[count // 2] * 1000) if count else None,
+                "p95_ms": (
+                    round(ordered[min(count - 1, int(count * 0.95))] * 1000)
+                    if count
+                    else None
+                ),
+            }
+        if self.worker_pool:
+            stats["pool"] = self.worker_pool.get_stats()
+        return stats
@@ -2,13 +2,17 @@
 
 Features:
 - Track tool calls
-- Security validation
+- Security validation with a precompiled policy
+- Verdict cache for repeated tool calls
+- Bounded violation history with per-type counters
 - Usage analytics
 """
 
-from collections import defaultdict
+import re
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Deque, Dict, FrozenSet, Hashable, List, Optional, Tuple
 
 import structlog
 
@@ -17,9 +21,83 @@ from ..security.validators import SecurityValidator
 
 logger = structlog.get_logger()
 
+FILE_TOOLS: FrozenSet[str] = frozenset(
+    ["create_file", "edit_file", "read_file", "Write", "Edit", "Read"]
+)
+SHELL_TOOLS: FrozenSet[str] = frozenset(["bash", "shell", "Bash"])
+
+# Substrings that block a shell command (matched case-insensitively, and
+# reported in this order when several are present)
+DANGEROUS_COMMAND_PATTERNS: Tuple[str, ...] = (
+    "rm -rf",
+    "sudo",
+    "chmod 777",
+    "curl",
+    "wget",
+    "nc ",
+    "netcat",
+    "> /dev/",  # Dangerous redirect to device files
+    ">> /dev/",  # Dangerous append to device files
+    "> /etc/",  # Dangerous redirect to system files
+    ">> /etc/",  # Dangerous append to system files
+    ">/dev/",  # Dangerous redirect without space
+    ">>/dev/",  # Dangerous append without space
+    ">/etc/",  # Dangerous redirect without space
+    ">>/etc/",  # Dangerous append without space
+    " | rm ",  # Piping to dangerous commands
+    " | sudo ",  # Piping to sudo
+    "; rm ",  # Command chaining with rm
+    "; sudo ",  # Command chaining with sudo
+    "&& rm ",  # AND chaining with rm
+    "&& sudo ",  # AND chaining with sudo
+    "$(",
+    "`",
+)
+
+_DANGEROUS_COMMAND_RE = re.compile(
+    "|".join(re.escape(pattern) for pattern in DANGEROUS_COMMAND_PATTERNS)
+)
+
+_VIOLATION_MESSAGES = {
+    "disallowed_tool": "Tool not allowed",
+    "explicitly_disallowed_tool": "Tool explicitly disallowed",
+    "invalid_file_path": "Invalid file path in tool call",
+    "dangerous_command": "Dangerous command detected",
+}
+
+DEFAULT_VERDICT_CACHE_SIZE = 1024
+DEFAULT_VERDICT_CACHE_TTL_SECONDS = 300
+DEFAULT_VIOLATION_HISTORY = 1000
+
+# Verdict: (valid, error message, violation type, violation details)
+Verdict = Tuple[bool, Optional[str], Optional[str], Dict[str, Any]]
+
+
+def find_dangerous_pattern(command: str) -> Optional[str]:
+    """Return the first dangerous pattern contained in ``command``, if any."""
+    lowered = command.lower()
+    if _DANGEROUS_COMMAND_RE.search(lowered) is None:
+        return None
+    # The regex reports the leftmost match; report by list order instead
+    for pattern in DANGEROUS_COMMAND_PATTERNS:
+        if pattern in lowered:
+            return pattern
+    return None
+
 
 class ToolMonitor:
-    """Monitor and validate Claude's tool usage."""
+    """Monitor and validate Claude's tool usage.
+
+    The tool allow/deny lists are frozen into sets once, shell commands are
+    checked with a single combined pattern, and verdicts are cached per
+    tool and relevant input so the same call repeated in an agent loop is
+    not validated again. Cached verdicts still count towards usage and
+    violations exactly like fresh ones.
+
+    File tool verdicts are never cached here: a path can be swapped for a
+    symlink between two calls, and ``SecurityValidator.validate_path``
+    keeps its own symlink-aware memo.
+    """
 
     def __init__(
         self, config: Settings, security_validator: Optional[SecurityValidator] = None
@@ -28,11 +106,34 @@ class ToolMonitor:
         self.config = config
         self.security_validator = security_validator
         self.tool_usage: Dict[str, int] = defaultdict(int)
-        self.security_violations: List[Dict[str, Any]] = []
-        
+
         # Enable flexible mode for development environments
         self.flexible_file_operations = getattr(config, 'development_mode', False)
 
+        allowed = getattr(config, "claude_allowed_tools", None)
+        disallowed = getattr(config, "claude_disallowed_tools", None)
+        self.allowed_tools: Optional[FrozenSet[str]] = (
+            frozenset(allowed) if allowed else None
+        )
+        self.disallowed_tools: FrozenSet[str] = frozenset(disallowed or ())
+
+        # Recent violations (bounded) plus exact counters over all of them
+        self.security_violations: Deque[Dict[str, Any]] = deque(
+            maxlen=getattr(config, "tool_violation_history", DEFAULT_VIOLATION_HISTORY)
+        )
+        self.violation_counts: Counter = Counter()
+        self.user_violation_counts: Dict[int, Counter] = defaultdict(Counter)
+
+        # (tool_name, relevant input, working_directory) -> (verdict, expires_at)
+        self.verdict_cache_size = getattr(
+            config, "tool_verdict_cache_size", DEFAULT_VERDICT_CACHE_SIZE
+        )
+        self.verdict_cache_ttl = getattr(
+            config, "tool_verdict_cache_ttl_seconds", DEFAULT_VERDICT_CACHE_TTL_SECONDS
+        )
+        self._verdicts: "OrderedDict[Hashable, Tuple[Verdict, float]]" = OrderedDict()
+        self.cache_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
     async def validate_tool_call(
         self,
         tool_name: str,
@@ -48,50 +149,49 @@ class ToolMonitor:
             user_id=user_id,
         )
 
+        key = self._verdict_key(tool_name, tool_input, working_directory)
+        verdict = self._cached_verdict(key) if key is not None else None
+        if verdict is None:
+            verdict = self._evaluate(tool_name, tool_input, working_directory)
+            if key is not None:
+                self._store_verdict(key, verdict)
+
+        valid, error, violation_type, details = verdict
+        if not valid:
+            if violation_type is not None:
+                self._record_violation(
+                    violation_type, tool_name, user_id, working_directory, details
+                )
+            return False, error
+
+        # Track usage
+        self.tool_usage[tool_name] += 1
+
+        logger.debug("Tool call validated successfully", tool_name=tool_name)
+        return True, None
+
+    def _evaluate(
+        self, tool_name: str, tool_input: Dict[str, Any], working_directory: Path
+    ) -> Verdict:
+        """Run the policy for one tool call (no side effects)."""
         # Check if tool is allowed
-        if (
-            hasattr(self.config, "claude_allowed_tools")
-            and self.config.claude_allowed_tools
-        ):
-            if tool_name not in self.config.claude_allowed_tools:
-                violation = {
-                    "type": "disallowed_tool",
-                    "tool_name": tool_name,
-                    "user_id": user_id,
-                    "working_directory": str(working_directory),
-                }
-                self.security_violations.append(violation)
-                logger.warning("Tool not allowed", **violation)
-                return False, f"Tool not allowed: {tool_name}"
+        if self.allowed_tools is not None and tool_name not in self.allowed_tools:
+            return False, f"Tool not allowed: {tool_name}", "disallowed_tool", {}
 
         # Check if tool is explicitly disallowed
-        if (
-            hasattr(self.config, "claude_disallowed_tools")
-            and self.config.claude_disallowed_tools
-        ):
-            if tool_name in self.config.claude_disallowed_tools:
-                violation = {
-                    "type": "explicitly_disallowed_tool",
-                    "tool_name": tool_name,
-                    "user_id": user_id,
-                    "working_directory": str(working_directory),
-                }
-                self.security_violations.append(violation)
-                logger.warning("Tool explicitly disallowed", **violation)
-                return False, f"Tool explicitly disallowed: {tool_name}"
+        if tool_name in self.disallowed_tools:
+            return (
+                False,
+                f"Tool explicitly disallowed: {tool_name}",
+                "explicitly_disallowed_tool",
+                {},
+            )
 
         # Validate file operations
-        if tool_name in [
-            "create_file",
-            "edit_file",
-            "read_file",
-            "Write",
-            "Edit",
-            "Read",
-        ]:
+        if tool_name in FILE_TOOLS:
             file_path = tool_input.get("path") or tool_input.get("file_path")
             if not file_path:
-                return False, "File path required"
+                return False, "File path required", None, {}
 
             # Validate path security
             if self.security_validator:
@@ -100,116 +200,133 @@ class ToolMonitor:
                 )
 
                 if not valid:
-                    violation = {
-                        "type": "invalid_file_path",
-                        "tool_name": tool_name,
-                        "file_path": file_path,
-                        "user_id": user_id,
-                        "working_directory": str(working_directory),
-                        "error": error,
-                    }
-                    self.security_violations.append(violation)
-                    logger.warning("Invalid file path in tool call", **violation)
-                    return False, error
+                    return (
+                        False,
+                        error,
+                        "invalid_file_path",
+                        {"file_path": file_path, "error": error},
+                    )
 
         # Validate shell commands
-        if tool_name in ["bash", "shell", "Bash"]:
+        elif tool_name in SHELL_TOOLS:
             command = tool_input.get("command", "")
+            pattern = find_dangerous_pattern(command)
+            if pattern is not None:
+                return (
+                    False,
+                    f"Dangerous command pattern detected: {pattern}",
+                    "dangerous_command",
+                    {"command": command, "pattern": pattern},
+                )
 
-            # Check for dangerous commands
-            dangerous_patterns = [
-                "rm -rf",
-                "sudo",
-                "chmod 777",
-                "curl",
-                "wget",
-                "nc ",
-                "netcat",
-                "> /dev/",     # Dangerous redirect to device files
-                ">> /dev/",    # Dangerous append to device files
-                "> /etc/",     # Dangerous redirect to system files
-                ">> /etc/",    # Dangerous append to system files
-                ">/dev/",      # Dangerous redirect without space
-                ">>/dev/",     # Dangerous append without space
-                ">/etc/",      # Dangerous redirect without space
-                ">>/etc/",     # Dangerous append without space
-                " | rm ",      # Piping to dangerous commands
-                " | sudo ",    # Piping to sudo
-                "; rm ",       # Command chaining with rm
-                "; sudo ",     # Command chaining with sudo
-                "&& rm ",      # AND chaining with rm
-                "&& sudo ",    # AND chaining with sudo
-                "$(",
-                "`",
-            ]
-
-            for pattern in dangerous_patterns:
-                if pattern in command.lower():
-                    violation = {
-                        "type": "dangerous_command",
-                        "tool_name": tool_name,
-                        "command": command,
-                        "pattern": pattern,
-                        "user_id": user_id,
-                        "working_directory": str(working_directory),
-                    }
-                    self.security_violations.append(violation)
-                    logger.warning("Dangerous command detected", **violation)
-                    return False, f"Dangerous command pattern detected: {pattern}"
+        return True, None, None, {}
 
-        # Track usage
-        self.tool_usage[tool_name] += 1
+    def _record_violation(
+        self,
+        violation_type: str,
+        tool_name: str,
+        user_id: int,
+        working_directory: Path,
+        details: Dict[str, Any],
+    ) -> None:
+        violation = {
+            "type": violation_type,
+            "tool_name": tool_name,
+            **details,
+            "user_id": user_id,
+            "working_directory": str(working_directory),
+        }
+        self.security_violations.append(violation)
+        self.violation_counts[violation_type] += 1
+        self.user_violation_counts[user_id][violation_type] += 1
+        logger.warning(_VIOLATION_MESSAGES[violation_type], **violation)
 
-        logger.debug("Tool call validated successfully", tool_name=tool_name)
-        return True, None
+    @staticmethod
+    def _verdict_key(
+        tool_name: str, tool_input: Dict[str, Any], working_directory: Path
+    ) -> Optional[Hashable]:
+        """Cache key built from only the inputs the policy looks at.
+
+        Large inputs such as file contents for Write never affect the
+        verdict, so they are neither hashed nor kept alive by the cache.
+        Returns None for file tools, whose verdicts must not be cached.
+        """
+        if tool_name in FILE_TOOLS:
+            return None
+        if tool_name in SHELL_TOOLS:
+            relevant: Any = tool_input.get("command", "")
+        else:
+            relevant = None
+        if not isinstance(relevant, (str, type(None))):
+            relevant = repr(relevant)
+        return (tool_name, relevant, str(working_directory))
+
+    def _cached_verdict(self, key: Hashable) -> Optional[Verdict]:
+        if self.verdict_cache_size <= 0:
+            return None
+        entry = self._verdicts.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self._verdicts[key]
+            self.cache_stats["misses"] += 1
+            return None
+        self._verdicts.move_to_end(key)
+        self.cache_stats["hits"] += 1
+        return entry[0]
+
+    def _store_verdict(self, key: Hashable, verdict: Verdict) -> None:
+        if self.verdict_cache_size <= 0:
+            return
+        self._verdicts[key] = (verdict, time.monotonic() + self.verdict_cache_ttl)
+        self._verdicts.move_to_end(key)
+        while len(self._verdicts) > self.verdict_cache_size:
+            self._verdicts.popitem(last=False)
+
+    def clear_verdict_cache(self) -> None:
+        """Forget cached verdicts (e.g. after the filesystem layout changed)."""
+        self._verdicts.clear()
 
     def get_tool_stats(self) -> Dict[str, Any]:
         """Get tool usage statistics."""
+        lookups = self.cache_stats["hits"] + self.cache_stats["misses"]
         return {
             "total_calls": sum(self.tool_usage.values()),
             "by_tool": dict(self.tool_usage),
             "unique_tools": len(self.tool_usage),
-            "security_violations": len(self.security_violations),
+            "security_violations": sum(self.violation_counts.values()),
+            "violations_by_type": dict(self.violation_counts),
+            "verdict_cache": {
+                **self.cache_stats,
+                "size": len(self._verdicts),
+                "hit_rate": self.cache_stats["hits"] / lookups if lookups else 0.0,
+            },
         }
 
     def get_security_violations(self) -> List[Dict[str, Any]]:
-        """Get security violations."""
-        return self.security_violations.copy()
+        """Get recent security violations (oldest first)."""
+        return list(self.security_violations)
 
     def reset_stats(self) -> None:
         """Reset statistics."""
         self.tool_usage.clear()
         self.security_violations.clear()
+        self.violation_counts.clear()
+        self.user_violation_counts.clear()
+        self.cache_stats = {"hits": 0, "misses": 0}
         logger.info("Tool monitor statistics reset")
 
     def get_user_tool_usage(self, user_id: int) -> Dict[str, Any]:
         """Get tool usage for specific user."""
-        user_violations = [
-            v for v in self.security_violations if v.get("user_id") == user_id
-        ]
+        counts = self.user_violation_counts.get(user_id, Counter())
 
         return {
             "user_id": user_id,
-            "security_violations": len(user_violations),
-            "violation_types": list(set(v.get("type") for v in user_violations)),
+            "security_violations": sum(counts.values()),
+            "violation_types": list(counts),
         }
 
     def is_tool_allowed(self, tool_name: str) -> bool:
         """Check if tool is allowed without validation."""
-        # Check allowed list
-        if (
-            hasattr(self.config, "claude_allowed_tools")
-            and self.config.claude_allowed_tools
-        ):
-            if tool_name not in self.config.claude_allowed_tools:
-                return False
-
-        # Check disallowed list
-        if (
-            hasattr(self.config, "claude_disallowed_tools")
-            and self.config.claude_disallowed_tools
-        ):
-            if tool_name in self.config.claude_disallowed_tools:
-                return False
-
-        return True
+        if self.allowed_tools is not None and tool_name not in self.allowed_tools:
+            return False
+        return tool_name not in self.disallowed_tools
@@ -0,0 +1,248 @@
+"""Admission control for Claude runs.
+
+Features:
+- Global cap on concurrently running Claude processes
+- Per-user concurrency cap
+- Fair round-robin queueing between users
+- Queue-position callbacks for progress feedback
+- Newer request from a user supersedes their still-queued one
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Set
+
+import structlog
+
+from .exceptions import ClaudeRequestCancelledError
+
+logger = structlog.get_logger()
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class _Waiter:
+    """A queued admission request."""
+
+    __slots__ = (
+        "user_id",
+        "future",
+        "on_position",
+        "position",
+        "enqueued_at",
+        "granted",
+    )
+
+    def __init__(self, user_id: int, on_position: Optional[PositionCallback]):
+        self.user_id = user_id
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.position = 0
+        self.enqueued_at = time.monotonic()
+        # Set only by _dispatch; a superseded waiter's future is done too
+        self.granted = False
+
+
+class ClaudeScheduler:
+    """Bound concurrent Claude runs with per-user fairness.
+
+    Users with queued requests are served round-robin: whenever a slot
+    frees up, the next user in rotation that is below the per-user cap
+    gets it, so one user's burst cannot starve everybody else.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_user: int):
+        """Initialize scheduler with global and per-user limits."""
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_user = max(1, max_per_user)
+
+        self._running = 0
+        self._running_per_user: Dict[int, int] = {}
+        # user_id -> queued waiters, ordered by round-robin turn
+        self._queues: "OrderedDict[int, Deque[_Waiter]]" = OrderedDict()
+        self._notify_tasks: Set[asyncio.Task] = set()
+
+        self.stats: Dict[str, Any] = {
+            "admitted": 0,
+            "admitted_immediately": 0,
+            "superseded": 0,
+            "abandoned": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    @asynccontextmanager
+    async def slot(
+        self, user_id: int, on_position: Optional[PositionCallback] = None
+    ) -> AsyncIterator[None]:
+        """Hold a run slot for ``user_id`` for the duration of the block.
+
+        Raises ``ClaudeRequestCancelledError`` if a newer request from the
+        same user arrives while this one is still queued.
+        """
+        await self.acquire(user_id, on_position)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    async def acquire(
+        self, user_id: int, on_position: Optional[PositionCallback] = None
+    ) -> None:
+        """Wait until ``user_id`` may start a run."""
+        self._supersede(user_id)
+
+        if not self._queues and self._can_run(user_id):
+            self._grant(user_id)
+            self.stats["admitted"] += 1
+            self.stats["admitted_immediately"] += 1
+            return
+
+        waiter = _Waiter(user_id, on_position)
+        self._queues.setdefault(user_id, deque()).append(waiter)
+        self._dispatch()
+        self._publish_positions()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.granted:
+                # Granted and cancelled at the same time: give the slot back
+                self.release(user_id)
+            else:
+                self._remove(waiter)
+                self.stats["abandoned"] += 1
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        self.stats["admitted"] += 1
+        self.stats["total_wait_seconds"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+
+    def release(self, user_id: int) -> None:
+        """Free a slot previously granted to ``user_id``."""
+        self._running -= 1
+        remaining = self._running_per_user.get(user_id, 1) - 1
+        if remaining > 0:
+            self._running_per_user[user_id] = remaining
+        else:
+            self._running_per_user.pop(user_id, None)
+        self._dispatch()
+        self._publish_positions()
+
+    def queue_position(self, user_id: int) -> Optional[int]:
+        """Position of the user's oldest queued request (1-based), if any."""
+        queue = self._queues.get(user_id)
+        return queue[0].position if queue else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler statistics."""
+        admitted = self.stats["admitted"]
+        queued = admitted - self.stats["admitted_immediately"]
+        return {
+            **self.stats,
+            "running": self._running,
+            "queued": sum(len(q) for q in self._queues.values()),
+            "queued_users": len(self._queues),
+            "avg_wait_seconds": (
+                self.stats["total_wait_seconds"] / queued if queued else 0.0
+            ),
+            "max_concurrent": self.max_concurrent,
+            "max_per_user": self.max_per_user,
+        }
+
+    def _can_run(self, user_id: int) -> bool:
+        return (
+            self._running < self.max_concurrent
+            and self._running_per_user.get(user_id, 0) < self.max_per_user
+        )
+
+    def _grant(self, user_id: int) -> None:
+        self._running += 1
+        self._running_per_user[user_id] = self._running_per_user.get(user_id, 0) + 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued users in round-robin order."""
+        while self._running < self.max_concurrent and self._queues:
+            for user_id in self._queues:
+                if self._running_per_user.get(user_id, 0) < self.max_per_user:
+                    break
+            else:
+                return
+
+            queue = self._queues[user_id]
+            waiter = queue.popleft()
+            if queue:
+                # User goes to the back of the rotation
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+
+            self._grant(user_id)
+            waiter.granted = True
+            waiter.future.set_result(None)
+
+    def _supersede(self, user_id: int) -> None:
+        """Cancel the user's queued (not yet running) requests."""
+        queue = self._queues.pop(user_id, None)
+        if not queue:
+            return
+        for waiter in queue:
+            if not waiter.future.done():
+                waiter.future.set_exception(
+                    ClaudeRequestCancelledError(
+                        "Request replaced by a newer message before it started"
+                    )
+                )
+                self.stats["superseded"] += 1
+        logger.info(
+            "Superseded queued Claude requests", user_id=user_id, count=len(queue)
+        )
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.user_id)
+        if not queue:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[waiter.user_id]
+        self._publish_positions()
+
+    def _publish_positions(self) -> None:
+        """Recompute queue positions and notify waiters whose slot changed.
+
+        Position follows the round-robin order: the k-th waiter of a user is
+        served after up to k waiters of every user ahead in rotation (k+1
+        for users ahead of it in this round).
+        """
+        lengths = [(uid, len(q)) for uid, q in self._queues.items()]
+        for index, (user_id, queue) in enumerate(self._queues.items()):
+            for k, waiter in enumerate(queue):
+                position = k + 1
+                for other_index, (other_id, other_len) in enumerate(lengths):
+                    if other_id == user_id:
+                        continue
+                    ahead = k + 1 if other_index < index else k
+                    position += min(other_len, ahead)
+
+                if position != waiter.position:
+                    waiter.position = position
+                    if waiter.on_position:
+                        self._notify(waiter.on_position, position)
+
+    def _notify(self, callback: PositionCallback, position: int) -> None:
+        task = asyncio.create_task(self._safe_notify(callback, position))
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+    @staticmethod
+    async def _safe_notify(callback: PositionCallback, position: int) -> None:
+        try:
+            await callback(position)
+        except Exception as e:
+            logger.warning("Queue position callback failed", error=str(e))
@@ -4,18 +4,22 @@ Features:
 - Session state tracking
 - Multi-project support
 - Session persistence
+- Bounded LRU/TTL session cache
 - Cleanup policies
 """
 
+import asyncio
+import time
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import TYPE_CHECKING, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
 import structlog
 
 from ..config.settings import Settings
+from .session_cache import SessionCache
 
 if TYPE_CHECKING:
     from .integration import ClaudeResponse as CLIClaudeResponse
@@ -114,6 +118,12 @@ class SessionStorage:
         """Get all sessions."""
         raise NotImplementedError
 
+    async def cleanup_expired_sessions(
+        self, timeout_hours: int, batch_size: int = 500
+    ) -> List[Tuple[str, int]]:
+        """Deactivate expired sessions, returning their (session_id, user_id)."""
+        raise NotImplementedError
+
 
 class InMemorySessionStorage(SessionStorage):
     """In-memory session storage for development/testing."""
@@ -150,6 +160,19 @@ class InMemorySessionStorage(SessionStorage):
         """Get all sessions."""
         return list(self.sessions.values())
 
+    async def cleanup_expired_sessions(
+        self, timeout_hours: int, batch_size: int = 500
+    ) -> List[Tuple[str, int]]:
+        """Delete expired sessions from memory."""
+        expired = [
+            (session.session_id, session.user_id)
+            for session in self.sessions.values()
+            if session.is_expired(timeout_hours)
+        ]
+        for session_id, _ in expired:
+            del self.sessions[session_id]
+        return expired
+
 
 class SessionManager:
     """Manage Claude Code sessions."""
@@ -158,7 +181,19 @@ class SessionManager:
         """Initialize session manager."""
         self.config = config
         self.storage = storage
-        self.active_sessions: Dict[str, ClaudeSession] = {}
+        self.cache = SessionCache(
+            max_size=config.session_cache_max_size,
+            ttl_seconds=config.session_cache_ttl_seconds,
+        )
+        self._cleanup_task: Optional[asyncio.Task] = None
+        self.cleanup_stats: Dict[str, Any] = {
+            "runs": 0,
+            "failures": 0,
+            "sessions_expired": 0,
+            "cache_invalidated": 0,
+            "last_run_ms": 0.0,
+            "last_expired": 0,
+        }
 
     async def get_or_create_session(
         self,
@@ -173,31 +208,34 @@ class SessionManager:
             project_path=str(project_path),
             session_id=session_id,
         )
+        self._ensure_cleanup_task()
 
         # Check for existing session
-        if session_id and session_id in self.active_sessions:
-            session = self.active_sessions[session_id]
-            if not session.is_expired(self.config.session_timeout_hours):
+        if session_id:
+            session = self.cache.get(session_id)
+            if session and not session.is_expired(self.config.session_timeout_hours):
                 logger.debug("Using active session", session_id=session_id)
                 return session
 
-        # Try to load from storage
-        if session_id:
+        # Try to load from storage (unless we recently learned it isn't there)
+        if session_id and not self.cache.is_missing(session_id):
             session = await self.storage.load_session(session_id)
-            if session and not session.is_expired(self.config.session_timeout_hours):
-                self.active_sessions[session_id] = session
+            if session is None:
+                self.cache.mark_missing(session_id)
+            elif not session.is_expired(self.config.session_timeout_hours):
+                self.cache.put(session)
                 logger.info("Loaded session from storage", session_id=session_id)
                 return session
 
         # Check user session limit
-        user_sessions = await self._get_user_sessions(user_id)
-        if len(user_sessions) >= self.config.max_sessions_per_user:
+        await self._ensure_user_index(user_id)
+        if self.cache.user_session_count(user_id) >= self.config.max_sessions_per_user:
             # Remove oldest session
-            oldest = min(user_sessions, key=lambda s: s.last_used)
-            await self.remove_session(oldest.session_id)
+            oldest_id = self.cache.oldest_user_session(user_id)
+            await self.remove_session(oldest_id, user_id)
             logger.info(
                 "Removed oldest session due to limit",
-                removed_session_id=oldest.session_id,
+                removed_session_id=oldest_id,
                 user_id=user_id,
             )
 
@@ -216,7 +254,7 @@ class SessionManager:
 
         # Save to storage
         await self.storage.save_session(new_session)
-        self.active_sessions[new_session.session_id] = new_session
+        self.cache.put(new_session)
 
         logger.info(
             "Created new session",
@@ -229,58 +267,62 @@ class SessionManager:
 
     async def update_session(self, session_id: str, response: ClaudeResponse) -> None:
         """Update session with response data."""
-        if session_id in self.active_sessions:
-            session = self.active_sessions[session_id]
-            old_session_id = session.session_id
-
-            # For new sessions, update to Claude's actual session ID
-            if (
-                hasattr(session, "is_new_session")
-                and session.is_new_session
-                and response.session_id
-            ):
-                # Remove old temporary session from memory
-                del self.active_sessions[old_session_id]
-                
-                # Update session ID in database instead of deleting
-                if hasattr(self.storage, 'update_session_id'):
-                    await self.storage.update_session_id(old_session_id, response.session_id)
-                else:
-                    # Fallback to delete for storage implementations that don't support update
-                    await self.storage.delete_session(old_session_id)
-
-                # Update session with Claude's session ID
-                session.session_id = response.session_id
-                session.is_new_session = False
-
-                # Store with new session ID
-                self.active_sessions[response.session_id] = session
-
-                logger.info(
-                    "Session ID updated from temporary to Claude session ID",
-                    old_session_id=old_session_id,
-                    new_session_id=response.session_id,
-                )
-            elif hasattr(session, "is_new_session") and session.is_new_session:
-                # Mark as no longer new even if no session_id from Claude
-                session.is_new_session = False
-
-            session.update_usage(response)
-
-            # Persist to storage
-            await self.storage.save_session(session)
-
-            logger.debug(
-                "Session updated",
-                session_id=session.session_id,
-                total_cost=session.total_cost,
-                message_count=session.message_count,
+        session = self.cache.get(session_id)
+        if session is None:
+            # Evicted while Claude was running; storage is always current
+            session = await self.storage.load_session(session_id)
+            if session is None:
+                return
+
+        old_session_id = session.session_id
+
+        # For new sessions, update to Claude's actual session ID
+        if (
+            hasattr(session, "is_new_session")
+            and session.is_new_session
+            and response.session_id
+        ):
+            # Update session ID in database instead of deleting
+            if hasattr(self.storage, 'update_session_id'):
+                await self.storage.update_session_id(old_session_id, response.session_id)
+            else:
+                # Fallback to delete for storage implementations that don't support update
+                await self.storage.delete_session(old_session_id)
+
+            # Update session with Claude's session ID
+            session.session_id = response.session_id
+            session.is_new_session = False
+
+            # Re-key the cached session under the new ID
+            self.cache.rename(old_session_id, session)
+
+            logger.info(
+                "Session ID updated from temporary to Claude session ID",
+                old_session_id=old_session_id,
+                new_session_id=response.session_id,
             )
+        elif hasattr(session, "is_new_session") and session.is_new_session:
+            # Mark as no longer new even if no session_id from Claude
+            session.is_new_session = False
+
+        session.update_usage(response)
+
+        # Persist to storage
+        await self.storage.save_session(session)
+        self.cache.put(session)
+
+        logger.debug(
+            "Session updated",
+            session_id=session.session_id,
+            total_cost=session.total_cost,
+            message_count=session.message_count,
+        )
 
-    async def remove_session(self, session_id: str) -> None:
+    async def remove_session(
+        self, session_id: str, user_id: Optional[int] = None
+    ) -> None:
         """Remove session."""
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
+        self.cache.remove(session_id, user_id)
 
         await self.storage.delete_session(session_id)
         logger.info("Session removed", session_id=session_id)
@@ -288,25 +330,72 @@ class SessionManager:
     async def cleanup_expired_sessions(self) -> int:
         """Remove expired sessions."""
         logger.info("Starting session cleanup")
+        started = time.perf_counter()
 
-        all_sessions = await self.storage.get_all_sessions()
-        expired_count = 0
+        expired = await self.storage.cleanup_expired_sessions(
+            self.config.session_timeout_hours,
+            self.config.session_cleanup_batch_size,
+        )
+        invalidated = self.cache.invalidate(expired)
 
-        for session in all_sessions:
-            if session.is_expired(self.config.session_timeout_hours):
-                await self.remove_session(session.session_id)
-                expired_count += 1
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.cleanup_stats["runs"] += 1
+        self.cleanup_stats["sessions_expired"] += len(expired)
+        self.cleanup_stats["cache_invalidated"] += invalidated
+        self.cleanup_stats["last_run_ms"] = elapsed_ms
+        self.cleanup_stats["last_expired"] = len(expired)
 
-        logger.info("Session cleanup completed", expired_sessions=expired_count)
-        return expired_count
+        logger.info(
+            "Session cleanup completed",
+            expired_sessions=len(expired),
+            cache_invalidated=invalidated,
+            duration_ms=elapsed_ms,
+        )
+        return len(expired)
+
+    async def shutdown(self) -> None:
+        """Stop the background cleanup job."""
+        if self._cleanup_task and not self._cleanup_task.done():
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                logger.debug("Session cleanup job stopped")
+
+    def _ensure_cleanup_task(self) -> None:
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def _cleanup_loop(self) -> None:
+        interval = self.config.session_cleanup_interval_seconds
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.cleanup_expired_sessions()
+            except Exception as e:
+                self.cleanup_stats["failures"] += 1
+                logger.error("Background session cleanup failed", error=str(e))
 
     async def _get_user_sessions(self, user_id: int) -> List[ClaudeSession]:
         """Get all sessions for a user."""
         return await self.storage.get_user_sessions(user_id)
 
+    async def _ensure_user_index(self, user_id: int) -> None:
+        """Load the user's session ids from storage the first time only."""
+        if not self.cache.has_user_index(user_id):
+            self.cache.load_user_index(user_id, await self._get_user_sessions(user_id))
+
+    def get_cache_stats(self) -> Dict:
+        """Get session cache statistics."""
+        return self.cache.get_stats()
+
+    def get_cleanup_stats(self) -> Dict:
+        """Get expired-session cleanup statistics."""
+        return dict(self.cleanup_stats)
+
     async def get_session_info(self, session_id: str) -> Optional[Dict]:
         """Get session information."""
-        session = self.active_sessions.get(session_id)
+        session = self.cache.peek(session_id)
 
         if not session:
             session = await self.storage.load_session(session_id)
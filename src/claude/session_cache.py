@@ -0,0 +1,196 @@
+"""Bounded in-memory cache for Claude sessions.
+
+Features:
+- LRU eviction with a sliding per-entry TTL
+- Per-user index of known session ids for O(1) limit checks
+- Negative cache for session ids that are not in storage
+- Hit/miss counters
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+if TYPE_CHECKING:
+    from .session import ClaudeSession
+
+logger = structlog.get_logger()
+
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_NEGATIVE_TTL_SECONDS = 60
+DEFAULT_MAX_NEGATIVE = 10000
+
+
+class SessionCache:
+    """LRU+TTL cache of ``ClaudeSession`` objects.
+
+    Sessions are written through to storage by ``SessionManager`` on every
+    change, so evicting an entry never loses data; it only means the next
+    access reads it back from storage.
+
+    Independently of which sessions are cached, the cache keeps a per-user
+    index of session id -> last_used for every session it has been told
+    about, so the manager can enforce ``max_sessions_per_user`` without
+    querying storage on each new session.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SESSIONS,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        negative_ttl_seconds: float = DEFAULT_NEGATIVE_TTL_SECONDS,
+        max_negative: int = DEFAULT_MAX_NEGATIVE,
+    ):
+        """Initialize cache."""
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_negative = max_negative
+
+        # session_id -> (session, expires_at)
+        self._entries: "OrderedDict[str, Tuple[ClaudeSession, float]]" = OrderedDict()
+        # session_id -> expires_at
+        self._negative: "OrderedDict[str, float]" = OrderedDict()
+        # user_id -> {session_id: last_used}
+        self._user_index: Dict[int, Dict[str, datetime]] = {}
+
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "evicted_lru": 0,
+            "evicted_ttl": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.peek(session_id) is not None
+
+    def get(self, session_id: str) -> Optional["ClaudeSession"]:
+        """Return a cached session and mark it recently used."""
+        session = self.peek(session_id)
+        if session is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        self._entries[session_id] = (session, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(session_id)
+        return session
+
+    def peek(self, session_id: str) -> Optional["ClaudeSession"]:
+        """Return a cached session without touching LRU order or counters."""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        session, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[session_id]
+            self.stats["evicted_ttl"] += 1
+            return None
+        return session
+
+    def put(self, session: "ClaudeSession") -> None:
+        """Cache a session and record it in the user's index."""
+        session_id = session.session_id
+        self._negative.pop(session_id, None)
+        self._entries[session_id] = (session, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(session_id)
+
+        index = self._user_index.get(session.user_id)
+        if index is not None:
+            index[session_id] = session.last_used
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evicted_lru"] += 1
+
+    def remove(self, session_id: str, user_id: Optional[int] = None) -> None:
+        """Drop a session from the cache and from the user index."""
+        entry = self._entries.pop(session_id, None)
+        if user_id is None and entry is not None:
+            user_id = entry[0].user_id
+
+        if user_id is not None:
+            index = self._user_index.get(user_id)
+            if index is not None:
+                index.pop(session_id, None)
+        else:
+            for index in self._user_index.values():
+                if index.pop(session_id, None) is not None:
+                    break
+
+    def rename(self, old_session_id: str, session: "ClaudeSession") -> None:
+        """Re-key a session whose id changed (temporary -> Claude id)."""
+        self.remove(old_session_id, session.user_id)
+        self.put(session)
+
+    def mark_missing(self, session_id: str) -> None:
+        """Remember that ``session_id`` does not exist in storage."""
+        self._negative[session_id] = time.monotonic() + self.negative_ttl_seconds
+        self._negative.move_to_end(session_id)
+        while len(self._negative) > self.max_negative:
+            self._negative.popitem(last=False)
+
+    def is_missing(self, session_id: str) -> bool:
+        """Check the negative cache."""
+        expires_at = self._negative.get(session_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._negative[session_id]
+            return False
+        self.stats["negative_hits"] += 1
+        return True
+
+    def has_user_index(self, user_id: int) -> bool:
+        return user_id in self._user_index
+
+    def load_user_index(self, user_id: int, sessions: List["ClaudeSession"]) -> None:
+        """Seed a user's index from storage (done once per user)."""
+        index = {s.session_id: s.last_used for s in sessions}
+        # Sessions cached before the index existed are known too
+        for session, _ in self._entries.values():
+            if session.user_id == user_id:
+                index[session.session_id] = session.last_used
+        self._user_index[user_id] = index
+
+    def user_session_count(self, user_id: int) -> int:
+        return len(self._user_index.get(user_id, ()))
+
+    def oldest_user_session(self, user_id: int) -> Optional[str]:
+        """Least recently used session id of a user, per the index."""
+        index = self._user_index.get(user_id)
+        if not index:
+            return None
+        return min(index, key=index.__getitem__)
+
+    def invalidate(self, sessions: Iterable[Tuple[str, int]]) -> int:
+        """Drop ``(session_id, user_id)`` pairs from the cache and indexes.
+
+        Returns how many of them were cached.
+        """
+        removed = 0
+        for session_id, user_id in sessions:
+            if session_id in self._entries:
+                removed += 1
+            self.remove(session_id, user_id)
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "negative_size": len(self._negative),
+            "indexed_users": len(self._user_index),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,135 @@
+"""Linear-time line framing for Claude CLI stream-json output.
+
+Features:
+- Single growable bytearray buffer, consumed from the front in O(1)
+- Incremental newline scanning (every byte is scanned exactly once)
+- Hard per-line cap with truncation instead of unbounded buffer growth
+- Zero-copy decoding through memoryview slices
+"""
+
+import asyncio
+from typing import AsyncIterator, List
+
+# Default read size for a single ``stream.read`` call
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Lines longer than this are truncated; the tail is discarded up to the newline
+DEFAULT_MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+class LineFramer:
+    """Split a byte stream into lines without quadratic copying.
+
+    ``feed`` appends a chunk to an internal bytearray and returns the decoded
+    lines completed by it. Scanning resumes where the previous call stopped,
+    and consumed bytes are dropped from the front of the buffer, which CPython
+    does without moving the remaining data.
+
+    A line that grows past ``max_line_bytes`` is emitted truncated to the cap
+    as soon as the cap is reached; the rest of it is discarded as it arrives,
+    so the buffer never holds more than ``max_line_bytes + chunk size`` bytes.
+    """
+
+    __slots__ = (
+        "max_line_bytes",
+        "truncated_lines",
+        "lines_emitted",
+        "bytes_fed",
+        "_buf",
+        "_scan",
+        "_discarding",
+    )
+
+    def __init__(self, max_line_bytes: int = DEFAULT_MAX_LINE_BYTES):
+        """Initialize framer with a hard per-line byte cap."""
+        if max_line_bytes <= 0:
+            raise ValueError("max_line_bytes must be positive")
+        self.max_line_bytes = max_line_bytes
+        self.truncated_lines = 0
+        self.lines_emitted = 0
+        self.bytes_fed = 0
+        self._buf = bytearray()
+        self._scan = 0
+        self._discarding = False
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """Add a chunk and return every line it completes."""
+        self.bytes_fed += len(chunk)
+        buf = self._buf
+        buf += chunk
+        cap = self.max_line_bytes
+        lines: List[str] = []
+        start = 0
+        scan = self._scan
+
+        with memoryview(buf) as view:
+            while True:
+                newline = buf.find(b"\n", scan)
+                if newline == -1:
+                    break
+                if self._discarding:
+                    # Tail of a line that was already emitted truncated
+                    self._discarding = False
+                else:
+                    end = newline
+                    if end - start > cap:
+                        end = start + cap
+                        self.truncated_lines += 1
+                    lines.append(self._decode(view[start:end]))
+                start = scan = newline + 1
+
+            pending = len(buf) - start
+            if pending > cap or (self._discarding and pending):
+                if not self._discarding:
+                    lines.append(self._decode(view[start : start + cap]))
+                    self.truncated_lines += 1
+                    self._discarding = True
+                start = len(buf)
+
+        if start:
+            del buf[:start]
+        self._scan = len(buf)
+        self.lines_emitted += len(lines)
+        return lines
+
+    def flush(self) -> List[str]:
+        """Return the trailing unterminated line, if any, and reset."""
+        lines: List[str] = []
+        if self._buf and not self._discarding:
+            with memoryview(self._buf) as view:
+                line = self._decode(view)
+            if line:
+                lines.append(line)
+        self._buf.clear()
+        self._scan = 0
+        self._discarding = False
+        self.lines_emitted += len(lines)
+        return lines
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Number of bytes currently held for an incomplete line."""
+        return len(self._buf)
+
+    @staticmethod
+    def _decode(data: memoryview) -> str:
+        """Decode a line slice, tolerating bad UTF-8 and stray CR."""
+        return str(data, "utf-8", "replace").strip()
+
+
+async def iter_stream_lines(
+    stream: asyncio.StreamReader,
+    framer: LineFramer,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> AsyncIterator[str]:
+    """Yield non-empty lines from an asyncio stream through ``framer``."""
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+        for line in framer.feed(chunk):
+            if line:
+                yield line
+
+    for line in framer.flush():
+        yield line
@@ -0,0 +1,460 @@
+"""Warm pool of long-lived Claude CLI workers.
+
+Features:
+- Pre-spawned workers per working directory using stream-json input mode
+- Session affinity: a worker that served a session is reused for it
+- Max-idle eviction, per-worker request caps and crash recycling
+- Pool statistics for monitoring
+"""
+
+import asyncio
+import json
+import time
+from asyncio.subprocess import Process
+from collections import deque
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterator,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import structlog
+
+from ..config.settings import Settings
+from .stream_reader import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_LINE_BYTES, LineFramer
+
+logger = structlog.get_logger()
+
+# Keep only the tail of a worker's stderr for error reporting
+STDERR_TAIL_BYTES = 64 * 1024
+
+PoolKey = Tuple[str, Optional[str]]
+
+
+class ClaudeWorker:
+    """A single long-lived ``claude -p --input-format stream-json`` process.
+
+    Prompts are written to stdin as stream-json user messages; each turn
+    ends with a ``result`` event while the process stays alive.
+    """
+
+    __slots__ = (
+        "process",
+        "working_directory",
+        "session_id",
+        "requests_served",
+        "created_at",
+        "last_used",
+        "_framer",
+        "_pending",
+        "_stderr_tail",
+        "_stderr_task",
+    )
+
+    def __init__(
+        self,
+        process: Process,
+        working_directory: Path,
+        session_id: Optional[str] = None,
+        max_line_bytes: int = DEFAULT_MAX_LINE_BYTES,
+    ):
+        self.process = process
+        self.working_directory = working_directory
+        self.session_id = session_id
+        self.requests_served = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self._framer = LineFramer(max_line_bytes)
+        self._pending: Deque[str] = deque()
+        self._stderr_tail = bytearray()
+        self._stderr_task = asyncio.create_task(self._drain_stderr())
+
+    @property
+    def is_alive(self) -> bool:
+        """Check if the underlying process is still running."""
+        return self.process.returncode is None
+
+    @property
+    def key(self) -> PoolKey:
+        return (str(self.working_directory), self.session_id)
+
+    @property
+    def stderr_tail(self) -> str:
+        """Last bytes written to stderr, decoded."""
+        return self._stderr_tail.decode("utf-8", errors="replace")
+
+    async def send_prompt(self, prompt: str) -> None:
+        """Write one user turn to the worker's stdin."""
+        message = {
+            "type": "user",
+            "message": {
+                "role": "user",
+                "content": [{"type": "text", "text": prompt}],
+            },
+        }
+        stdin = self.process.stdin
+        assert stdin is not None, "worker spawned without stdin pipe"
+        stdin.write(json.dumps(message).encode("utf-8") + b"\n")
+        await stdin.drain()
+        self.requests_served += 1
+
+    async def read_line(self) -> Optional[str]:
+        """Return the next non-empty stdout line, or ``None`` on EOF."""
+        stdout = self.process.stdout
+        assert stdout is not None, "worker spawned without stdout pipe"
+        while not self._pending:
+            chunk = await stdout.read(DEFAULT_CHUNK_SIZE)
+            if not chunk:
+                self._pending.extend(line for line in self._framer.flush() if line)
+                if not self._pending:
+                    return None
+                break
+            self._pending.extend(line for line in self._framer.feed(chunk) if line)
+        return self._pending.popleft()
+
+    async def lines(self) -> AsyncIterator[str]:
+        """Iterate stdout lines; stopping early keeps unread lines buffered."""
+        while True:
+            line = await self.read_line()
+            if line is None:
+                return
+            yield line
+
+    async def close(self) -> None:
+        """Terminate the process and release its resources."""
+        if self.is_alive:
+            try:
+                if self.process.stdin is not None:
+                    self.process.stdin.close()
+                self.process.terminate()
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except (ProcessLookupError, asyncio.TimeoutError):
+                if self.is_alive:
+                    self.process.kill()
+                    await self.process.wait()
+        self._stderr_task.cancel()
+
+    async def _drain_stderr(self) -> None:
+        """Continuously drain stderr so a chatty worker never blocks."""
+        stderr = self.process.stderr
+        assert stderr is not None, "worker spawned without stderr pipe"
+        while True:
+            chunk = await stderr.read(DEFAULT_CHUNK_SIZE)
+            if not chunk:
+                return
+            self._stderr_tail += chunk
+            overflow = len(self._stderr_tail) - STDERR_TAIL_BYTES
+            if overflow > 0:
+                del self._stderr_tail[:overflow]
+
+
+class ClaudeWorkerPool:
+    """Lease warm Claude CLI workers keyed by working directory and session.
+
+    Fresh workers (no conversation yet) are pre-spawned per directory and
+    handed to new sessions. After a turn the worker is returned bound to
+    the session it now holds, so follow-ups skip process start-up and the
+    ``--resume`` transcript reload entirely.
+
+    At most ``max_workers`` processes exist at once: a cold lease first
+    evicts the least recently used idle worker and, when every worker is
+    leased, waits until one is released.
+    """
+
+    def __init__(self, config: Settings):
+        """Initialize pool from configuration."""
+        self.config = config
+        self.warm_size = config.claude_worker_pool_size
+        self.max_workers = config.claude_worker_pool_max_workers
+        self.max_idle_seconds = config.claude_worker_max_idle_seconds
+        self.max_requests = config.claude_worker_max_requests
+        self.max_line_bytes = DEFAULT_MAX_LINE_BYTES
+
+        self._idle: Dict[PoolKey, Deque[ClaudeWorker]] = {}
+        self._leased: Dict[int, ClaudeWorker] = {}
+        self._spawning: Dict[str, int] = {}
+        self._capacity = asyncio.Condition()
+        self._eviction_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+        self._closed = False
+
+        self.stats: Dict[str, int] = {
+            "leases": 0,
+            "warm_hits": 0,
+            "cold_spawns": 0,
+            "prewarmed": 0,
+            "recycled_crash": 0,
+            "recycled_cap": 0,
+            "evicted_idle": 0,
+            "evicted_capacity": 0,
+            "capacity_waits": 0,
+        }
+
+    def build_command(self, session_id: Optional[str] = None) -> List[str]:
+        """Build the CLI command for a streaming-input worker."""
+        cmd = [
+            self.config.claude_binary_path or "claude",
+            "-p",
+            "--input-format",
+            "stream-json",
+            "--output-format",
+            "stream-json",
+            "--verbose",
+            "--max-turns",
+            str(self.config.claude_max_turns),
+        ]
+        if self.config.claude_allowed_tools:
+            cmd.extend(["--allowedTools", ",".join(self.config.claude_allowed_tools)])
+        if session_id:
+            cmd.extend(["--resume", session_id])
+        return cmd
+
+    async def lease(
+        self, working_directory: Path, session_id: Optional[str] = None
+    ) -> Tuple[ClaudeWorker, bool]:
+        """Lease a worker for a directory/session.
+
+        Returns the worker and whether it was already warm.
+        """
+        self._ensure_eviction_task()
+        self.stats["leases"] += 1
+        key = (str(working_directory), session_id)
+
+        worker = self._pop_idle(key)
+        warm = worker is not None
+        if worker is None:
+            worker = await self._spawn_within_capacity(working_directory, session_id)
+            self.stats["cold_spawns"] += 1
+        else:
+            self.stats["warm_hits"] += 1
+
+        self._leased[id(worker)] = worker
+
+        # Refill fresh workers for this directory in the background
+        if session_id is None:
+            self._run_background(self._prewarm(working_directory))
+
+        return worker, warm
+
+    async def release(
+        self, worker: ClaudeWorker, session_id: Optional[str], healthy: bool = True
+    ) -> None:
+        """Return a worker after a turn, recycling it when needed."""
+        self._leased.pop(id(worker), None)
+        worker.last_used = time.monotonic()
+        try:
+            await self._recycle_or_park(worker, session_id, healthy)
+        finally:
+            await self._notify_capacity()
+
+    async def _recycle_or_park(
+        self, worker: ClaudeWorker, session_id: Optional[str], healthy: bool
+    ) -> None:
+        if not healthy or not worker.is_alive:
+            self.stats["recycled_crash"] += 1
+            logger.info(
+                "Recycling crashed Claude worker",
+                working_directory=str(worker.working_directory),
+                returncode=worker.process.returncode,
+            )
+            await worker.close()
+            return
+
+        if worker.requests_served >= self.max_requests or self._closed:
+            self.stats["recycled_cap"] += 1
+            await worker.close()
+            return
+
+        worker.session_id = session_id or worker.session_id
+        self._idle.setdefault(worker.key, deque()).append(worker)
+        await self._enforce_capacity()
+
+    async def prewarm(self, working_directory: Path) -> None:
+        """Spawn fresh workers for a directory up to the warm size."""
+        await self._prewarm(working_directory)
+
+    async def shutdown(self) -> None:
+        """Close every worker, idle and leased."""
+        self._closed = True
+        if self._eviction_task:
+            self._eviction_task.cancel()
+        for task in list(self._background):
+            task.cancel()
+
+        workers = [w for queue in self._idle.values() for w in queue]
+        workers.extend(self._leased.values())
+        self._idle.clear()
+        self._leased.clear()
+        async with self._capacity:
+            self._capacity.notify_all()
+
+        for worker in workers:
+            await worker.close()
+        logger.info("Claude worker pool shut down", closed=len(workers))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        return {
+            **self.stats,
+            "idle": sum(len(q) for q in self._idle.values()),
+            "leased": len(self._leased),
+            "max_workers": self.max_workers,
+        }
+
+    def _pop_idle(self, key: PoolKey) -> Optional[ClaudeWorker]:
+        queue = self._idle.get(key)
+        while queue:
+            worker = queue.pop()
+            if worker.is_alive:
+                if not queue:
+                    del self._idle[key]
+                return worker
+            self.stats["recycled_crash"] += 1
+            self._run_background(worker.close())
+        self._idle.pop(key, None)
+        return None
+
+    def _run_background(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _total_workers(self) -> int:
+        idle = sum(len(q) for q in self._idle.values())
+        return idle + len(self._leased) + sum(self._spawning.values())
+
+    async def _spawn_within_capacity(
+        self, working_directory: Path, session_id: Optional[str]
+    ) -> ClaudeWorker:
+        """Spawn a worker once the pool has room for it under ``max_workers``."""
+        directory = str(working_directory)
+        async with self._capacity:
+            waited = False
+            while self._total_workers() >= self.max_workers:
+                idle = self._pop_lru_idle()
+                if idle is not None:
+                    self.stats["evicted_capacity"] += 1
+                    self._run_background(idle.close())
+                    continue
+                if not waited:
+                    self.stats["capacity_waits"] += 1
+                    waited = True
+                await self._capacity.wait()
+            # Count the spawn before the lock is released
+            self._spawning[directory] = self._spawning.get(directory, 0) + 1
+
+        try:
+            return await self._spawn(working_directory, session_id)
+        finally:
+            self._spawning[directory] -= 1
+            if not self._spawning[directory]:
+                del self._spawning[directory]
+            await self._notify_capacity()
+
+    async def _notify_capacity(self) -> None:
+        """Wake one lease waiting for room in the pool."""
+        async with self._capacity:
+            self._capacity.notify()
+
+    def _pop_lru_idle(self) -> Optional[ClaudeWorker]:
+        """Remove and return the least recently used idle worker."""
+        oldest_key = None
+        oldest_used = None
+        for key, queue in self._idle.items():
+            if queue and (oldest_used is None or queue[0].last_used < oldest_used):
+                oldest_key, oldest_used = key, queue[0].last_used
+        if oldest_key is None:
+            return None
+        worker = self._idle[oldest_key].popleft()
+        if not self._idle[oldest_key]:
+            del self._idle[oldest_key]
+        return worker
+
+    async def _spawn(
+        self, working_directory: Path, session_id: Optional[str] = None
+    ) -> ClaudeWorker:
+        process = await asyncio.create_subprocess_exec(
+            *self.build_command(session_id),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(working_directory),
+        )
+        logger.debug(
+            "Spawned Claude worker",
+            pid=process.pid,
+            working_directory=str(working_directory),
+            resume=bool(session_id),
+        )
+        return ClaudeWorker(process, working_directory, session_id, self.max_line_bytes)
+
+    async def _prewarm(self, working_directory: Path) -> None:
+        directory = str(working_directory)
+        fresh = len(self._idle.get((directory, None), ()))
+        missing = self.warm_size - fresh - self._spawning.get(directory, 0)
+
+        while missing > 0 and not self._closed:
+            if self._total_workers() >= self.max_workers:
+                return
+            self._spawning[directory] = self._spawning.get(directory, 0) + 1
+            try:
+                worker = await self._spawn(working_directory)
+            except OSError as e:
+                logger.warning(
+                    "Failed to prewarm Claude worker",
+                    working_directory=directory,
+                    error=str(e),
+                )
+                return
+            finally:
+                self._spawning[directory] -= 1
+                if not self._spawning[directory]:
+                    del self._spawning[directory]
+            self._idle.setdefault(worker.key, deque()).append(worker)
+            self.stats["prewarmed"] += 1
+            missing -= 1
+
+    async def _enforce_capacity(self) -> None:
+        """Close least recently used idle workers above ``max_workers``."""
+        while self._total_workers() > self.max_workers:
+            worker = self._pop_lru_idle()
+            if worker is None:
+                return
+            self.stats["evicted_capacity"] += 1
+            await worker.close()
+
+    def _ensure_eviction_task(self) -> None:
+        if self._eviction_task is None or self._eviction_task.done():
+            self._eviction_task = asyncio.create_task(self._eviction_loop())
+
+    async def _eviction_loop(self) -> None:
+        interval = max(1, min(60, self.max_idle_seconds // 2))
+        while not self._closed:
+            await asyncio.sleep(interval)
+            await self._evict_idle()
+
+    async def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.max_idle_seconds
+        expired: List[ClaudeWorker] = []
+        for key in list(self._idle):
+            queue = self._idle[key]
+            keep = deque(w for w in queue if w.last_used >= cutoff and w.is_alive)
+            expired.extend(w for w in queue if w not in keep)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+        for worker in expired:
+            self.stats["evicted_idle"] += 1
+            await worker.close()
+
+        if expired:
+            logger.debug("Evicted idle Claude workers", count=len(expired))
@@ -69,6 +69,18 @@ class Settings(BaseSettings):
     security_flexible_mode: bool = Field(
         False, description="Allow more flexible file operations within project subdirectories"
     )
+    auth_decision_ttl_seconds: int = Field(
+        300, description="Seconds before an authenticated user is re-checked", ge=1
+    )
+    auth_negative_cache_ttl_seconds: int = Field(
+        60, description="Seconds an unknown user stays denied without re-checking", ge=0
+    )
+    path_cache_size: int = Field(
+        1024, description="Resolved paths cached by the validator (0 disables)", ge=0
+    )
+    path_cache_ttl_seconds: float = Field(
+        60.0, description="Seconds a cached path resolution is trusted", gt=0
+    )
     # allowed_users: Optional[List[int]] = Field(
     #     default=None, description="Allowed Telegram user IDs"
     # )
@@ -127,6 +139,41 @@ class Settings(BaseSettings):
         default=["git commit", "git push"],
         description="List of explicitly disallowed Claude tools/commands",
     )
+    tool_verdict_cache_size: int = Field(
+        1024, description="Tool call verdicts remembered (0 disables the cache)", ge=0
+    )
+    tool_verdict_cache_ttl_seconds: int = Field(
+        300, description="Seconds a cached tool call verdict stays valid", ge=1
+    )
+    tool_violation_history: int = Field(
+        1000, description="Recent tool security violations kept in memory", ge=1
+    )
+
+    # Claude CLI worker pool (streaming input mode)
+    claude_worker_pool_enabled: bool = Field(
+        False,
+        description="Reuse warm Claude CLI workers instead of one process per message",
+    )
+    claude_worker_pool_size: int = Field(
+        1, description="Fresh warm workers kept per working directory", ge=0
+    )
+    claude_worker_pool_max_workers: int = Field(
+        4, description="Max Claude CLI workers alive at once (idle + leased)", ge=1
+    )
+    claude_worker_max_idle_seconds: int = Field(
+        600, description="Close workers idle longer than this", ge=10
+    )
+    claude_worker_max_requests: int = Field(
+        50, description="Recycle a worker after this many turns", ge=1
+    )
+
+    # Claude admission control
+    claude_max_concurrent_processes: int = Field(
+        2, description="Max Claude runs executing at once (others are queued)", ge=1
+    )
+    claude_max_concurrent_per_user: int = Field(
+        1, description="Max Claude runs executing at once per user", ge=1
+    )
 
     # Rate limiting
     rate_limit_requests: int = Field(
@@ -138,11 +185,88 @@ class Settings(BaseSettings):
     rate_limit_burst: int = Field(
         DEFAULT_RATE_LIMIT_BURST, description="Burst capacity"
     )
+    rate_limit_global_requests: int = Field(
+        0,
+        description="Requests per window across all users (0 = no global limit)",
+        ge=0,
+    )
+    rate_limit_global_burst: int = Field(
+        50, description="Burst capacity of the global limit", ge=1
+    )
+    rate_limit_sweep_interval_seconds: int = Field(
+        300,
+        description="Seconds between sweeps of idle rate limit state (0 = off)",
+        ge=0,
+    )
+    claude_cost_window_hours: int = Field(
+        24, description="Sliding window for the per-user cost limit", ge=1
+    )
+    rate_limit_state_flush_interval_ms: int = Field(
+        2000,
+        description="Delay before charged cost is written to cost_tracking",
+        ge=100,
+    )
+    rate_limit_prewarm_hours: int = Field(
+        1, description="Load limits of users active this recently at startup", ge=0
+    )
+    rate_limit_prewarm_max_users: int = Field(
+        1000,
+        description="Max users whose limits are loaded at startup (0 = lazy only)",
+        ge=0,
+    )
+    cost_model_alpha: float = Field(
+        0.2,
+        description="Weight of the newest sample in learned message costs",
+        gt=0,
+        le=1,
+    )
+    cost_model_min_samples: int = Field(
+        3, description="Samples needed before a learned cost average is used", ge=1
+    )
+    cost_model_refit_interval_seconds: int = Field(
+        300,
+        description=(
+            "Seconds between cost model refits from messages (0 = startup only)"
+        ),
+        ge=0,
+    )
+    cost_model_history_days: int = Field(
+        30, description="Days of message history the cost model is fitted on", ge=1
+    )
 
     # Storage
     database_url: str = Field(
         DEFAULT_DATABASE_URL, description="Database connection URL"
     )
+    database_pool_size: int = Field(
+        4, description="Read-only SQLite connections kept open", ge=1
+    )
+    database_pool_timeout: float = Field(
+        10.0, description="Seconds to wait for a free database connection", gt=0
+    )
+    storage_flush_interval_ms: int = Field(
+        250,
+        description=(
+            "Max delay before queued interactions are written (0 = write-through)"
+        ),
+        ge=0,
+    )
+    storage_flush_batch_size: int = Field(
+        100, description="Queued interactions that trigger an immediate flush", ge=1
+    )
+    telegram_persistence_interval_seconds: int = Field(
+        10,
+        description="Seconds between writes of changed user_data/chat_data keys",
+        ge=1,
+    )
+    audit_buffer_size: int = Field(
+        10000, description="Recent audit events kept in memory for queries", ge=100
+    )
+    audit_flush_interval_ms: int = Field(
+        1000,
+        description="Max delay before audit events are written (0 = write-through)",
+        ge=0,
+    )
     session_timeout_hours: int = Field(
         DEFAULT_SESSION_TIMEOUT_HOURS, description="Session timeout"
     )
@@ -155,6 +279,18 @@ class Settings(BaseSettings):
     max_sessions_per_user: int = Field(
         DEFAULT_MAX_SESSIONS_PER_USER, description="Max concurrent sessions"
     )
+    session_cache_max_size: int = Field(
+        1000, description="Max Claude sessions kept in memory", ge=1
+    )
+    session_cache_ttl_seconds: int = Field(
+        3600, description="Idle seconds before a cached session is dropped", ge=1
+    )
+    session_cleanup_interval_seconds: int = Field(
+        900, description="Seconds between expired-session cleanup runs", ge=10
+    )
+    session_cleanup_batch_size: int = Field(
+        500, description="Sessions deactivated per cleanup transaction", ge=1
+    )
 
     # Features
     enable_mcp: bool = Field(False, description="Enable Model Context Protocol")
@@ -164,6 +300,10 @@ class Settings(BaseSettings):
     enable_git_integration: bool = Field(True, description="Enable git commands")
     enable_file_uploads: bool = Field(True, description="Enable file upload handling")
     enable_quick_actions: bool = Field(True, description="Enable quick action buttons")
+    enable_progressive_delivery: bool = Field(
+        False,
+        description="Send finished response chunks while Claude is still working",
+    )
     claude_availability: ClaudeAvailabilitySettings = Field(default_factory=ClaudeAvailabilitySettings)
     
     # Image processing settings
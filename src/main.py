@@ -25,21 +25,25 @@ from src.config.features import FeatureFlags
 from src.config.loader import load_config
 from src.config.settings import Settings
 from src.exceptions import ConfigurationError
-from src.security.audit import AuditLogger, InMemoryAuditStorage
+from src.security.audit import AuditLogger
 from src.security.auth import (
     AuthenticationManager,
     InMemoryTokenStorage,
     TokenAuthProvider,
     WhitelistAuthProvider,
 )
+from src.security.cost_model import CostModel
 from src.security.rate_limiter import RateLimiter
 from src.security.validators import SecurityValidator
+from src.storage.audit_storage import SQLiteAuditStorage
 from src.storage.facade import Storage
 from src.storage.session_storage import SQLiteSessionStorage
 from src.localization import LocalizationManager, UserLanguageStorage
 from src.mcp.manager import MCPManager
 from src.mcp.context_handler import MCPContextHandler
 from src.bot.integration import initialize_enhanced_modules, get_enhanced_integration
+from src.bot.utils.directory_listing import DirectoryLister
+from src.bot.utils.progress_updater import ProgressUpdater
 
 
 def setup_logging(debug: bool = False) -> None:
@@ -141,7 +145,13 @@ async def create_application(config: Settings) -> Dict[str, Any]:
     logger.info("Creating application components")
 
     # Initialize storage system
-    storage = Storage(config.database_url)
+    storage = Storage(
+        config.database_url,
+        flush_interval_ms=config.storage_flush_interval_ms,
+        flush_batch_size=config.storage_flush_batch_size,
+        pool_size=config.database_pool_size,
+        pool_timeout=config.database_pool_timeout,
+    )
     await storage.initialize()
 
     # Create security components
@@ -165,15 +175,36 @@ async def create_application(config: Settings) -> Dict[str, Any]:
     elif not providers:
         raise ConfigurationError("No authentication providers configured")
 
-    auth_manager = AuthenticationManager(providers)
+    auth_manager = AuthenticationManager(
+        providers,
+        decision_ttl=config.auth_decision_ttl_seconds,
+        negative_ttl=config.auth_negative_cache_ttl_seconds,
+    )
+    # Permission changes in the database drop cached decisions immediately
+    storage.users.add_invalidation_listener(auth_manager.invalidate)
     security_validator = SecurityValidator(
         config.approved_directory, 
-        flexible_mode=getattr(config, 'security_flexible_mode', False)
+        flexible_mode=getattr(config, 'security_flexible_mode', False),
+        path_cache_size=config.path_cache_size,
+        path_cache_ttl=config.path_cache_ttl_seconds,
+    )
+    rate_limiter = RateLimiter(config, state_store=storage.costs)
+    await rate_limiter.prewarm()
+    cost_model = CostModel(
+        storage.messages,
+        alpha=config.cost_model_alpha,
+        min_samples=config.cost_model_min_samples,
+        refit_interval=config.cost_model_refit_interval_seconds,
+        history_days=config.cost_model_history_days,
     )
-    rate_limiter = RateLimiter(config)
+    await cost_model.start()
 
     # Create audit storage and logger
-    audit_storage = InMemoryAuditStorage()  # TODO: Use database storage in production
+    audit_storage = SQLiteAuditStorage(
+        storage.db_manager,
+        max_events=config.audit_buffer_size,
+        flush_interval_ms=config.audit_flush_interval_ms,
+    )
     audit_logger = AuditLogger(audit_storage)
 
     # Create Claude integration components with persistent storage
@@ -242,6 +273,7 @@ async def create_application(config: Settings) -> Dict[str, Any]:
         "auth_manager": auth_manager,
         "security_validator": security_validator,
         "rate_limiter": rate_limiter,
+        "cost_model": cost_model,
         "audit_logger": audit_logger,
         "claude_integration": claude_integration,
         "storage": storage,
@@ -250,6 +282,8 @@ async def create_application(config: Settings) -> Dict[str, Any]:
         "mcp_manager": mcp_manager,
         "mcp_context_handler": mcp_context_handler,
         "image_command_handler": image_command_handler,
+        "progress_updater": ProgressUpdater(),
+        "directory_lister": DirectoryLister(),
     }
 
     # Initialize enhanced modules
@@ -264,6 +298,9 @@ async def create_application(config: Settings) -> Dict[str, Any]:
         "bot": bot,
         "claude_integration": claude_integration,
         "storage": storage,
+        "audit_storage": audit_storage,
+        "rate_limiter": rate_limiter,
+        "cost_model": cost_model,
         "config": config,
     }
 
@@ -274,6 +311,9 @@ async def run_application(app: Dict[str, Any]) -> None:
     bot: ClaudeCodeBot = app["bot"]
     claude_integration: ClaudeIntegration = app["claude_integration"]
     storage: Storage = app["storage"]
+    audit_storage: SQLiteAuditStorage = app["audit_storage"]
+    rate_limiter: RateLimiter = app["rate_limiter"]
+    cost_model: CostModel = app["cost_model"]
 
     # Set up signal handlers for graceful shutdown
     shutdown_event = asyncio.Event()
@@ -316,6 +356,9 @@ async def run_application(app: Dict[str, Any]) -> None:
         try:
             await bot.stop()
             await claude_integration.shutdown()
+            await cost_model.shutdown()
+            await rate_limiter.shutdown()
+            await audit_storage.close()
             await storage.close()
         except Exception as e:
             logger.error("Error during shutdown", error=str(e))
@@ -10,6 +10,7 @@ This module provides comprehensive security features including:
 Key Components:
 - AuthenticationManager: Main authentication system
 - RateLimiter: Request and cost-based rate limiting
+- CostModel: Learned per-message cost predictions
 - SecurityValidator: Input validation and path security
 - AuditLogger: Security event logging
 """
@@ -22,6 +23,7 @@ from .auth import (
     UserSession,
     WhitelistAuthProvider,
 )
+from .cost_model import CostModel
 from .rate_limiter import RateLimitBucket, RateLimiter
 from .validators import SecurityValidator
 
@@ -33,6 +35,7 @@ __all__ = [
     "UserSession",
     "RateLimiter",
     "RateLimitBucket",
+    "CostModel",
     "SecurityValidator",
     "AuditLogger",
     "AuditEvent",
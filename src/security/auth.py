@@ -3,16 +3,20 @@
 Features:
 - Telegram ID whitelist
 - Token-based authentication
-- Session management
+- Session management with heap-based expiry
+- Cached authorization decisions (positive and negative)
 - Audit logging
 """
 
 import hashlib
+import heapq
+import itertools
 import secrets
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import structlog
 
@@ -22,6 +26,10 @@ from src.exceptions import SecurityError
 
 logger = structlog.get_logger()
 
+DEFAULT_DECISION_TTL_SECONDS = 300
+DEFAULT_NEGATIVE_TTL_SECONDS = 60
+DEFAULT_MAX_NEGATIVE = 10000
+
 
 @dataclass
 class UserSession:
@@ -50,11 +58,26 @@ class UserSession:
 class AuthProvider(ABC):
     """Base authentication provider."""
 
+    def add_invalidation_listener(self, callback: Callable[[int], None]) -> None:
+        """Call ``callback(user_id)`` whenever a user's credentials change."""
+        listeners = self.__dict__.setdefault("_invalidation_listeners", [])
+        listeners.append(callback)
+
+    def notify_invalidated(self, user_id: int) -> None:
+        """Tell listeners that cached decisions for ``user_id`` are stale."""
+        for callback in self.__dict__.get("_invalidation_listeners", ()):
+            callback(user_id)
+
     @abstractmethod
     async def authenticate(self, user_id: int, credentials: Dict[str, Any]) -> bool:
         """Verify user credentials."""
         pass
 
+    async def revalidate(self, user_id: int) -> bool:
+        """Check, without credentials, that a session this provider created
+        is still valid."""
+        return await self.authenticate(user_id, {})
+
     @abstractmethod
     async def get_user_info(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user information."""
@@ -185,6 +208,7 @@ class TokenAuthProvider(AuthProvider):
         expires_at = datetime.utcnow() + self.token_lifetime
 
         await self.storage.store_token(user_id, hashed, expires_at)
+        self.notify_invalidated(user_id)
 
         logger.info(
             "Token generated", user_id=user_id, expires_at=expires_at.isoformat()
@@ -194,8 +218,16 @@ class TokenAuthProvider(AuthProvider):
     async def revoke_token(self, user_id: int) -> None:
         """Revoke user's token."""
         await self.storage.revoke_token(user_id)
+        self.notify_invalidated(user_id)
         logger.info("Token revoked", user_id=user_id)
 
+    async def revalidate(self, user_id: int) -> bool:
+        """A token session stays valid while the token is stored and unexpired.
+
+        Issuing or revoking a token invalidates the session directly.
+        """
+        return await self.storage.get_user_token(user_id) is not None
+
     async def get_user_info(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user information if token is valid."""
         token_data = await self.storage.get_user_token(user_id)
@@ -219,29 +251,95 @@ class TokenAuthProvider(AuthProvider):
 
 
 class AuthenticationManager:
-    """Main authentication manager supporting multiple providers."""
+    """Main authentication manager supporting multiple providers.
 
-    def __init__(self, providers: List[AuthProvider]):
+    Authorization for a user with a live session is answered from two
+    dicts (session deadline and provider re-check time), so the common
+    path costs a lookup and a clock read. Session expiry is driven by a
+    min-heap of deadlines: only sessions that are actually due are looked
+    at, and a session that was refreshed since its entry was pushed is
+    simply re-queued. Unknown users are remembered as denied for a short
+    time so repeated messages do not hit every provider again.
+
+    Once the decision TTL runs out, a live session is re-checked only with
+    the provider that created it (``AuthProvider.revalidate``); the other
+    providers, and failed credentials, never end it.
+    """
+
+    def __init__(
+        self,
+        providers: List[AuthProvider],
+        decision_ttl: float = DEFAULT_DECISION_TTL_SECONDS,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL_SECONDS,
+        max_negative: int = DEFAULT_MAX_NEGATIVE,
+    ):
         if not providers:
             raise SecurityError("At least one authentication provider is required")
 
         self.providers = providers
         self.sessions: Dict[int, UserSession] = {}
+        self.decision_ttl = decision_ttl
+        self.negative_ttl = negative_ttl
+        self.max_negative = max_negative
+
+        # user_id -> monotonic deadline of the (sliding) session timeout
+        self._deadlines: Dict[int, float] = {}
+        # user_id -> monotonic time until which the provider decision holds
+        self._verified_until: Dict[int, float] = {}
+        # user_id -> provider that created the session
+        self._session_providers: Dict[int, AuthProvider] = {}
+        # (deadline, seq, user_id, session); stale entries are skipped
+        self._expiry_heap: List[Tuple[float, int, int, UserSession]] = []
+        self._heap_seq = itertools.count()
+        # user_id -> monotonic time until which the user stays denied
+        self._denied: Dict[int, float] = {}
+
+        self.stats: Dict[str, int] = {
+            "negative_hits": 0,
+            "reverifications": 0,
+            "invalidations": 0,
+            "expired_sessions": 0,
+        }
+
+        for provider in providers:
+            provider.add_invalidation_listener(self.invalidate)
+
         logger.info("Authentication manager initialized", providers=len(self.providers))
 
     async def authenticate_user(
         self, user_id: int, credentials: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Try authentication with all providers."""
-        credentials = credentials or {}
+        now = time.monotonic()
+        self._expire_due(now)
 
-        # Clean expired sessions first
-        self._cleanup_expired_sessions()
+        # Recently denied and no new credentials: skip the providers
+        if not credentials and self.is_denied(user_id, now):
+            self.stats["negative_hits"] += 1
+            logger.debug("Authentication denied from cache", user_id=user_id)
+            return False
+
+        if not credentials and self._has_live_session(user_id, now):
+            if await self._reverify(user_id):
+                return True
+            # The session's own provider no longer accepts the user
+            self._drop_session(user_id)
+
+        credentials = credentials or {}
 
         # Try each provider
         for provider in self.providers:
             try:
                 if await provider.authenticate(user_id, credentials):
+                    self._denied.pop(user_id, None)
+                    if self._has_live_session(user_id, time.monotonic()):
+                        # Credentials confirmed for an existing session
+                        self.stats["reverifications"] += 1
+                        self._verified_until[user_id] = (
+                            time.monotonic() + self.decision_ttl
+                        )
+                        self.refresh_session(user_id)
+                        return True
                     await self._create_session(user_id, provider)
                     logger.info(
                         "User authenticated successfully",
@@ -257,68 +355,176 @@ class AuthenticationManager:
                     error=str(e),
                 )
 
+        if self._has_live_session(user_id, time.monotonic()):
+            # Rejected credentials do not end a session that is still valid
+            logger.warning("Authentication attempt rejected", user_id=user_id)
+            return False
+
+        self._remember_denied(user_id)
         logger.warning("Authentication failed for user", user_id=user_id)
         return False
 
+    async def _reverify(self, user_id: int) -> bool:
+        """Re-check a live session with the provider that created it."""
+        provider = self._session_providers.get(user_id)
+        if provider is None:
+            return False
+        try:
+            valid = await provider.revalidate(user_id)
+        except Exception as e:
+            logger.error(
+                "Authentication provider error",
+                user_id=user_id,
+                provider=provider.__class__.__name__,
+                error=str(e),
+            )
+            return False
+        if not valid:
+            return False
+        self.stats["reverifications"] += 1
+        self._verified_until[user_id] = time.monotonic() + self.decision_ttl
+        self.refresh_session(user_id)
+        return True
+
     async def _create_session(self, user_id: int, provider: AuthProvider) -> None:
         """Create authenticated session."""
         user_info = await provider.get_user_info(user_id)
-        self.sessions[user_id] = UserSession(
+        session = UserSession(
             user_id=user_id,
             auth_provider=provider.__class__.__name__,
             created_at=datetime.utcnow(),
             last_activity=datetime.utcnow(),
             user_info=user_info,
         )
+        now = time.monotonic()
+        deadline = now + session.session_timeout.total_seconds()
+        self.sessions[user_id] = session
+        self._session_providers[user_id] = provider
+        self._deadlines[user_id] = deadline
+        self._verified_until[user_id] = now + self.decision_ttl
+        heapq.heappush(
+            self._expiry_heap, (deadline, next(self._heap_seq), user_id, session)
+        )
 
         logger.info(
             "Session created", user_id=user_id, provider=provider.__class__.__name__
         )
 
     def is_authenticated(self, user_id: int) -> bool:
-        """Check if user has active session."""
-        session = self.sessions.get(user_id)
-        if session and not session.is_expired():
+        """Check if user has an active, recently verified session."""
+        now = time.monotonic()
+        if self._expiry_heap and self._expiry_heap[0][0] <= now:
+            self._expire_due(now)
+        return (
+            self._deadlines.get(user_id, 0.0) > now
+            and self._verified_until.get(user_id, 0.0) > now
+        )
+
+    def check_and_refresh(self, user_id: int) -> bool:
+        """``is_authenticated`` plus ``refresh_session`` in one lookup."""
+        now = time.monotonic()
+        if self._expiry_heap and self._expiry_heap[0][0] <= now:
+            self._expire_due(now)
+        if (
+            self._deadlines.get(user_id, 0.0) > now
+            and self._verified_until.get(user_id, 0.0) > now
+        ):
+            self._deadlines[user_id] = (
+                now + self.sessions[user_id].session_timeout.total_seconds()
+            )
             return True
-        elif session:
-            # Remove expired session
-            del self.sessions[user_id]
-            logger.info("Expired session removed", user_id=user_id)
         return False
 
+    def is_denied(self, user_id: int, now: Optional[float] = None) -> bool:
+        """Check the negative cache."""
+        expires_at = self._denied.get(user_id)
+        if expires_at is None:
+            return False
+        if expires_at <= (time.monotonic() if now is None else now):
+            del self._denied[user_id]
+            return False
+        return True
+
     def get_session(self, user_id: int) -> Optional[UserSession]:
         """Get user session if valid."""
-        if self.is_authenticated(user_id):
-            return self.sessions[user_id]
-        return None
+        if not self.is_authenticated(user_id):
+            return None
+        session = self.sessions[user_id]
+        # Activity is tracked on the monotonic clock; sync the wall-clock view
+        idle = time.monotonic() - (
+            self._deadlines[user_id] - session.session_timeout.total_seconds()
+        )
+        session.last_activity = datetime.utcnow() - timedelta(seconds=max(0.0, idle))
+        return session
 
     def refresh_session(self, user_id: int) -> bool:
         """Refresh user session activity."""
-        session = self.get_session(user_id)
-        if session:
-            session.refresh()
-            return True
-        return False
+        now = time.monotonic()
+        if not self._has_live_session(user_id, now):
+            return False
+        session = self.sessions[user_id]
+        self._deadlines[user_id] = now + session.session_timeout.total_seconds()
+        session.last_activity = datetime.utcnow()
+        return True
 
     def end_session(self, user_id: int) -> None:
         """End user session."""
-        if user_id in self.sessions:
-            del self.sessions[user_id]
+        if self._drop_session(user_id):
             logger.info("Session ended", user_id=user_id)
 
+    def invalidate(self, user_id: int) -> None:
+        """Forget every cached decision for ``user_id``.
+
+        Called when a user's credentials change (token issued or revoked,
+        database permission updated). The next update re-authenticates.
+        """
+        self.stats["invalidations"] += 1
+        self._denied.pop(user_id, None)
+        if self._drop_session(user_id):
+            logger.info("Session invalidated", user_id=user_id)
+
+    def _has_live_session(self, user_id: int, now: float) -> bool:
+        return self._deadlines.get(user_id, 0.0) > now
+
+    def _drop_session(self, user_id: int) -> bool:
+        # The heap entry goes stale and is discarded when it comes due
+        self._deadlines.pop(user_id, None)
+        self._verified_until.pop(user_id, None)
+        self._session_providers.pop(user_id, None)
+        return self.sessions.pop(user_id, None) is not None
+
+    def _remember_denied(self, user_id: int) -> None:
+        if self.negative_ttl <= 0:
+            return
+        self._denied.pop(user_id, None)
+        self._denied[user_id] = time.monotonic() + self.negative_ttl
+        while len(self._denied) > self.max_negative:
+            # Oldest insertion first
+            del self._denied[next(iter(self._denied))]
+
+    def _expire_due(self, now: float) -> None:
+        """Expire sessions whose deadline has passed (heap order, no scans)."""
+        expired = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            _, _, user_id, session = heapq.heappop(heap)
+            if self.sessions.get(user_id) is not session:
+                continue  # Session ended or replaced since this was pushed
+            deadline = self._deadlines[user_id]
+            if deadline > now:
+                # Refreshed since: queue again at its current deadline
+                heapq.heappush(heap, (deadline, next(self._heap_seq), user_id, session))
+                continue
+            self._drop_session(user_id)
+            expired += 1
+
+        if expired:
+            self.stats["expired_sessions"] += expired
+            logger.info("Expired sessions cleaned up", count=expired)
+
     def _cleanup_expired_sessions(self) -> None:
         """Remove expired sessions."""
-        expired_sessions = [
-            user_id
-            for user_id, session in self.sessions.items()
-            if session.is_expired()
-        ]
-
-        for user_id in expired_sessions:
-            del self.sessions[user_id]
-
-        if expired_sessions:
-            logger.info("Expired sessions cleaned up", count=len(expired_sessions))
+        self._expire_due(time.monotonic())
 
     def get_active_sessions_count(self) -> int:
         """Get count of active sessions."""
@@ -0,0 +1,251 @@
+"""Learned per-message cost model for admission control.
+
+Features:
+- Exponentially weighted average of actual Claude cost per user,
+  message kind and length bucket
+- Bot-wide averages for users with little history
+- Heuristic prior until any history exists
+- Incremental refit from the messages table
+- O(1) prediction at middleware time
+"""
+
+import asyncio
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import structlog
+
+if TYPE_CHECKING:
+    from ..storage.repositories import MessageRepository
+
+logger = structlog.get_logger()
+
+MESSAGE_KINDS = ("command", "file", "complex", "text")
+
+# Upper bounds (characters, or bytes for files) of the length buckets
+LENGTH_BUCKETS = (64, 256, 1024, 4096, 16384, 65536)
+
+COMPLEX_KEYWORDS = (
+    "analyze",
+    "build",
+    "compile",
+    "create",
+    "debug",
+    "document",
+    "explain",
+    "generate",
+    "implement",
+    "optimize",
+    "refactor",
+    "test",
+)
+
+# How the document handler embeds an uploaded file in the prompt
+FILE_PROMPT_MARKER = "**File:** `"
+
+# Only this much of a prompt is looked at for keywords, here and when fitting
+CLASSIFY_PREFIX_CHARS = 4096
+
+DEFAULT_ALPHA = 0.2
+DEFAULT_MIN_SAMPLES = 3
+DEFAULT_REFIT_INTERVAL_SECONDS = 300
+DEFAULT_HISTORY_DAYS = 30
+REFIT_BATCH_SIZE = 5000
+
+
+def classify_message(text: Optional[str], is_file: bool = False) -> str:
+    """Kind of a message: command, file, complex or text."""
+    if is_file:
+        return "file"
+    if not text:
+        return "text"
+    if text.startswith("/"):
+        return "command"
+    head = text[:CLASSIFY_PREFIX_CHARS].lower()
+    if any(keyword in head for keyword in COMPLEX_KEYWORDS):
+        return "complex"
+    return "text"
+
+
+def length_bucket(length: int) -> int:
+    """Index of the length bucket ``length`` falls in."""
+    return bisect_right(LENGTH_BUCKETS, length)
+
+
+def prior_cost(kind: str, length: int) -> float:
+    """Heuristic estimate used before any cost history exists."""
+    base_cost = 0.01
+    if kind == "file":
+        # Uploads: flat surcharge plus size in KB
+        return base_cost + 0.05 + (length / 1024) * 0.0001
+    cost = base_cost + length * 0.0001
+    if kind == "command":
+        return cost + 0.02
+    if kind == "complex":
+        return cost + 0.03
+    return cost
+
+
+class CostModel:
+    """Predict what a message will cost from what similar ones cost.
+
+    Keeps an exponentially weighted average of ``ClaudeResponse.cost`` per
+    (user, kind, length bucket) and per (kind, length bucket) across all
+    users. A prediction uses the user's own average once it has
+    ``min_samples`` samples, then the bot-wide one, then ``prior_cost``.
+    Averages are fed from the ``messages`` table: the first refit reads
+    ``history_days`` of history, later ones only rows added since.
+    """
+
+    def __init__(
+        self,
+        store: Optional["MessageRepository"] = None,
+        alpha: float = DEFAULT_ALPHA,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        refit_interval: float = DEFAULT_REFIT_INTERVAL_SECONDS,
+        history_days: int = DEFAULT_HISTORY_DAYS,
+    ):
+        """Initialize cost model."""
+        self.store = store
+        self.alpha = alpha
+        self.min_samples = max(1, min_samples)
+        self.refit_interval = refit_interval
+        self.history_days = history_days
+
+        # key -> [average, samples]
+        self._user: Dict[Tuple[int, str, int], List[float]] = {}
+        self._global: Dict[Tuple[str, int], List[float]] = {}
+        self._last_message_id = 0
+        self._refit_task: Optional[asyncio.Task] = None
+        self._refit_lock = asyncio.Lock()
+
+        self.stats: Dict[str, int] = {
+            "predictions": 0,
+            "user_hits": 0,
+            "global_hits": 0,
+            "prior_hits": 0,
+            "samples": 0,
+            "refits": 0,
+        }
+
+    def predict(self, user_id: int, kind: str, length: int) -> float:
+        """Expected cost of a message of ``kind`` and ``length`` from ``user_id``."""
+        self.stats["predictions"] += 1
+        bucket = length_bucket(length)
+        entry = self._user.get((user_id, kind, bucket))
+        if entry is not None and entry[1] >= self.min_samples:
+            self.stats["user_hits"] += 1
+            return entry[0]
+        entry = self._global.get((kind, bucket))
+        if entry is not None and entry[1] >= self.min_samples:
+            self.stats["global_hits"] += 1
+            return entry[0]
+        self.stats["prior_hits"] += 1
+        return prior_cost(kind, length)
+
+    def estimate(
+        self,
+        user_id: int,
+        text: Optional[str],
+        is_file: bool = False,
+        file_size: Optional[int] = None,
+    ) -> float:
+        """Expected cost of a message, classifying it first."""
+        kind = classify_message(text, is_file)
+        if is_file:
+            length = file_size or 0
+        else:
+            length = len(text or "")
+        return self.predict(user_id, kind, length)
+
+    def observe(self, user_id: int, kind: str, length: int, cost: float) -> None:
+        """Fold one actual cost into the averages."""
+        bucket = length_bucket(length)
+        user_key = (user_id, kind, bucket)
+        global_key = (kind, bucket)
+        self._user[user_key] = self._fold(self._user.get(user_key), cost)
+        self._global[global_key] = self._fold(self._global.get(global_key), cost)
+        self.stats["samples"] += 1
+
+    def _fold(self, entry: Optional[List[float]], cost: float) -> List[float]:
+        """EWMA update of one ``[average, samples]`` entry."""
+        if entry is None:
+            return [cost, 1]
+        entry[0] += self.alpha * (cost - entry[0])
+        entry[1] += 1
+        return entry
+
+    async def refit(self) -> int:
+        """Fold in messages stored since the last refit; returns how many."""
+        if self.store is None:
+            return 0
+        async with self._refit_lock:
+            added = 0
+            while True:
+                rows = await self.store.get_cost_samples(
+                    self._last_message_id,
+                    self.history_days,
+                    REFIT_BATCH_SIZE,
+                    CLASSIFY_PREFIX_CHARS,
+                )
+                for row in rows:
+                    head = row["prompt_head"] or ""
+                    kind = classify_message(head, FILE_PROMPT_MARKER in head)
+                    self.observe(
+                        row["user_id"], kind, row["prompt_length"] or 0, row["cost"]
+                    )
+                if rows:
+                    self._last_message_id = rows[-1]["message_id"]
+                added += len(rows)
+                if len(rows) < REFIT_BATCH_SIZE:
+                    break
+                # Let other coroutines run between batches
+                await asyncio.sleep(0)
+
+            self.stats["refits"] += 1
+            if added:
+                logger.debug("Cost model refit", samples=added, users=self.user_count)
+            return added
+
+    async def start(self) -> None:
+        """Fit on recent history and keep refitting in the background."""
+        if self.store is None:
+            return
+        added = await self.refit()
+        logger.info("Cost model fitted", samples=added, users=self.user_count)
+        if self.refit_interval > 0 and self._refit_task is None:
+            self._refit_task = asyncio.create_task(self._refit_loop())
+
+    async def shutdown(self) -> None:
+        """Stop background refitting."""
+        if self._refit_task and not self._refit_task.done():
+            self._refit_task.cancel()
+            try:
+                await self._refit_task
+            except asyncio.CancelledError:
+                logger.debug("Cost model refit stopped")
+        self._refit_task = None
+
+    @property
+    def user_count(self) -> int:
+        return len({key[0] for key in self._user})
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prediction counters and bot-wide averages."""
+        return {
+            **self.stats,
+            "last_message_id": self._last_message_id,
+            "tracked_users": self.user_count,
+            "global_averages": {
+                f"{kind}:{bucket}": round(entry[0], 4)
+                for (kind, bucket), entry in sorted(self._global.items())
+            },
+        }
+
+    async def _refit_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refit_interval)
+            try:
+                await self.refit()
+            except Exception as e:
+                logger.error("Cost model refit failed", error=str(e))
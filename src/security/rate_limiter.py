@@ -1,33 +1,56 @@
 """Rate limiting implementation with multiple strategies.
 
 Features:
-- Token bucket algorithm
-- Cost-based limiting
-- Per-user tracking
+- Token bucket algorithm on the monotonic clock
+- Sliding-window cost limiting
+- Global limit on top of per-user limits
+- Compact per-user state with periodic sweeping
+- State persisted to cost_tracking (lazy load, batched writes, prewarm)
 - Burst handling
 """
 
 import asyncio
-from collections import defaultdict
-from dataclasses import dataclass
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 import structlog
 
 from ..config.settings import Settings
 
+if TYPE_CHECKING:
+    from ..storage.repositories import CostTrackingRepository
+
 logger = structlog.get_logger()
 
+DEFAULT_COST_WINDOW_HOURS = 24
+DEFAULT_SWEEP_INTERVAL_SECONDS = 300
+# Users examined per event-loop turn while sweeping
+SWEEP_CHUNK_SIZE = 5000
 
-@dataclass
-class RateLimitBucket:
-    """Token bucket for rate limiting."""
+DEFAULT_STATE_FLUSH_INTERVAL_MS = 2000
+DEFAULT_PREWARM_HOURS = 1
+DEFAULT_PREWARM_MAX_USERS = 1000
+# Rows per write when persisting limiter state
+STATE_WRITE_BATCH_SIZE = 500
 
-    capacity: int
-    tokens: float
-    last_update: datetime
-    refill_rate: float = 1.0  # tokens per second
+
+class RateLimitBucket:
+    """Token bucket for rate limiting (monotonic clock, refilled lazily)."""
+
+    __slots__ = ("capacity", "tokens", "last_update", "refill_rate")
+
+    def __init__(
+        self,
+        capacity: int,
+        tokens: Optional[float] = None,
+        last_update: Optional[float] = None,
+        refill_rate: float = 1.0,  # tokens per second
+    ):
+        self.capacity = capacity
+        self.tokens = float(capacity if tokens is None else tokens)
+        self.last_update = time.monotonic() if last_update is None else last_update
+        self.refill_rate = refill_rate
 
     def consume(self, tokens: int = 1) -> bool:
         """Try to consume tokens from bucket."""
@@ -39,9 +62,10 @@ class RateLimitBucket:
 
     def _refill(self) -> None:
         """Refill tokens based on time passed."""
-        now = datetime.utcnow()
-        elapsed = (now - self.last_update).total_seconds()
-        self.tokens = min(self.capacity, self.tokens + (elapsed * self.refill_rate))
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.last_update) * self.refill_rate
+        )
         self.last_update = now
 
     def get_wait_time(self, tokens: int = 1) -> float:
@@ -64,20 +88,114 @@ class RateLimitBucket:
         }
 
 
-class RateLimiter:
-    """Main rate limiting system with request and cost-based limits."""
+class UserLimitState:
+    """Everything the limiter knows about one user.
+
+    The request bucket is stored as (tokens, updated) and refilled only
+    when looked at. Cost uses a sliding-window counter: the spend of the
+    current fixed window plus the previous window's spend weighted by how
+    much of it still overlaps the sliding window.
+    """
+
+    __slots__ = ("tokens", "updated", "cost_window", "cost_current", "cost_previous")
+
+    def __init__(self, tokens: float, now: float, cost_window: int):
+        self.tokens = tokens
+        self.updated = now
+        self.cost_window = cost_window
+        self.cost_current = 0.0
+        self.cost_previous = 0.0
 
-    def __init__(self, config: Settings):
+
+class RateLimiter:
+    """Main rate limiting system with request and cost-based limits.
+
+    ``check_rate_limit`` never awaits between reading and updating a user's
+    state, so it is atomic with respect to other coroutines and needs no
+    locks. The only await is loading persisted state for a user who is not
+    in memory yet, which happens before the state is read.
+
+    With a ``state_store``, spend and bucket levels are written through to
+    the ``cost_tracking`` table in batches (one row per user per UTC day)
+    and read back lazily, so restarts do not reset budgets. Cost windows
+    are aligned to wall-clock multiples of the window length. Each write
+    also stores the spend of the user's current and previous window with
+    the window's start, so any window length is rebuilt exactly; a day
+    row cannot tell which part of the day's spend is still in a shorter
+    window.
+    """
+
+    def __init__(
+        self,
+        config: Settings,
+        state_store: Optional["CostTrackingRepository"] = None,
+    ):
         self.config = config
-        self.request_buckets: Dict[int, RateLimitBucket] = {}
-        self.cost_tracker: Dict[int, float] = defaultdict(float)
-        self.cost_reset_time: Dict[int, datetime] = {}
-        self.locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.users: Dict[int, UserLimitState] = {}
 
         # Calculate refill rate from config
         self.refill_rate = (
             self.config.rate_limit_requests / self.config.rate_limit_window
         )
+        self.capacity = self.config.rate_limit_burst
+        self.max_cost = self.config.claude_max_cost_per_user
+        self.cost_window_seconds = (
+            getattr(config, "claude_cost_window_hours", DEFAULT_COST_WINDOW_HOURS)
+            * 3600
+        )
+
+        # Bot-wide bucket checked after the user's own
+        global_requests = getattr(config, "rate_limit_global_requests", 0)
+        self.global_bucket: Optional[RateLimitBucket] = None
+        if global_requests > 0:
+            self.global_bucket = RateLimitBucket(
+                capacity=getattr(config, "rate_limit_global_burst", global_requests),
+                refill_rate=global_requests / self.config.rate_limit_window,
+            )
+
+        self.sweep_interval = getattr(
+            config, "rate_limit_sweep_interval_seconds", DEFAULT_SWEEP_INTERVAL_SECONDS
+        )
+        self._sweep_task: Optional[asyncio.Task] = None
+        # Monotonic and wall-clock time of the last window boundary
+        wall = time.time()
+        offset = wall % self.cost_window_seconds
+        self._epoch = time.monotonic() - offset
+        self._epoch_wall = wall - offset
+
+        self.state_store = state_store
+        self.flush_interval = (
+            getattr(
+                config,
+                "rate_limit_state_flush_interval_ms",
+                DEFAULT_STATE_FLUSH_INTERVAL_MS,
+            )
+            / 1000
+        )
+        self.prewarm_hours = getattr(
+            config, "rate_limit_prewarm_hours", DEFAULT_PREWARM_HOURS
+        )
+        self.prewarm_max_users = getattr(
+            config, "rate_limit_prewarm_max_users", DEFAULT_PREWARM_MAX_USERS
+        )
+        # (user_id, UTC date) -> cost charged since the last flush
+        self._pending: Dict[Tuple[int, str], float] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.stats: Dict[str, int] = {
+            "allowed": 0,
+            "rejected_user_rate": 0,
+            "rejected_global_rate": 0,
+            "rejected_cost": 0,
+            "swept_users": 0,
+            "sweeps": 0,
+            "state_loaded": 0,
+            "state_load_misses": 0,
+            "state_prewarmed": 0,
+            "state_written": 0,
+            "state_skipped_unknown_user": 0,
+            "state_write_errors": 0,
+        }
 
         logger.info(
             "Rate limiter initialized",
@@ -86,203 +204,189 @@ class RateLimiter:
             burst_capacity=self.config.rate_limit_burst,
             max_cost_per_user=self.config.claude_max_cost_per_user,
             refill_rate=self.refill_rate,
+            global_requests_per_window=global_requests,
         )
 
     async def check_rate_limit(
         self, user_id: int, cost: float = 1.0, tokens: int = 1
     ) -> Tuple[bool, Optional[str]]:
         """Check if request is allowed under rate limits."""
-        async with self.locks[user_id]:
-            # Check request rate limit
-            rate_allowed, rate_message = self._check_request_rate(user_id, tokens)
-            if not rate_allowed:
-                logger.warning(
-                    "Request rate limit exceeded",
-                    user_id=user_id,
-                    tokens_requested=tokens,
-                )
-                return False, rate_message
-
-            # Check cost limit
-            cost_allowed, cost_message = self._check_cost_limit(user_id, cost)
-            if not cost_allowed:
-                logger.warning(
-                    "Cost limit exceeded",
-                    user_id=user_id,
-                    cost_requested=cost,
-                    current_usage=self.cost_tracker[user_id],
-                )
-                return False, cost_message
-
-            # If both checks pass, consume resources
-            self._consume_request_tokens(user_id, tokens)
-            self._track_cost(user_id, cost)
-
-            logger.debug(
-                "Rate limit check passed", user_id=user_id, cost=cost, tokens=tokens
+        self._ensure_sweeper()
+        state = self.users.get(user_id)
+        if state is None:
+            state = await self._load_state(user_id)
+        now = time.monotonic()
+
+        # Check request rate limit
+        available = self._refill(state, now)
+        if available < tokens:
+            self.stats["rejected_user_rate"] += 1
+            logger.warning(
+                "Request rate limit exceeded",
+                user_id=user_id,
+                tokens_requested=tokens,
+            )
+            wait_time = (tokens - available) / self.refill_rate
+            return False, (
+                f"Rate limit exceeded. Please wait {wait_time:.1f} seconds "
+                f"before making more requests. "
+                f"Bucket: {available:.1f}/{self.capacity} tokens available."
             )
-            return True, None
-
-    def _check_request_rate(
-        self, user_id: int, tokens: int
-    ) -> Tuple[bool, Optional[str]]:
-        """Check request rate limit."""
-        bucket = self._get_or_create_bucket(user_id)
-
-        if bucket.consume(tokens):
-            return True, None
-
-        wait_time = bucket.get_wait_time(tokens)
-        status = bucket.get_status()
-
-        message = (
-            f"Rate limit exceeded. Please wait {wait_time:.1f} seconds "
-            f"before making more requests. "
-            f"Bucket: {status['tokens']:.1f}/{status['capacity']} tokens available."
-        )
-        return False, message
 
-    def _check_cost_limit(
-        self, user_id: int, cost: float
-    ) -> Tuple[bool, Optional[str]]:
-        """Check cost-based limit."""
-        # Reset cost tracker if enough time has passed
-        self._maybe_reset_cost_tracker(user_id)
-
-        current_cost = self.cost_tracker[user_id]
-        if current_cost + cost > self.config.claude_max_cost_per_user:
-            remaining = max(0, self.config.claude_max_cost_per_user - current_cost)
-            message = (
+        # Check cost limit
+        current_cost = self._window_cost(state, now)
+        if current_cost + cost > self.max_cost:
+            self.stats["rejected_cost"] += 1
+            logger.warning(
+                "Cost limit exceeded",
+                user_id=user_id,
+                cost_requested=cost,
+                current_usage=current_cost,
+            )
+            remaining = max(0, self.max_cost - current_cost)
+            return False, (
                 f"Cost limit exceeded. Remaining budget: ${remaining:.2f}. "
                 f"Current usage: ${current_cost:.2f}/"
-                f"${self.config.claude_max_cost_per_user:.2f}"
+                f"${self.max_cost:.2f}"
             )
-            return False, message
-
-        return True, None
 
-    def _consume_request_tokens(self, user_id: int, tokens: int) -> None:
-        """Consume tokens from request bucket."""
-        bucket = self._get_or_create_bucket(user_id)
-        bucket.consume(tokens)
+        # Check the bot-wide limit last so rejected users do not drain it
+        if self.global_bucket is not None and not self.global_bucket.consume(tokens):
+            self.stats["rejected_global_rate"] += 1
+            wait_time = self.global_bucket.get_wait_time(tokens)
+            logger.warning("Global rate limit exceeded", user_id=user_id)
+            return False, (
+                f"The bot is handling too many requests right now. "
+                f"Please try again in {wait_time:.1f} seconds."
+            )
 
-    def _track_cost(self, user_id: int, cost: float) -> None:
-        """Track cost usage for user."""
-        self.cost_tracker[user_id] += cost
+        # If all checks pass, consume resources
+        state.tokens = available - tokens
+        state.cost_current += cost
+        self.stats["allowed"] += 1
+        if self.state_store is not None:
+            key = (user_id, _utc_date(time.time()))
+            self._pending[key] = self._pending.get(key, 0.0) + cost
+            self._ensure_flusher()
 
         logger.debug(
-            "Cost tracked",
-            user_id=user_id,
-            cost=cost,
-            total_usage=self.cost_tracker[user_id],
+            "Rate limit check passed", user_id=user_id, cost=cost, tokens=tokens
         )
-
-    def _get_or_create_bucket(self, user_id: int) -> RateLimitBucket:
-        """Get or create rate limit bucket for user."""
-        if user_id not in self.request_buckets:
-            self.request_buckets[user_id] = RateLimitBucket(
-                capacity=self.config.rate_limit_burst,
-                tokens=self.config.rate_limit_burst,
-                last_update=datetime.utcnow(),
-                refill_rate=self.refill_rate,
-            )
-            logger.debug("Created rate limit bucket", user_id=user_id)
-
-        return self.request_buckets[user_id]
-
-    def _maybe_reset_cost_tracker(self, user_id: int) -> None:
-        """Reset cost tracker if reset period has passed."""
-        now = datetime.utcnow()
-        last_reset = self.cost_reset_time.get(user_id, now - timedelta(days=1))
-
-        # Reset daily (configurable)
-        reset_interval = timedelta(hours=24)
-        if now - last_reset >= reset_interval:
-            old_cost = self.cost_tracker[user_id]
-            self.cost_tracker[user_id] = 0
-            self.cost_reset_time[user_id] = now
-
-            if old_cost > 0:
-                logger.info(
-                    "Cost tracker reset",
-                    user_id=user_id,
-                    old_cost=old_cost,
-                    reset_time=now.isoformat(),
-                )
+        return True, None
 
     async def reset_user_limits(self, user_id: int) -> None:
         """Reset all limits for a user (admin function)."""
-        async with self.locks[user_id]:
-            # Reset cost tracking
-            old_cost = self.cost_tracker[user_id]
-            self.cost_tracker[user_id] = 0
-            self.cost_reset_time[user_id] = datetime.utcnow()
-
-            # Reset request bucket
-            if user_id in self.request_buckets:
-                self.request_buckets[user_id].tokens = self.request_buckets[
-                    user_id
-                ].capacity
-                self.request_buckets[user_id].last_update = datetime.utcnow()
-
-            logger.info("User limits reset", user_id=user_id, old_cost=old_cost)
+        now = time.monotonic()
+        state = self.users.get(user_id)
+        old_cost = self._window_cost(state, now) if state else 0.0
+        # Keep a fresh entry so the persisted state is not loaded back
+        self.users[user_id] = UserLimitState(
+            float(self.capacity), now, self._window_index(now)
+        )
+        if self.state_store is not None:
+            for key in [key for key in self._pending if key[0] == user_id]:
+                del self._pending[key]
+            await self.state_store.reset_limit_state(user_id)
+        logger.info("User limits reset", user_id=user_id, old_cost=old_cost)
 
     def get_user_status(self, user_id: int) -> Dict[str, Any]:
         """Get current rate limit status for user."""
-        # Get request bucket status
-        bucket = self._get_or_create_bucket(user_id)
-        bucket_status = bucket.get_status()
-
-        # Get cost status
-        self._maybe_reset_cost_tracker(user_id)
-        current_cost = self.cost_tracker[user_id]
-        cost_remaining = max(0, self.config.claude_max_cost_per_user - current_cost)
+        now = time.monotonic()
+        state = self.users.get(user_id)
+        if state is not None:
+            tokens = self._refill(state, now)
+            current_cost = self._window_cost(state, now)
+        else:
+            tokens = float(self.capacity)
+            current_cost = 0.0
+
+        window_index = self._window_index(now)
+        window_start = self._epoch + window_index * self.cost_window_seconds
+        last_reset = datetime.utcnow() - timedelta(seconds=now - window_start)
 
         return {
-            "request_bucket": bucket_status,
+            "request_bucket": {
+                "capacity": self.capacity,
+                "tokens": tokens,
+                "utilization": (self.capacity - tokens) / self.capacity,
+                "refill_rate": self.refill_rate,
+            },
             "cost_usage": {
                 "current": current_cost,
-                "limit": self.config.claude_max_cost_per_user,
-                "remaining": cost_remaining,
-                "utilization": current_cost / self.config.claude_max_cost_per_user,
+                "limit": self.max_cost,
+                "remaining": max(0, self.max_cost - current_cost),
+                "utilization": current_cost / self.max_cost,
+                "window_hours": self.cost_window_seconds / 3600,
             },
-            "last_reset": self.cost_reset_time.get(
-                user_id, datetime.utcnow()
-            ).isoformat(),
+            "last_reset": last_reset.isoformat(),
         }
 
     def get_global_status(self) -> Dict[str, Any]:
         """Get global rate limiter statistics."""
+        now = time.monotonic()
         return {
-            "active_users": len(self.request_buckets),
-            "total_cost_tracked": sum(self.cost_tracker.values()),
+            "active_users": len(self.users),
+            "total_cost_tracked": sum(
+                self._window_cost(state, now) for state in self.users.values()
+            ),
+            "global_bucket": (
+                self.global_bucket.get_status() if self.global_bucket else None
+            ),
+            "stats": dict(self.stats),
             "config": {
                 "requests_per_window": self.config.rate_limit_requests,
                 "window_seconds": self.config.rate_limit_window,
                 "burst_capacity": self.config.rate_limit_burst,
                 "max_cost_per_user": self.config.claude_max_cost_per_user,
+                "cost_window_hours": self.cost_window_seconds / 3600,
                 "refill_rate": self.refill_rate,
             },
         }
 
+    async def sweep(self) -> int:
+        """Drop users whose state is indistinguishable from a new user's.
+
+        A user can be forgotten once their bucket has refilled and no cost
+        is left in the sliding window, so sweeping never changes a decision.
+        """
+        now = time.monotonic()
+        removed = 0
+        user_ids = list(self.users)
+        for start in range(0, len(user_ids), SWEEP_CHUNK_SIZE):
+            for user_id in user_ids[start : start + SWEEP_CHUNK_SIZE]:
+                state = self.users.get(user_id)
+                if state is not None and self._is_idle(state, now):
+                    del self.users[user_id]
+                    removed += 1
+            # Let other coroutines run between chunks
+            await asyncio.sleep(0)
+
+        if removed > len(self.users):
+            # Dicts never shrink on deletion; rebuild to hand the memory back
+            self.users = dict(self.users)
+
+        self.stats["sweeps"] += 1
+        self.stats["swept_users"] += removed
+        if removed:
+            logger.debug(
+                "Swept idle rate limit state",
+                removed=removed,
+                remaining=len(self.users),
+            )
+        return removed
+
     async def cleanup_inactive_users(
         self, inactive_threshold: timedelta = timedelta(hours=24)
     ) -> int:
         """Clean up rate limit data for inactive users."""
-        now = datetime.utcnow()
-        inactive_users = []
-
-        # Find users with old buckets
-        for user_id, bucket in self.request_buckets.items():
-            if now - bucket.last_update > inactive_threshold:
-                inactive_users.append(user_id)
+        cutoff = time.monotonic() - inactive_threshold.total_seconds()
+        inactive_users = [
+            user_id for user_id, state in self.users.items() if state.updated < cutoff
+        ]
 
         # Clean up data
         for user_id in inactive_users:
-            self.request_buckets.pop(user_id, None)
-            self.cost_tracker.pop(user_id, None)
-            self.cost_reset_time.pop(user_id, None)
-            self.locks.pop(user_id, None)
+            del self.users[user_id]
 
         if inactive_users:
             logger.info(
@@ -292,3 +396,249 @@ class RateLimiter:
             )
 
         return len(inactive_users)
+
+    async def prewarm(self) -> int:
+        """Load persisted state of recently active users.
+
+        Only users active within ``prewarm_hours`` are loaded (at most
+        ``prewarm_max_users``), so startup stays fast; everyone else is
+        loaded on their first request.
+        """
+        if self.state_store is None or self.prewarm_max_users <= 0:
+            return 0
+
+        wall = time.time()
+        rows = await self.state_store.get_recent_limit_states(
+            self._state_since_date(wall),
+            wall - self.prewarm_hours * 3600,
+            self.prewarm_max_users,
+        )
+        by_user: Dict[int, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_user.setdefault(row["user_id"], []).append(row)
+
+        now = time.monotonic()
+        loaded = 0
+        for user_id, user_rows in by_user.items():
+            if user_id not in self.users:
+                self.users[user_id] = self._state_from_rows(user_rows, now, wall)
+                loaded += 1
+
+        self.stats["state_prewarmed"] += loaded
+        logger.info("Rate limit state prewarmed", users=loaded)
+        return loaded
+
+    async def flush(self) -> int:
+        """Write charged cost and bucket levels now; returns rows written."""
+        if self.state_store is None or not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        return await self._write_rows(
+            [(user_id, date, cost) for (user_id, date), cost in pending.items()]
+        )
+
+    async def snapshot(self) -> int:
+        """Write pending cost plus the bucket level of every user in memory."""
+        if self.state_store is None:
+            return 0
+        now = time.monotonic()
+        today = _utc_date(time.time())
+        pending, self._pending = self._pending, {}
+        entries = [(user_id, date, cost) for (user_id, date), cost in pending.items()]
+        pending_users = {user_id for user_id, _ in pending}
+        for user_id, state in list(self.users.items()):
+            if user_id in pending_users:
+                continue
+            # A full bucket is what a missing row means anyway
+            if state.tokens + (now - state.updated) * self.refill_rate < self.capacity:
+                entries.append((user_id, today, 0.0))
+        return await self._write_rows(entries)
+
+    async def shutdown(self) -> None:
+        """Stop background tasks and persist a final snapshot."""
+        for task in (self._sweep_task, self._flush_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    logger.debug("Rate limit background task stopped")
+
+        if self.state_store is not None:
+            try:
+                written = await self.snapshot()
+                logger.info("Rate limit state saved", rows=written)
+            except Exception as e:
+                logger.error("Failed to save rate limit state", error=str(e))
+
+    async def _load_state(self, user_id: int) -> UserLimitState:
+        """State for a user not in memory: persisted if any, else fresh."""
+        rows: List[Dict[str, Any]] = []
+        if self.state_store is not None:
+            wall = time.time()
+            try:
+                rows = await self.state_store.get_limit_state(
+                    user_id, self._state_since_date(wall)
+                )
+            except Exception as e:
+                logger.error(
+                    "Failed to load rate limit state", user_id=user_id, error=str(e)
+                )
+            self.stats["state_loaded" if rows else "state_load_misses"] += 1
+
+        # Another request from the same user may have got here first
+        state = self.users.get(user_id)
+        if state is None:
+            state = self._state_from_rows(rows, time.monotonic(), time.time())
+            self.users[user_id] = state
+        return state
+
+    def _state_from_rows(
+        self, rows: List[Dict[str, Any]], now: float, wall: float
+    ) -> UserLimitState:
+        """Rebuild a user's state from their cost_tracking rows."""
+        state = UserLimitState(float(self.capacity), now, self._window_index(now))
+        if not rows:
+            return state
+
+        latest = max(rows, key=lambda row: row["bucket_updated"] or 0)
+        if latest["bucket_tokens"] is not None and latest["bucket_updated"] is not None:
+            idle = max(0.0, wall - latest["bucket_updated"])
+            state.tokens = min(
+                float(self.capacity), latest["bucket_tokens"] + idle * self.refill_rate
+            )
+
+        if latest.get("window_start") is not None:
+            # The latest write holds the spend of its window and the one before
+            current_start = self._window_start(state.cost_window)
+            if latest["window_start"] == current_start:
+                state.cost_current = latest["window_cost"]
+                state.cost_previous = latest["window_previous_cost"]
+            elif latest["window_start"] == current_start - self.cost_window_seconds:
+                state.cost_previous = latest["window_cost"]
+        elif self.cost_window_seconds == 86400:
+            # Rows without window columns: windows are UTC days, so today's
+            # row is the current window and yesterday's the previous one
+            today = _utc_date(wall)
+            yesterday = _utc_date(wall - 86400)
+            for row in rows:
+                if row["date"] == today:
+                    state.cost_current += row["limiter_cost"]
+                elif row["date"] == yesterday:
+                    state.cost_previous += row["limiter_cost"]
+        return state
+
+    def _state_since_date(self, wall: float) -> str:
+        """Oldest UTC date whose rows can still affect the cost window."""
+        # A write from the previous window can be up to two windows old
+        return _utc_date(wall - 2 * self.cost_window_seconds)
+
+    def _window_start(self, index: int) -> int:
+        """Wall-clock start of window ``index``, in whole seconds."""
+        return int(round(self._epoch_wall + index * self.cost_window_seconds))
+
+    async def _write_rows(self, entries: List[Tuple[int, str, float]]) -> int:
+        """Persist ``(user_id, date, cost_delta)`` entries with bucket levels."""
+        now = time.monotonic()
+        wall = time.time()
+        window_start = self._window_start(self._window_index(now))
+        rows = []
+        for user_id, date, cost in entries:
+            state = self.users.get(user_id)
+            if state is None:
+                # Swept or reset: full bucket, nothing left in the window
+                tokens, updated = float(self.capacity), wall
+                current = previous = 0.0
+            else:
+                self._window_cost(state, now)  # roll over to the current window
+                tokens, updated = state.tokens, wall - (now - state.updated)
+                current, previous = state.cost_current, state.cost_previous
+            rows.append(
+                (user_id, date, cost, tokens, updated, window_start, current, previous)
+            )
+
+        written = 0
+        for start in range(0, len(rows), STATE_WRITE_BATCH_SIZE):
+            batch = rows[start : start + STATE_WRITE_BATCH_SIZE]
+            try:
+                count = await self.state_store.save_limit_state(batch)
+            except Exception as e:
+                self.stats["state_write_errors"] += 1
+                logger.error(
+                    "Failed to persist rate limit state", rows=len(batch), error=str(e)
+                )
+                # Keep the unwritten cost for the next attempt
+                for user_id, date, cost, *_ in rows[start:]:
+                    key = (user_id, date)
+                    self._pending[key] = self._pending.get(key, 0.0) + cost
+                break
+            written += count
+            self.stats["state_skipped_unknown_user"] += len(batch) - count
+        self.stats["state_written"] += written
+        return written
+
+    def _refill(self, state: UserLimitState, now: float) -> float:
+        """Bring the user's bucket up to date and return available tokens."""
+        state.tokens = min(
+            self.capacity, state.tokens + (now - state.updated) * self.refill_rate
+        )
+        state.updated = now
+        return state.tokens
+
+    def _window_index(self, now: float) -> int:
+        return int((now - self._epoch) // self.cost_window_seconds)
+
+    def _window_cost(self, state: UserLimitState, now: float) -> float:
+        """Estimated spend over the last ``cost_window_seconds``."""
+        index = self._window_index(now)
+        if index != state.cost_window:
+            state.cost_previous = (
+                state.cost_current if index == state.cost_window + 1 else 0.0
+            )
+            state.cost_current = 0.0
+            state.cost_window = index
+
+        elapsed = (now - self._epoch) / self.cost_window_seconds - index
+        return state.cost_previous * (1 - elapsed) + state.cost_current
+
+    def _is_idle(self, state: UserLimitState, now: float) -> bool:
+        if state.tokens + (now - state.updated) * self.refill_rate < self.capacity:
+            return False
+        # Any spend in the current or previous fixed window still counts
+        index = self._window_index(now)
+        if state.cost_window == index:
+            return state.cost_current == 0 and state.cost_previous == 0
+        if state.cost_window == index - 1:
+            return state.cost_current == 0
+        return True
+
+    def _ensure_sweeper(self) -> None:
+        if self.sweep_interval <= 0:
+            return
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    def _ensure_flusher(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Rate limit state flush failed", error=str(e))
+        # Idle: exit and let the next charge restart the loop
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error("Rate limit sweep failed", error=str(e))
+
+
+def _utc_date(wall: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(wall))
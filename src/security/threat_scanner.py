@@ -0,0 +1,231 @@
+"""Precompiled threat scanning for incoming text.
+
+Features:
+- Rule patterns compiled once at import instead of per message
+- Exact literal prefilter so clean text rarely reaches a regex
+- Same verdict and rule attribution as checking every pattern in order
+- Scan statistics
+"""
+
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+# Command injection patterns (checked first)
+COMMAND_INJECTION_PATTERNS = [
+    r";\s*rm\s+",
+    r";\s*del\s+",
+    r";\s*format\s+",
+    r"`[^`]*`",
+    r"\$\([^)]*\)",
+    r"&&\s*rm\s+",
+    r"\|\s*mail\s+",
+    r">\s*/dev/",
+    r"curl\s+.*\|\s*sh",
+    r"wget\s+.*\|\s*sh",
+    r"exec\s*\(",
+    r"eval\s*\(",
+]
+
+# Path traversal patterns (case-sensitive)
+PATH_TRAVERSAL_PATTERNS = [
+    r"\.\./.*",
+    r"~\/.*",
+    r"\/etc\/.*",
+    r"\/var\/.*",
+    r"\/usr\/.*",
+    r"\/sys\/.*",
+    r"\/proc\/.*",
+]
+
+# Suspicious URLs or domains
+SUSPICIOUS_URL_PATTERNS = [
+    r"https?://[^/]*\.ru/",
+    r"https?://[^/]*\.tk/",
+    r"https?://[^/]*\.ml/",
+    r"https?://bit\.ly/",
+    r"https?://tinyurl\.com/",
+    r"javascript:",
+    r"data:text/html",
+]
+
+# Commands that might indicate reconnaissance
+RECON_PATTERNS = [
+    r"ls\s+/",
+    r"find\s+/",
+    r"locate\s+",
+    r"which\s+",
+    r"whereis\s+",
+    r"ps\s+",
+    r"netstat\s+",
+    r"lsof\s+",
+    r"env\s*$",
+    r"printenv\s*$",
+    r"whoami\s*$",
+    r"id\s*$",
+    r"uname\s+",
+    r"cat\s+/etc/",
+    r"cat\s+/proc/",
+]
+
+
+# Characters outside ASCII that ``re.IGNORECASE`` treats as ASCII letters
+_ASCII_FOLD = {0x130: "i", 0x131: "i", 0x17F: "s", 0x212A: "k"}
+
+_METACHARS = set(".^$*+?{}[]|()")
+_QUANTIFIERS = set("*+?{")
+
+
+def required_literal(pattern: str) -> str:
+    """Leading literal text that any match of ``pattern`` must contain.
+
+    Returns an empty string when the pattern does not start with a plain
+    literal (or has a top-level alternation), in which case the rule is
+    always checked with its regex.
+    """
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return ""
+        i += 1
+
+    literal = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            token, i = pattern[i + 1], i + 2
+        elif char == "\\" or char in _METACHARS:
+            break
+        else:
+            token, i = char, i + 1
+        if i < len(pattern) and pattern[i] in _QUANTIFIERS:
+            # The quantified character is optional or repeated: stop before it
+            break
+        literal.append(token)
+    return "".join(literal)
+
+
+class ThreatRule:
+    """A single detection pattern and what it means when it fires."""
+
+    __slots__ = ("pattern", "category", "severity", "flags", "regex", "literal")
+
+    def __init__(self, pattern: str, category: str, severity: str, flags: int = 0):
+        self.pattern = pattern
+        self.category = category
+        self.severity = severity
+        self.flags = flags
+        self.regex: Pattern[str] = re.compile(pattern, flags)
+        literal = required_literal(pattern)
+        self.literal = literal.lower() if flags & re.IGNORECASE else literal
+
+    @property
+    def ignore_case(self) -> bool:
+        return bool(self.flags & re.IGNORECASE)
+
+    def __repr__(self) -> str:
+        return f"ThreatRule({self.category!r}, {self.pattern!r})"
+
+
+class ThreatScanner:
+    """Match text against an ordered rule list with a literal prefilter.
+
+    Every rule pattern starts with a literal (``;``, ``$(``, ``/etc/``,
+    ``http``...) that any match must contain. Checking those with ``in``
+    is a C-level substring search, so for clean text most rules are
+    rejected without running their regex at all. The prefilter is exact:
+    a rule is skipped only when its regex cannot match, so verdicts and
+    attribution are identical to searching every pattern in order.
+    """
+
+    def __init__(self, rules: Iterable[ThreatRule]):
+        """Initialize scanner with ``rules`` in priority order."""
+        self.rules: List[ThreatRule] = list(rules)
+        # Flattened per-rule data so the hot loop avoids attribute lookups
+        self._plan: List[Tuple[ThreatRule, str, bool, Callable]] = [
+            (rule, rule.literal, rule.ignore_case, rule.regex.search)
+            for rule in self.rules
+        ]
+        self._needs_folded = any(r.ignore_case and r.literal for r in self.rules)
+
+        self.stats: Dict[str, int] = {"scans": 0, "regex_checks": 0, "hits": 0}
+
+    def scan(self, text: str) -> Optional[ThreatRule]:
+        """Return the highest-priority rule that matches ``text``, if any."""
+        self.stats["scans"] += 1
+        folded = self._fold(text)
+        checks = 0
+        found = None
+        for rule, literal, ignore_case, search in self._plan:
+            if literal and literal not in (folded if ignore_case else text):
+                continue
+            checks += 1
+            if search(text) is not None:
+                found = rule
+                break
+        self._record(checks, found is not None)
+        return found
+
+    def scan_all(self, text: str) -> List[ThreatRule]:
+        """Return every rule that matches ``text``, in priority order."""
+        self.stats["scans"] += 1
+        folded = self._fold(text)
+        checks = 0
+        matched = []
+        for rule, literal, ignore_case, search in self._plan:
+            if literal and literal not in (folded if ignore_case else text):
+                continue
+            checks += 1
+            if search(text) is not None:
+                matched.append(rule)
+        self._record(checks, bool(matched))
+        return matched
+
+    def _fold(self, text: str) -> str:
+        if not self._needs_folded:
+            return text
+        if text.isascii():
+            return text.lower()
+        return text.translate(_ASCII_FOLD).lower()
+
+    def _record(self, checks: int, hit: bool) -> None:
+        if checks:
+            self.stats["regex_checks"] += checks
+        if hit:
+            self.stats["hits"] += 1
+
+
+def _rules(
+    patterns: List[str], category: str, severity: str, flags: int = 0
+) -> List[ThreatRule]:
+    return [ThreatRule(p, category, severity, flags) for p in patterns]
+
+
+def build_message_scanner() -> ThreatScanner:
+    """Scanner for message text: injection, then traversal, then URLs."""
+    return ThreatScanner(
+        _rules(COMMAND_INJECTION_PATTERNS, "command_injection", "high", re.IGNORECASE)
+        + _rules(PATH_TRAVERSAL_PATTERNS, "path_traversal", "high")
+        + _rules(SUSPICIOUS_URL_PATTERNS, "suspicious_url", "medium", re.IGNORECASE)
+    )
+
+
+def build_recon_scanner() -> ThreatScanner:
+    """Scanner for reconnaissance-style commands."""
+    return ThreatScanner(
+        _rules(RECON_PATTERNS, "reconnaissance", "high", re.IGNORECASE)
+    )
+
+
+# Shared, precompiled instances used by the security middleware
+MESSAGE_SCANNER = build_message_scanner()
+RECON_SCANNER = build_recon_scanner()
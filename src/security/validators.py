@@ -5,9 +5,14 @@ Features:
 - Command injection prevention
 - File type validation
 - Input sanitization
+- Bounded cache of resolved paths
 """
 
+import os
 import re
+import stat
+import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -17,6 +22,42 @@ import structlog
 
 logger = structlog.get_logger()
 
+DEFAULT_PATH_CACHE_SIZE = 1024
+DEFAULT_PATH_CACHE_TTL_SECONDS = 60.0
+
+
+def _inode(path: str) -> Optional[Tuple[int, int]]:
+    """(device, inode) of ``path`` itself, or None if missing or a symlink."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    if stat.S_ISLNK(st.st_mode):
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+def _inode_chain(root: str, path: str) -> Optional[Tuple[Tuple[int, int], ...]]:
+    """Identity of every component from ``root`` down to ``path``.
+
+    None if ``path`` is not under ``root`` or any component is missing or
+    a symlink.
+    """
+    if path != root and not path.startswith(root.rstrip(os.sep) + os.sep):
+        return None
+    components = [root]
+    for name in path[len(root) :].split(os.sep):
+        if name:
+            components.append(os.path.join(components[-1], name))
+
+    chain = []
+    for component in components:
+        identity = _inode(component)
+        if identity is None:
+            return None
+        chain.append(identity)
+    return tuple(chain)
+
 
 class SecurityValidator:
     """Security validation for user inputs."""
@@ -46,6 +87,17 @@ class SecurityValidator:
     # Keep original for backward compatibility - now combines both
     DANGEROUS_PATTERNS = DANGEROUS_PATH_PATTERNS + DANGEROUS_COMMAND_PATTERNS
 
+    # Precompiled (pattern, regex) pairs, checked in order
+    _PATH_PATTERN_REGEXES = [
+        (pattern, re.compile(pattern, re.IGNORECASE))
+        for pattern in DANGEROUS_PATH_PATTERNS
+    ]
+
+    # Precompiled sanitizers (run on every incoming message)
+    _SANITIZE_STRICT = re.compile(r"[`$;|&<>#\x00-\x1f\x7f]")
+    _SANITIZE_LENIENT = re.compile(r"[`$;|&<>\x00-\x1f\x7f]")
+    _WHITESPACE_RUNS = re.compile(r"\s{3,}")
+
     # Allowed file extensions for uploads
     ALLOWED_EXTENSIONS = {
         ".py",
@@ -146,15 +198,35 @@ class SecurityValidator:
         r".*\.rar$",  # Archives (potentially dangerous)
     ]
 
-    def __init__(self, approved_directory: Path, flexible_mode: bool = False):
+    def __init__(
+        self,
+        approved_directory: Path,
+        flexible_mode: bool = False,
+        path_cache_size: int = DEFAULT_PATH_CACHE_SIZE,
+        path_cache_ttl: float = DEFAULT_PATH_CACHE_TTL_SECONDS,
+    ):
         """Initialize validator with approved directory.
         
         Args:
             approved_directory: Base directory for file operations
             flexible_mode: If True, allows operations in subdirectories of approved_directory
                           If False, strict mode - only exact approved_directory
+            path_cache_size: Resolved paths remembered (0 disables the cache)
+            path_cache_ttl: Seconds a resolved path is trusted without re-resolving
         """
-        self.approved_directory = approved_directory.resolve()
+        self.path_cache_size = max(0, path_cache_size)
+        self.path_cache_ttl = path_cache_ttl
+        # str(unresolved target) -> (resolved target, expires_at, inode chain)
+        self._path_cache: "OrderedDict[str, Tuple[Path, float, Tuple[Any, ...]]]" = (
+            OrderedDict()
+        )
+        self.path_cache_stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "uncacheable": 0,
+        }
+
+        self.approved_directory = approved_directory
         self.flexible_mode = flexible_mode
         logger.info(
             "Security validator initialized",
@@ -162,6 +234,82 @@ class SecurityValidator:
             flexible_mode=flexible_mode,
         )
 
+    @property
+    def approved_directory(self) -> Path:
+        return self._approved_directory
+
+    @approved_directory.setter
+    def approved_directory(self, value: Path) -> None:
+        self._approved_directory = Path(value).resolve()
+        self.clear_path_cache()
+
+    def clear_path_cache(self) -> None:
+        """Forget all cached path resolutions."""
+        self._path_cache.clear()
+
+    def get_path_cache_stats(self) -> Dict[str, Any]:
+        """Get path cache statistics."""
+        return {
+            **self.path_cache_stats,
+            "size": len(self._path_cache),
+            "max_size": self.path_cache_size,
+        }
+
+    def _resolve(self, target: Path) -> Path:
+        """``target.resolve()``, memoized for plain existing paths.
+
+        Only existing paths inside ``approved_directory`` that involve no
+        symlink are cached: a missing path may later be created as a
+        symlink, and a symlink may be re-pointed, so both are resolved
+        afresh every time. Entries also expire after ``path_cache_ttl``.
+
+        A hit is only served after ``lstat`` of every component from
+        ``approved_directory`` down to the target shows the same,
+        non-symlink inodes as when it was cached, so a directory moved
+        away and replaced by a symlink to it is caught at any depth.
+        """
+        if self.path_cache_size <= 0:
+            return target.resolve()
+
+        key = str(target)
+        entry = self._path_cache.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic() and (
+                _inode_chain(str(self._approved_directory), key) == entry[2]
+            ):
+                self._path_cache.move_to_end(key)
+                self.path_cache_stats["hits"] += 1
+                return entry[0]
+            del self._path_cache[key]
+
+        self.path_cache_stats["misses"] += 1
+        try:
+            resolved = target.resolve(strict=True)
+        except OSError:
+            # Missing path (or a symlink loop): same result as before, uncached
+            self.path_cache_stats["uncacheable"] += 1
+            return target.resolve()
+
+        if str(resolved) != os.path.normpath(key):
+            # A symlink was followed somewhere along the path
+            self.path_cache_stats["uncacheable"] += 1
+            return resolved
+
+        chain = _inode_chain(str(self._approved_directory), key)
+        if chain is None:
+            # Outside the approved directory, or changed while resolving
+            self.path_cache_stats["uncacheable"] += 1
+            return resolved
+
+        self._path_cache[key] = (
+            resolved,
+            time.monotonic() + self.path_cache_ttl,
+            chain,
+        )
+        while len(self._path_cache) > self.path_cache_size:
+            self._path_cache.popitem(last=False)
+        return resolved
+
     def validate_path(
         self, user_path: str, current_dir: Optional[Path] = None
     ) -> Tuple[bool, Optional[Path], Optional[str]]:
@@ -178,8 +326,8 @@ class SecurityValidator:
             user_path = user_path.strip()
 
             # Check for dangerous path patterns (more restrictive for paths)
-            for pattern in self.DANGEROUS_PATH_PATTERNS:
-                if re.search(pattern, user_path, re.IGNORECASE):
+            for pattern, regex in self._PATH_PATTERN_REGEXES:
+                if regex.search(user_path):
                     logger.warning(
                         "Dangerous pattern detected in path",
                         path=user_path,
@@ -202,7 +350,7 @@ class SecurityValidator:
                 target = current_dir / user_path
 
             # Resolve path and check boundaries
-            target = target.resolve()
+            target = self._resolve(target)
 
             # Ensure target is within approved directory
             if not self._is_within_directory(target, self.approved_directory):
@@ -269,8 +417,8 @@ class SecurityValidator:
             return False, "Invalid filename: contains path separators"
 
         # Check for forbidden patterns in filenames (use path patterns, not command patterns)
-        for pattern in self.DANGEROUS_PATH_PATTERNS:
-            if re.search(pattern, filename, re.IGNORECASE):
+        for pattern, regex in self._PATH_PATTERN_REGEXES:
+            if regex.search(filename):
                 logger.warning(
                     "Dangerous pattern in filename", filename=filename, pattern=pattern
                 )
@@ -322,7 +470,7 @@ class SecurityValidator:
 
         # Remove dangerous characters but preserve basic ones
         # Note: This is very restrictive - adjust based on actual needs
-        sanitized = re.sub(r"[`$;|&<>#\x00-\x1f\x7f]", "", text)
+        sanitized = self._SANITIZE_STRICT.sub("", text)
 
         # Limit length to prevent buffer overflow attacks
         max_length = 1000
@@ -356,7 +504,7 @@ class SecurityValidator:
 
         # Remove dangerous characters but allow Markdown formatting
         # Allow # for headers, * for emphasis, etc.
-        sanitized = re.sub(r"[`$;|&<>\x00-\x1f\x7f]", "", text)
+        sanitized = self._SANITIZE_LENIENT.sub("", text)
 
         # Limit length to prevent buffer overflow attacks
         max_length = 5000  # Higher limit for image context with detailed prompts
@@ -370,7 +518,7 @@ class SecurityValidator:
 
         # Keep original whitespace structure for formatted text
         # Only collapse excessive runs of whitespace
-        sanitized = re.sub(r'\s{3,}', '  ', sanitized)
+        sanitized = self._WHITESPACE_RUNS.sub("  ", sanitized)
 
         if sanitized != text:
             logger.debug(
@@ -425,8 +573,8 @@ class SecurityValidator:
         dirname = dirname.strip()
 
         # Check for dangerous patterns in directory names (use path patterns)
-        for pattern in self.DANGEROUS_PATH_PATTERNS:
-            if re.search(pattern, dirname, re.IGNORECASE):
+        for _, regex in self._PATH_PATTERN_REGEXES:
+            if regex.search(dirname):
                 return False
 
         # Check for path separators
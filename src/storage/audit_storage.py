@@ -0,0 +1,352 @@
+"""Persistent audit event storage.
+
+Features:
+- Bounded in-memory ring buffer of recent events
+- Per-user and per-event-type indexes for hot queries
+- Sliding-window counters for the security dashboard
+- Batched, asynchronous writes to the audit_log table
+- Flush on shutdown
+"""
+
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import structlog
+
+from ..security.audit import AuditEvent, AuditStorage
+from .database import DatabaseManager
+
+logger = structlog.get_logger()
+
+DEFAULT_MAX_EVENTS = 10000
+DEFAULT_FLUSH_INTERVAL_MS = 1000
+DEFAULT_FLUSH_BATCH_SIZE = 200
+DEFAULT_STATS_WINDOW = timedelta(hours=24)
+# Pending rows beyond this are dropped (oldest first) if the database stalls
+DEFAULT_MAX_PENDING = 50000
+
+# (sequence number, event)
+Entry = Tuple[int, AuditEvent]
+
+
+class SQLiteAuditStorage(AuditStorage):
+    """Audit storage backed by a ring buffer and the ``audit_log`` table.
+
+    Queries are answered from memory: every event sits in the main ring
+    and in one deque per user and per event type, so a per-user query only
+    touches that user's events. When the ring overflows, the oldest event
+    is popped from all three in O(1). Events are also queued and written
+    to SQLite in batches by a background task, so ``store_event`` never
+    waits on the database.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        max_events: int = DEFAULT_MAX_EVENTS,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+        batch_size: int = DEFAULT_FLUSH_BATCH_SIZE,
+        stats_window: timedelta = DEFAULT_STATS_WINDOW,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        """Initialize storage."""
+        self.db = db_manager
+        self.max_events = max(1, max_events)
+        self.flush_interval = max(0, flush_interval_ms) / 1000
+        self.batch_size = max(1, batch_size)
+        self.stats_window = stats_window
+
+        self._seq = 0
+        self._events: Deque[Entry] = deque()
+        self._by_user: Dict[int, Deque[Entry]] = {}
+        self._by_type: Dict[str, Deque[Entry]] = {}
+        # Sequence number of the newest event that arrived with an older
+        # timestamp than its predecessor. Until it leaves the ring, queries
+        # sort instead of trusting arrival order.
+        self._disorder_seq = 0
+
+        # Events inside the stats window and the counters derived from them
+        self._window: Deque[Entry] = deque()
+        self._window_counts: Counter = Counter()
+        self._window_users: Counter = Counter()
+
+        self._pending: Deque[AuditEvent] = deque(
+            maxlen=max(self.batch_size, max_pending)
+        )
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.stats: Dict[str, Any] = {
+            "stored": 0,
+            "evicted": 0,
+            "written": 0,
+            "skipped_unknown_user": 0,
+            "dropped": 0,
+            "batches": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    async def store_event(self, event: AuditEvent) -> None:
+        """Index event in memory and queue it for the database."""
+        self._seq += 1
+        entry = (self._seq, event)
+
+        if self._events and event.timestamp < self._events[-1][1].timestamp:
+            self._disorder_seq = self._seq
+
+        self._events.append(entry)
+        self._by_user.setdefault(event.user_id, deque()).append(entry)
+        self._by_type.setdefault(event.event_type, deque()).append(entry)
+        self._window.append(entry)
+        self._count(event, 1)
+        self.stats["stored"] += 1
+
+        while len(self._events) > self.max_events:
+            self._evict()
+
+        # Log high-risk events immediately
+        if event.risk_level in ["high", "critical"]:
+            logger.warning(
+                "High-risk security event",
+                event_type=event.event_type,
+                user_id=event.user_id,
+                risk_level=event.risk_level,
+                details=event.details,
+            )
+
+        if self._closed:
+            return
+        if len(self._pending) == self._pending.maxlen:
+            self.stats["dropped"] += 1
+        self._pending.append(event)
+        if self.flush_interval == 0:
+            await self.flush()
+            return
+        self._ensure_task()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def get_events(
+        self,
+        user_id: Optional[int] = None,
+        event_type: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[AuditEvent]:
+        """Get filtered events, newest first."""
+        # Start from the smallest index that satisfies a filter
+        if user_id is not None:
+            source = self._by_user.get(user_id, ())
+            if event_type is not None:
+                by_type = self._by_type.get(event_type, ())
+                if len(by_type) < len(source):
+                    source = by_type
+        elif event_type is not None:
+            source = self._by_type.get(event_type, ())
+        else:
+            source = self._events
+
+        def matches(event: AuditEvent) -> bool:
+            return (
+                (user_id is None or event.user_id == user_id)
+                and (event_type is None or event.event_type == event_type)
+                and (end_time is None or event.timestamp <= end_time)
+                and (start_time is None or event.timestamp >= start_time)
+            )
+
+        if not self._is_ordered():
+            events = [e for _, e in source if matches(e)]
+            events.sort(key=lambda e: e.timestamp, reverse=True)
+            return events[:limit]
+
+        result: List[AuditEvent] = []
+        for _, event in reversed(source):
+            if len(result) >= limit:
+                break
+            if start_time is not None and event.timestamp < start_time:
+                # Arrival order is timestamp order: nothing older can match
+                break
+            if matches(event):
+                result.append(event)
+        return result
+
+    async def get_security_violations(
+        self, user_id: Optional[int] = None, limit: int = 100
+    ) -> List[AuditEvent]:
+        """Get security violations."""
+        return await self.get_events(
+            user_id=user_id, event_type="security_violation", limit=limit
+        )
+
+    async def get_window_stats(self) -> Dict[str, Any]:
+        """Counters over the events of the last ``stats_window``."""
+        self._expire_window(datetime.utcnow() - self.stats_window)
+        counts = self._window_counts
+        return {
+            "window_seconds": int(self.stats_window.total_seconds()),
+            "total_events": len(self._window),
+            "active_users": len(self._window_users),
+            "risk_distribution": {
+                risk: n for (kind, risk), n in counts.items() if kind == "risk" and n
+            },
+            "event_types": {
+                etype: n for (kind, etype), n in counts.items() if kind == "type" and n
+            },
+            "authentication_failures": counts[("auth_failure", None)],
+            "security_violations": counts[("type", "security_violation")],
+            "violation_types": {
+                vtype: n
+                for (kind, vtype), n in counts.items()
+                if kind == "violation" and n
+            },
+        }
+
+    async def flush(self) -> None:
+        """Write everything pending now."""
+        async with self._flush_lock:
+            while self._pending:
+                batch = [
+                    self._pending.popleft()
+                    for _ in range(min(self.batch_size, len(self._pending)))
+                ]
+                await self._write_batch(batch)
+
+    async def close(self) -> None:
+        """Stop the background task and write whatever is left."""
+        self._closed = True
+        if self._task and not self._task.done():
+            self._wakeup.set()
+            await self._task
+        await self.flush()
+        logger.info("Audit storage closed", **self.get_stats())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get storage statistics."""
+        return {
+            **self.stats,
+            "buffered": len(self._events),
+            "indexed_users": len(self._by_user),
+            "pending": len(self._pending),
+        }
+
+    def _count(self, event: AuditEvent, delta: int) -> None:
+        counts = self._window_counts
+        counts[("risk", event.risk_level)] += delta
+        counts[("type", event.event_type)] += delta
+        if event.event_type == "auth_attempt" and not event.success:
+            counts[("auth_failure", None)] += delta
+        elif event.event_type == "security_violation":
+            vtype = event.details.get("violation_type", "unknown")
+            counts[("violation", vtype)] += delta
+
+        self._window_users[event.user_id] += delta
+        if self._window_users[event.user_id] <= 0:
+            del self._window_users[event.user_id]
+
+    def _evict(self) -> None:
+        """Drop the oldest event from the ring, its indexes and the window."""
+        entry = self._events.popleft()
+        event = entry[1]
+        user_events = self._by_user[event.user_id]
+        user_events.popleft()
+        if not user_events:
+            del self._by_user[event.user_id]
+        type_events = self._by_type[event.event_type]
+        type_events.popleft()
+        if not type_events:
+            del self._by_type[event.event_type]
+        if self._window and self._window[0][0] == entry[0]:
+            self._window.popleft()
+            self._count(event, -1)
+        self.stats["evicted"] += 1
+
+    def _is_ordered(self) -> bool:
+        """Whether ring order is currently also timestamp order."""
+        return not self._events or self._events[0][0] >= self._disorder_seq
+
+    def _expire_window(self, cutoff: datetime) -> None:
+        if not self._is_ordered():
+            # Rebuild from scratch rather than trust arrival order
+            self._window = deque(e for e in self._events if e[1].timestamp >= cutoff)
+            self._window_counts.clear()
+            self._window_users.clear()
+            for _, event in self._window:
+                self._count(event, 1)
+            return
+        while self._window and self._window[0][1].timestamp < cutoff:
+            self._count(self._window.popleft()[1], -1)
+
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                if not self._pending:
+                    # Idle: exit and let the next event restart the loop
+                    return
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Audit flush failed", error=str(e))
+
+    async def _write_batch(self, batch: List[AuditEvent]) -> None:
+        started = time.perf_counter()
+        rows = [
+            (
+                event.user_id,
+                event.event_type,
+                json.dumps(
+                    {
+                        "details": event.details,
+                        "risk_level": event.risk_level,
+                        "session_id": event.session_id,
+                    },
+                    default=str,
+                ),
+                event.success,
+                event.timestamp,
+                event.ip_address,
+                event.user_id,
+            )
+            for event in batch
+        ]
+        async with self.db.get_connection() as conn:
+            try:
+                # audit_log.user_id references users; events from users the
+                # bot has never registered (e.g. rejected strangers) stay in
+                # memory only instead of failing the whole batch
+                cursor = await conn.executemany(
+                    """
+                    INSERT INTO audit_log
+                    (user_id, event_type, event_data, success, timestamp, ip_address)
+                    SELECT ?, ?, ?, ?, ?, ?
+                    WHERE EXISTS (SELECT 1 FROM users WHERE user_id = ?)
+                """,
+                    rows,
+                )
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                self.stats["dropped"] += len(batch)
+                logger.error(
+                    "Failed to persist audit events", count=len(batch), error=str(e)
+                )
+                return
+
+        written = max(0, cursor.rowcount)
+        self.stats["written"] += written
+        self.stats["skipped_unknown_user"] += len(batch) - written
+        self.stats["batches"] += 1
+        self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
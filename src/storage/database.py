@@ -1,22 +1,38 @@
 """Database connection and initialization.
 
 Features:
-- Connection pooling
+- Connection pooling (one writer, N read-only readers)
+- WAL journal and tuned pragmas
+- Bounded pool waits with statistics
 - Automatic migrations
 - Health checks
 - Schema versioning
 """
 
 import asyncio
+import time
+from collections import deque
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import AsyncIterator, List, Tuple
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
 
 import aiosqlite
 import structlog
 
+from ..exceptions import DatabaseConnectionError
+
 logger = structlog.get_logger()
 
+DEFAULT_READ_POOL_SIZE = 4
+DEFAULT_MAX_OVERFLOW = 2
+DEFAULT_POOL_TIMEOUT = 10.0
+
+# Per-connection tuning
+CACHE_SIZE_KIB = 16 * 1024
+MMAP_SIZE_BYTES = 128 * 1024 * 1024
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+
 # Initial schema migration
 INITIAL_SCHEMA = """
 -- Core Tables
@@ -122,15 +138,310 @@ CREATE INDEX idx_cost_tracking_user_date ON cost_tracking(user_id, date);
 """
 
 
-class DatabaseManager:
-    """Manage database connections and initialization."""
+# Migration 5: incrementally maintained analytics rollups.
+# Dashboards read these instead of aggregating the whole messages table.
+ROLLUP_SCHEMA = """
+-- Per-user totals
+CREATE TABLE IF NOT EXISTS user_rollup (
+    user_id INTEGER PRIMARY KEY,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    total_cost REAL NOT NULL DEFAULT 0.0,
+    duration_sum INTEGER NOT NULL DEFAULT 0,
+    duration_count INTEGER NOT NULL DEFAULT 0,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    last_activity TIMESTAMP
+);
+
+-- Per-user, per-day totals
+CREATE TABLE IF NOT EXISTS user_daily_rollup (
+    user_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    total_cost REAL NOT NULL DEFAULT 0.0,
+    session_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date)
+);
+
+-- System-wide per-day totals
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    date DATE PRIMARY KEY,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    total_cost REAL NOT NULL DEFAULT 0.0,
+    duration_sum INTEGER NOT NULL DEFAULT 0,
+    duration_count INTEGER NOT NULL DEFAULT 0,
+    active_users INTEGER NOT NULL DEFAULT 0
+);
+
+-- Tool totals
+CREATE TABLE IF NOT EXISTS tool_rollup (
+    tool_name TEXT PRIMARY KEY,
+    usage_count INTEGER NOT NULL DEFAULT 0,
+    session_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS user_tool_rollup (
+    user_id INTEGER NOT NULL,
+    tool_name TEXT NOT NULL,
+    usage_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, tool_name)
+);
+
+-- Seen-sets backing the distinct counts above
+CREATE TABLE IF NOT EXISTS rollup_sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL
+) WITHOUT ROWID;
 
-    def __init__(self, database_url: str):
+CREATE TABLE IF NOT EXISTS rollup_session_days (
+    session_id TEXT NOT NULL,
+    date DATE NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (session_id, date)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_tool_sessions (
+    tool_name TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (tool_name, session_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_user_rollup_cost ON user_rollup(total_cost);
+CREATE INDEX IF NOT EXISTS idx_user_daily_rollup_date ON user_daily_rollup(date);
+CREATE INDEX IF NOT EXISTS idx_tool_rollup_usage ON tool_rollup(usage_count);
+
+-- Backfill from existing data
+INSERT OR REPLACE INTO rollup_sessions (session_id, user_id)
+SELECT session_id, MIN(user_id) FROM messages GROUP BY session_id;
+
+INSERT OR REPLACE INTO rollup_session_days (session_id, date, user_id)
+SELECT session_id, date(timestamp), MIN(user_id)
+FROM messages GROUP BY session_id, date(timestamp);
+
+INSERT OR REPLACE INTO rollup_tool_sessions (tool_name, session_id)
+SELECT DISTINCT tool_name, session_id FROM tool_usage;
+
+INSERT OR REPLACE INTO user_rollup
+    (user_id, message_count, total_cost, duration_sum, duration_count,
+     session_count, last_activity)
+SELECT
+    m.user_id,
+    COUNT(*),
+    COALESCE(SUM(m.cost), 0),
+    COALESCE(SUM(m.duration_ms), 0),
+    COUNT(m.duration_ms),
+    (SELECT COUNT(*) FROM rollup_sessions rs WHERE rs.user_id = m.user_id),
+    MAX(m.timestamp)
+FROM messages m
+GROUP BY m.user_id;
+
+INSERT OR REPLACE INTO user_daily_rollup
+    (user_id, date, message_count, total_cost, session_count)
+SELECT
+    user_id,
+    date(timestamp),
+    COUNT(*),
+    COALESCE(SUM(cost), 0),
+    COUNT(DISTINCT session_id)
+FROM messages
+GROUP BY user_id, date(timestamp);
+
+INSERT OR REPLACE INTO daily_rollup
+    (date, message_count, total_cost, duration_sum, duration_count, active_users)
+SELECT
+    date(timestamp),
+    COUNT(*),
+    COALESCE(SUM(cost), 0),
+    COALESCE(SUM(duration_ms), 0),
+    COUNT(duration_ms),
+    COUNT(DISTINCT user_id)
+FROM messages
+GROUP BY date(timestamp);
+
+INSERT OR REPLACE INTO tool_rollup (tool_name, usage_count, session_count)
+SELECT tool_name, COUNT(*), COUNT(DISTINCT session_id)
+FROM tool_usage
+GROUP BY tool_name;
+
+INSERT OR REPLACE INTO user_tool_rollup (user_id, tool_name, usage_count)
+SELECT s.user_id, tu.tool_name, COUNT(*)
+FROM tool_usage tu
+JOIN sessions s ON tu.session_id = s.session_id
+GROUP BY s.user_id, tu.tool_name;
+
+-- Keep rollups current on every write path
+CREATE TRIGGER IF NOT EXISTS trg_messages_rollup
+AFTER INSERT ON messages
+BEGIN
+    INSERT INTO user_rollup
+        (user_id, message_count, total_cost,
+         duration_sum, duration_count, last_activity)
+    VALUES (
+        NEW.user_id, 1, COALESCE(NEW.cost, 0), COALESCE(NEW.duration_ms, 0),
+        NEW.duration_ms IS NOT NULL, NEW.timestamp
+    )
+    ON CONFLICT(user_id) DO UPDATE SET
+        message_count = message_count + 1,
+        total_cost = total_cost + excluded.total_cost,
+        duration_sum = duration_sum + excluded.duration_sum,
+        duration_count = duration_count + excluded.duration_count,
+        last_activity = MAX(COALESCE(last_activity, ''), excluded.last_activity);
+
+    INSERT INTO daily_rollup
+        (date, message_count, total_cost, duration_sum, duration_count)
+    VALUES (
+        date(NEW.timestamp), 1, COALESCE(NEW.cost, 0),
+        COALESCE(NEW.duration_ms, 0), NEW.duration_ms IS NOT NULL
+    )
+    ON CONFLICT(date) DO UPDATE SET
+        message_count = message_count + 1,
+        total_cost = total_cost + excluded.total_cost,
+        duration_sum = duration_sum + excluded.duration_sum,
+        duration_count = duration_count + excluded.duration_count;
+
+    INSERT INTO user_daily_rollup (user_id, date, message_count, total_cost)
+    VALUES (NEW.user_id, date(NEW.timestamp), 1, COALESCE(NEW.cost, 0))
+    ON CONFLICT(user_id, date) DO UPDATE SET
+        message_count = message_count + 1,
+        total_cost = total_cost + excluded.total_cost;
+
+    INSERT OR IGNORE INTO rollup_sessions (session_id, user_id)
+    VALUES (NEW.session_id, NEW.user_id);
+
+    INSERT OR IGNORE INTO rollup_session_days (session_id, date, user_id)
+    VALUES (NEW.session_id, date(NEW.timestamp), NEW.user_id);
+END;
+
+-- Distinct counters only move when a seen-set row is actually inserted
+CREATE TRIGGER IF NOT EXISTS trg_user_daily_rollup_active
+AFTER INSERT ON user_daily_rollup
+BEGIN
+    UPDATE daily_rollup SET active_users = active_users + 1 WHERE date = NEW.date;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollup_sessions_count
+AFTER INSERT ON rollup_sessions
+BEGIN
+    UPDATE user_rollup SET session_count = session_count + 1
+    WHERE user_id = NEW.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollup_session_days_count
+AFTER INSERT ON rollup_session_days
+BEGIN
+    UPDATE user_daily_rollup SET session_count = session_count + 1
+    WHERE user_id = NEW.user_id AND date = NEW.date;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tool_usage_rollup
+AFTER INSERT ON tool_usage
+BEGIN
+    INSERT INTO tool_rollup (tool_name, usage_count) VALUES (NEW.tool_name, 1)
+    ON CONFLICT(tool_name) DO UPDATE SET usage_count = usage_count + 1;
+
+    INSERT OR IGNORE INTO rollup_tool_sessions (tool_name, session_id)
+    VALUES (NEW.tool_name, NEW.session_id);
+
+    INSERT INTO user_tool_rollup (user_id, tool_name, usage_count)
+    SELECT user_id, NEW.tool_name, 1 FROM sessions WHERE session_id = NEW.session_id
+    ON CONFLICT(user_id, tool_name) DO UPDATE SET usage_count = usage_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_rollup_tool_sessions_count
+AFTER INSERT ON rollup_tool_sessions
+BEGIN
+    UPDATE tool_rollup SET session_count = session_count + 1
+    WHERE tool_name = NEW.tool_name;
+END;
+
+-- Temporary session ids are renamed to Claude's id; follow the rename
+CREATE TRIGGER IF NOT EXISTS trg_sessions_rename_rollup
+AFTER UPDATE OF session_id ON sessions
+WHEN OLD.session_id <> NEW.session_id
+BEGIN
+    UPDATE OR IGNORE rollup_sessions SET session_id = NEW.session_id
+    WHERE session_id = OLD.session_id;
+    DELETE FROM rollup_sessions WHERE session_id = OLD.session_id;
+
+    UPDATE OR IGNORE rollup_session_days SET session_id = NEW.session_id
+    WHERE session_id = OLD.session_id;
+    DELETE FROM rollup_session_days WHERE session_id = OLD.session_id;
+
+    UPDATE OR IGNORE rollup_tool_sessions SET session_id = NEW.session_id
+    WHERE session_id = OLD.session_id;
+    DELETE FROM rollup_tool_sessions WHERE session_id = OLD.session_id;
+END;
+
+-- The old views aggregated (and fanned out over) the full tables
+DROP VIEW IF EXISTS daily_stats;
+CREATE VIEW daily_stats AS
+SELECT
+    date,
+    active_users,
+    message_count AS total_messages,
+    total_cost,
+    CASE WHEN duration_count > 0
+        THEN CAST(duration_sum AS REAL) / duration_count END AS avg_duration
+FROM daily_rollup;
+
+DROP VIEW IF EXISTS user_stats;
+CREATE VIEW user_stats AS
+SELECT
+    u.user_id,
+    u.telegram_username,
+    COALESCE(r.session_count, 0) AS total_sessions,
+    COALESCE(r.message_count, 0) AS total_messages,
+    r.total_cost AS total_cost,
+    r.last_activity AS last_activity
+FROM users u
+LEFT JOIN user_rollup r ON u.user_id = r.user_id;
+"""
+
+class DatabaseManager:
+    """Manage database connections and initialization.
+
+    All writes go through a single writer connection (SQLite allows one
+    writer at a time anyway); reads use a separate pool of read-only
+    connections, which in WAL mode never block on, or are blocked by, the
+    writer.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        pool_size: int = DEFAULT_READ_POOL_SIZE,
+        pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+        max_overflow: int = DEFAULT_MAX_OVERFLOW,
+    ):
         """Initialize database manager."""
         self.database_path = self._parse_database_url(database_url)
-        self._connection_pool = []
-        self._pool_size = 5
-        self._pool_lock = asyncio.Lock()
+        self._pool_size = max(1, pool_size)
+        self._pool_timeout = pool_timeout
+        self._max_overflow = max(0, max_overflow)
+
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock = asyncio.Lock()
+        self._writer_owner: Optional[asyncio.Task] = None
+        self._writer_depth = 0
+
+        self._readers: Deque[aiosqlite.Connection] = deque()
+        self._reader_count = 0
+        # ids of temporary connections opened beyond the pool size
+        self._overflow: Set[int] = set()
+        self._reader_available = asyncio.Condition()
+
+        self._init_lock = asyncio.Lock()
+        self._initialized = False
+        self.journal_mode: Optional[str] = None
+
+        self.stats: Dict[str, Any] = {
+            "write_checkouts": 0,
+            "read_checkouts": 0,
+            "waits": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "overflow_opened": 0,
+            "timeouts": 0,
+        }
 
     def _parse_database_url(self, database_url: str) -> Path:
         """Parse database URL to path."""
@@ -357,47 +668,247 @@ class DatabaseManager:
                 CREATE INDEX IF NOT EXISTS idx_image_sessions_expires_at ON image_sessions(expires_at);
                 """,
             ),
+            (5, ROLLUP_SCHEMA),
+            (
+                6,
+                """
+                -- Index-backed expired session cleanup
+                CREATE INDEX IF NOT EXISTS idx_sessions_active_last_used
+                ON sessions(is_active, last_used);
+                """,
+            ),
+            (
+                7,
+                """
+                -- Rate limiter budget and bucket state, so limits survive restarts.
+                -- limiter_cost is what the limiter charged (estimated cost);
+                -- daily_cost stays the actual Claude spend.
+                ALTER TABLE cost_tracking
+                ADD COLUMN limiter_cost REAL NOT NULL DEFAULT 0.0;
+                ALTER TABLE cost_tracking ADD COLUMN bucket_tokens REAL;
+                ALTER TABLE cost_tracking ADD COLUMN bucket_updated REAL;
+
+                CREATE INDEX IF NOT EXISTS idx_cost_tracking_bucket_updated
+                ON cost_tracking(bucket_updated);
+                """,
+            ),
+            (
+                8,
+                """
+                -- Telegram user_data / chat_data, one pickled value per key
+                CREATE TABLE IF NOT EXISTS telegram_persistence (
+                    scope TEXT NOT NULL,
+                    owner_id INTEGER NOT NULL,
+                    key BLOB NOT NULL,
+                    value BLOB NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (scope, owner_id, key)
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS telegram_conversations (
+                    name TEXT NOT NULL,
+                    conversation_key TEXT NOT NULL,
+                    state BLOB NOT NULL,
+                    PRIMARY KEY (name, conversation_key)
+                ) WITHOUT ROWID;
+                """,
+            ),
+            (
+                9,
+                """
+                -- Limiter spend per cost window, for windows other than a UTC day.
+                -- Absolute values as of bucket_updated; window_start is the
+                -- wall-clock start (epoch seconds) of the current window.
+                ALTER TABLE cost_tracking ADD COLUMN window_start INTEGER;
+                ALTER TABLE cost_tracking ADD COLUMN window_cost REAL;
+                ALTER TABLE cost_tracking ADD COLUMN window_previous_cost REAL;
+                """,
+            ),
         ]
 
+    async def _open_connection(self, readonly: bool = False) -> aiosqlite.Connection:
+        """Open a connection with the standard pragmas applied."""
+        conn = await aiosqlite.connect(
+            self.database_path, cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA foreign_keys = ON")
+        await conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        await conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+        await conn.execute("PRAGMA temp_store = MEMORY")
+        if readonly:
+            await conn.execute("PRAGMA query_only = ON")
+        return conn
+
     async def _init_pool(self):
         """Initialize connection pool."""
-        logger.info("Initializing connection pool", size=self._pool_size)
+        async with self._init_lock:
+            if self._initialized:
+                return
+
+            logger.info(
+                "Initializing connection pool",
+                readers=self._pool_size,
+                max_overflow=self._max_overflow,
+            )
+
+            self._writer = await self._open_connection()
+            # WAL is persistent in the database file; set it once on the writer
+            cursor = await self._writer.execute("PRAGMA journal_mode = WAL")
+            row = await cursor.fetchone()
+            self.journal_mode = row[0] if row else None
+            if self.journal_mode != "wal":
+                logger.warning(
+                    "WAL journal mode unavailable", journal_mode=self.journal_mode
+                )
 
-        async with self._pool_lock:
             for _ in range(self._pool_size):
-                conn = await aiosqlite.connect(self.database_path)
-                conn.row_factory = aiosqlite.Row
-                await conn.execute("PRAGMA foreign_keys = ON")
-                self._connection_pool.append(conn)
+                self._readers.append(await self._open_connection(readonly=True))
+            self._reader_count = self._pool_size
+            self._initialized = True
+
+    def _record_wait(self, started: float) -> None:
+        waited_ms = (time.monotonic() - started) * 1000
+        self.stats["waits"] += 1
+        self.stats["total_wait_ms"] += waited_ms
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], waited_ms)
 
     @asynccontextmanager
     async def get_connection(self) -> AsyncIterator[aiosqlite.Connection]:
-        """Get database connection from pool."""
-        async with self._pool_lock:
-            if self._connection_pool:
-                conn = self._connection_pool.pop()
-            else:
-                conn = await aiosqlite.connect(self.database_path)
-                conn.row_factory = aiosqlite.Row
-                await conn.execute("PRAGMA foreign_keys = ON")
+        """Get the writer connection.
 
+        Reentrant within a task, so helpers that open their own connection
+        while the caller holds one do not deadlock.
+        """
+        if not self._initialized:
+            await self._init_pool()
+
+        task = asyncio.current_task()
+        if self._writer_owner is task and self._writer_depth:
+            self._writer_depth += 1
+            try:
+                yield self._writer
+            finally:
+                self._writer_depth -= 1
+            return
+
+        if self._writer_lock.locked():
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(
+                    self._writer_lock.acquire(), timeout=self._pool_timeout
+                )
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                raise DatabaseConnectionError(
+                    f"Timed out after {self._pool_timeout}s waiting for the "
+                    "database writer"
+                )
+            self._record_wait(started)
+        else:
+            await self._writer_lock.acquire()
+
+        self._writer_owner = task
+        self._writer_depth = 1
+        self.stats["write_checkouts"] += 1
+        try:
+            yield self._writer
+        finally:
+            self._writer_depth = 0
+            self._writer_owner = None
+            try:
+                if self._writer.in_transaction:
+                    # Never leak a caller's uncommitted work to the next one
+                    await self._writer.rollback()
+            finally:
+                self._writer_lock.release()
+
+    @asynccontextmanager
+    async def get_read_connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Get a read-only connection from the reader pool."""
+        if not self._initialized:
+            await self._init_pool()
+
+        conn = await self._checkout_reader()
+        self.stats["read_checkouts"] += 1
         try:
             yield conn
         finally:
-            async with self._pool_lock:
-                if len(self._connection_pool) < self._pool_size:
-                    self._connection_pool.append(conn)
-                else:
-                    await conn.close()
+            await self._return_reader(conn)
+
+    async def _checkout_reader(self) -> aiosqlite.Connection:
+        if self._readers:
+            return self._readers.popleft()
+
+        if len(self._overflow) < self._max_overflow:
+            # Reserve the slot before awaiting so concurrent callers see it
+            placeholder = object()
+            self._overflow.add(id(placeholder))
+            try:
+                conn = await self._open_connection(readonly=True)
+            finally:
+                self._overflow.discard(id(placeholder))
+            self._overflow.add(id(conn))
+            self.stats["overflow_opened"] += 1
+            return conn
+
+        started = time.monotonic()
+        async with self._reader_available:
+            try:
+                await asyncio.wait_for(
+                    self._reader_available.wait_for(lambda: bool(self._readers)),
+                    timeout=self._pool_timeout,
+                )
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                raise DatabaseConnectionError(
+                    f"Timed out after {self._pool_timeout}s waiting for a "
+                    "database connection"
+                )
+            self._record_wait(started)
+            return self._readers.popleft()
+
+    async def _return_reader(self, conn: aiosqlite.Connection) -> None:
+        if conn.in_transaction:
+            await conn.rollback()
+
+        if id(conn) in self._overflow:
+            # Overflow connection: close it instead of growing the pool
+            self._overflow.discard(id(conn))
+            await conn.close()
+            return
+
+        async with self._reader_available:
+            self._readers.append(conn)
+            self._reader_available.notify()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics."""
+        waits = self.stats["waits"]
+        return {
+            **self.stats,
+            "avg_wait_ms": self.stats["total_wait_ms"] / waits if waits else 0.0,
+            "readers": self._reader_count,
+            "readers_idle": len(self._readers),
+            "overflow_in_use": len(self._overflow),
+            "writer_busy": self._writer_lock.locked(),
+            "journal_mode": self.journal_mode,
+        }
 
     async def close(self):
         """Close all connections in pool."""
-        logger.info("Closing database connections")
-
-        async with self._pool_lock:
-            for conn in self._connection_pool:
-                await conn.close()
-            self._connection_pool.clear()
+        logger.info("Closing database connections", **self.get_pool_stats())
+
+        async with self._init_lock:
+            while self._readers:
+                await self._readers.popleft().close()
+            if self._writer is not None:
+                async with self._writer_lock:
+                    await self._writer.close()
+                self._writer = None
+            self._initialized = False
 
     async def health_check(self) -> bool:
         """Check database health."""
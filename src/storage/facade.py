@@ -9,12 +9,10 @@ from typing import Any, Dict, Optional
 import structlog
 
 from ..claude.integration import ClaudeResponse
-from .database import DatabaseManager
+from .database import DEFAULT_POOL_TIMEOUT, DEFAULT_READ_POOL_SIZE, DatabaseManager
 from .models import (
     AuditLogModel,
-    MessageModel,
     SessionModel,
-    ToolUsageModel,
     UserModel,
 )
 from .repositories import (
@@ -26,6 +24,12 @@ from .repositories import (
     ToolUsageRepository,
     UserRepository,
 )
+from .write_behind import (
+    DEFAULT_FLUSH_BATCH_SIZE,
+    DEFAULT_FLUSH_INTERVAL_MS,
+    InteractionWriter,
+    PendingInteraction,
+)
 
 logger = structlog.get_logger()
 
@@ -33,9 +37,18 @@ logger = structlog.get_logger()
 class Storage:
     """Main storage interface."""
 
-    def __init__(self, database_url: str):
+    def __init__(
+        self,
+        database_url: str,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+        flush_batch_size: int = DEFAULT_FLUSH_BATCH_SIZE,
+        pool_size: int = DEFAULT_READ_POOL_SIZE,
+        pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+    ):
         """Initialize storage with database URL."""
-        self.db_manager = DatabaseManager(database_url)
+        self.db_manager = DatabaseManager(
+            database_url, pool_size=pool_size, pool_timeout=pool_timeout
+        )
         self.users = UserRepository(self.db_manager)
         self.sessions = SessionRepository(self.db_manager)
         self.messages = MessageRepository(self.db_manager)
@@ -43,6 +56,9 @@ class Storage:
         self.audit = AuditLogRepository(self.db_manager)
         self.costs = CostTrackingRepository(self.db_manager)
         self.analytics = AnalyticsRepository(self.db_manager)
+        self.interactions = InteractionWriter(
+            self.db_manager, flush_interval_ms, flush_batch_size
+        )
 
     async def initialize(self):
         """Initialize storage system."""
@@ -53,12 +69,24 @@ class Storage:
     async def close(self):
         """Close storage connections."""
         logger.info("Closing storage system")
+        await self.interactions.close()
         await self.db_manager.close()
 
     async def health_check(self) -> bool:
         """Check storage system health."""
         return await self.db_manager.health_check()
 
+    async def flush(self):
+        """Write all queued interactions now."""
+        await self.interactions.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get connection pool and write queue statistics."""
+        return {
+            "pool": self.db_manager.get_pool_stats(),
+            "interactions": self.interactions.get_stats(),
+        }
+
     # High-level operations
 
     async def save_claude_interaction(
@@ -69,7 +97,11 @@ class Storage:
         response: ClaudeResponse,
         ip_address: Optional[str] = None,
     ):
-        """Save complete Claude interaction."""
+        """Queue a complete Claude interaction for persistence.
+
+        Returns without touching the database; the interaction is written
+        with others in a single transaction shortly afterwards.
+        """
         logger.info(
             "Saving Claude interaction",
             user_id=user_id,
@@ -77,74 +109,20 @@ class Storage:
             cost=response.cost,
         )
 
-        # Save message
-        message = MessageModel(
-            message_id=None,
-            session_id=session_id,
-            user_id=user_id,
-            timestamp=datetime.utcnow(),
-            prompt=prompt,
-            response=response.content,
-            cost=response.cost,
-            duration_ms=response.duration_ms,
-            error=response.error_type if response.is_error else None,
-        )
-
-        message_id = await self.messages.save_message(message)
-
-        # Save tool usage
-        if response.tools_used:
-            for tool in response.tools_used:
-                tool_usage = ToolUsageModel(
-                    id=None,
-                    session_id=session_id,
-                    message_id=message_id,
-                    tool_name=tool["name"],
-                    tool_input=tool.get("input", {}),
-                    timestamp=datetime.utcnow(),
-                    success=not response.is_error,
-                    error_message=response.error_type if response.is_error else None,
-                )
-                await self.tools.save_tool_usage(tool_usage)
-
-        # Update cost tracking
-        await self.costs.update_daily_cost(user_id, response.cost)
-
-        # Update user stats
-        user = await self.users.get_user(user_id)
-        if user:
-            user.total_cost += response.cost
-            user.message_count += 1
-            user.last_active = datetime.utcnow()
-            await self.users.update_user(user)
-
-        # Update session stats
-        session = await self.sessions.get_session(session_id)
-        if session:
-            session.total_cost += response.cost
-            session.total_turns += response.num_turns
-            session.message_count += 1
-            session.last_used = datetime.utcnow()
-            await self.sessions.update_session(session)
-
-        # Log audit event
-        audit_event = AuditLogModel(
-            id=None,
-            user_id=user_id,
-            event_type="claude_interaction",
-            event_data={
-                "session_id": session_id,
-                "cost": response.cost,
-                "duration_ms": response.duration_ms,
-                "num_turns": response.num_turns,
-                "is_error": response.is_error,
-                "tools_used": [t["name"] for t in response.tools_used],
-            },
-            success=not response.is_error,
-            timestamp=datetime.utcnow(),
-            ip_address=ip_address,
+        await self.interactions.submit(
+            PendingInteraction(
+                user_id=user_id,
+                session_id=session_id,
+                prompt=prompt,
+                response=response.content,
+                cost=response.cost,
+                duration_ms=response.duration_ms,
+                num_turns=response.num_turns,
+                error=response.error_type if response.is_error else None,
+                tools=list(response.tools_used or []),
+                ip_address=ip_address,
+            )
         )
-        await self.audit.log_event(audit_event)
 
     async def get_or_create_user(
         self, user_id: int, username: Optional[str] = None
@@ -229,11 +207,11 @@ class Storage:
 
     async def is_user_allowed(self, user_id: int) -> bool:
         """Check if user is allowed."""
-        user = await self.users.get_user(user_id)
-        return user.is_allowed if user else False
+        return await self.users.is_user_allowed(user_id)
 
     async def get_user_session_summary(self, user_id: int) -> Dict[str, Any]:
         """Get user session summary."""
+        await self.interactions.flush()
         sessions = await self.sessions.get_user_sessions(user_id, active_only=False)
         active_sessions = [s for s in sessions if s.is_active]
 
@@ -247,12 +225,14 @@ class Storage:
 
     async def update_session_id(self, old_session_id: str, new_session_id: str):
         """Update session ID when it changes from temporary to Claude session ID."""
+        await self.interactions.flush()
         await self.sessions.update_session_id(old_session_id, new_session_id)
 
     async def get_session_history(
         self, session_id: str, limit: int = 50
     ) -> Dict[str, Any]:
         """Get session history with messages and tools."""
+        await self.interactions.flush()
         session = await self.sessions.get_session(session_id)
         if not session:
             return None
@@ -279,6 +259,7 @@ class Storage:
 
     async def get_user_dashboard(self, user_id: int) -> Dict[str, Any]:
         """Get comprehensive user dashboard data."""
+        await self.interactions.flush()
         # Get user info
         user = await self.users.get_user(user_id)
         if not user:
@@ -310,6 +291,7 @@ class Storage:
 
     async def get_admin_dashboard(self) -> Dict[str, Any]:
         """Get admin dashboard data."""
+        await self.interactions.flush()
         # Get system stats
         system_stats = await self.analytics.get_system_stats()
 
@@ -217,6 +217,9 @@ class CostTrackingModel:
     date: str  # ISO date format (YYYY-MM-DD)
     daily_cost: float = 0.0
     request_count: int = 0
+    limiter_cost: float = 0.0
+    bucket_tokens: Optional[float] = None
+    bucket_updated: Optional[float] = None  # Unix time
     id: Optional[int] = None
 
     @classmethod
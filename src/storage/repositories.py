@@ -7,8 +7,9 @@ Features:
 """
 
 import json
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import structlog
 
@@ -24,6 +25,11 @@ from .models import (
 
 logger = structlog.get_logger()
 
+# is_user_allowed cache lifetimes (known users / users not in the table)
+ALLOWED_CACHE_TTL_SECONDS = 300
+ALLOWED_NEGATIVE_TTL_SECONDS = 60
+ALLOWED_CACHE_MAX_SIZE = 10000
+
 
 class UserRepository:
     """User data access."""
@@ -31,10 +37,38 @@ class UserRepository:
     def __init__(self, db_manager: DatabaseManager):
         """Initialize repository."""
         self.db = db_manager
+        # user_id -> (is_allowed, expires_at)
+        self._allowed_cache: Dict[int, Tuple[bool, float]] = {}
+        self._invalidation_listeners: List[Callable[[int], None]] = []
+
+    def add_invalidation_listener(self, callback: Callable[[int], None]) -> None:
+        """Call ``callback(user_id)`` whenever a user's permission changes."""
+        self._invalidation_listeners.append(callback)
+
+    async def is_user_allowed(self, user_id: int) -> bool:
+        """Check the user's is_allowed flag (cached, including unknown users)."""
+        now = time.monotonic()
+        entry = self._allowed_cache.get(user_id)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        user = await self.get_user(user_id)
+        allowed = user.is_allowed if user else False
+        ttl = ALLOWED_CACHE_TTL_SECONDS if user else ALLOWED_NEGATIVE_TTL_SECONDS
+        self._allowed_cache.pop(user_id, None)
+        self._allowed_cache[user_id] = (allowed, now + ttl)
+        while len(self._allowed_cache) > ALLOWED_CACHE_MAX_SIZE:
+            del self._allowed_cache[next(iter(self._allowed_cache))]
+        return allowed
+
+    def _invalidate(self, user_id: int) -> None:
+        self._allowed_cache.pop(user_id, None)
+        for callback in self._invalidation_listeners:
+            callback(user_id)
 
     async def get_user(self, user_id: int) -> Optional[UserModel]:
         """Get user by ID."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 "SELECT * FROM users WHERE user_id = ?", (user_id,)
             )
@@ -59,6 +93,8 @@ class UserRepository:
             )
             await conn.commit()
 
+            # May have been cached as unknown
+            self._allowed_cache.pop(user.user_id, None)
             logger.info(
                 "Created user", user_id=user.user_id, username=user.telegram_username
             )
@@ -87,7 +123,7 @@ class UserRepository:
 
     async def get_allowed_users(self) -> List[int]:
         """Get list of allowed user IDs."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 "SELECT user_id FROM users WHERE is_allowed = TRUE"
             )
@@ -102,11 +138,12 @@ class UserRepository:
             )
             await conn.commit()
 
-            logger.info("Updated user permissions", user_id=user_id, allowed=allowed)
+        self._invalidate(user_id)
+        logger.info("Updated user permissions", user_id=user_id, allowed=allowed)
 
     async def get_all_users(self) -> List[UserModel]:
         """Get all users."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute("SELECT * FROM users ORDER BY first_seen DESC")
             rows = await cursor.fetchall()
             return [UserModel.from_row(row) for row in rows]
@@ -121,7 +158,7 @@ class SessionRepository:
 
     async def get_session(self, session_id: str) -> Optional[SessionModel]:
         """Get session by ID."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
             )
@@ -200,7 +237,7 @@ class SessionRepository:
         self, user_id: int, active_only: bool = True
     ) -> List[SessionModel]:
         """Get sessions for user."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             query = "SELECT * FROM sessions WHERE user_id = ?"
             params = [user_id]
 
@@ -233,7 +270,7 @@ class SessionRepository:
 
     async def get_sessions_by_project(self, project_path: str) -> List[SessionModel]:
         """Get sessions for a specific project."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM sessions 
@@ -280,7 +317,7 @@ class MessageRepository:
         self, session_id: str, limit: int = 50
     ) -> List[MessageModel]:
         """Get messages for session."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM messages 
@@ -297,7 +334,7 @@ class MessageRepository:
         self, user_id: int, limit: int = 100
     ) -> List[MessageModel]:
         """Get messages for user."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM messages 
@@ -312,7 +349,7 @@ class MessageRepository:
 
     async def get_recent_messages(self, hours: int = 24) -> List[MessageModel]:
         """Get recent messages."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM messages 
@@ -324,6 +361,32 @@ class MessageRepository:
             rows = await cursor.fetchall()
             return [MessageModel.from_row(row) for row in rows]
 
+    async def get_cost_samples(
+        self, after_id: int, days: int, limit: int, prompt_chars: int
+    ) -> List[Dict[str, Any]]:
+        """Get message costs after ``after_id`` in id order, for cost model fitting.
+
+        Only the first ``prompt_chars`` characters of each prompt are
+        returned, plus its full length.
+        """
+        async with self.db.get_read_connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT message_id, user_id, cost,
+                       length(prompt) AS prompt_length,
+                       substr(prompt, 1, ?) AS prompt_head
+                FROM messages
+                WHERE message_id > ?
+                  AND cost IS NOT NULL
+                  AND timestamp > datetime('now', '-' || ? || ' days')
+                ORDER BY message_id
+                LIMIT ?
+            """,
+                (prompt_chars, after_id, days, limit),
+            )
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
 
 class ToolUsageRepository:
     """Tool usage data access."""
@@ -360,7 +423,7 @@ class ToolUsageRepository:
 
     async def get_session_tool_usage(self, session_id: str) -> List[ToolUsageModel]:
         """Get tool usage for session."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM tool_usage 
@@ -374,7 +437,7 @@ class ToolUsageRepository:
 
     async def get_user_tool_usage(self, user_id: int) -> List[ToolUsageModel]:
         """Get tool usage for user."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT tu.* FROM tool_usage tu
@@ -389,7 +452,7 @@ class ToolUsageRepository:
 
     async def get_tool_stats(self) -> List[Dict[str, any]]:
         """Get tool usage statistics."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT 
@@ -443,7 +506,7 @@ class AuditLogRepository:
         self, user_id: int, limit: int = 100
     ) -> List[AuditLogModel]:
         """Get audit log for user."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM audit_log 
@@ -458,7 +521,7 @@ class AuditLogRepository:
 
     async def get_recent_audit_log(self, hours: int = 24) -> List[AuditLogModel]:
         """Get recent audit log entries."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM audit_log 
@@ -501,7 +564,7 @@ class CostTrackingRepository:
         self, user_id: int, days: int = 30
     ) -> List[CostTrackingModel]:
         """Get user's daily costs."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM cost_tracking 
@@ -515,7 +578,7 @@ class CostTrackingRepository:
 
     async def get_total_costs(self, days: int = 30) -> List[Dict[str, any]]:
         """Get total costs by day."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT 
@@ -533,9 +596,101 @@ class CostTrackingRepository:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+    # Rate limiter state
+
+    async def get_limit_state(
+        self, user_id: int, since_date: str
+    ) -> List[Dict[str, Any]]:
+        """Get a user's rate limiter rows from ``since_date`` on."""
+        async with self.db.get_read_connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT user_id, date, limiter_cost, bucket_tokens, bucket_updated,
+                    window_start, window_cost, window_previous_cost
+                FROM cost_tracking
+                WHERE user_id = ? AND date >= ?
+            """,
+                (user_id, since_date),
+            )
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def get_recent_limit_states(
+        self, since_date: str, active_since: float, limit: int
+    ) -> List[Dict[str, Any]]:
+        """Get rate limiter rows of the ``limit`` most recently active users."""
+        async with self.db.get_read_connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT user_id, date, limiter_cost, bucket_tokens, bucket_updated,
+                    window_start, window_cost, window_previous_cost
+                FROM cost_tracking
+                WHERE date >= ? AND user_id IN (
+                    SELECT user_id FROM cost_tracking
+                    WHERE bucket_updated >= ?
+                    GROUP BY user_id
+                    ORDER BY MAX(bucket_updated) DESC
+                    LIMIT ?
+                )
+            """,
+                (since_date, active_since, limit),
+            )
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+
+    async def save_limit_state(
+        self, rows: List[Tuple[int, str, float, float, float, int, float, float]]
+    ) -> int:
+        """Add limiter cost and store bucket and window state.
+
+        ``rows`` are ``(user_id, date, cost_delta, bucket_tokens,
+        bucket_updated, window_start, window_cost, window_previous_cost)``.
+        Users missing from the users table are skipped; returns the number
+        of rows written.
+        """
+        async with self.db.get_connection() as conn:
+            cursor = await conn.executemany(
+                """
+                INSERT INTO cost_tracking
+                (user_id, date, limiter_cost, bucket_tokens, bucket_updated,
+                 window_start, window_cost, window_previous_cost)
+                SELECT ?, ?, ?, ?, ?, ?, ?, ?
+                WHERE EXISTS (SELECT 1 FROM users WHERE user_id = ?)
+                ON CONFLICT(user_id, date) DO UPDATE SET
+                    limiter_cost = limiter_cost + excluded.limiter_cost,
+                    bucket_tokens = excluded.bucket_tokens,
+                    bucket_updated = excluded.bucket_updated,
+                    window_start = excluded.window_start,
+                    window_cost = excluded.window_cost,
+                    window_previous_cost = excluded.window_previous_cost
+            """,
+                [(*row, row[0]) for row in rows],
+            )
+            await conn.commit()
+            return max(0, cursor.rowcount)
+
+    async def reset_limit_state(self, user_id: int) -> None:
+        """Forget a user's persisted rate limiter state."""
+        async with self.db.get_connection() as conn:
+            await conn.execute(
+                """
+                UPDATE cost_tracking
+                SET limiter_cost = 0.0, bucket_tokens = NULL, bucket_updated = NULL,
+                    window_start = NULL, window_cost = NULL,
+                    window_previous_cost = NULL
+                WHERE user_id = ?
+            """,
+                (user_id,),
+            )
+            await conn.commit()
+
 
 class AnalyticsRepository:
-    """Analytics and reporting."""
+    """Analytics and reporting.
+
+    Reads the rollup tables maintained by triggers (migration 5), so the
+    cost of a dashboard does not grow with the number of messages.
+    """
 
     def __init__(self, db_manager: DatabaseManager):
         """Initialize repository."""
@@ -543,36 +698,49 @@ class AnalyticsRepository:
 
     async def get_user_stats(self, user_id: int) -> Dict[str, any]:
         """Get user statistics."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             # User summary
             cursor = await conn.execute(
                 """
                 SELECT 
-                    COUNT(DISTINCT session_id) as total_sessions,
-                    COUNT(*) as total_messages,
-                    SUM(cost) as total_cost,
-                    AVG(cost) as avg_cost,
-                    MAX(timestamp) as last_activity,
-                    AVG(duration_ms) as avg_duration
-                FROM messages
+                    session_count as total_sessions,
+                    message_count as total_messages,
+                    total_cost,
+                    total_cost / message_count as avg_cost,
+                    last_activity,
+                    CASE WHEN duration_count > 0
+                        THEN CAST(duration_sum AS REAL) / duration_count
+                    END as avg_duration
+                FROM user_rollup
                 WHERE user_id = ?
             """,
                 (user_id,),
             )
 
-            summary = dict(await cursor.fetchone())
+            row = await cursor.fetchone()
+            summary = (
+                dict(row)
+                if row
+                else {
+                    "total_sessions": 0,
+                    "total_messages": 0,
+                    "total_cost": None,
+                    "avg_cost": None,
+                    "last_activity": None,
+                    "avg_duration": None,
+                }
+            )
 
             # Daily usage (last 30 days)
             cursor = await conn.execute(
                 """
                 SELECT 
-                    date(timestamp) as date,
-                    COUNT(*) as messages,
-                    SUM(cost) as cost,
-                    COUNT(DISTINCT session_id) as sessions
-                FROM messages
-                WHERE user_id = ? AND timestamp >= datetime('now', '-30 days')
-                GROUP BY date(timestamp)
+                    date,
+                    message_count as messages,
+                    total_cost as cost,
+                    session_count as sessions
+                FROM user_daily_rollup
+                WHERE user_id = ? AND date >= date('now', '-30 days')
                 ORDER BY date DESC
             """,
                 (user_id,),
@@ -583,13 +751,9 @@ class AnalyticsRepository:
             # Most used tools
             cursor = await conn.execute(
                 """
-                SELECT 
-                    tu.tool_name,
-                    COUNT(*) as usage_count
-                FROM tool_usage tu
-                JOIN sessions s ON tu.session_id = s.session_id
-                WHERE s.user_id = ?
-                GROUP BY tu.tool_name
+                SELECT tool_name, usage_count
+                FROM user_tool_rollup
+                WHERE user_id = ?
                 ORDER BY usage_count DESC
                 LIMIT 10
             """,
@@ -606,17 +770,19 @@ class AnalyticsRepository:
 
     async def get_system_stats(self) -> Dict[str, any]:
         """Get system-wide statistics."""
-        async with self.db.get_connection() as conn:
+        async with self.db.get_read_connection() as conn:
             # Overall stats
             cursor = await conn.execute(
                 """
                 SELECT 
-                    COUNT(DISTINCT user_id) as total_users,
-                    COUNT(DISTINCT session_id) as total_sessions,
-                    COUNT(*) as total_messages,
-                    SUM(cost) as total_cost,
-                    AVG(duration_ms) as avg_duration
-                FROM messages
+                    COUNT(*) as total_users,
+                    COALESCE(SUM(session_count), 0) as total_sessions,
+                    COALESCE(SUM(message_count), 0) as total_messages,
+                    SUM(total_cost) as total_cost,
+                    CASE WHEN SUM(duration_count) > 0
+                        THEN CAST(SUM(duration_sum) AS REAL) / SUM(duration_count)
+                    END as avg_duration
+                FROM user_rollup
             """
             )
 
@@ -626,8 +792,8 @@ class AnalyticsRepository:
             cursor = await conn.execute(
                 """
                 SELECT COUNT(DISTINCT user_id) as active_users
-                FROM messages
-                WHERE timestamp > datetime('now', '-7 days')
+                FROM user_daily_rollup
+                WHERE date >= date('now', '-7 days')
             """
             )
 
@@ -640,12 +806,11 @@ class AnalyticsRepository:
                 SELECT 
                     u.user_id,
                     u.telegram_username,
-                    SUM(m.cost) as total_cost,
-                    COUNT(m.message_id) as total_messages
-                FROM messages m
-                JOIN users u ON m.user_id = u.user_id
-                GROUP BY u.user_id
-                ORDER BY total_cost DESC
+                    r.total_cost,
+                    r.message_count as total_messages
+                FROM user_rollup r
+                JOIN users u ON r.user_id = u.user_id
+                ORDER BY r.total_cost DESC
                 LIMIT 10
             """
             )
@@ -657,10 +822,9 @@ class AnalyticsRepository:
                 """
                 SELECT 
                     tool_name,
-                    COUNT(*) as usage_count,
-                    COUNT(DISTINCT session_id) as sessions_used
-                FROM tool_usage
-                GROUP BY tool_name
+                    usage_count,
+                    session_count as sessions_used
+                FROM tool_rollup
                 ORDER BY usage_count DESC
                 LIMIT 10
             """
@@ -672,13 +836,12 @@ class AnalyticsRepository:
             cursor = await conn.execute(
                 """
                 SELECT 
-                    date(timestamp) as date,
-                    COUNT(DISTINCT user_id) as active_users,
-                    COUNT(*) as total_messages,
-                    SUM(cost) as total_cost
-                FROM messages
-                WHERE timestamp >= datetime('now', '-30 days')
-                GROUP BY date(timestamp)
+                    date,
+                    active_users,
+                    message_count as total_messages,
+                    total_cost
+                FROM daily_rollup
+                WHERE date >= date('now', '-30 days')
                 ORDER BY date DESC
             """
             )
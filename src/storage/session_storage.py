@@ -3,9 +3,10 @@
 Replaces the in-memory session storage with SQLite persistence.
 """
 
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import structlog
 
@@ -122,7 +123,7 @@ class SQLiteSessionStorage(SessionStorage):
 
     async def load_session(self, session_id: str) -> Optional[ClaudeSession]:
         """Load session from database."""
-        async with self.db_manager.get_connection() as conn:
+        async with self.db_manager.get_read_connection() as conn:
             cursor = await conn.execute(
                 "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
             )
@@ -194,7 +195,7 @@ class SQLiteSessionStorage(SessionStorage):
 
     async def get_user_sessions(self, user_id: int) -> List[ClaudeSession]:
         """Get all active sessions for a user."""
-        async with self.db_manager.get_connection() as conn:
+        async with self.db_manager.get_read_connection() as conn:
             cursor = await conn.execute(
                 """
                 SELECT * FROM sessions 
@@ -225,7 +226,7 @@ class SQLiteSessionStorage(SessionStorage):
 
     async def get_all_sessions(self) -> List[ClaudeSession]:
         """Get all active sessions."""
-        async with self.db_manager.get_connection() as conn:
+        async with self.db_manager.get_read_connection() as conn:
             cursor = await conn.execute(
                 "SELECT * FROM sessions WHERE is_active = TRUE ORDER BY last_used DESC"
             )
@@ -249,24 +250,47 @@ class SQLiteSessionStorage(SessionStorage):
 
             return sessions
 
-    async def cleanup_expired_sessions(self, timeout_hours: int) -> int:
-        """Mark expired sessions as inactive."""
-        async with self.db_manager.get_connection() as conn:
-            cursor = await conn.execute(
-                """
-                UPDATE sessions 
-                SET is_active = FALSE 
-                WHERE last_used < datetime('now', '-' || ? || ' hours')
-                  AND is_active = TRUE
-            """,
-                (timeout_hours,),
-            )
-            await conn.commit()
+    async def cleanup_expired_sessions(
+        self, timeout_hours: int, batch_size: int = 500
+    ) -> List[Tuple[str, int]]:
+        """Mark expired sessions as inactive.
+
+        Works in chunks of ``batch_size`` rows, committing and releasing
+        the writer between chunks so interaction writes are not held up.
+        Returns ``(session_id, user_id)`` of every session deactivated.
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=timeout_hours)
+        expired: List[Tuple[str, int]] = []
+
+        while True:
+            async with self.db_manager.get_connection() as conn:
+                # One set-based UPDATE per chunk (RETURNING needs SQLite 3.35+)
+                cursor = await conn.execute(
+                    """
+                    UPDATE sessions SET is_active = FALSE
+                    WHERE rowid IN (
+                        SELECT rowid FROM sessions
+                        WHERE is_active = TRUE AND last_used < ?
+                        LIMIT ?
+                    )
+                    RETURNING session_id, user_id
+                """,
+                    (cutoff, batch_size),
+                )
+                chunk = [(row[0], row[1]) for row in await cursor.fetchall()]
+                await conn.commit()
+                if not chunk:
+                    break
 
-            affected = cursor.rowcount
-            logger.info(
-                "Cleaned up expired sessions",
-                count=affected,
-                timeout_hours=timeout_hours,
-            )
-            return affected
+            expired.extend(chunk)
+            if len(chunk) < batch_size:
+                break
+            # Let queued writers take the connection between chunks
+            await asyncio.sleep(0)
+
+        logger.info(
+            "Cleaned up expired sessions",
+            count=len(expired),
+            timeout_hours=timeout_hours,
+        )
+        return expired
@@ -0,0 +1,398 @@
+"""SQLite-backed persistence for python-telegram-bot.
+
+Features:
+- user_data / chat_data stored one row per key in the bot database
+- Only keys whose value changed since the last write are written
+- Lazy per-user / per-chat loading on first access
+- Batched writes: one transaction per persistence run
+- One-time import of an existing PicklePersistence file
+"""
+
+import asyncio
+import hashlib
+import json
+import pickle
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+import structlog
+from telegram.ext import BasePersistence, PersistenceInput
+
+from .database import DatabaseManager
+
+logger = structlog.get_logger()
+
+USER_SCOPE = "user"
+CHAT_SCOPE = "chat"
+
+DEFAULT_UPDATE_INTERVAL = 10
+# Writes queued by one persistence run are coalesced for this long
+FLUSH_DELAY_SECONDS = 0.05
+WRITE_BATCH_SIZE = 500
+# Fixed so stored key blobs keep matching freshly pickled keys
+PICKLE_PROTOCOL = 5
+
+# Sentinel for "delete this key" in the pending write queue
+_DELETE = object()
+
+Owner = Tuple[str, int]
+
+
+def _digest(value: bytes) -> bytes:
+    return hashlib.blake2b(value, digest_size=16).digest()
+
+
+class SQLitePersistence(BasePersistence):
+    """Persist user_data, chat_data and conversations in SQLite.
+
+    ``PicklePersistence`` rewrites one file holding every user's data on
+    each run. Here each (scope, owner, key) is a row: a run pickles the
+    values of the users and chats PTB hands over, compares them with a
+    digest of what was last written and queues only changed or removed
+    keys, so the write cost depends on what changed, not on how many users
+    exist. Nothing is loaded at startup; an owner's rows are read the first
+    time PTB refreshes their data before an update.
+
+    ``bot_data`` is not persisted: it holds the injected managers and is
+    rebuilt on every start. Callback data is not used by the bot.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        update_interval: float = DEFAULT_UPDATE_INTERVAL,
+        legacy_pickle: Optional[Path] = None,
+    ):
+        """Initialize with database manager."""
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db_manager = db_manager
+        self.legacy_pickle = legacy_pickle
+
+        # Owners whose rows have been read (or dropped) in this process,
+        # with a digest of each key's last written pickle
+        self._digests: Dict[Owner, Dict[bytes, bytes]] = {}
+        self._pending: Dict[Tuple[str, int, bytes], Any] = {}
+        self._pending_drops: Set[Owner] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        self._imported = False
+
+        self.stats: Dict[str, int] = {
+            "loads": 0,
+            "rows_loaded": 0,
+            "keys_written": 0,
+            "keys_deleted": 0,
+            "keys_unchanged": 0,
+            "unpicklable": 0,
+            "flushes": 0,
+        }
+
+    # Loading
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._import_legacy_pickle()
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        await self._import_legacy_pickle()
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        """Load a user's stored keys the first time they are seen."""
+        await self._load_owner((USER_SCOPE, user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        """Load a chat's stored keys the first time it is seen."""
+        await self._load_owner((CHAT_SCOPE, chat_id), chat_data)
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        return None
+
+    async def _load_owner(self, owner: Owner, data: Dict[Any, Any]) -> None:
+        if owner in self._digests:
+            return
+        digests: Dict[bytes, bytes] = {}
+        self._digests[owner] = digests
+
+        async with self.db_manager.get_read_connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT key, value FROM telegram_persistence
+                WHERE scope = ? AND owner_id = ?
+                """,
+                owner,
+            )
+            rows = list(await cursor.fetchall())
+
+        for row in rows:
+            try:
+                key = pickle.loads(row["key"])
+                value = pickle.loads(row["value"])
+            except Exception as e:
+                logger.warning(
+                    "Skipping unreadable persisted key",
+                    scope=owner[0],
+                    owner_id=owner[1],
+                    error=str(e),
+                )
+                continue
+            digests[row["key"]] = _digest(row["value"])
+            # Anything set before the first refresh wins over stored data
+            data.setdefault(key, value)
+
+        self.stats["loads"] += 1
+        self.stats["rows_loaded"] += len(rows)
+
+    # Writing
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._diff((USER_SCOPE, user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        self._diff((CHAT_SCOPE, chat_id), data)
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        return None
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._drop((USER_SCOPE, user_id))
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._drop((CHAT_SCOPE, chat_id))
+
+    def _diff(self, owner: Owner, data: Dict[Any, Any]) -> None:
+        """Queue the keys of ``data`` that differ from what was last written."""
+        # PTB only hands over owners that had an update, so they were loaded;
+        # if not, stored keys we never saw are left alone
+        digests = self._digests.setdefault(owner, {})
+        scope, owner_id = owner
+        seen: Set[bytes] = set()
+
+        for key, value in data.items():
+            try:
+                key_blob = pickle.dumps(key, PICKLE_PROTOCOL)
+                seen.add(key_blob)
+                value_blob = pickle.dumps(value, PICKLE_PROTOCOL)
+            except Exception as e:
+                # Keeps the last value that could be written
+                self.stats["unpicklable"] += 1
+                logger.warning(
+                    "Not persisting unpicklable value",
+                    scope=scope,
+                    owner_id=owner_id,
+                    key=repr(key)[:100],
+                    error=str(e),
+                )
+                continue
+            digest = _digest(value_blob)
+            if digests.get(key_blob) == digest:
+                self.stats["keys_unchanged"] += 1
+                continue
+            digests[key_blob] = digest
+            self._pending[(scope, owner_id, key_blob)] = value_blob
+
+        for key_blob in [k for k in digests if k not in seen]:
+            del digests[key_blob]
+            self._pending[(scope, owner_id, key_blob)] = _DELETE
+
+        self._schedule_flush()
+
+    def _drop(self, owner: Owner) -> None:
+        # Stay marked as loaded so a refresh cannot read rows about to go
+        self._digests[owner] = {}
+        scope, owner_id = owner
+        for pending_key in [
+            k for k in self._pending if k[0] == scope and k[1] == owner_id
+        ]:
+            del self._pending[pending_key]
+        self._pending_drops.add(owner)
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(FLUSH_DELAY_SECONDS)
+        try:
+            await self._write_pending()
+        except Exception as e:
+            logger.error("Telegram persistence flush failed", error=str(e))
+
+    async def _write_pending(self) -> None:
+        async with self._write_lock:
+            if not self._pending and not self._pending_drops:
+                return
+            pending, self._pending = self._pending, {}
+            drops, self._pending_drops = self._pending_drops, set()
+
+            upserts = [
+                (scope, owner_id, key_blob, value)
+                for (scope, owner_id, key_blob), value in pending.items()
+                if value is not _DELETE
+            ]
+            deletes = [key for key, value in pending.items() if value is _DELETE]
+
+            try:
+                async with self.db_manager.get_connection() as conn:
+                    if drops:
+                        await conn.executemany(
+                            """
+                            DELETE FROM telegram_persistence
+                            WHERE scope = ? AND owner_id = ?
+                            """,
+                            list(drops),
+                        )
+                    for start in range(0, len(deletes), WRITE_BATCH_SIZE):
+                        await conn.executemany(
+                            """
+                            DELETE FROM telegram_persistence
+                            WHERE scope = ? AND owner_id = ? AND key = ?
+                            """,
+                            deletes[start : start + WRITE_BATCH_SIZE],
+                        )
+                    for start in range(0, len(upserts), WRITE_BATCH_SIZE):
+                        await conn.executemany(
+                            """
+                            INSERT INTO telegram_persistence
+                                (scope, owner_id, key, value, updated_at)
+                            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                            ON CONFLICT(scope, owner_id, key) DO UPDATE SET
+                                value = excluded.value,
+                                updated_at = excluded.updated_at
+                            """,
+                            upserts[start : start + WRITE_BATCH_SIZE],
+                        )
+                    await conn.commit()
+            except Exception:
+                # Put the batch back under anything queued since
+                pending.update(self._pending)
+                self._pending = pending
+                self._pending_drops |= drops
+                raise
+
+            self.stats["keys_written"] += len(upserts)
+            self.stats["keys_deleted"] += len(deletes)
+            self.stats["flushes"] += 1
+
+    async def flush(self) -> None:
+        """Write everything still queued; called by PTB on shutdown."""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                logger.debug("Pending persistence flush replaced by final flush")
+        self._flush_task = None
+        await self._write_pending()
+        logger.info("Telegram persistence flushed", **self.stats)
+
+    # Conversations
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, Any]:
+        async with self.db_manager.get_read_connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT conversation_key, state FROM telegram_conversations
+                WHERE name = ?
+                """,
+                (name,),
+            )
+            rows = await cursor.fetchall()
+        return {
+            tuple(json.loads(row["conversation_key"])): pickle.loads(row["state"])
+            for row in rows
+        }
+
+    async def update_conversation(
+        self, name: str, key: Tuple, new_state: Optional[object]
+    ) -> None:
+        conversation_key = json.dumps(list(key))
+        async with self.db_manager.get_connection() as conn:
+            if new_state is None:
+                await conn.execute(
+                    """
+                    DELETE FROM telegram_conversations
+                    WHERE name = ? AND conversation_key = ?
+                    """,
+                    (name, conversation_key),
+                )
+            else:
+                await conn.execute(
+                    """
+                    INSERT INTO telegram_conversations (name, conversation_key, state)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(name, conversation_key) DO UPDATE SET
+                        state = excluded.state
+                    """,
+                    (
+                        name,
+                        conversation_key,
+                        pickle.dumps(new_state, PICKLE_PROTOCOL),
+                    ),
+                )
+            await conn.commit()
+
+    # Migration from PicklePersistence
+
+    async def _import_legacy_pickle(self) -> None:
+        """Import a PicklePersistence file once, if the table is still empty."""
+        if self._imported:
+            return
+        self._imported = True
+        path = self.legacy_pickle
+        if path is None or not path.exists():
+            return
+
+        async with self.db_manager.get_read_connection() as conn:
+            cursor = await conn.execute("SELECT 1 FROM telegram_persistence LIMIT 1")
+            if await cursor.fetchone():
+                return
+
+        try:
+            with open(path, "rb") as f:
+                legacy = pickle.load(f)
+        except Exception as e:
+            logger.warning(
+                "Could not read legacy persistence file", path=str(path), error=str(e)
+            )
+            return
+
+        imported = 0
+        for scope, section in ((USER_SCOPE, "user_data"), (CHAT_SCOPE, "chat_data")):
+            for owner_id, data in (legacy.get(section) or {}).items():
+                self._diff((scope, owner_id), deepcopy(data))
+                imported += 1
+        # Import only writes; owners are loaded from the table when used
+        self._digests.clear()
+
+        for name, conversations in (legacy.get("conversations") or {}).items():
+            for key, state in conversations.items():
+                await self.update_conversation(name, key, state)
+
+        await self._write_pending()
+        path.rename(path.with_name(path.name + ".migrated"))
+        logger.info(
+            "Imported legacy Telegram persistence", path=str(path), owners=imported
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Write/load counters."""
+        return {
+            **self.stats,
+            "loaded_owners": len(self._digests),
+            "pending_keys": len(self._pending),
+        }
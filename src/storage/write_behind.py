@@ -0,0 +1,384 @@
+"""Write-behind persistence for Claude interactions.
+
+Features:
+- Interactions are queued in memory and returned to the caller immediately
+- Flushed in one transaction every N ms or M records
+- executemany for tool usage, audit and counter rows
+- Additive counter updates (no read-modify-write)
+- Per-interaction retry when a batch fails
+- Flush on shutdown
+"""
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosqlite
+import structlog
+
+from .database import DatabaseManager
+
+logger = structlog.get_logger()
+
+DEFAULT_FLUSH_INTERVAL_MS = 250
+DEFAULT_FLUSH_BATCH_SIZE = 100
+# Writers block (flush inline) once this many interactions are pending
+DEFAULT_MAX_PENDING = 10000
+
+
+class PendingInteraction:
+    """A Claude interaction waiting to be written."""
+
+    __slots__ = (
+        "user_id",
+        "session_id",
+        "prompt",
+        "response",
+        "cost",
+        "duration_ms",
+        "num_turns",
+        "error",
+        "tools",
+        "ip_address",
+        "timestamp",
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        session_id: str,
+        prompt: str,
+        response: Optional[str],
+        cost: float,
+        duration_ms: Optional[int],
+        num_turns: int,
+        error: Optional[str],
+        tools: List[Dict[str, Any]],
+        ip_address: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
+    ):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.prompt = prompt
+        self.response = response
+        self.cost = cost
+        self.duration_ms = duration_ms
+        self.num_turns = num_turns
+        self.error = error
+        self.tools = tools
+        self.ip_address = ip_address
+        self.timestamp = timestamp or datetime.utcnow()
+
+
+class InteractionWriter:
+    """Batch Claude interactions into as few SQLite transactions as possible.
+
+    ``save_claude_interaction`` used to cost eight round trips and as many
+    commits per reply. Here a reply only appends to a list; a background
+    task writes everything pending in a single transaction.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+        batch_size: int = DEFAULT_FLUSH_BATCH_SIZE,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        """Initialize writer.
+
+        A ``flush_interval_ms`` of 0 or less writes every interaction
+        before ``submit`` returns (write-through).
+        """
+        self.db = db_manager
+        self.flush_interval = max(0, flush_interval_ms) / 1000
+        self.batch_size = max(1, batch_size)
+        self.max_pending = max(self.batch_size, max_pending)
+
+        self._pending: List[PendingInteraction] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.stats: Dict[str, Any] = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "batch_retries": 0,
+            "max_batch": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    @property
+    def pending(self) -> int:
+        """Number of interactions not yet written."""
+        return len(self._pending)
+
+    async def submit(self, interaction: PendingInteraction) -> None:
+        """Queue an interaction for writing."""
+        self._pending.append(interaction)
+        self.stats["submitted"] += 1
+
+        if self._closed or self.flush_interval == 0:
+            await self.flush()
+            return
+
+        self._ensure_task()
+
+        if len(self._pending) >= self.max_pending:
+            # Storage cannot keep up: apply backpressure to the caller
+            await self.flush()
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Write everything pending now."""
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[: self.batch_size]
+                del self._pending[: len(batch)]
+                await self._write_batch(batch)
+
+    async def close(self) -> None:
+        """Stop the background task and write whatever is left."""
+        self._closed = True
+        if self._task and not self._task.done():
+            # Let an in-flight transaction finish instead of cancelling it
+            self._wakeup.set()
+            await self._task
+        await self.flush()
+        logger.info("Interaction writer closed", **self.get_stats())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get writer statistics."""
+        return {**self.stats, "pending": len(self._pending)}
+
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                if not self._pending:
+                    # Idle: exit and let the next submit restart the loop
+                    return
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Interaction flush failed", error=str(e))
+
+    async def _write_batch(self, batch: List[PendingInteraction]) -> None:
+        started = time.perf_counter()
+        async with self.db.get_connection() as conn:
+            try:
+                await self._write(conn, batch)
+                await conn.commit()
+                self.stats["written"] += len(batch)
+            except Exception as e:
+                await conn.rollback()
+                if len(batch) == 1:
+                    self.stats["dropped"] += 1
+                    logger.warning(
+                        "Failed to persist Claude interaction",
+                        user_id=batch[0].user_id,
+                        session_id=batch[0].session_id,
+                        error=str(e),
+                    )
+                else:
+                    # Isolate the bad row(s) so one failure does not lose the batch
+                    self.stats["batch_retries"] += 1
+                    logger.warning(
+                        "Interaction batch failed, retrying individually",
+                        size=len(batch),
+                        error=str(e),
+                    )
+                    for interaction in batch:
+                        await self._write_single(conn, interaction)
+
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        logger.debug(
+            "Flushed Claude interactions",
+            count=len(batch),
+            duration_ms=self.stats["last_flush_ms"],
+        )
+
+    async def _write_single(
+        self, conn: aiosqlite.Connection, interaction: PendingInteraction
+    ) -> None:
+        try:
+            await self._write(conn, [interaction])
+            await conn.commit()
+            self.stats["written"] += 1
+        except Exception as e:
+            await conn.rollback()
+            self.stats["dropped"] += 1
+            logger.warning(
+                "Failed to persist Claude interaction",
+                user_id=interaction.user_id,
+                session_id=interaction.session_id,
+                error=str(e),
+            )
+
+    async def _write(
+        self, conn: aiosqlite.Connection, batch: List[PendingInteraction]
+    ) -> None:
+        """Issue all statements for ``batch`` inside the current transaction."""
+        tool_rows: List[Tuple] = []
+        audit_rows: List[Tuple] = []
+        daily_costs: Dict[Tuple[int, str], List[float]] = defaultdict(lambda: [0.0, 0])
+        user_deltas: Dict[int, List[Any]] = {}
+        session_deltas: Dict[str, List[Any]] = {}
+
+        for item in batch:
+            # Message ids are needed for tool rows, so these stay one by one
+            cursor = await conn.execute(
+                """
+                INSERT INTO messages
+                (session_id, user_id, timestamp, prompt, response, cost,
+                 duration_ms, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    item.session_id,
+                    item.user_id,
+                    item.timestamp,
+                    item.prompt,
+                    item.response,
+                    item.cost,
+                    item.duration_ms,
+                    item.error,
+                ),
+            )
+            message_id = cursor.lastrowid
+            success = item.error is None
+
+            for tool in item.tools:
+                tool_input = tool.get("input", {})
+                tool_rows.append(
+                    (
+                        item.session_id,
+                        message_id,
+                        tool["name"],
+                        json.dumps(tool_input) if tool_input else None,
+                        item.timestamp,
+                        success,
+                        item.error,
+                    )
+                )
+
+            audit_rows.append(
+                (
+                    item.user_id,
+                    "claude_interaction",
+                    json.dumps(
+                        {
+                            "session_id": item.session_id,
+                            "cost": item.cost,
+                            "duration_ms": item.duration_ms,
+                            "num_turns": item.num_turns,
+                            "is_error": not success,
+                            "tools_used": [t["name"] for t in item.tools],
+                        }
+                    ),
+                    success,
+                    item.timestamp,
+                    item.ip_address,
+                )
+            )
+
+            day = daily_costs[(item.user_id, item.timestamp.strftime("%Y-%m-%d"))]
+            day[0] += item.cost
+            day[1] += 1
+
+            user = user_deltas.setdefault(item.user_id, [0.0, 0, item.timestamp])
+            user[0] += item.cost
+            user[1] += 1
+            user[2] = max(user[2], item.timestamp)
+
+            session = session_deltas.setdefault(
+                item.session_id, [0.0, 0, 0, item.timestamp]
+            )
+            session[0] += item.cost
+            session[1] += item.num_turns
+            session[2] += 1
+            session[3] = max(session[3], item.timestamp)
+
+        if tool_rows:
+            await conn.executemany(
+                """
+                INSERT INTO tool_usage
+                (session_id, message_id, tool_name, tool_input, timestamp, success,
+                 error_message)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+                tool_rows,
+            )
+
+        await conn.executemany(
+            """
+            INSERT INTO audit_log
+            (user_id, event_type, event_data, success, timestamp, ip_address)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            audit_rows,
+        )
+
+        await conn.executemany(
+            """
+            INSERT INTO cost_tracking (user_id, date, daily_cost, request_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, date)
+            DO UPDATE SET
+                daily_cost = daily_cost + excluded.daily_cost,
+                request_count = request_count + excluded.request_count
+        """,
+            [
+                (user_id, date, cost, count)
+                for (user_id, date), (cost, count) in daily_costs.items()
+            ],
+        )
+
+        await conn.executemany(
+            """
+            UPDATE users
+            SET total_cost = total_cost + ?,
+                message_count = message_count + ?,
+                last_active = ?
+            WHERE user_id = ?
+        """,
+            [
+                (cost, count, last_active, user_id)
+                for user_id, (cost, count, last_active) in user_deltas.items()
+            ],
+        )
+
+        await conn.executemany(
+            """
+            UPDATE sessions
+            SET total_cost = total_cost + ?,
+                total_turns = total_turns + ?,
+                message_count = message_count + ?,
+                last_used = ?
+            WHERE session_id = ?
+        """,
+            [
+                (cost, turns, count, last_used, session_id)
+                for session_id, (
+                    cost,
+                    turns,
+                    count,
+                    last_used,
+                ) in session_deltas.items()
+            ],
+        )
@@ -0,0 +1,240 @@
+"""Tests for the ring-buffer audit storage persisted to audit_log."""
+
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from src.security.audit import AuditEvent, AuditLogger
+from src.storage.audit_storage import SQLiteAuditStorage
+from src.storage.database import DatabaseManager
+from src.storage.models import UserModel
+from src.storage.repositories import UserRepository
+
+KNOWN_USERS = (1, 2)
+
+
+def _event(
+    user_id: int = 1,
+    event_type: str = "command",
+    minutes_ago: float = 0,
+    success: bool = True,
+    risk_level: str = "low",
+    violation_type: Optional[str] = None,
+) -> AuditEvent:
+    details = {"violation_type": violation_type} if violation_type else {}
+    return AuditEvent(
+        timestamp=datetime.utcnow() - timedelta(minutes=minutes_ago),
+        user_id=user_id,
+        event_type=event_type,
+        success=success,
+        details=details,
+        risk_level=risk_level,
+    )
+
+
+@pytest.fixture
+async def db(tmp_path: Path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}")
+    await manager.initialize()
+    users = UserRepository(manager)
+    for user_id in KNOWN_USERS:
+        await users.create_user(UserModel(user_id=user_id, is_allowed=True))
+    yield manager
+    await manager.close()
+
+
+def _memory_storage(**overrides) -> SQLiteAuditStorage:
+    """Storage whose events stay in memory (never flushed)."""
+    storage = SQLiteAuditStorage(db_manager=None, **overrides)
+    storage._closed = True
+    return storage
+
+
+async def _audit_rows(db: DatabaseManager):
+    async with db.get_connection() as conn:
+        cursor = await conn.execute(
+            "SELECT user_id, event_type, event_data, success FROM audit_log"
+            " ORDER BY id"
+        )
+        return await cursor.fetchall()
+
+
+class TestEviction:
+    async def test_overflow_evicts_from_every_index(self):
+        storage = _memory_storage(max_events=3)
+
+        await storage.store_event(_event(user_id=1, event_type="auth_attempt"))
+        await storage.store_event(_event(user_id=2, event_type="command"))
+        await storage.store_event(_event(user_id=2, event_type="command"))
+        await storage.store_event(_event(user_id=3, event_type="command"))
+
+        # User 1 and the auth_attempt type only had the evicted event
+        assert 1 not in storage._by_user
+        assert "auth_attempt" not in storage._by_type
+        assert len(storage._by_user[2]) == 2
+        assert len(storage._by_type["command"]) == 3
+        assert len(storage._window) == 3
+        assert await storage.get_events(user_id=1) == []
+
+        stats = await storage.get_window_stats()
+        assert stats["total_events"] == 3
+        assert stats["active_users"] == 2
+        assert stats["event_types"] == {"command": 3}
+        assert storage.get_stats()["evicted"] == 1
+
+    async def test_evicted_event_already_expired_is_not_counted_twice(self):
+        storage = _memory_storage(max_events=2, stats_window=timedelta(hours=1))
+
+        await storage.store_event(_event(user_id=1, minutes_ago=120))
+        assert (await storage.get_window_stats())["total_events"] == 0
+
+        await storage.store_event(_event(user_id=2))
+        await storage.store_event(_event(user_id=2))
+
+        stats = await storage.get_window_stats()
+        assert stats["total_events"] == 2
+        assert stats["active_users"] == 1
+
+
+class TestOrdering:
+    async def test_out_of_order_timestamps_are_sorted(self):
+        storage = _memory_storage()
+
+        await storage.store_event(_event(event_type="a", minutes_ago=1))
+        await storage.store_event(_event(event_type="b", minutes_ago=5))
+        await storage.store_event(_event(event_type="c", minutes_ago=3))
+
+        assert storage._disorder_seq == 2
+        events = await storage.get_events()
+        assert [e.event_type for e in events] == ["a", "c", "b"]
+
+        since = datetime.utcnow() - timedelta(minutes=4)
+        events = await storage.get_events(start_time=since)
+        assert [e.event_type for e in events] == ["a", "c"]
+
+    async def test_order_trusted_again_once_disorder_is_evicted(self):
+        storage = _memory_storage(max_events=2)
+
+        await storage.store_event(_event(event_type="a", minutes_ago=1))
+        await storage.store_event(_event(event_type="b", minutes_ago=5))
+        assert not storage._is_ordered()
+
+        await storage.store_event(_event(event_type="c", minutes_ago=0))
+        await storage.store_event(_event(event_type="d", minutes_ago=0))
+
+        assert storage._is_ordered()
+        events = await storage.get_events()
+        assert [e.event_type for e in events] == ["d", "c"]
+
+    async def test_window_rebuilt_when_out_of_order(self):
+        storage = _memory_storage(stats_window=timedelta(hours=1))
+
+        await storage.store_event(_event(user_id=1, minutes_ago=10))
+        # Older than the window but arrives last
+        await storage.store_event(_event(user_id=2, minutes_ago=90))
+
+        stats = await storage.get_window_stats()
+        assert stats["total_events"] == 1
+        assert stats["active_users"] == 1
+
+
+class TestWindowStats:
+    async def test_events_expire_from_window(self):
+        storage = _memory_storage(stats_window=timedelta(hours=1))
+
+        await storage.store_event(
+            _event(event_type="auth_attempt", success=False, minutes_ago=90)
+        )
+        await storage.store_event(
+            _event(event_type="auth_attempt", success=False, minutes_ago=30)
+        )
+        await storage.store_event(_event(user_id=2, risk_level="high"))
+
+        stats = await storage.get_window_stats()
+        assert stats["window_seconds"] == 3600
+        assert stats["total_events"] == 2
+        assert stats["active_users"] == 2
+        assert stats["authentication_failures"] == 1
+        assert stats["risk_distribution"] == {"low": 1, "high": 1}
+        # Expired events stay queryable, only the counters move on
+        assert len(await storage.get_events()) == 3
+
+    async def test_dashboard_violations_limited_to_window(self):
+        storage = _memory_storage()
+
+        await storage.store_event(
+            _event(
+                event_type="security_violation",
+                minutes_ago=30 * 60,
+                violation_type="path_traversal",
+            )
+        )
+        for vtype in ("path_traversal", "command_injection", "path_traversal"):
+            await storage.store_event(
+                _event(event_type="security_violation", violation_type=vtype)
+            )
+
+        dashboard = await AuditLogger(storage).get_security_dashboard()
+
+        assert dashboard["period"] == "24_hours"
+        assert dashboard["security_violations"] == 3
+        assert dashboard["top_violation_types"] == {
+            "path_traversal": 2,
+            "command_injection": 1,
+        }
+
+
+class TestPersistence:
+    async def test_flush_writes_to_audit_log(self, db):
+        storage = SQLiteAuditStorage(db, flush_interval_ms=60_000)
+
+        await storage.store_event(_event(user_id=1, event_type="command"))
+        await storage.store_event(
+            _event(user_id=2, event_type="auth_attempt", success=False)
+        )
+        assert await _audit_rows(db) == []
+
+        await storage.flush()
+
+        rows = await _audit_rows(db)
+        assert [(r[0], r[1], bool(r[3])) for r in rows] == [
+            (1, "command", True),
+            (2, "auth_attempt", False),
+        ]
+        assert json.loads(rows[0][2])["risk_level"] == "low"
+        assert storage.get_stats()["written"] == 2
+        assert storage.get_stats()["pending"] == 0
+        await storage.close()
+
+    async def test_close_writes_pending_events(self, db):
+        storage = SQLiteAuditStorage(db, flush_interval_ms=60_000, batch_size=100)
+
+        for _ in range(3):
+            await storage.store_event(_event(user_id=1))
+        await storage.close()
+
+        assert len(await _audit_rows(db)) == 3
+        # Events after close stay in memory only
+        await storage.store_event(_event(user_id=1))
+        assert storage.get_stats()["pending"] == 0
+        assert len(await _audit_rows(db)) == 3
+
+    async def test_unknown_users_are_skipped_and_counted(self, db):
+        storage = SQLiteAuditStorage(db, flush_interval_ms=0)
+
+        await storage.store_event(_event(user_id=1))
+        await storage.store_event(_event(user_id=999))
+        await storage.store_event(_event(user_id=2))
+
+        rows = await _audit_rows(db)
+        assert [r[0] for r in rows] == [1, 2]
+        stats = storage.get_stats()
+        assert stats["written"] == 2
+        assert stats["skipped_unknown_user"] == 1
+        assert stats["dropped"] == 0
+        # The stranger's event is still answered from memory
+        assert len(await storage.get_events(user_id=999)) == 1
+        await storage.close()
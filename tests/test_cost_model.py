@@ -0,0 +1,189 @@
+"""Tests for the learned per-message cost model."""
+
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from src.security import cost_model
+from src.security.cost_model import (
+    CostModel,
+    classify_message,
+    length_bucket,
+    prior_cost,
+)
+from src.storage.database import DatabaseManager
+from src.storage.models import MessageModel, SessionModel, UserModel
+from src.storage.repositories import (
+    MessageRepository,
+    SessionRepository,
+    UserRepository,
+)
+
+
+class TestPredict:
+    def test_prior_without_history(self):
+        model = CostModel(min_samples=2)
+
+        assert model.predict(1, "complex", 100) == prior_cost("complex", 100)
+        assert model.stats["prior_hits"] == 1
+
+    def test_global_average_once_it_has_enough_samples(self):
+        model = CostModel(min_samples=2)
+        model.observe(2, "text", 100, 0.5)
+        assert model.predict(1, "text", 100) == prior_cost("text", 100)
+
+        model.observe(3, "text", 120, 0.5)
+
+        # User 1 has no history of its own; bucket is shared with 100..120
+        assert model.predict(1, "text", 110) == pytest.approx(0.5)
+        assert model.stats["global_hits"] == 1
+
+    def test_user_average_preferred_over_global(self):
+        model = CostModel(min_samples=2)
+        for _ in range(2):
+            model.observe(1, "text", 100, 1.0)
+        for _ in range(5):
+            model.observe(2, "text", 100, 0.1)
+
+        assert model.predict(1, "text", 100) == pytest.approx(1.0)
+        assert model.stats["user_hits"] == 1
+        assert model.predict(3, "text", 100) < 1.0
+        assert model.stats["global_hits"] == 1
+
+    def test_user_with_too_few_samples_falls_back_to_global(self):
+        model = CostModel(min_samples=3)
+        model.observe(1, "text", 100, 9.0)
+        for _ in range(3):
+            model.observe(2, "text", 100, 0.2)
+
+        # The global average includes user 1's single sample
+        predicted = model.predict(1, "text", 100)
+        assert model.stats["user_hits"] == 0
+        assert model.stats["global_hits"] == 1
+        assert predicted != pytest.approx(9.0)
+
+    def test_buckets_and_kinds_are_separate(self):
+        model = CostModel(min_samples=1)
+        model.observe(1, "text", 10, 1.0)
+
+        assert length_bucket(10) != length_bucket(5000)
+        assert model.predict(1, "text", 5000) == prior_cost("text", 5000)
+        assert model.predict(1, "command", 10) == prior_cost("command", 10)
+
+    def test_estimate_classifies_message(self):
+        model = CostModel(min_samples=1)
+        model.observe(1, "file", 2048, 0.7)
+
+        assert model.estimate(1, "ignored", is_file=True, file_size=2048) == (
+            pytest.approx(0.7)
+        )
+        assert classify_message("/status") == "command"
+        assert classify_message("please refactor this") == "complex"
+        assert classify_message(None) == "text"
+
+
+class TestObserve:
+    def test_first_sample_sets_average(self):
+        model = CostModel(alpha=0.5, min_samples=1)
+
+        model.observe(1, "text", 100, 0.4)
+
+        assert model.predict(1, "text", 100) == pytest.approx(0.4)
+
+    def test_ewma_update(self):
+        model = CostModel(alpha=0.5, min_samples=1)
+
+        model.observe(1, "text", 100, 1.0)
+        model.observe(1, "text", 100, 0.0)
+        assert model.predict(1, "text", 100) == pytest.approx(0.5)
+
+        model.observe(1, "text", 100, 1.0)
+        assert model.predict(1, "text", 100) == pytest.approx(0.75)
+        assert model.stats["samples"] == 3
+        assert model.get_stats()["global_averages"] == {
+            f"text:{length_bucket(100)}": 0.75
+        }
+
+
+@pytest.fixture
+async def messages(tmp_path: Path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}")
+    await db.initialize()
+    now = datetime.utcnow()
+    await UserRepository(db).create_user(UserModel(user_id=1, is_allowed=True))
+    await SessionRepository(db).create_session(
+        SessionModel(
+            session_id="s1",
+            user_id=1,
+            project_path="/tmp",
+            created_at=now,
+            last_used=now,
+        )
+    )
+    repo = MessageRepository(db)
+
+    async def add(prompt: str, cost: float) -> int:
+        return await repo.save_message(
+            MessageModel(
+                session_id="s1", user_id=1, timestamp=now, prompt=prompt, cost=cost
+            )
+        )
+
+    yield repo, add
+    await db.close()
+
+
+class TestRefit:
+    async def test_refit_pages_through_samples(self, messages, monkeypatch):
+        repo, add = messages
+        monkeypatch.setattr(cost_model, "REFIT_BATCH_SIZE", 2)
+        ids = [await add("hello there", 0.1) for _ in range(5)]
+        fetch = repo.get_cost_samples
+        after_ids = []
+
+        async def spy(after_id, *args):
+            after_ids.append(after_id)
+            return await fetch(after_id, *args)
+
+        monkeypatch.setattr(repo, "get_cost_samples", spy)
+        model = CostModel(store=repo, alpha=0.5, min_samples=5)
+
+        assert await model.refit() == 5
+
+        assert after_ids == [0, ids[1], ids[3]]
+
+        assert model.get_stats()["last_message_id"] == ids[-1]
+        assert model.stats["samples"] == 5
+        assert model.predict(1, "text", len("hello there")) == pytest.approx(0.1)
+
+    async def test_refit_only_reads_new_rows(self, messages, monkeypatch):
+        repo, add = messages
+        monkeypatch.setattr(cost_model, "REFIT_BATCH_SIZE", 2)
+        for _ in range(3):
+            await add("hello", 0.1)
+        model = CostModel(store=repo, min_samples=1)
+        await model.refit()
+
+        assert await model.refit() == 0
+
+        last = await add("please explain this", 0.9)
+        assert await model.refit() == 1
+        assert model.get_stats()["last_message_id"] == last
+        assert model.stats["samples"] == 4
+        assert model.predict(1, "complex", len("please explain this")) == (
+            pytest.approx(0.9)
+        )
+
+    async def test_refit_recognises_uploaded_files(self, messages):
+        repo, add = messages
+        prompt = f"Review this\n\n{cost_model.FILE_PROMPT_MARKER}main.py`\n\n..."
+        await add(prompt, 0.3)
+        model = CostModel(store=repo, min_samples=1)
+
+        await model.refit()
+
+        assert model.predict(1, "file", len(prompt)) == pytest.approx(0.3)
+
+    async def test_refit_without_store(self):
+        assert await CostModel().refit() == 0
@@ -0,0 +1,169 @@
+"""Tests for the fused pre-dispatch middleware pipeline."""
+
+import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from telegram import Chat, Message, Update, User
+from telegram.ext import Application, ExtBot, MessageHandler, filters
+
+from src.bot.middleware.pipeline import (
+    UPDATE_CONTEXT_KEY,
+    MiddlewarePipeline,
+    UpdateContext,
+    get_update_context,
+)
+
+
+def _update(user_id: int = 5, text: str = "hello") -> Update:
+    message = Message(
+        1,
+        datetime.datetime.now(),
+        Chat(1, "private"),
+        from_user=User(user_id, "user", False, username="someone"),
+        text=text,
+    )
+    return Update(1, message=message)
+
+
+async def _passing(handler, event, data):
+    return await handler(event, data)
+
+
+async def _blocking(handler, event, data):
+    return None
+
+
+async def _failing(handler, event, data):
+    raise RuntimeError("stage exploded")
+
+
+@pytest.fixture
+async def application():
+    """Initialized application that never talks to Telegram."""
+    app = Application.builder().token("123:abc").updater(None).build()
+    with (
+        patch.object(ExtBot, "initialize", AsyncMock()),
+        patch.object(ExtBot, "shutdown", AsyncMock()),
+    ):
+        await app.initialize()
+        yield app
+        await app.shutdown()
+
+
+def _install(app: Application, stages) -> tuple:
+    """Register the pipeline like the bot does, plus a recording handler."""
+    pipeline = MiddlewarePipeline(stages, {"dep": object()}, settings=object())
+    reached = []
+
+    async def handler(update, context):
+        reached.append(update.update_id)
+
+    app.add_handler(MessageHandler(filters.ALL, pipeline), group=-1)
+    app.add_handler(MessageHandler(filters.ALL, handler), group=0)
+    return pipeline, reached
+
+
+class TestShortCircuit:
+    async def test_passed_update_reaches_handlers(self, application):
+        pipeline, reached = _install(
+            application, [("auth", _passing), ("rate_limit", _passing)]
+        )
+
+        await application.process_update(_update())
+
+        assert reached == [1]
+        assert pipeline.stats["passed"] == 1
+
+    async def test_stage_not_calling_handler_stops_later_groups(self, application):
+        later_stage = AsyncMock()
+        pipeline, reached = _install(
+            application, [("auth", _blocking), ("rate_limit", later_stage)]
+        )
+
+        await application.process_update(_update())
+
+        assert reached == []
+        later_stage.assert_not_called()
+        stats = pipeline.get_stats()
+        assert stats["blocked"] == 1
+        assert stats["stages"]["auth"]["blocked"] == 1
+        assert stats["stages"]["rate_limit"]["latency"]["count"] == 0
+
+    async def test_failing_stage_reports_error_and_stops(self, application):
+        errors = []
+
+        async def on_error(update, context):
+            errors.append(context.error)
+
+        application.add_error_handler(on_error)
+        pipeline, reached = _install(
+            application, [("security", _failing), ("auth", _passing)]
+        )
+
+        await application.process_update(_update())
+
+        assert reached == []
+        assert len(errors) == 1
+        assert isinstance(errors[0], RuntimeError)
+        stats = pipeline.get_stats()
+        assert stats["errors"] == 1
+        assert stats["stages"]["security"]["errors"] == 1
+        assert stats["stages"]["auth"]["passed"] == 0
+
+
+class TestLatency:
+    async def test_passed_update_records_histograms(self, application):
+        pipeline, _ = _install(
+            application, [("security", _passing), ("auth", _passing)]
+        )
+
+        await application.process_update(_update())
+        await application.process_update(_update())
+
+        stats = pipeline.get_stats()
+        for name in ("security", "auth"):
+            assert stats["stages"][name]["passed"] == 2
+            assert stats["stages"][name]["latency"]["count"] == 2
+        assert stats["total"]["count"] == 2
+        assert stats["dispatch_overhead"]["count"] == 2
+        assert stats["dispatch_overhead"]["max_ms"] <= stats["total"]["max_ms"]
+
+
+class TestUpdateContext:
+    async def test_stages_share_one_context(self, application):
+        seen = []
+
+        async def recording(handler, event, data):
+            seen.append(get_update_context(event, data))
+            return await handler(event, data)
+
+        _install(application, [("first", recording), ("second", recording)])
+
+        await application.process_update(_update(user_id=42, text="hi"))
+
+        assert seen[0] is seen[1]
+        assert seen[0].user_id == 42
+        assert seen[0].text == "hi"
+
+    def test_outside_pipeline_builds_fresh_context(self):
+        context = get_update_context(_update(user_id=7, text="ls"), {})
+
+        assert isinstance(context, UpdateContext)
+        assert context.user_id == 7
+        assert context.username == "someone"
+        assert context.text == "ls"
+
+    def test_outside_pipeline_handles_update_without_user(self):
+        context = get_update_context(Update(2), {})
+
+        assert context.user_id is None
+        assert context.message is None
+        assert context.text is None
+
+    def test_prefers_context_from_data(self):
+        shared = UpdateContext(_update(user_id=9))
+
+        context = get_update_context(_update(user_id=1), {UPDATE_CONTEXT_KEY: shared})
+
+        assert context is shared
@@ -0,0 +1,200 @@
+"""Tests for RateLimiter's in-memory limits."""
+
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from src.config.loader import create_test_config
+from src.security import rate_limiter
+from src.security.rate_limiter import RateLimiter
+
+HOUR = 3600
+
+
+class _Clock:
+    """Monotonic and wall clock advanced together by the test."""
+
+    def __init__(self) -> None:
+        # Exactly on a UTC hour boundary
+        self.wall = float(1_700_000_000 - 1_700_000_000 % HOUR)
+        self.mono = 5000.0
+
+    def monotonic(self) -> float:
+        return self.mono
+
+    def time(self) -> float:
+        return self.wall
+
+    def strftime(self, fmt: str, t: Any) -> str:
+        return time.strftime(fmt, t)
+
+    def gmtime(self, secs: float) -> Any:
+        return time.gmtime(secs)
+
+    def advance(self, seconds: float) -> None:
+        self.mono += seconds
+        self.wall += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_limiter(clock, tmp_path: Path):
+    def make(**overrides: Any) -> RateLimiter:
+        values: Dict[str, Any] = {
+            "approved_directory": str(tmp_path / "projects"),
+            "claude_max_cost_per_user": 10.0,
+            "claude_cost_window_hours": 1,
+            # One token per minute
+            "rate_limit_requests": 60,
+            "rate_limit_window": HOUR,
+            "rate_limit_burst": 5,
+            "rate_limit_sweep_interval_seconds": 0,
+        }
+        values.update(overrides)
+        return RateLimiter(create_test_config(**values))
+
+    return make
+
+
+def _cost(limiter: RateLimiter, user_id: int) -> float:
+    return limiter.get_user_status(user_id)["cost_usage"]["current"]
+
+
+def _tokens(limiter: RateLimiter, user_id: int) -> float:
+    return limiter.get_user_status(user_id)["request_bucket"]["tokens"]
+
+
+class TestCostWindow:
+    async def test_spend_counts_fully_within_window(self, make_limiter, clock):
+        limiter = make_limiter()
+        assert (await limiter.check_rate_limit(1, cost=8.0))[0]
+
+        clock.advance(HOUR - 1)
+
+        assert _cost(limiter, 1) == pytest.approx(8.0)
+        assert not (await limiter.check_rate_limit(1, cost=2.5))[0]
+
+    async def test_previous_window_decays_across_one_boundary(
+        self, make_limiter, clock
+    ):
+        limiter = make_limiter()
+        assert (await limiter.check_rate_limit(1, cost=8.0))[0]
+
+        # A quarter into the next window, three quarters still overlap
+        clock.advance(HOUR + HOUR / 4)
+        assert _cost(limiter, 1) == pytest.approx(6.0)
+        assert not (await limiter.check_rate_limit(1, cost=4.5))[0]
+        assert (await limiter.check_rate_limit(1, cost=3.5))[0]
+        assert _cost(limiter, 1) == pytest.approx(9.5)
+
+    async def test_spend_is_gone_after_two_boundaries(self, make_limiter, clock):
+        limiter = make_limiter()
+        assert (await limiter.check_rate_limit(1, cost=8.0))[0]
+
+        clock.advance(2 * HOUR + 1)
+
+        assert _cost(limiter, 1) == 0.0
+        assert (await limiter.check_rate_limit(1, cost=9.5))[0]
+
+
+class TestBuckets:
+    async def test_check_consumes_exactly_one_token(self, make_limiter):
+        limiter = make_limiter(
+            rate_limit_global_requests=60, rate_limit_global_burst=10
+        )
+
+        assert (await limiter.check_rate_limit(1))[0]
+
+        assert _tokens(limiter, 1) == pytest.approx(4.0)
+        assert limiter.global_bucket.tokens == pytest.approx(9.0)
+
+    async def test_bucket_refills_lazily(self, make_limiter, clock):
+        limiter = make_limiter()
+        for _ in range(5):
+            assert (await limiter.check_rate_limit(1))[0]
+        assert not (await limiter.check_rate_limit(1))[0]
+
+        clock.advance(60)
+
+        assert (await limiter.check_rate_limit(1))[0]
+        assert not (await limiter.check_rate_limit(1))[0]
+
+    async def test_user_rejection_does_not_drain_global_bucket(self, make_limiter):
+        limiter = make_limiter(
+            rate_limit_burst=1,
+            rate_limit_global_requests=60,
+            rate_limit_global_burst=10,
+        )
+        assert (await limiter.check_rate_limit(1))[0]
+
+        for _ in range(3):
+            allowed, message = await limiter.check_rate_limit(1)
+            assert not allowed
+            assert "Rate limit exceeded" in message
+
+        assert limiter.global_bucket.tokens == pytest.approx(9.0)
+        assert limiter.stats["rejected_user_rate"] == 3
+
+    async def test_cost_rejection_does_not_drain_buckets(self, make_limiter):
+        limiter = make_limiter(
+            rate_limit_global_requests=60, rate_limit_global_burst=10
+        )
+
+        assert not (await limiter.check_rate_limit(1, cost=11.0))[0]
+
+        assert _tokens(limiter, 1) == pytest.approx(5.0)
+        assert limiter.global_bucket.tokens == pytest.approx(10.0)
+
+    async def test_global_limit_applies_across_users(self, make_limiter):
+        limiter = make_limiter(rate_limit_global_requests=60, rate_limit_global_burst=2)
+
+        assert (await limiter.check_rate_limit(1))[0]
+        assert (await limiter.check_rate_limit(2))[0]
+        allowed, message = await limiter.check_rate_limit(3)
+
+        assert not allowed
+        assert "too many requests" in message
+        # The rejected user's own bucket is left as it was
+        assert _tokens(limiter, 3) == pytest.approx(5.0)
+
+
+class TestSweep:
+    async def test_sweep_removes_only_users_with_unchanged_decisions(
+        self, make_limiter, clock
+    ):
+        limiter = make_limiter()
+        for user_id in (1, 3, 4):
+            assert (await limiter.check_rate_limit(user_id, cost=0.0))[0]
+        assert (await limiter.check_rate_limit(2, cost=9.5))[0]
+
+        # Every bucket has refilled; user 1 then spends another token
+        clock.advance(61)
+        assert (await limiter.check_rate_limit(1, cost=0.0))[0]
+        before = {user_id: limiter.get_user_status(user_id) for user_id in (1, 2, 3, 4)}
+
+        assert await limiter.sweep() == 2
+
+        assert set(limiter.users) == {1, 2}
+        for user_id, status in before.items():
+            after = limiter.get_user_status(user_id)
+            assert after["request_bucket"] == status["request_bucket"]
+            assert after["cost_usage"] == status["cost_usage"]
+        assert not (await limiter.check_rate_limit(2, cost=1.0))[0]
+
+    async def test_spend_in_previous_window_keeps_user(self, make_limiter, clock):
+        limiter = make_limiter()
+        await limiter.check_rate_limit(1, cost=1.0)
+
+        clock.advance(HOUR + 60)
+        assert await limiter.sweep() == 0
+
+        clock.advance(HOUR)
+        assert await limiter.sweep() == 1
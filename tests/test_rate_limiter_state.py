@@ -0,0 +1,267 @@
+"""Tests for RateLimiter state persisted to cost_tracking."""
+
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from src.config.loader import create_test_config
+from src.security import rate_limiter
+from src.security.rate_limiter import RateLimiter
+from src.storage.database import DatabaseManager
+from src.storage.models import UserModel
+from src.storage.repositories import CostTrackingRepository, UserRepository
+
+KNOWN_USERS = (1, 2)
+HOUR = 3600
+
+
+class _Clock:
+    """Monotonic and wall clock advanced together by the test."""
+
+    def __init__(self) -> None:
+        # Ten minutes into a UTC hour, well before midnight
+        self.wall = 1_700_000_000 - 1_700_000_000 % 86400 + 10 * HOUR + 600
+        self.mono = 5000.0
+
+    def monotonic(self) -> float:
+        return self.mono
+
+    def time(self) -> float:
+        return self.wall
+
+    def strftime(self, fmt: str, t: Any) -> str:
+        return time.strftime(fmt, t)
+
+    def gmtime(self, secs: float) -> Any:
+        return time.gmtime(secs)
+
+    def advance(self, seconds: float) -> None:
+        self.mono += seconds
+        self.wall += seconds
+
+
+@pytest.fixture
+async def costs(tmp_path: Path):
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}")
+    await db.initialize()
+    users = UserRepository(db)
+    for user_id in KNOWN_USERS:
+        await users.create_user(UserModel(user_id=user_id, is_allowed=True))
+    yield CostTrackingRepository(db)
+    await db.close()
+
+
+@pytest.fixture
+def make_limiter(costs, tmp_path: Path):
+    """Build limiters sharing one database; their flush tasks are cancelled."""
+    limiters: List[RateLimiter] = []
+
+    def make(**overrides: Any) -> RateLimiter:
+        values: Dict[str, Any] = {
+            "approved_directory": str(tmp_path / "projects"),
+            "claude_max_cost_per_user": 10.0,
+            # One token per hour: bucket levels do not drift during a test
+            "rate_limit_requests": 1,
+            "rate_limit_window": 3600,
+            "rate_limit_burst": 20,
+            "rate_limit_sweep_interval_seconds": 0,
+            "rate_limit_state_flush_interval_ms": 60_000,
+        }
+        values.update(overrides)
+        limiter = RateLimiter(create_test_config(**values), state_store=costs)
+        limiters.append(limiter)
+        return limiter
+
+    yield make
+    for limiter in limiters:
+        for task in (limiter._flush_task, limiter._sweep_task):
+            if task and not task.done():
+                task.cancel()
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+async def _rows(costs: CostTrackingRepository, user_id: int) -> List[Dict[str, Any]]:
+    return await costs.get_limit_state(user_id, "0000-00-00")
+
+
+class TestLoading:
+    async def test_spend_survives_restart_via_lazy_load(self, make_limiter):
+        first = make_limiter()
+        assert (await first.check_rate_limit(1, cost=4.0))[0]
+        assert await first.flush() == 1
+
+        second = make_limiter()
+        allowed, message = await second.check_rate_limit(1, cost=7.0)
+        assert not allowed
+        assert "Cost limit exceeded" in message
+        assert (await second.check_rate_limit(1, cost=6.0))[0]
+        assert second.stats["state_loaded"] == 1
+
+    async def test_user_without_state_starts_fresh(self, make_limiter):
+        limiter = make_limiter()
+
+        assert (await limiter.check_rate_limit(2, cost=9.0))[0]
+        assert limiter.stats["state_load_misses"] == 1
+
+    async def test_bucket_level_is_restored(self, make_limiter):
+        first = make_limiter()
+        assert (await first.check_rate_limit(1, cost=0.0, tokens=15))[0]
+        await first.flush()
+
+        second = make_limiter()
+        assert not (await second.check_rate_limit(1, cost=0.0, tokens=10))[0]
+        assert (await second.check_rate_limit(1, cost=0.0, tokens=5))[0]
+
+    async def test_prewarm_loads_recently_active_users(self, make_limiter):
+        first = make_limiter()
+        for user_id in KNOWN_USERS:
+            assert (await first.check_rate_limit(user_id, cost=3.0))[0]
+        await first.flush()
+
+        second = make_limiter()
+        assert await second.prewarm() == 2
+        assert set(second.users) == set(KNOWN_USERS)
+        status = second.get_user_status(1)
+        assert status["cost_usage"]["current"] == pytest.approx(3.0)
+
+        # Prewarmed users are not loaded again on their first request
+        await second.check_rate_limit(1, cost=1.0)
+        assert second.stats["state_loaded"] == 0
+
+    async def test_prewarm_respects_max_users(self, make_limiter):
+        first = make_limiter()
+        for user_id in KNOWN_USERS:
+            await first.check_rate_limit(user_id, cost=1.0)
+        await first.flush()
+
+        assert await make_limiter(rate_limit_prewarm_max_users=1).prewarm() == 1
+        assert await make_limiter(rate_limit_prewarm_max_users=0).prewarm() == 0
+
+
+class TestWriting:
+    async def test_shutdown_snapshot_writes_pending_cost(self, make_limiter, costs):
+        limiter = make_limiter()
+        await limiter.check_rate_limit(1, cost=2.5, tokens=4)
+
+        await limiter.shutdown()
+
+        [row] = await _rows(costs, 1)
+        assert row["limiter_cost"] == pytest.approx(2.5)
+        assert row["bucket_tokens"] == pytest.approx(16, abs=0.1)
+
+    async def test_snapshot_writes_bucket_without_recharging(self, make_limiter, costs):
+        limiter = make_limiter()
+        await limiter.check_rate_limit(1, cost=2.5, tokens=4)
+        await limiter.check_rate_limit(2, cost=0.0, tokens=0)
+        await limiter.flush()
+
+        # Only user 1 has a bucket below capacity
+        assert await limiter.snapshot() == 1
+
+        [row] = await _rows(costs, 1)
+        assert row["limiter_cost"] == pytest.approx(2.5)
+
+    async def test_users_without_users_row_are_skipped(self, make_limiter, costs):
+        limiter = make_limiter()
+        await limiter.check_rate_limit(1, cost=1.0)
+        await limiter.check_rate_limit(99, cost=1.0)
+
+        assert await limiter.flush() == 1
+        assert limiter.stats["state_skipped_unknown_user"] == 1
+        assert await _rows(costs, 99) == []
+        assert len(await _rows(costs, 1)) == 1
+
+    async def test_reset_user_limits_clears_persisted_state(self, make_limiter, costs):
+        first = make_limiter()
+        await first.check_rate_limit(1, cost=8.0, tokens=10)
+        await first.flush()
+
+        await first.reset_user_limits(1)
+
+        [row] = await _rows(costs, 1)
+        assert row["limiter_cost"] == 0.0
+        assert row["bucket_tokens"] is None
+        assert row["bucket_updated"] is None
+
+        second = make_limiter()
+        assert (await second.check_rate_limit(1, cost=9.0, tokens=20))[0]
+
+    async def test_reset_drops_unflushed_cost(self, make_limiter, costs):
+        limiter = make_limiter()
+        await limiter.check_rate_limit(1, cost=8.0)
+
+        await limiter.reset_user_limits(1)
+        await limiter.flush()
+
+        assert await _rows(costs, 1) == []
+        assert (await limiter.check_rate_limit(1, cost=9.0))[0]
+
+
+class TestShortWindow:
+    """A one hour cost window, which UTC day rows alone cannot represent."""
+
+    async def test_spend_expires_across_sweep(self, make_limiter, clock):
+        limiter = make_limiter(claude_cost_window_hours=1)
+        assert (await limiter.check_rate_limit(1, cost=9.5))[0]
+        await limiter.flush()
+
+        clock.advance(3 * HOUR)
+        assert await limiter.sweep() == 1
+
+        # Reloaded from the row, the spend is out of the window
+        assert (await limiter.check_rate_limit(1, cost=9.0))[0]
+        assert limiter.stats["state_loaded"] == 1
+
+    async def test_sweep_does_not_change_decisions(self, make_limiter, clock):
+        limiter = make_limiter(claude_cost_window_hours=1)
+        assert (await limiter.check_rate_limit(1, cost=9.5))[0]
+        await limiter.flush()
+        clock.advance(3 * HOUR)
+        before = limiter.get_user_status(1)["cost_usage"]["current"]
+
+        await limiter.sweep()
+        await limiter._load_state(1)
+
+        assert before == 0.0
+        assert limiter.get_user_status(1)["cost_usage"]["current"] == 0.0
+
+    async def test_reload_within_window_keeps_spend(self, make_limiter, clock):
+        first = make_limiter(claude_cost_window_hours=1)
+        assert (await first.check_rate_limit(1, cost=9.5))[0]
+        await first.flush()
+
+        clock.advance(600)
+        second = make_limiter(claude_cost_window_hours=1)
+        assert not (await second.check_rate_limit(1, cost=1.0))[0]
+
+    async def test_reload_in_next_window_keeps_weighted_spend(
+        self, make_limiter, clock
+    ):
+        first = make_limiter(claude_cost_window_hours=1)
+        assert (await first.check_rate_limit(1, cost=8.0))[0]
+        await first.flush()
+
+        # Halfway through the next hour half of the spend still counts
+        clock.advance(HOUR - 600 + HOUR / 2)
+        second = make_limiter(claude_cost_window_hours=1)
+        assert not (await second.check_rate_limit(1, cost=6.5))[0]
+        assert (await second.check_rate_limit(1, cost=5.5))[0]
+
+    async def test_prewarm_rebuilds_window_state(self, make_limiter, clock):
+        first = make_limiter(claude_cost_window_hours=1)
+        await first.check_rate_limit(1, cost=9.5)
+        await first.flush()
+
+        clock.advance(600)
+        second = make_limiter(claude_cost_window_hours=1)
+        assert await second.prewarm() == 1
+        status = second.get_user_status(1)
+        assert status["cost_usage"]["current"] == pytest.approx(9.5)
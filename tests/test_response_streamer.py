@@ -0,0 +1,127 @@
+"""Tests for progressive response delivery across SDK->CLI fallback."""
+
+import asyncio
+from pathlib import Path
+from typing import List
+
+from src.bot.handlers.message import _create_stream_handler
+from src.bot.utils.progress_updater import ProgressUpdater
+from src.bot.utils.response_renderer import ResponseRenderer
+from src.bot.utils.response_streamer import BLOCK_SEPARATOR, ResponseStreamer
+from src.claude.facade import ClaudeIntegration
+from src.claude.integration import ClaudeResponse, StreamUpdate
+from src.config.loader import create_test_config
+
+PARAGRAPHS = [
+    " ".join(f"Paragraph {i} sentence {j} says something." for j in range(4))
+    for i in range(8)
+]
+
+
+async def _settle() -> None:
+    """Let the background sender run until it blocks again."""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+class FakeMessage:
+    """Just enough of ``telegram.Message`` for the streamer."""
+
+    chat_id = 1
+    message_id = 10
+
+    def __init__(self):
+        self.sent: List[str] = []
+
+    async def reply_text(self, text, **kwargs):
+        self.sent.append(text)
+        return self
+
+
+class FakeProgress:
+    def update(self, text, parse_mode=None):
+        pass
+
+
+class FailingSDK:
+    """Streams part of an answer, then fails the way the SDK does."""
+
+    def __init__(self, blocks: List[str], reply_to: FakeMessage):
+        self.blocks = blocks
+        self.reply_to = reply_to
+        self.sent_before_failure: List[str] = []
+
+    async def execute_command(self, stream_callback=None, **kwargs):
+        for block in self.blocks:
+            await stream_callback(StreamUpdate(type="assistant", content=block))
+            await _settle()
+        self.sent_before_failure = list(self.reply_to.sent)
+        raise RuntimeError("Failed to decode JSON: unexpected end of data")
+
+
+class StreamingCLI:
+    """Streams the whole answer block by block."""
+
+    def __init__(self, blocks: List[str]):
+        self.blocks = blocks
+
+    async def execute_command(self, stream_callback=None, **kwargs):
+        for block in self.blocks:
+            await stream_callback(StreamUpdate(type="assistant", content=block))
+        return ClaudeResponse(
+            content=self.blocks[-1],
+            session_id="session",
+            cost=0.0,
+            duration_ms=1,
+            num_turns=1,
+        )
+
+
+def _renderer() -> ResponseRenderer:
+    # Small limits so the answer spans several chunks
+    return ResponseRenderer(max_message_length=200, max_code_block_length=150)
+
+
+async def _run(tmp_path: Path, sdk_blocks: List[str], cli_blocks: List[str]):
+    config = create_test_config(approved_directory=str(tmp_path), use_sdk=True)
+    reply_to = FakeMessage()
+    integration = ClaudeIntegration(config, process_manager=StreamingCLI(cli_blocks))
+    integration.sdk_manager = sdk = FailingSDK(sdk_blocks, reply_to)
+
+    updater = ProgressUpdater(
+        chat_rate=1000, chat_burst=1000, global_rate=1000, global_burst=1000
+    )
+    streamer = ResponseStreamer(reply_to, _renderer(), updater)
+    handler = _create_stream_handler(FakeProgress(), streamer)
+
+    response = await integration._execute_with_fallback(
+        prompt="explain", working_directory=tmp_path, stream_callback=handler
+    )
+    if not streamer.includes(response.content):
+        streamer.add_text(response.content)
+    await streamer.finish()
+    return reply_to.sent, sdk.sent_before_failure
+
+
+class TestFallbackDelivery:
+    async def test_each_chunk_delivered_once(self, tmp_path):
+        sent, early = await _run(tmp_path, PARAGRAPHS[:5], PARAGRAPHS)
+
+        # Part of the answer was out before the SDK attempt failed
+        assert early
+        assert sent == _renderer().render(BLOCK_SEPARATOR.join(PARAGRAPHS))
+
+    async def test_unsent_text_of_abandoned_attempt_is_dropped(self, tmp_path):
+        sent, early = await _run(tmp_path, ["An abandoned draft"], PARAGRAPHS)
+
+        assert not early
+        assert all("abandoned" not in text for text in sent)
+        assert sent == _renderer().render(BLOCK_SEPARATOR.join(PARAGRAPHS))
+
+    async def test_diverging_retry_is_sent_after_delivered_chunks(self, tmp_path):
+        retry = ["Different opening. " * 4] + PARAGRAPHS[1:]
+        sent, early = await _run(tmp_path, PARAGRAPHS[:5], retry)
+
+        # Chunks already out stay; the diverging retry is sent in full
+        assert len([text for text in sent if "Paragraph 0" in text]) == 1
+        assert sent == early + _renderer().render(BLOCK_SEPARATOR.join(retry))
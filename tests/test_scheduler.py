@@ -0,0 +1,269 @@
+"""Tests for the Claude run admission scheduler."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.claude.exceptions import ClaudeRequestCancelledError
+from src.claude.facade import ClaudeIntegration
+from src.claude.scheduler import ClaudeScheduler
+from src.config.loader import create_test_config
+
+
+async def _settle() -> None:
+    """Let woken tasks run until they block again."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _queue(scheduler: ClaudeScheduler, user_id: int) -> asyncio.Task:
+    return asyncio.create_task(scheduler.acquire(user_id))
+
+
+class TestAdmission:
+    async def test_admits_immediately_when_free(self):
+        scheduler = ClaudeScheduler(max_concurrent=2, max_per_user=1)
+
+        await scheduler.acquire(1)
+
+        stats = scheduler.get_stats()
+        assert stats["running"] == 1
+        assert stats["admitted_immediately"] == 1
+
+    async def test_queues_at_global_cap_and_admits_on_release(self):
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+        await scheduler.acquire(1)
+
+        waiting = _queue(scheduler, 2)
+        await _settle()
+        assert not waiting.done()
+        assert scheduler.queue_position(2) == 1
+
+        scheduler.release(1)
+        await _settle()
+        assert waiting.done()
+        assert scheduler.get_stats()["running"] == 1
+
+        scheduler.release(2)
+        assert scheduler.get_stats()["running"] == 0
+
+    async def test_per_user_cap(self):
+        scheduler = ClaudeScheduler(max_concurrent=3, max_per_user=1)
+        await scheduler.acquire(1)
+
+        second = _queue(scheduler, 1)
+        await _settle()
+        assert not second.done()
+
+        # Another user still gets a free slot
+        await asyncio.wait_for(scheduler.acquire(2), timeout=1)
+
+        scheduler.release(1)
+        await _settle()
+        assert second.done()
+
+    async def test_user_at_cap_does_not_block_others(self):
+        scheduler = ClaudeScheduler(max_concurrent=2, max_per_user=1)
+        await scheduler.acquire(1)
+        await scheduler.acquire(2)
+
+        # User 1 is first in rotation but already at the per-user cap
+        first = _queue(scheduler, 1)
+        await _settle()
+        other = _queue(scheduler, 3)
+        await _settle()
+
+        scheduler.release(2)
+        await _settle()
+        assert other.done()
+        assert not first.done()
+
+        scheduler.release(1)
+        await _settle()
+        assert first.done()
+        assert scheduler.get_stats()["running"] == 2
+
+    async def test_slot_context_manager_releases(self):
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot(1):
+                assert scheduler.get_stats()["running"] == 1
+                raise RuntimeError("boom")
+
+        assert scheduler.get_stats()["running"] == 0
+
+
+class TestSupersede:
+    async def test_newer_request_supersedes_queued_one(self):
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+        await scheduler.acquire(1)
+
+        old = _queue(scheduler, 2)
+        await _settle()
+        new = _queue(scheduler, 2)
+        await _settle()
+
+        with pytest.raises(ClaudeRequestCancelledError):
+            await old
+        assert not new.done()
+        assert scheduler.get_stats()["superseded"] == 1
+
+        scheduler.release(1)
+        await _settle()
+        assert new.done() and new.exception() is None
+
+    async def test_cancelled_superseded_waiter_does_not_release(self):
+        """Regression: a superseded waiter cancelled in the same tick must
+        not give back a slot it never held."""
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+        await scheduler.acquire(1)
+
+        old = _queue(scheduler, 2)
+        await _settle()
+        new = _queue(scheduler, 2)
+        # Supersede resolves ``old`` with an exception; cancel it before it
+        # gets to run
+        await asyncio.sleep(0)
+        old.cancel()
+        await _settle()
+
+        assert old.cancelled() or isinstance(
+            old.exception(), ClaudeRequestCancelledError
+        )
+        # User 1 still holds the only slot
+        assert not new.done()
+        assert scheduler.get_stats()["running"] == 1
+
+        scheduler.release(1)
+        await _settle()
+        assert new.done()
+        assert scheduler.get_stats()["running"] == 1
+
+        scheduler.release(2)
+        assert scheduler.get_stats()["running"] == 0
+
+
+class TestCancellation:
+    async def test_cancel_while_queued_removes_waiter(self):
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+        await scheduler.acquire(1)
+
+        waiting = _queue(scheduler, 2)
+        await _settle()
+        waiting.cancel()
+        await _settle()
+
+        stats = scheduler.get_stats()
+        assert stats["queued"] == 0
+        assert stats["abandoned"] == 1
+
+        scheduler.release(1)
+        assert scheduler.get_stats()["running"] == 0
+
+    async def test_granted_then_cancelled_gives_slot_back(self):
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+        await scheduler.acquire(1)
+
+        waiting = _queue(scheduler, 2)
+        await _settle()
+        # Grant and cancel in the same tick
+        scheduler.release(1)
+        waiting.cancel()
+        await _settle()
+
+        assert waiting.cancelled()
+        assert scheduler.get_stats()["running"] == 0
+
+        # The slot is usable again
+        await asyncio.wait_for(scheduler.acquire(3), timeout=1)
+
+
+class TestPositions:
+    async def test_position_callback_reports_queue_moves(self):
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+        await scheduler.acquire(1)
+
+        positions = []
+
+        async def on_position(position: int) -> None:
+            positions.append(position)
+
+        first = _queue(scheduler, 2)
+        await _settle()
+        second = asyncio.create_task(scheduler.acquire(3, on_position))
+        await _settle()
+        assert positions == [2]
+
+        scheduler.release(1)
+        await _settle()
+        assert first.done()
+        assert positions == [2, 1]
+
+        scheduler.release(2)
+        await _settle()
+        assert second.done()
+
+
+class TestImageAdmission:
+    """The SDK image path is admitted like run_command."""
+
+    @pytest.fixture
+    def integration(self, tmp_path: Path, monkeypatch):
+        config = create_test_config(approved_directory=str(tmp_path))
+        scheduler = ClaudeScheduler(max_concurrent=1, max_per_user=1)
+        integration = ClaudeIntegration(
+            config, process_manager=object(), scheduler=scheduler
+        )
+        integration.sdk_manager = object()
+        integration.sdk_calls = []
+        integration.cli_calls = []
+
+        async def sdk(prompt, *args):
+            integration.sdk_calls.append(scheduler.get_stats()["running"])
+            return prompt
+
+        async def cli(prompt, *args):
+            integration.cli_calls.append(prompt)
+            return prompt
+
+        monkeypatch.setattr(integration, "_run_command_with_images_sdk", sdk)
+        monkeypatch.setattr(integration, "_run_command_with_images_cli", cli)
+        return integration
+
+    def _run(self, integration, user_id: int, prompt: str) -> asyncio.Task:
+        return asyncio.create_task(
+            integration.run_command_with_images(prompt, [], Path("."), user_id)
+        )
+
+    async def test_sdk_images_wait_for_a_slot(self, integration):
+        scheduler = integration.scheduler
+        await scheduler.acquire(2)
+
+        task = self._run(integration, 1, "look")
+        await _settle()
+        assert not task.done()
+        assert integration.sdk_calls == []
+
+        scheduler.release(2)
+        await _settle()
+        assert await task == "look"
+        assert integration.sdk_calls == [1]
+        assert scheduler.get_stats()["running"] == 0
+
+    async def test_superseded_image_request_does_not_fall_back(self, integration):
+        scheduler = integration.scheduler
+        await scheduler.acquire(2)
+
+        old = self._run(integration, 1, "old")
+        await _settle()
+        new = self._run(integration, 1, "new")
+        await _settle()
+
+        with pytest.raises(ClaudeRequestCancelledError):
+            await old
+        assert integration.cli_calls == []
+
+        scheduler.release(2)
+        assert await new == "new"
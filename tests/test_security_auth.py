@@ -0,0 +1,262 @@
+"""Tests for AuthenticationManager's cached authorization decisions."""
+
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Set
+
+import pytest
+
+from src.security import auth
+from src.security.auth import (
+    AuthenticationManager,
+    AuthProvider,
+    InMemoryTokenStorage,
+    TokenAuthProvider,
+)
+from src.storage.database import DatabaseManager
+from src.storage.models import UserModel
+from src.storage.repositories import UserRepository
+
+
+class _Clock:
+    """Manually advanced stand-in for time.monotonic."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class _SetProvider(AuthProvider):
+    """Allows the users in ``allowed`` and counts provider calls."""
+
+    def __init__(self, allowed: Optional[Set[int]] = None) -> None:
+        self.allowed = set(allowed or ())
+        self.calls = 0
+
+    async def authenticate(self, user_id: int, credentials: Dict[str, Any]) -> bool:
+        self.calls += 1
+        return user_id in self.allowed
+
+    async def get_user_info(self, user_id: int) -> Optional[Dict[str, Any]]:
+        return {"user_id": user_id}
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(auth, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+class TestNegativeCache:
+    async def test_denied_user_skips_providers_until_ttl(self, clock):
+        provider = _SetProvider()
+        manager = AuthenticationManager([provider], negative_ttl=60)
+
+        assert not await manager.authenticate_user(1)
+        assert not await manager.authenticate_user(1)
+        assert provider.calls == 1
+        assert manager.stats["negative_hits"] == 1
+
+        clock.advance(61)
+        provider.allowed.add(1)
+        assert await manager.authenticate_user(1)
+        assert provider.calls == 2
+
+    async def test_credentials_bypass_negative_cache(self, clock):
+        provider = _SetProvider()
+        manager = AuthenticationManager([provider], negative_ttl=60)
+        assert not await manager.authenticate_user(1)
+
+        provider.allowed.add(1)
+        assert await manager.authenticate_user(1, {"token": "new"})
+        assert not manager.is_denied(1)
+
+    async def test_zero_ttl_disables_negative_cache(self, clock):
+        provider = _SetProvider()
+        manager = AuthenticationManager([provider], negative_ttl=0)
+
+        assert not await manager.authenticate_user(1)
+        assert not await manager.authenticate_user(1)
+        assert provider.calls == 2
+
+    async def test_negative_cache_is_bounded(self, clock):
+        manager = AuthenticationManager([_SetProvider()], max_negative=2)
+
+        for user_id in (1, 2, 3):
+            await manager.authenticate_user(user_id)
+
+        assert not manager.is_denied(1)
+        assert manager.is_denied(2) and manager.is_denied(3)
+
+
+class TestDecisionCache:
+    async def test_session_needs_reverification_after_decision_ttl(self, clock):
+        provider = _SetProvider({1})
+        manager = AuthenticationManager([provider], decision_ttl=300)
+        assert await manager.authenticate_user(1)
+
+        clock.advance(299)
+        assert manager.check_and_refresh(1)
+        clock.advance(2)
+        assert not manager.is_authenticated(1)
+
+        assert await manager.authenticate_user(1)
+        assert manager.stats["reverifications"] == 1
+        assert manager.is_authenticated(1)
+
+    async def test_failed_reverification_drops_session(self, clock):
+        provider = _SetProvider({1})
+        manager = AuthenticationManager([provider], decision_ttl=300)
+        assert await manager.authenticate_user(1)
+
+        provider.allowed.clear()
+        clock.advance(301)
+        assert not await manager.authenticate_user(1)
+        assert 1 not in manager.sessions
+        assert manager.is_denied(1)
+
+    async def test_token_session_outlives_decision_ttl(self, clock):
+        provider = TokenAuthProvider("secret", InMemoryTokenStorage())
+        manager = AuthenticationManager([provider], decision_ttl=300)
+        token = await provider.generate_token(1)
+        assert await manager.authenticate_user(1, {"token": token})
+
+        # The middleware re-checks without credentials
+        clock.advance(301)
+        assert not manager.check_and_refresh(1)
+        assert await manager.authenticate_user(1)
+
+        assert manager.is_authenticated(1)
+        assert not manager.is_denied(1)
+        assert manager.stats["reverifications"] == 1
+
+    async def test_other_provider_rejection_keeps_session(self, clock):
+        tokens = TokenAuthProvider("secret", InMemoryTokenStorage())
+        whitelist = _SetProvider()
+        manager = AuthenticationManager([whitelist, tokens], decision_ttl=300)
+        token = await tokens.generate_token(1)
+        assert await manager.authenticate_user(1, {"token": token})
+
+        clock.advance(301)
+        assert await manager.authenticate_user(1)
+        # Only the provider that created the session was asked
+        assert whitelist.calls == 1
+
+        # A wrong token does not end the session either
+        assert not await manager.authenticate_user(1, {"token": "wrong"})
+        assert manager.is_authenticated(1)
+        assert not manager.is_denied(1)
+
+    async def test_expired_token_ends_session_on_recheck(self, clock):
+        storage = InMemoryTokenStorage()
+        provider = TokenAuthProvider("secret", storage, timedelta(minutes=1))
+        manager = AuthenticationManager([provider], decision_ttl=300)
+        token = await provider.generate_token(1)
+        assert await manager.authenticate_user(1, {"token": token})
+
+        # Token lifetime is checked on the wall clock
+        storage._tokens[1]["expires_at"] -= timedelta(minutes=2)
+        clock.advance(301)
+
+        assert not await manager.authenticate_user(1)
+        assert 1 not in manager.sessions
+        assert manager.is_denied(1)
+
+
+class TestInvalidation:
+    async def test_token_revoke_drops_session(self, clock):
+        provider = TokenAuthProvider("secret", InMemoryTokenStorage())
+        manager = AuthenticationManager([provider])
+        token = await provider.generate_token(1)
+        assert await manager.authenticate_user(1, {"token": token})
+
+        await provider.revoke_token(1)
+
+        assert not manager.is_authenticated(1)
+        assert not await manager.authenticate_user(1, {"token": token})
+        assert manager.stats["invalidations"] == 2  # generate + revoke
+
+    async def test_new_token_clears_negative_cache(self, clock):
+        provider = TokenAuthProvider("secret", InMemoryTokenStorage())
+        manager = AuthenticationManager([provider])
+        assert not await manager.authenticate_user(1)
+        assert manager.is_denied(1)
+
+        await provider.generate_token(1)
+
+        assert not manager.is_denied(1)
+
+    async def test_set_user_allowed_invalidates(self, clock, tmp_path: Path):
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}")
+        await db.initialize()
+        try:
+            users = UserRepository(db)
+            await users.create_user(UserModel(user_id=1, is_allowed=True))
+            provider = _SetProvider({1})
+            manager = AuthenticationManager([provider])
+            users.add_invalidation_listener(manager.invalidate)
+
+            assert await users.is_user_allowed(1)
+            assert await manager.authenticate_user(1)
+
+            await users.set_user_allowed(1, False)
+
+            assert not manager.is_authenticated(1)
+            # The repository's own cache was dropped as well
+            assert not await users.is_user_allowed(1)
+        finally:
+            await db.close()
+
+
+class TestSessionExpiry:
+    async def test_refreshed_session_is_requeued_not_expired(self, clock):
+        manager = AuthenticationManager([_SetProvider({1, 2})], decision_ttl=10**6)
+        timeout = timedelta(hours=24).total_seconds()
+        assert await manager.authenticate_user(1)
+        assert await manager.authenticate_user(2)
+
+        clock.advance(timeout - 10)
+        assert manager.refresh_session(1)
+        clock.advance(20)
+
+        assert manager.get_active_sessions_count() == 1
+        assert manager.is_authenticated(1)
+        assert not manager.is_authenticated(2)
+        assert manager.stats["expired_sessions"] == 1
+
+        clock.advance(timeout)
+        assert manager.get_active_sessions_count() == 0
+        assert manager.stats["expired_sessions"] == 2
+
+    async def test_check_and_refresh_extends_deadline(self, clock):
+        manager = AuthenticationManager([_SetProvider({1})], decision_ttl=10**6)
+        timeout = timedelta(hours=24).total_seconds()
+        assert await manager.authenticate_user(1)
+
+        clock.advance(timeout - 1)
+        assert manager.check_and_refresh(1)
+        clock.advance(timeout - 1)
+
+        assert manager.is_authenticated(1)
+
+    async def test_stale_heap_entry_of_replaced_session_is_skipped(self, clock):
+        provider = _SetProvider({1})
+        manager = AuthenticationManager([provider], decision_ttl=10**6)
+        timeout = timedelta(hours=24).total_seconds()
+        assert await manager.authenticate_user(1)
+
+        manager.end_session(1)
+        clock.advance(timeout / 2)
+        assert await manager.authenticate_user(1)
+        clock.advance(timeout / 2 + 1)
+
+        # Only the first session's entry is due; the new one survives
+        assert manager.is_authenticated(1)
+        assert manager.stats["expired_sessions"] == 0
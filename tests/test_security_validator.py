@@ -0,0 +1,105 @@
+"""Tests for SecurityValidator's resolved-path cache."""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from src.security.validators import SecurityValidator
+
+
+@pytest.fixture
+def approved(tmp_path: Path) -> Path:
+    directory = tmp_path / "approved"
+    directory.mkdir()
+    return directory.resolve()
+
+
+@pytest.fixture
+def outside(tmp_path: Path) -> Path:
+    directory = tmp_path / "outside"
+    directory.mkdir()
+    (directory / "secret").write_text("secret")
+    return directory.resolve()
+
+
+def test_plain_path_is_served_from_cache(approved: Path):
+    (approved / "a.py").write_text("x")
+    validator = SecurityValidator(approved, flexible_mode=True)
+
+    for _ in range(3):
+        valid, _, _ = validator.validate_path(str(approved / "a.py"), approved)
+        assert valid
+
+    stats = validator.get_path_cache_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+
+
+def test_file_swapped_for_symlink_is_rejected(approved: Path, outside: Path):
+    target = approved / "x"
+    target.write_text("hi")
+    validator = SecurityValidator(approved, flexible_mode=True)
+    assert validator.validate_path(str(target), approved)[0]
+
+    target.unlink()
+    os.symlink(outside / "secret", target)
+
+    valid, _, error = validator.validate_path(str(target), approved)
+    assert not valid
+    assert "outside approved directory" in error
+
+
+def test_parent_swapped_for_symlink_is_rejected(approved: Path, outside: Path):
+    sub = approved / "sub"
+    sub.mkdir()
+    (sub / "secret").write_text("mine")
+    validator = SecurityValidator(approved, flexible_mode=True)
+    assert validator.validate_path(str(sub / "secret"), approved)[0]
+
+    sub.rename(approved / "old")
+    os.symlink(outside, sub)
+
+    valid, _, _ = validator.validate_path(str(sub / "secret"), approved)
+    assert not valid
+
+
+def test_symlinked_paths_are_never_cached(approved: Path):
+    (approved / "real").write_text("x")
+    os.symlink(approved / "real", approved / "link")
+    validator = SecurityValidator(approved, flexible_mode=True)
+
+    for _ in range(2):
+        assert validator.validate_path(str(approved / "link"), approved)[0]
+
+    stats = validator.get_path_cache_stats()
+    assert stats["hits"] == 0
+    assert stats["uncacheable"] == 2
+
+
+def test_parent_moved_out_and_symlinked_back_is_rejected(approved: Path, outside: Path):
+    sub = approved / "sub"
+    sub.mkdir()
+    (sub / "f.txt").write_text("mine")
+    validator = SecurityValidator(approved, flexible_mode=True)
+    assert validator.validate_path(str(sub / "f.txt"), approved)[0]
+
+    # Same directory inode and same file inode, now reached through a symlink
+    sub.rename(outside / "sub")
+    os.symlink(outside / "sub", sub)
+
+    valid, _, error = validator.validate_path(str(sub / "f.txt"), approved)
+    assert not valid
+    assert "outside approved directory" in error
+    assert validator.get_path_cache_stats()["hits"] == 0
+
+
+def test_paths_outside_approved_directory_are_not_cached(approved: Path, outside: Path):
+    validator = SecurityValidator(approved, flexible_mode=True)
+
+    for _ in range(2):
+        assert not validator.validate_path(str(outside / "secret"), approved)[0]
+
+    stats = validator.get_path_cache_stats()
+    assert stats["hits"] == 0
+    assert stats["size"] == 0
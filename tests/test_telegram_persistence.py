@@ -0,0 +1,202 @@
+"""Tests for the SQLite-backed python-telegram-bot persistence."""
+
+import pickle
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from src.storage.database import DatabaseManager
+from src.storage.telegram_persistence import SQLitePersistence
+
+
+@pytest.fixture
+async def db(tmp_path: Path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}")
+    await manager.initialize()
+    yield manager
+    await manager.close()
+
+
+async def _load_user(db: DatabaseManager, user_id: int) -> Dict[Any, Any]:
+    """User data as a freshly started bot would see it."""
+    data: Dict[Any, Any] = {}
+    await SQLitePersistence(db).refresh_user_data(user_id, data)
+    return data
+
+
+class TestUserData:
+    async def test_round_trip(self, db):
+        persistence = SQLitePersistence(db)
+        await persistence.update_user_data(1, {"lang": "uk", ("tuple", 1): [1, 2]})
+        await persistence.flush()
+
+        assert await _load_user(db, 1) == {"lang": "uk", ("tuple", 1): [1, 2]}
+        assert await _load_user(db, 2) == {}
+
+    async def test_only_changed_keys_are_written(self, db):
+        persistence = SQLitePersistence(db)
+        await persistence.update_user_data(1, {"a": 1, "b": 2})
+        await persistence.flush()
+        assert persistence.stats["keys_written"] == 2
+
+        await persistence.update_user_data(1, {"a": 1, "b": 3})
+        await persistence.flush()
+
+        assert persistence.stats["keys_written"] == 3
+        assert persistence.stats["keys_unchanged"] == 1
+        assert await _load_user(db, 1) == {"a": 1, "b": 3}
+
+    async def test_removed_keys_are_deleted(self, db):
+        persistence = SQLitePersistence(db)
+        await persistence.update_user_data(1, {"a": 1, "b": 2})
+        await persistence.flush()
+
+        await persistence.update_user_data(1, {"b": 2})
+        await persistence.flush()
+
+        assert persistence.stats["keys_deleted"] == 1
+        assert await _load_user(db, 1) == {"b": 2}
+
+    async def test_loaded_keys_are_not_rewritten(self, db):
+        first = SQLitePersistence(db)
+        await first.update_user_data(1, {"a": 1})
+        await first.flush()
+
+        second = SQLitePersistence(db)
+        data: Dict[Any, Any] = {}
+        await second.refresh_user_data(1, data)
+        await second.update_user_data(1, data)
+        await second.flush()
+
+        assert second.stats["keys_written"] == 0
+        assert second.stats["keys_unchanged"] == 1
+
+    async def test_values_set_before_refresh_win(self, db):
+        first = SQLitePersistence(db)
+        await first.update_user_data(1, {"a": "stored", "b": "stored"})
+        await first.flush()
+
+        data = {"a": "new"}
+        await SQLitePersistence(db).refresh_user_data(1, data)
+
+        assert data == {"a": "new", "b": "stored"}
+
+    async def test_unpicklable_value_is_skipped(self, db):
+        persistence = SQLitePersistence(db)
+        await persistence.update_user_data(1, {"a": 1, "b": 2})
+        await persistence.flush()
+
+        await persistence.update_user_data(1, {"a": lambda: None, "b": 3})
+        await persistence.flush()
+
+        assert persistence.stats["unpicklable"] == 1
+        # The last value that could be written is kept, not deleted
+        assert await _load_user(db, 1) == {"a": 1, "b": 3}
+
+    async def test_drop_user_data(self, db):
+        persistence = SQLitePersistence(db)
+        await persistence.update_user_data(1, {"a": 1})
+        await persistence.update_user_data(2, {"a": 2})
+        await persistence.flush()
+
+        # A write still queued for the user is discarded as well
+        await persistence.update_user_data(1, {"a": 1, "b": 2})
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+
+        assert await _load_user(db, 1) == {}
+        assert await _load_user(db, 2) == {"a": 2}
+
+        data: Dict[Any, Any] = {}
+        await persistence.refresh_user_data(1, data)
+        assert data == {}
+
+    async def test_chat_data_is_separate_from_user_data(self, db):
+        persistence = SQLitePersistence(db)
+        await persistence.update_user_data(1, {"a": "user"})
+        await persistence.update_chat_data(1, {"a": "chat"})
+        await persistence.flush()
+
+        chat: Dict[Any, Any] = {}
+        await SQLitePersistence(db).refresh_chat_data(1, chat)
+
+        assert chat == {"a": "chat"}
+        assert await _load_user(db, 1) == {"a": "user"}
+
+
+class TestConversations:
+    async def test_update_and_remove(self, db):
+        persistence = SQLitePersistence(db)
+        await persistence.update_conversation("setup", (1, 2), "ASK_NAME")
+        await persistence.update_conversation("setup", (3, 4), "ASK_NAME")
+        await persistence.update_conversation("setup", (1, 2), "ASK_PATH")
+        await persistence.update_conversation("setup", (3, 4), None)
+        await persistence.update_conversation("other", (1, 2), 7)
+
+        fresh = SQLitePersistence(db)
+        assert await fresh.get_conversations("setup") == {(1, 2): "ASK_PATH"}
+        assert await fresh.get_conversations("other") == {(1, 2): 7}
+        assert await fresh.get_conversations("missing") == {}
+
+
+class TestLegacyImport:
+    @pytest.fixture
+    def legacy_file(self, tmp_path: Path) -> Path:
+        path = tmp_path / "bot_persistence.pickle"
+        with open(path, "wb") as f:
+            pickle.dump(
+                {
+                    "user_data": {1: {"lang": "uk"}, 2: {"lang": "en"}},
+                    "chat_data": {-5: {"topic": "x"}},
+                    "bot_data": {"ignored": True},
+                    "conversations": {"setup": {(1, 1): "ASK_NAME"}},
+                    "callback_data": None,
+                },
+                f,
+            )
+        return path
+
+    async def test_imports_and_renames_file(self, db, legacy_file: Path):
+        persistence = SQLitePersistence(db, legacy_pickle=legacy_file)
+
+        assert await persistence.get_user_data() == {}
+        await persistence.flush()
+
+        assert not legacy_file.exists()
+        assert legacy_file.with_name(legacy_file.name + ".migrated").exists()
+        assert await _load_user(db, 1) == {"lang": "uk"}
+        assert await _load_user(db, 2) == {"lang": "en"}
+
+        chat: Dict[Any, Any] = {}
+        await SQLitePersistence(db).refresh_chat_data(-5, chat)
+        assert chat == {"topic": "x"}
+        assert await persistence.get_conversations("setup") == {(1, 1): "ASK_NAME"}
+
+    async def test_import_runs_once(self, db, legacy_file: Path):
+        persistence = SQLitePersistence(db, legacy_pickle=legacy_file)
+        await persistence.get_user_data()
+        await persistence.get_chat_data()
+
+        assert persistence.stats["flushes"] == 1
+
+    async def test_not_imported_into_populated_table(self, db, legacy_file: Path):
+        first = SQLitePersistence(db)
+        await first.update_user_data(1, {"lang": "de"})
+        await first.flush()
+
+        persistence = SQLitePersistence(db, legacy_pickle=legacy_file)
+        await persistence.get_user_data()
+
+        assert legacy_file.exists()
+        assert await _load_user(db, 1) == {"lang": "de"}
+        assert await _load_user(db, 2) == {}
+
+    async def test_unreadable_file_is_left_alone(self, db, tmp_path: Path):
+        path = tmp_path / "bot_persistence.pickle"
+        path.write_bytes(b"not a pickle")
+
+        persistence = SQLitePersistence(db, legacy_pickle=path)
+        assert await persistence.get_user_data() == {}
+
+        assert path.exists()
@@ -0,0 +1,177 @@
+"""Tests for the Claude worker pool capacity limit and stale-worker retry."""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+import pytest
+
+from src.claude.integration import ClaudeProcessManager
+from src.claude.worker_pool import ClaudeWorkerPool
+from src.config.loader import create_test_config
+
+
+class _FakeWorker:
+    """Stand-in for ClaudeWorker without a subprocess."""
+
+    def __init__(self, working_directory: Path, session_id: Optional[str]):
+        self.working_directory = working_directory
+        self.session_id = session_id
+        self.requests_served = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        self.process = SimpleNamespace(returncode=None)
+
+    @property
+    def is_alive(self) -> bool:
+        return not self.closed
+
+    @property
+    def key(self):
+        return (str(self.working_directory), self.session_id)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class _Pool(ClaudeWorkerPool):
+    def __init__(self, max_workers: int):
+        super().__init__(
+            SimpleNamespace(
+                claude_worker_pool_size=0,
+                claude_worker_pool_max_workers=max_workers,
+                claude_worker_max_idle_seconds=600,
+                claude_worker_max_requests=50,
+            )
+        )
+        self.spawned: List[_FakeWorker] = []
+
+    async def _spawn(self, working_directory, session_id=None):
+        await asyncio.sleep(0)
+        worker = _FakeWorker(working_directory, session_id)
+        self.spawned.append(worker)
+        return worker
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _alive(pool: _Pool) -> int:
+    return sum(1 for worker in pool.spawned if not worker.closed)
+
+
+async def test_cold_lease_evicts_idle_worker_at_capacity(tmp_path: Path):
+    pool = _Pool(max_workers=1)
+    worker, _ = await pool.lease(tmp_path / "a")
+    await pool.release(worker, "s1")
+
+    other, warm = await pool.lease(tmp_path / "b")
+    await _settle()
+
+    assert not warm
+    assert worker.closed
+    assert _alive(pool) == 1
+    assert pool.get_stats()["evicted_capacity"] == 1
+    await pool.shutdown()
+
+
+async def test_cold_lease_waits_while_all_workers_leased(tmp_path: Path):
+    pool = _Pool(max_workers=1)
+    first, _ = await pool.lease(tmp_path)
+
+    second = asyncio.create_task(pool.lease(tmp_path, "other-session"))
+    await _settle()
+    assert not second.done()
+    assert len(pool.spawned) == 1
+    assert pool.get_stats()["capacity_waits"] == 1
+
+    await pool.release(first, "s1")
+    await _settle()
+    assert second.done()
+    assert _alive(pool) == 1
+    await pool.shutdown()
+
+
+async def test_concurrent_cold_leases_stay_under_cap(tmp_path: Path):
+    pool = _Pool(max_workers=2)
+
+    leases = [asyncio.create_task(pool.lease(tmp_path, f"s{i}")) for i in range(4)]
+    await _settle()
+    assert sum(task.done() for task in leases) == 2
+    assert len(pool.spawned) == 2
+
+    for task in [t for t in leases if t.done()]:
+        worker, _ = task.result()
+        await pool.release(worker, None)
+    await asyncio.wait_for(asyncio.gather(*leases), timeout=1)
+    await _settle()
+
+    assert _alive(pool) <= 2
+    await pool.shutdown()
+
+
+class _TurnWorker(_FakeWorker):
+    """Worker that fails to take the prompt or answers with a result line."""
+
+    def __init__(self, pid: int, send_error: Optional[Exception] = None):
+        super().__init__(Path("."), None)
+        self.process = SimpleNamespace(returncode=None, pid=pid)
+        self.send_error = send_error
+        self.stderr_tail = ""
+
+    async def send_prompt(self, prompt: str) -> None:
+        if self.send_error is not None:
+            raise self.send_error
+        self.requests_served += 1
+
+    async def lines(self):
+        yield json.dumps(
+            {"type": "result", "result": "done", "session_id": f"s{self.process.pid}"}
+        )
+
+
+class _ScriptedPool:
+    """Hands out prepared ``(worker, warm)`` leases and records releases."""
+
+    def __init__(self, leases: List[Tuple[_TurnWorker, bool]]):
+        self.leases = leases
+        self.released: List[Tuple[int, bool]] = []
+
+    async def lease(self, working_directory, session_id=None):
+        return self.leases.pop(0)
+
+    async def release(self, worker, session_id, healthy=True):
+        self.released.append((worker.process.pid, healthy))
+
+
+def _manager(tmp_path: Path, pool: _ScriptedPool) -> ClaudeProcessManager:
+    manager = ClaudeProcessManager(create_test_config(approved_directory=str(tmp_path)))
+    manager.worker_pool = pool
+    return manager
+
+
+@pytest.mark.parametrize("error", [BrokenPipeError(), ConnectionResetError()])
+async def test_warm_worker_with_closed_stdin_is_retried(tmp_path: Path, error):
+    pool = _ScriptedPool(
+        [(_TurnWorker(1, send_error=error), True), (_TurnWorker(2), False)]
+    )
+
+    response = await _manager(tmp_path, pool).execute_command("hi", tmp_path)
+
+    assert response.content == "done"
+    assert response.session_id == "s2"
+    assert pool.released == [(1, False), (2, True)]
+
+
+async def test_cold_worker_with_closed_stdin_is_not_retried(tmp_path: Path):
+    pool = _ScriptedPool([(_TurnWorker(1, send_error=BrokenPipeError()), False)])
+
+    with pytest.raises(BrokenPipeError):
+        await _manager(tmp_path, pool).execute_command("hi", tmp_path)
+
+    assert pool.released == [(1, False)]
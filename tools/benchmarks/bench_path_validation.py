@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for SecurityValidator.validate_path.
+
+Builds a deep synthetic project tree, replays a stream of path lookups
+(``/cd``, ``/ls`` and file tool calls repeat the same few paths a lot)
+through a validator with the path cache disabled and one with it enabled,
+and reports filesystem syscalls and wall time for each. Results are
+checked to be identical for every lookup.
+
+Syscalls are counted by wrapping ``os.lstat``, ``os.stat`` and
+``os.readlink``, which is what ``Path.resolve()`` goes through.
+
+Usage:
+    python tools/benchmarks/bench_path_validation.py --depth 12 --lookups 20000
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+VALIDATORS_PATH = ROOT / "src" / "security" / "validators.py"
+
+SYSCALLS = Counter()
+
+
+def load_validators():
+    """Load validators without importing the whole bot package."""
+    spec = importlib.util.spec_from_file_location("validators", VALIDATORS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def count_syscalls() -> None:
+    """Wrap the os functions used by path resolution with counters."""
+    for name in ("lstat", "stat", "readlink"):
+        original = getattr(os, name)
+
+        def wrapper(*args, _original=original, _name=name, **kwargs):
+            SYSCALLS[_name] += 1
+            return _original(*args, **kwargs)
+
+        setattr(os, name, wrapper)
+
+
+def build_tree(root: Path, depth: int, width: int) -> list:
+    """Create ``width`` nested chains ``depth`` levels deep; return all dirs."""
+    dirs = []
+    for branch in range(width):
+        current = root
+        for level in range(depth):
+            current = current / f"pkg{branch}_{level}"
+            current.mkdir()
+            (current / "module.py").write_text("pass\n")
+            dirs.append(current)
+    # One symlinked directory so the uncached path is exercised too
+    (root / "linked").symlink_to(dirs[0])
+    return dirs
+
+
+def make_lookups(root: Path, dirs: list, count: int, seed: int) -> list:
+    """(user_path, current_dir) pairs with a realistic amount of repetition."""
+    rng = random.Random(seed)
+    hot = rng.sample(dirs, min(20, len(dirs)))
+    lookups = []
+    for _ in range(count):
+        directory = rng.choice(hot) if rng.random() < 0.9 else rng.choice(dirs)
+        roll = rng.random()
+        if roll < 0.4:
+            lookups.append((str(directory.relative_to(root)), None))
+        elif roll < 0.8:
+            lookups.append(("module.py", directory))
+        elif roll < 0.9:
+            lookups.append(("missing.txt", directory))
+        else:
+            lookups.append(("linked/module.py", None))
+    return lookups
+
+
+def run(validator, lookups: list) -> dict:
+    SYSCALLS.clear()
+    results = []
+    started = time.perf_counter()
+    for user_path, current_dir in lookups:
+        results.append(validator.validate_path(user_path, current_dir))
+    elapsed = time.perf_counter() - started
+    return {
+        "results": results,
+        "syscalls": sum(SYSCALLS.values()),
+        "seconds": elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    validators = load_validators()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp).resolve()
+        dirs = build_tree(root, args.depth, args.width)
+        lookups = make_lookups(root, dirs, args.lookups, args.seed)
+
+        count_syscalls()
+        uncached = validators.SecurityValidator(root, path_cache_size=0)
+        cached = validators.SecurityValidator(root)
+
+        before = run(uncached, lookups)
+        after = run(cached, lookups)
+        if before["results"] != after["results"]:
+            raise AssertionError("Cached and uncached validation results differ")
+
+    print(f"{len(lookups)} lookups, depth {args.depth}, results identical")
+    header = f"{'validator':<10} {'syscalls':>10} {'per lookup':>11} {'seconds':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in (("uncached", before), ("cached", after)):
+        print(
+            f"{name:<10} {r['syscalls']:>10} "
+            f"{r['syscalls'] / len(lookups):>11.2f} {r['seconds']:>9.3f}"
+        )
+    print(f"cache: {cached.get_path_cache_stats()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
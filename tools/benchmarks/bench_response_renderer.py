@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for rendering Claude responses into Telegram messages.
+
+Runs synthetic (or recorded) responses of 50-500 KB through the legacy
+multi-pass ``ResponseFormatter`` pipeline and the single-pass
+``ResponseRenderer``, both on the whole text and fed in small pieces the
+way a streamed response arrives, and reports milliseconds and MB/s for
+each. Before timing, a golden corpus of edge cases plus every benchmark
+input is checked to render to byte-identical messages with both
+implementations; the benchmark aborts on the first difference.
+
+Usage:
+    python tools/benchmarks/bench_response_renderer.py --sizes 50 100 250 500
+    python tools/benchmarks/bench_response_renderer.py --corpus responses/
+"""
+
+import argparse
+import importlib.util
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parents[2]
+RENDERER_PATH = ROOT / "src" / "bot" / "utils" / "response_renderer.py"
+STREAM_PIECE_CHARS = 256
+
+GOLDEN_CASES = [
+    "",
+    "   \n\n  ",
+    "Hello",
+    "Line one\n\n\n\nLine two\n\n\n",
+    "Use [brackets] and a \\ backslash, `keep [this]` as is",
+    "```python\nprint('[x]')\n```",
+    "```\nunclosed [code]\n\n\n\nstill code",
+    "Text\n```py\na = [1]\n```\nmore\n```\nb\n```\n```js\nc\n```\n",
+    "Creating file src/app.py\nEditing file src/[x].py\nDone.",
+    "Intro\n\nWriting to out.txt\n\n```\nFile created inside code\n```\n",
+    "Reading file a\nReading file b\n \n\t\nplain after",
+    "  ``` indented fence\ncode\n  ```\n",
+    "````\nfour backticks\n````",
+    "```python extra\nx\n```\ntext ```inline``` here",
+    "x" * 9000,
+    ("Sentence number one. " * 500).strip(),
+    "```\n" + "\n".join(f"line {i} [v]" for i in range(2000)) + "\n```",
+    "```\n" + "continued " * 400 + "\n```\nCreating file x",
+    "Modified file a\n" + "y" * 12000 + "\n```\n" + "z" * 5000 + "\n```",
+    "\r\nwindows\r\n\r\n\r\nline\r\n",
+    "a\n\n\n\n\n```\n\n\n\n```\n\n\n\nb",
+]
+
+
+def load_renderer():
+    """Load response_renderer without importing the whole bot package."""
+    spec = importlib.util.spec_from_file_location("response_renderer", RENDERER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class LegacyFormatter:
+    """Original ResponseFormatter.format_claude_response pipeline."""
+
+    FILE_INDICATORS = [
+        "Creating file",
+        "Editing file",
+        "Reading file",
+        "Writing to",
+        "Modified file",
+        "Deleted file",
+        "File created",
+        "File updated",
+    ]
+
+    def __init__(self):
+        self.max_message_length = 4000
+        self.max_code_block_length = 3000
+
+    def format(self, text: str) -> List[str]:
+        text = self._clean_text(text)
+        if self._should_use_semantic_chunking(text):
+            messages = []
+            for chunk in self._semantic_chunk(text):
+                messages.extend(self._format_chunk(chunk))
+        else:
+            messages = self._split_message(self._format_code_blocks(text))
+        return messages
+
+    def _should_use_semantic_chunking(self, text: str) -> bool:
+        code_block_count = text.count("```")
+        has_file_operations = any(i in text for i in self.FILE_INDICATORS)
+        is_very_long = len(text) > self.max_message_length * 2
+        return code_block_count > 2 or has_file_operations or is_very_long
+
+    def _semantic_chunk(self, text: str) -> List[dict]:
+        chunks = []
+        for section in self._identify_sections(text):
+            if section["type"] == "code_block":
+                chunks.extend(self._chunk_code_block(section))
+            elif section["type"] == "file_operations":
+                chunks.append(
+                    {"type": "file_operations", "content": section["content"]}
+                )
+            else:
+                chunks.extend(self._chunk_text(section))
+        return chunks
+
+    def _identify_sections(self, text: str) -> List[dict]:
+        sections = []
+        lines = text.split("\n")
+        current_section = {"type": "text", "content": ""}
+        in_code_block = False
+
+        for line in lines:
+            if line.strip().startswith("```"):
+                if not in_code_block:
+                    if current_section["content"].strip():
+                        sections.append(current_section)
+                    in_code_block = True
+                    current_section = {"type": "code_block", "content": line + "\n"}
+                else:
+                    current_section["content"] += line + "\n"
+                    sections.append(current_section)
+                    in_code_block = False
+                    current_section = {"type": "text", "content": ""}
+            elif in_code_block:
+                current_section["content"] += line + "\n"
+            elif any(i in line for i in self.FILE_INDICATORS):
+                if current_section["type"] != "file_operations":
+                    if current_section["content"].strip():
+                        sections.append(current_section)
+                    current_section = {
+                        "type": "file_operations",
+                        "content": line + "\n",
+                    }
+                else:
+                    current_section["content"] += line + "\n"
+            else:
+                if current_section["type"] != "text":
+                    if current_section["content"].strip():
+                        sections.append(current_section)
+                    current_section = {"type": "text", "content": line + "\n"}
+                else:
+                    current_section["content"] += line + "\n"
+
+        if current_section["content"].strip():
+            sections.append(current_section)
+        return sections
+
+    def _chunk_code_block(self, section: dict) -> List[dict]:
+        content = section["content"]
+        if len(content) <= self.max_code_block_length:
+            return [{"type": "code_block", "content": content, "format": "single"}]
+
+        chunks = []
+        lines = content.split("\n")
+        current_chunk = lines[0] + "\n"
+        for line in lines[1:-1]:
+            if len(current_chunk + line + "\n```\n") > self.max_code_block_length:
+                current_chunk += "```"
+                chunks.append(
+                    {"type": "code_block", "content": current_chunk, "format": "split"}
+                )
+                current_chunk = "```\n" + line + "\n"
+            else:
+                current_chunk += line + "\n"
+        current_chunk += lines[-1]
+        chunks.append(
+            {"type": "code_block", "content": current_chunk, "format": "split"}
+        )
+        return chunks
+
+    def _chunk_text(self, section: dict) -> List[dict]:
+        content = section["content"]
+        if len(content) <= self.max_message_length:
+            return [{"type": "text", "content": content}]
+
+        chunks = []
+        current_chunk = ""
+        for sentence in content.split(". "):
+            test_chunk = current_chunk + sentence + ". "
+            if len(test_chunk) > self.max_message_length:
+                if current_chunk:
+                    chunks.append({"type": "text", "content": current_chunk.strip()})
+                current_chunk = sentence + ". "
+            else:
+                current_chunk = test_chunk
+        if current_chunk:
+            chunks.append({"type": "text", "content": current_chunk.strip()})
+        return chunks
+
+    def _format_chunk(self, chunk: dict) -> List[str]:
+        content = chunk["content"]
+        if chunk["type"] == "code_block":
+            if chunk.get("format") == "split" and "continued" in content:
+                title = "📄 **Code (continued)**"
+            else:
+                title = "📄 **Code**"
+            text = f"{title}\n\n{content}"
+        elif chunk["type"] == "file_operations":
+            text = f"📁 **File Operations**\n\n{content}"
+        else:
+            text = content
+        return self._split_message(text)
+
+    def _clean_text(self, text: str) -> str:
+        text = re.sub(r"\n{3,}", "\n\n", text)
+        text = self._escape_markdown_outside_code(text)
+        return text.strip()
+
+    def _escape_markdown_outside_code(self, text: str) -> str:
+        parts = []
+        in_code_block = False
+        for line in text.split("\n"):
+            if line.strip().startswith("```"):
+                in_code_block = not in_code_block
+                parts.append(line)
+            elif in_code_block:
+                parts.append(line)
+            else:
+                segments = line.split("`")
+                for i, segment in enumerate(segments):
+                    if i % 2 == 0:
+                        segments[i] = (
+                            segment.replace("\\", "\\\\")
+                            .replace("[", r"\[")
+                            .replace("]", r"\]")
+                        )
+                parts.append("`".join(segments))
+        return "\n".join(parts)
+
+    def _format_code_blocks(self, text: str) -> str:
+        def replace_code_block(match):
+            lang = match.group(1) or ""
+            code = match.group(2)
+            if lang and lang.lower() not in ["text", "plain"]:
+                code = f"# {lang}\n{code}"
+            if len(code) > self.max_code_block_length:
+                code = code[: self.max_code_block_length - 50] + "\n... (truncated)"
+            return f"```\n{code}\n```"
+
+        return re.sub(r"```(\w+)?\n(.*?)```", replace_code_block, text, flags=re.DOTALL)
+
+    def _split_message(self, text: str) -> List[str]:
+        if len(text) <= self.max_message_length:
+            return [text]
+
+        messages = []
+        current_lines = []
+        current_length = 0
+        in_code_block = False
+
+        for line in text.split("\n"):
+            line_length = len(line) + 1
+            if line.strip() == "```":
+                in_code_block = not in_code_block
+
+            if line_length > self.max_message_length:
+                step = self.max_message_length - 100
+                for i in range(0, len(line), step):
+                    chunk = line[i : i + step]
+                    chunk_length = len(chunk) + 1
+                    if (
+                        current_length + chunk_length > self.max_message_length
+                        and current_lines
+                    ):
+                        if in_code_block:
+                            current_lines.append("```")
+                        messages.append("\n".join(current_lines))
+                        current_lines = []
+                        current_length = 0
+                        if in_code_block:
+                            current_lines.append("```")
+                            current_length = 4
+                    current_lines.append(chunk)
+                    current_length += chunk_length
+                continue
+
+            if current_length + line_length > self.max_message_length and current_lines:
+                if in_code_block:
+                    current_lines.append("```")
+                messages.append("\n".join(current_lines))
+                current_lines = []
+                current_length = 0
+                if in_code_block:
+                    current_lines.append("```")
+                    current_length = 4
+
+            current_lines.append(line)
+            current_length += line_length
+
+        if current_lines:
+            if in_code_block:
+                current_lines.append("```")
+            messages.append("\n".join(current_lines))
+        return messages
+
+
+def render_streamed(renderer, text: str, piece: int = STREAM_PIECE_CHARS) -> List[str]:
+    stream = renderer.stream()
+    messages = []
+    for start in range(0, len(text), piece):
+        messages.extend(stream.feed(text[start : start + piece]))
+    messages.extend(stream.close())
+    return messages
+
+
+def generate_response(size_kb: int, seed: int = 42) -> str:
+    """Claude-like response of roughly ``size_kb`` KB.
+
+    Prose paragraphs with links and inline code, fenced code blocks of
+    varying size, file-operation lines and the odd run of blank lines.
+    """
+    rng = random.Random(seed)
+    target = size_kb * 1024
+    parts = []
+    written = 0
+    while written < target:
+        roll = rng.random()
+        if roll < 0.45:
+            sentences = [
+                'The handler reads `context.user_data["current_directory"]` first.',
+                "See [the docs](https://docs.python-telegram-bot.org) for details.",
+                "This keeps the rate limiter state in a single dict.",
+                "Paths like C:\\Users\\bot are escaped before sending.",
+                "Nothing else changes in the middleware order.",
+            ]
+            part = " ".join(rng.choice(sentences) for _ in range(rng.randint(2, 12)))
+        elif roll < 0.8:
+            lang = rng.choice(["python", "bash", "", "json"])
+            lines = [
+                f'    value_{i} = compute(items[{i}], key="k{i}")'
+                for i in range(rng.randint(3, 300))
+            ]
+            part = f"```{lang}\n" + "\n".join(lines) + "\n```"
+        elif roll < 0.95:
+            verb = rng.choice(["Creating file", "Editing file", "Reading file"])
+            part = "\n".join(
+                f"{verb} src/module_{rng.randint(0, 99)}.py"
+                for _ in range(rng.randint(1, 5))
+            )
+        else:
+            part = "\n" * rng.randint(2, 6)
+        parts.append(part)
+        written += len(part) + 2
+    return "\n\n".join(parts)
+
+
+def check_equivalence(texts: List[str], renderer) -> int:
+    """Assert byte-identical output; returns the number of messages."""
+    legacy = LegacyFormatter()
+    total = 0
+    for index, text in enumerate(texts):
+        expected = legacy.format(text)
+        for name, actual in (
+            ("render", renderer.render(text)),
+            ("streamed", render_streamed(renderer, text)),
+            ("char-streamed", render_streamed(renderer, text, 1)),
+        ):
+            if actual != expected:
+                raise AssertionError(
+                    f"{name} output differs for input #{index} ({len(text)} chars)"
+                )
+        total += len(expected)
+    return total
+
+
+def time_run(name: str, func, text: str, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - started)
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+    return {
+        "impl": name,
+        "kb": round(size_mb * 1024),
+        "ms": round(best * 1000, 2),
+        "mb_per_sec": round(size_mb / best, 1) if best else 0,
+    }
+
+
+def print_table(results: list) -> None:
+    header = f"{'impl':<10} {'kb':>6} {'ms':>9} {'MB/s':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['impl']:<10} {r['kb']:>6} {r['ms']:>9} {r['mb_per_sec']:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--corpus",
+        type=Path,
+        help="Directory of recorded responses, one .txt/.md file each",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    module = load_renderer()
+    renderer = module.ResponseRenderer()
+    if args.corpus:
+        inputs = [
+            path.read_text(encoding="utf-8")
+            for path in sorted(args.corpus.iterdir())
+            if path.suffix in (".txt", ".md")
+        ]
+    else:
+        inputs = [generate_response(size, args.seed + size) for size in args.sizes]
+
+    messages = check_equivalence(GOLDEN_CASES + inputs, renderer)
+    print(
+        f"{len(GOLDEN_CASES)} golden cases + {len(inputs)} inputs, "
+        f"{messages} messages, output identical",
+        file=sys.stderr,
+    )
+
+    legacy = LegacyFormatter()
+    results = []
+    for text in inputs:
+        results.append(time_run("legacy", legacy.format, text, args.repeat))
+        results.append(time_run("renderer", renderer.render, text, args.repeat))
+        results.append(
+            time_run(
+                "streamed",
+                lambda t: render_streamed(renderer, t),
+                text,
+                args.repeat,
+            )
+        )
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
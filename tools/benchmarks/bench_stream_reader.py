@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for Claude stream-json line framing.
+
+Replays recorded (or synthetic) stream-json transcripts through the legacy
+``buffer += chunk`` / ``split`` reader and the linear-time ``LineFramer``
+and reports lines per second and peak RSS for each run. Every run happens in
+a fresh subprocess so that peak RSS is not polluted by earlier runs.
+
+Usage:
+    python tools/benchmarks/bench_stream_reader.py --sizes 1 10 100
+    python tools/benchmarks/bench_stream_reader.py --transcript run.jsonl
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+STREAM_READER_PATH = ROOT / "src" / "claude" / "stream_reader.py"
+CHUNK_SIZE = 64 * 1024
+
+
+def load_stream_reader():
+    """Load stream_reader without importing the whole bot package."""
+    spec = importlib.util.spec_from_file_location("stream_reader", STREAM_READER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FileStream:
+    """Minimal asyncio-stream stand-in that reads a file on demand."""
+
+    def __init__(self, path: Path):
+        self._fh = open(path, "rb")
+
+    async def read(self, n: int) -> bytes:
+        data = self._fh.read(n)
+        if not data:
+            self._fh.close()
+        return data
+
+
+async def legacy_lines(stream):
+    """Original ClaudeProcessManager._read_stream_bounded algorithm."""
+    buffer = b""
+    while True:
+        chunk = await stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            yield line.decode("utf-8", errors="replace").strip()
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace").strip()
+
+
+async def framer_lines(stream, module, max_line_bytes: int):
+    framer = module.LineFramer(max_line_bytes)
+    async for line in module.iter_stream_lines(stream, framer, CHUNK_SIZE):
+        yield line
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    # ru_maxrss survives exec on Linux (it would include the parent's peak),
+    # so prefer the per-address-space high-water mark when available
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak / divisor
+
+
+async def replay(path: Path, reader: str, max_line_bytes: int) -> dict:
+    stream = FileStream(path)
+    if reader == "legacy":
+        lines = legacy_lines(stream)
+    else:
+        lines = framer_lines(stream, load_stream_reader(), max_line_bytes)
+
+    count = 0
+    started = time.perf_counter()
+    async for _ in lines:
+        count += 1
+    elapsed = time.perf_counter() - started
+
+    size_mb = path.stat().st_size / (1024 * 1024)
+    return {
+        "reader": reader,
+        "transcript": path.name,
+        "size_mb": round(size_mb, 1),
+        "lines": count,
+        "seconds": round(elapsed, 3),
+        "lines_per_sec": round(count / elapsed) if elapsed else 0,
+        "mb_per_sec": round(size_mb / elapsed, 1) if elapsed else 0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def generate_transcript(path: Path, size_mb: int, seed: int = 42) -> None:
+    """Write a synthetic stream-json transcript of roughly ``size_mb`` MB.
+
+    Mix of small assistant/tool_use events and occasional multi-MB
+    tool_result lines, which is what makes the legacy reader quadratic.
+    """
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(json.dumps({"type": "system", "subtype": "init", "tools": []}))
+        fh.write("\n")
+        while written < target:
+            roll = rng.random()
+            if roll < 0.02:
+                payload = "x" * rng.randint(1, 4) * 1024 * 1024
+                event = {
+                    "type": "tool_result",
+                    "tool_use_id": f"toolu_{written}",
+                    "result": {"content": payload, "is_error": False},
+                }
+            elif roll < 0.3:
+                event = {
+                    "type": "assistant",
+                    "message": {
+                        "content": [
+                            {
+                                "type": "tool_use",
+                                "id": f"toolu_{written}",
+                                "name": "Bash",
+                                "input": {"command": "ls -la src"},
+                            }
+                        ]
+                    },
+                }
+            else:
+                text = "Lorem ipsum dolor sit amet. " * rng.randint(1, 40)
+                event = {
+                    "type": "assistant",
+                    "message": {"content": [{"type": "text", "text": text}]},
+                }
+            line = json.dumps(event) + "\n"
+            fh.write(line)
+            written += len(line)
+        fh.write(json.dumps({"type": "result", "result": "done"}) + "\n")
+
+
+def run_child(path: Path, reader: str, max_line_bytes: int) -> dict:
+    """Run a single replay in a fresh interpreter and return its stats."""
+    cmd = [
+        sys.executable,
+        __file__,
+        "--child",
+        reader,
+        "--transcript",
+        str(path),
+        "--max-line-bytes",
+        str(max_line_bytes),
+    ]
+    output = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def print_table(results: list) -> None:
+    header = (
+        f"{'transcript':<24} {'reader':<8} {'MB':>7} {'lines':>9} "
+        f"{'lines/s':>11} {'MB/s':>8} {'peak RSS MB':>12}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['transcript']:<24} {r['reader']:<8} {r['size_mb']:>7} "
+            f"{r['lines']:>9} {r['lines_per_sec']:>11} {r['mb_per_sec']:>8} "
+            f"{r['peak_rss_mb']:>12}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--transcript",
+        type=Path,
+        action="append",
+        help="Recorded stream-json transcript to replay (repeatable)",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=[1, 10, 100],
+        help="Synthetic transcript sizes in MB when no transcript is given",
+    )
+    parser.add_argument("--max-line-bytes", type=int, default=16 * 1024 * 1024)
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="Only benchmark the new framer (legacy is quadratic on big lines)",
+    )
+    parser.add_argument("--child", choices=["legacy", "framer"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        stats = asyncio.run(replay(args.transcript[0], args.child, args.max_line_bytes))
+        print(json.dumps(stats))
+        return
+
+    readers = ["framer"] if args.skip_legacy else ["legacy", "framer"]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        transcripts = args.transcript or []
+        if not transcripts:
+            for size in args.sizes:
+                path = Path(tmp) / f"synthetic_{size}mb.jsonl"
+                generate_transcript(path, size)
+                transcripts.append(path)
+
+        for path in transcripts:
+            for reader in readers:
+                results.append(run_child(path, reader, args.max_line_bytes))
+
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()